@@ -88,6 +88,29 @@ class MetadataManager:
             pass
         return end_date
 
+    def set_startup_phases(self):
+        """
+        Add the number of seconds it took slips to reach each startup
+        phase (e.g. first_flow_processed) to the metadata file and the db
+        """
+        phases: dict = self.main.db.get_startup_phases()
+        # stored even if metadata is disabled, it's how we know how much
+        # traffic was missed while slips was starting
+        self.main.db.set_input_metadata({"startup_phases": json.dumps(phases)})
+        if not self.enable_metadata:
+            return phases
+
+        try:
+            with open(self.info_path, "a") as f:
+                f.write("Startup phases (seconds since slips started):\n")
+                for phase, elapsed in sorted(
+                    phases.items(), key=lambda phase: phase[1]
+                ):
+                    f.write(f"\t{phase}: {elapsed}\n")
+        except (NameError, AttributeError):
+            pass
+        return phases
+
     def get_zeek_version(self) -> str:
         """
         Get the version of zeek/bro used if zeek is used. (e.g. in pcaps
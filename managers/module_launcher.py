@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import importlib
+import time
+import traceback
+from typing import Optional
+from multiprocessing import (
+    Event,
+    Process,
+)
+
+from slips_files.common.printer import Printer
+from slips_files.core.output import Output
+
+
+class ModuleLauncher(Process):
+    """
+    Imports and runs a slips module in its own process.
+
+    slips.py only knows the name, class and description of each module
+    from the module manifest, the module itself is imported here, after
+    the fork. This way the heavy dependencies of each module (e.g.
+    tensorflow, sklearn, stix2) are only loaded by the process that uses
+    them instead of being loaded by slips.py and inherited by every
+    other child.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        module_name: str,
+        class_name: str,
+        logger: Output,
+        output_dir,
+        redis_port,
+        termination_event,
+        module_kwargs: Optional[dict] = None,
+    ):
+        Process.__init__(self)
+        # the name of the module, e.g. "ARP". the rest of slips
+        # identifies the process of each module by it
+        self.name = name
+        # e.g. modules.arp.arp
+        self.module_name = module_name
+        self.class_name = class_name
+        self.logger = logger
+        self.output_dir = output_dir
+        self.redis_port = redis_port
+        self.termination_event = termination_event
+        # passed to the init() of the module, e.g. the id of the worker
+        # for modules that run in several processes
+        self.module_kwargs = module_kwargs or {}
+        # set once the module is initialized and subscribed to its
+        # channels, or once it failed to
+        self.ready = Event()
+        self.failed = Event()
+
+    def import_module_class(self):
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.class_name)
+
+    def run(self):
+        try:
+            start = time.time()
+            module_class = self.import_module_class()
+            imported = time.time()
+            module = module_class(
+                self.logger,
+                self.output_dir,
+                self.redis_port,
+                self.termination_event,
+                **self.module_kwargs,
+            )
+            initialized = time.time()
+        except Exception as e:
+            # process_manager.py reports that the module failed to start
+            printer = Printer(self.logger, self.name)
+            printer.print(
+                f"Something wrong happened while "
+                f"importing the module {self.module_name}: {e}",
+                0,
+                1,
+            )
+            printer.print(traceback.format_exc(), 0, 1)
+            self.failed.set()
+            self.ready.set()
+            return
+
+        module.db.set_module_startup_times(
+            self.name,
+            {
+                "import": round(imported - start, 3),
+                "init": round(initialized - imported, 3),
+            },
+        )
+        self.ready.set()
+        module.run()
@@ -1,8 +1,7 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
+import ast
 import asyncio
-import importlib
-import inspect
 import os
 import pkgutil
 import signal
@@ -21,6 +20,7 @@ from typing import (
     List,
     Tuple,
     Dict,
+    Optional,
 )
 
 from exclusiveprocess import (
@@ -30,11 +30,9 @@ from exclusiveprocess import (
 import multiprocessing
 
 import modules
+from managers.module_launcher import ModuleLauncher
 from modules.update_manager.update_manager import UpdateManager
 from slips_files.common.slips_utils import utils
-from slips_files.common.abstracts.module import (
-    IModule,
-)
 
 from slips_files.common.style import green
 from slips_files.core.evidence_handler import EvidenceHandler
@@ -44,6 +42,10 @@ from slips_files.core.profiler import Profiler
 
 
 class ProcessManager:
+    # max seconds to wait for all modules to be imported and initialized
+    # in their processes before starting the input
+    module_init_timeout = 60
+
     def __init__(self, main):
         self.main = main
         # this will be set by main.py if slips is not daemonized,
@@ -57,6 +59,8 @@ class ProcessManager:
         # shutdown at the very end of all other slips modules.
         self.evidence_handler_termination_event: Event = Event()
         self.stopped_modules = []
+        # modules that couldn't be read, imported or initialized
+        self.failed_to_load_modules = 0
         # used to stop slips when these 2 are done
         # since the semaphore count is zero, slips.py will wait until another
         # thread (input and profiler)
@@ -210,71 +214,99 @@ class ProcessManager:
                 return True
         return False
 
-    def is_abstract_module(self, obj) -> bool:
-        return obj.name in ("IModule", "AsyncModule")
+    def is_abstract_module(self, class_name: str) -> bool:
+        return class_name in ("IModule", "AsyncModule")
+
+    def get_module_manifest(self, path: str) -> Optional[Dict[str, str]]:
+        """
+        Finds the slips module defined in the given file without
+        importing it, so that the dependencies of each module are only
+        imported in the process of that module.
+        :return: the class, name and description of the IModule subclass
+        in the given file, or None if there's none
+        """
+        with open(path) as module_file:
+            tree = ast.parse(module_file.read(), filename=path)
+
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            bases = {
+                getattr(base, "id", getattr(base, "attr", None))
+                for base in node.bases
+            }
+            if not bases & {"IModule", "AsyncModule"}:
+                continue
+            if self.is_abstract_module(node.name):
+                continue
+
+            attributes = {}
+            for statement in node.body:
+                if (
+                    isinstance(statement, ast.Assign)
+                    and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name)
+                    and statement.targets[0].id in ("name", "description")
+                ):
+                    attributes[statement.targets[0].id] = ast.literal_eval(
+                        statement.value
+                    )
+
+            return {
+                "class": node.name,
+                "name": attributes.get("name", node.name),
+                "description": attributes.get("description", ""),
+            }
 
     def get_modules(self):
         """
         Get modules from the 'modules' folder.
+        The modules aren't imported here, only their manifest is read.
+        each one is imported by the process that runs it.
         """
-        # This plugins import will automatically load the modules
-        # and put them in the __modules__ variable
         plugins = {}
         failed_to_load_modules = 0
 
         # __path__ is the current path of this python program
         look_for_modules_in = modules.__path__
         prefix = f"{modules.__name__}."
-        # Walk recursively through all modules and packages found on the .
-        # folder.
-        for loader, module_name, ispkg in pkgutil.walk_packages(
-            look_for_modules_in, prefix
-        ):
-            # If current item is a package, skip.
-            if ispkg:
+        for module_info in pkgutil.iter_modules(look_for_modules_in):
+            # If current item isn't a package, skip.
+            if not module_info.ispkg:
                 continue
 
             # to avoid loading everything in the dir,
             # only load modules that have the same name as the dir name
-            dir_name = module_name.split(".")[1]
-            file_name = module_name.split(".")[2]
-            if dir_name != file_name:
+            dir_name = module_info.name
+            module_name = f"{prefix}{dir_name}.{dir_name}"
+            path = os.path.join(
+                module_info.module_finder.path, dir_name, f"{dir_name}.py"
+            )
+            if not os.path.exists(path):
                 continue
 
             if self.is_ignored_module(module_name):
                 continue
 
-            # Try to import the module, otherwise skip.
             try:
-                # "level specifies whether to use absolute or relative imports.
-                # The default is -1 which
-                # indicates both absolute and relative imports will
-                # be attempted.
-                # 0 means only perform absolute imports.
-                # Positive values for level indicate the number of parent
-                # directories to search relative to the directory of the
-                # module calling __import__()."
-                module = importlib.import_module(module_name)
-            except ImportError as e:
+                manifest = self.get_module_manifest(path)
+            except (SyntaxError, ValueError) as e:
                 print(
                     f"Something wrong happened while "
-                    f"importing the module {module_name}: {e}"
+                    f"reading the module {module_name}: {e}"
                 )
                 print(traceback.format_exc())
                 failed_to_load_modules += 1
                 continue
 
-            # Walk through all members of currently imported modules.
-            for member_name, member_object in inspect.getmembers(module):
-                # Check if current member is a class.
-                if inspect.isclass(member_object) and (
-                    issubclass(member_object, IModule)
-                    and not self.is_abstract_module(member_object)
-                ):
-                    plugins[member_object.name] = dict(
-                        obj=member_object,
-                        description=member_object.description,
-                    )
+            if not manifest:
+                continue
+
+            plugins[manifest["name"]] = dict(
+                module=module_name,
+                class_name=manifest["class"],
+                description=manifest["description"],
+            )
 
         # Change the order of the blocking module(load it first)
         # so it can receive msgs sent from other modules
@@ -299,23 +331,97 @@ class ProcessManager:
         self.main.print(f"Disabled Modules: {self.modules_to_ignore}", 1, 0)
 
     def load_modules(self):
-        """responsible for starting all the modules in the modules/ dir"""
-        modules_to_call = self.get_modules()[0]
-        for module_name in modules_to_call:
-            module_class = modules_to_call[module_name]["obj"]
-            module = module_class(
-                self.main.logger,
-                self.main.args.output,
-                self.main.redis_port,
-                self.termination_event,
-            )
-            module.start()
-            self.main.db.store_pid(module_name, int(module.pid))
+        """
+        responsible for starting all the modules in the modules/ dir
+        each module is imported and initialized in its own process, this
+        function returns once all of them are subscribed to their
+        channels so they don't miss the msgs of the input and profiler
+        """
+        modules_to_call, self.failed_to_load_modules = self.get_modules()
+        launchers: List[ModuleLauncher] = []
+        descriptions: Dict[str, str] = {}
+        for module_name, module_info in modules_to_call.items():
+            for worker_name, module_kwargs in self.get_module_workers(
+                module_name
+            ):
+                launcher = ModuleLauncher(
+                    worker_name,
+                    module_info["module"],
+                    module_info["class_name"],
+                    self.main.logger,
+                    self.main.args.output,
+                    self.main.redis_port,
+                    self.termination_event,
+                    module_kwargs=module_kwargs,
+                )
+                launcher.start()
+                launchers.append(launcher)
+                descriptions[worker_name] = module_info["description"]
+                # stored right away so the module is stopped with the
+                # rest of slips even if it takes too long to start
+                self.main.db.store_pid(worker_name, int(launcher.pid))
+
+        started: List[ModuleLauncher] = []
+        deadline = time.time() + self.module_init_timeout
+        for launcher in launchers:
+            if not launcher.ready.wait(max(deadline - time.time(), 0)):
+                self.main.print(
+                    f"Module {launcher.name} is taking too long to "
+                    f"start, not waiting for it."
+                )
+            elif launcher.failed.is_set():
+                self.main.print(
+                    f"Module {launcher.name} failed to start. "
+                    f"Check errors.log for details.",
+                    0,
+                    1,
+                )
+                self.main.db.delete_pid(launcher.name)
+                self.failed_to_load_modules += 1
+                continue
+
+            started.append(launcher)
             self.print_started_module(
-                module_name,
-                module.pid,
-                modules_to_call[module_name]["description"],
+                launcher.name,
+                launcher.pid,
+                descriptions[launcher.name],
+            )
+
+        if self.failed_to_load_modules:
+            self.main.print(
+                f"{self.failed_to_load_modules} modules failed to load.",
+                1,
+                0,
             )
+        return started
+
+    def get_module_workers(
+        self, module_name: str
+    ) -> List[Tuple[str, Dict[str, int]]]:
+        """
+        returns the name and the init() kwargs of each process the given
+        module runs in.
+        modules run in 1 process unless they support workers and more
+        than 1 worker is configured for them, in that case each worker
+        handles a partition of the profiles
+        """
+        workers = {
+            "Flow Alerts": self.main.conf.flowalerts_workers(),
+        }.get(module_name, 1)
+        if workers <= 1:
+            return [(module_name, {})]
+
+        return [
+            (
+                (
+                    module_name
+                    if worker_id == 0
+                    else f"{module_name} {worker_id}"
+                ),
+                {"worker_id": worker_id, "workers": workers},
+            )
+            for worker_id in range(workers)
+        ]
 
     def print_started_module(
         self, module_name: str, module_pid: int, module_description: str
@@ -341,13 +447,16 @@ class ProcessManager:
 
     def start_update_manager(self, local_files=False, ti_feeds=False):
         """
-        starts the update manager process
+        updates the given files using the update manager in this process
         PS; this function is blocking, slips.py will not start the rest of the
          module unless this functionis done
         :kwarg local_files: if true, updates the local ports and
                 org files from disk
         :kwarg ti_feeds: if true, updates the remote TI feeds.
-            PS: this takes time.
+            PS: this takes time. slips doesn't use it on startup anymore,
+            the remote feeds are updated in the background by the update
+            manager module, and the TI module defers the lookups until
+            they're ready if wait_for_TI_to_finish is enabled.
         """
         try:
             # only one instance of slips should be able to update ports
@@ -734,6 +843,7 @@ class ProcessManager:
 
             analysis_time, end_date = self.get_analysis_time()
             self.main.metadata_man.set_analysis_end_date(end_date)
+            self.main.metadata_man.set_startup_phases()
 
             print(
                 f"Analysis of {self.main.input_information} "
@@ -1,9 +1,12 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
+import json
 import os
 import subprocess
 import sys
 
+import psutil
+
 
 class ProfilersManager:
     def __init__(self, main):
@@ -118,3 +121,53 @@ class ProfilersManager:
             and self.memory_profiler_enabled
         ):
             self.memory_profiler.stop()
+
+    def print_startup_profile(self):
+        """
+        prints how long slips took to reach each startup phase, how long
+        each module took to be imported and initialized in its process,
+        and the memory used by slips.py. the report is saved to
+        startup_profile.json in the output dir too.
+        only used with --profile-startup
+        """
+        if not self.main.args.profile_startup:
+            return
+
+        process = psutil.Process()
+        start_time = self.main.db.get_slips_start_time()
+        report = {
+            # seconds slips.py spent before starting the db, mostly
+            # importing its dependencies
+            "imports": (
+                round(float(start_time) - process.create_time(), 3)
+                if start_time
+                else None
+            ),
+            "phases": self.main.db.get_startup_phases(),
+            "modules": self.main.db.get_modules_startup_times(),
+            "slips_py_rss_mb": round(process.memory_info().rss / 1024**2, 1),
+        }
+        path = os.path.join(self.main.args.output, "startup_profile.json")
+        with open(path, "w") as profile:
+            json.dump(report, profile, indent=2)
+
+        lines = [
+            "Startup profile:",
+            f"\tslips.py imports: {report['imports']}s",
+        ]
+        for phase, elapsed in sorted(
+            report["phases"].items(), key=lambda phase: phase[1]
+        ):
+            lines.append(f"\t{phase}: {elapsed}s since slips started")
+
+        lines.append("\tModules (import, init):")
+        for module, times in sorted(
+            report["modules"].items(),
+            key=lambda module: sum(module[1].values()),
+            reverse=True,
+        ):
+            lines.append(f"\t\t{module}: {times['import']}s, {times['init']}s")
+        lines.append(f"\tslips.py RSS: {report['slips_py_rss_mb']} MB")
+        lines.append(f"\tSaved to {path}")
+        self.main.print("\n".join(lines))
+        return report
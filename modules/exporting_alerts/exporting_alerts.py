@@ -74,9 +74,8 @@ class ExportingAlerts(IModule):
                     evidence["evidence_type"],
                     evidence["attacker"]["value"],
                 )
+                # the indicators are pushed to the taxii server
+                # every push_delay by the stix exporting thread
                 added_to_stix: bool = self.stix.add_to_stix_file(msg_to_send)
-                if added_to_stix:
-                    # now export to taxii
-                    self.stix.export()
-                else:
+                if not added_to_stix:
                     self.print("Problem in add_to_stix_file()", 0, 3)
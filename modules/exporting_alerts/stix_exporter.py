@@ -5,6 +5,12 @@ from cabby import create_client
 import time
 import threading
 import os
+from typing import (
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from slips_files.common.abstracts.exporter import IExporter
 from slips_files.common.parsers.config_parser import ConfigParser
@@ -22,11 +28,14 @@ class StixExporter(IExporter):
                 f"Exporting to Stix & TAXII very "
                 f"{self.push_delay} seconds."
             )
-            # This bundle should be created once and we should
-            # append all indicators to it
-            self.is_bundle_created = False
-            # To avoid duplicates in STIX_data.json
-            self.added_ips = set()
+            # indicators added since the last push. they're written to
+            # STIX_data.json in one bundle once per push
+            self.pending_indicators: List[Indicator] = []
+            # the push thread and the module access the pending indicators
+            self.lock = threading.Lock()
+            # (ioc type, value) of the exported ips, domains and urls,
+            # to avoid exporting duplicates
+            self.exported_iocs: Set[Tuple[str, str]] = set()
             self.export_to_taxii_thread = threading.Thread(
                 target=self.schedule_sending_to_taxii_server, daemon=True
             )
@@ -85,14 +94,16 @@ class StixExporter(IExporter):
             stix_data = stix_file.read()
         return stix_data
 
-    def export(self) -> bool:
+    def export(self, stix_data: Optional[str] = None) -> bool:
         """
         Exports evidence/alerts to the TAXII server
         Uses Inbox Service (TAXII Service to Support Producer-initiated
          pushes of cyber threat information) to publish
         our STIX_data.json file
+        :param stix_data: the content of STIX_data.json if it's already
+        known, to avoid reading the file again
         """
-        if not self.should_export:
+        if not self.should_export():
             return False
 
         client = self.create_client()
@@ -102,7 +113,8 @@ class StixExporter(IExporter):
         if not self.inbox_service_exists_in_taxii_server(services):
             return False
 
-        stix_data: str = self.read_stix_file()
+        if stix_data is None:
+            stix_data: str = self.read_stix_file()
 
         # Make sure we don't push empty files
         if len(stix_data) == 0:
@@ -128,7 +140,7 @@ class StixExporter(IExporter):
         """Exits gracefully"""
         # We need to publish to taxii server before stopping
         if self.should_export():
-            self.export()
+            self.push()
 
     def should_export(self) -> bool:
         """Determines whether to export or not"""
@@ -160,9 +172,22 @@ class StixExporter(IExporter):
         # stopping
         return True
 
-    def ip_exists_in_stix_file(self, ip):
-        """Searches for ip in STIX_data.json to avoid exporting duplicates"""
-        return ip in self.added_ips
+    @staticmethod
+    def get_ioc_key(ioc_type: str, attacker: str) -> Tuple[str, str]:
+        """
+        returns the key used to detect duplicate iocs. domains are case
+        insensitive and may be written with a trailing dot
+        """
+        if ioc_type == "domain":
+            attacker = attacker.lower().rstrip(".")
+        return ioc_type, attacker
+
+    def is_exported(self, ioc_type: str, attacker: str) -> bool:
+        """
+        checks if the given ip, domain or url was already exported to
+        avoid exporting duplicates
+        """
+        return self.get_ioc_key(ioc_type, attacker) in self.exported_iocs
 
     def get_ioc_pattern(self, ioc_type: str, attacker) -> str:
         patterns_map = {
@@ -170,29 +195,33 @@ class StixExporter(IExporter):
             "domain": f"[domain-name:value = '{attacker}']",
             "url": f"[url:value = '{attacker}']",
         }
-        if ioc_type not in ioc_type:
+        if ioc_type not in patterns_map:
             self.print(f"Can't set pattern for STIX. {attacker}", 0, 3)
             return False
         return patterns_map[ioc_type]
 
     def add_to_stix_file(self, to_add: tuple) -> bool:
         """
-        Function to export evidence to a STIX_data.json file in the cwd.
-        It keeps appending the given indicator to STIX_data.json until they're
-         sent to the
-        taxii server
+        Adds the given evidence to the indicators that are written to
+        STIX_data.json and sent to the taxii server in the next push.
+        Ips, domains and urls that were already exported are skipped.
         msg_to_send is a tuple: (evidence_type,attacker)
             evidence_type: e.g PortScan, ThreatIntelligence etc
-            attacker: ip of the attcker
+            attacker: ip, domain or url of the attacker
         """
         evidence_type, attacker = (
             to_add[0],
             to_add[1],
         )
+        ioc_type = utils.detect_ioc_type(attacker)
+        if self.is_exported(ioc_type, attacker):
+            return True
+
         # Get the right description to use in stix
         name = evidence_type
-        ioc_type = utils.detect_ioc_type(attacker)
         pattern: str = self.get_ioc_pattern(ioc_type, attacker)
+        if not pattern:
+            return False
         # Required Indicator Properties: type, spec_version, id, created,
         # modified , all are set automatically
         # Valid_from, created and modified attribute will
@@ -202,38 +231,49 @@ class StixExporter(IExporter):
         indicator = Indicator(
             name=name, pattern=pattern, pattern_type="stix"
         )  # the pattern language that the indicator pattern is expressed in.
-        # Create and Populate Bundle.
-        # All our indicators will be inside bundle['objects'].
-        bundle = Bundle()
-        if not self.is_bundle_created:
-            bundle = Bundle(indicator)
-            # Clear everything in the existing STIX_data.json
-            # if it's not empty
-            open(self.stix_filename, "w").close()
-            # Write the bundle.
-            with open(self.stix_filename, "w") as stix_file:
-                stix_file.write(str(bundle))
-            self.is_bundle_created = True
-        elif not self.ip_exists_in_stix_file(attacker):
-            # Bundle is already created just append to it
-            # r+ to delete last 4 chars
-            with open(self.stix_filename, "r+") as stix_file:
-                # delete the last 4 characters in the file ']\n}\n' so we
-                # can append to the objects array and add them back later
-                stix_file.seek(0, os.SEEK_END)
-                stix_file.seek(stix_file.tell() - 4, 0)
-                stix_file.truncate()
-
-            # Append mode to add the new indicator to the objects array
-            with open(self.stix_filename, "a") as stix_file:
-                # Append the indicator in the objects array
-                stix_file.write(f",{str(indicator)}" + "]\n}\n")
-
-        # Set of unique ips added to stix_data.json to avoid duplicates
-        self.added_ips.add(attacker)
+        with self.lock:
+            self.pending_indicators.append(indicator)
+        self.exported_iocs.add(self.get_ioc_key(ioc_type, attacker))
         self.print("Indicator added to STIX_data.json", 2, 0)
         return True
 
+    def write_stix_file(self) -> str:
+        """
+        Writes all the pending indicators to STIX_data.json in one bundle.
+        The bundle is written to a temporary file first and then renamed,
+        so a crash never leaves a half written STIX_data.json
+        returns the written bundle or "" if there are no pending
+        indicators
+        """
+        with self.lock:
+            indicators: List[Indicator] = self.pending_indicators
+            self.pending_indicators = []
+
+        if not indicators:
+            return ""
+
+        # All our indicators will be inside bundle['objects'].
+        bundle = str(Bundle(objects=indicators))
+        tmp_filename = f"{self.stix_filename}.tmp"
+        with open(tmp_filename, "w") as stix_file:
+            stix_file.write(bundle)
+        os.replace(tmp_filename, self.stix_filename)
+        return bundle
+
+    def push(self) -> Optional[bool]:
+        """
+        writes the pending indicators to STIX_data.json and sends them to
+        the taxii server
+        returns None if there was nothing to push
+        """
+        stix_data: str = self.write_stix_file()
+        if not stix_data:
+            return None
+        exported: bool = self.export(stix_data)
+        # Delete stix_data.json file so we don't send duplicates
+        os.remove(self.stix_filename)
+        return exported
+
     def schedule_sending_to_taxii_server(self):
         """
         Responsible for publishing STIX_data.json to the taxii server every
@@ -245,16 +285,11 @@ class StixExporter(IExporter):
             time.sleep(self.push_delay)
             # Sometimes the time's up and we need to send to
             # server again but there's no
-            # new alerts in stix_data.json yet
-            if os.path.exists(self.stix_filename):
-                self.export()
-                # Delete stix_data.json file so we don't send duplicates
-                os.remove(self.stix_filename)
-                self.is_bundle_created = False
-            else:
+            # new alerts yet
+            if self.push() is None:
                 self.print(
                     f"{self.push_delay} seconds passed, "
-                    f"no new alerts in STIX_data.json.",
+                    f"no new alerts to export to STIX.",
                     2,
                     0,
                 )
@@ -82,6 +82,12 @@ class FidesModule(IModule):
         self.sqlite = SQLiteDB(
             self.logger,
             os.path.join(os.getcwd(), self.__trust_model_config.database),
+            service_history_max_size=(
+                self.__trust_model_config.service_history_max_size
+            ),
+            recommendation_history_max_size=(
+                self.__trust_model_config.recommendations.history_max_size
+            ),
         )
 
     def read_configuration(self):
@@ -181,6 +187,11 @@ class FidesModule(IModule):
     def shutdown_gracefully(self):
         self.sqlite.close()
         self.network_fides_queue.stop_all_queue_threads()
+        metrics = self.network_fides_queue.get_metrics()
+        for channel, channel_metrics in metrics.items():
+            self.print(
+                f"Messages received on {channel}: {channel_metrics}", 2, 0
+            )
 
     def pre_main(self):
         """
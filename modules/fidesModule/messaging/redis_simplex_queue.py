@@ -1,16 +1,127 @@
-from threading import Thread
-from typing import Callable, Optional
+import time
+from threading import (
+    Event,
+    Lock,
+    Thread,
+)
+from typing import Callable, Dict, List, Optional
 
 
 from slips_files.core.database.database_manager import DBManager
 from ..messaging.queue import Queue
 from ..utils.logger import Logger
-from dataclasses import dataclass
-from typing import List, Optional
 
 logger = Logger(__name__)
 
 
+class QueueListener(Thread):
+    """
+    Thread that hands the messages received by a redis pubsub to a
+    callback.
+
+    It blocks on the socket of the pubsub until a message arrives
+    instead of polling it every few ms, so it doesn't use any CPU while
+    no peers are talking. Once a message arrives, the messages that
+    arrived meanwhile are handled in the same batch.
+    """
+
+    def __init__(
+        self,
+        pubsub,
+        on_batch: Callable[[List[dict]], None],
+        timeout: float = 1,
+        max_batch_size: int = 100,
+    ):
+        """
+        :param on_batch: called with each batch of received redis msgs
+        :param timeout: max seconds to block waiting for a msg before
+        checking if the thread was stopped
+        :param max_batch_size: max number of msgs handed off at once
+        """
+        super().__init__(daemon=True)
+        self.pubsub = pubsub
+        self.on_batch = on_batch
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self._stopped = Event()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    batch = self.get_batch()
+                except Exception as ex:
+                    # the connection was closed or lost
+                    if not self._stopped.is_set():
+                        logger.error(f"Error when receiving messages: {ex}")
+                    return
+                if batch:
+                    self.on_batch(batch)
+        finally:
+            # release the redis connection of the pubsub once stopped
+            self.pubsub.close()
+
+    def get_batch(self) -> List[dict]:
+        """
+        blocks until a msg arrives or the timeout is reached, then
+        returns it along with the msgs that are already waiting
+        """
+        msg = self.pubsub.get_message(timeout=self.timeout)
+        if msg is None:
+            return []
+
+        batch = [msg]
+        while len(batch) < self.max_batch_size and not self._stopped.is_set():
+            # returns right away if there are no more waiting msgs
+            if (msg := self.pubsub.get_message(timeout=0)) is None:
+                break
+            batch.append(msg)
+        return batch
+
+    def stop(self):
+        self._stopped.set()
+
+
+class ChannelMetrics:
+    """Latency and backlog of the messages received on a channel"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.messages = 0
+        self.batches = 0
+        # number of msgs that were waiting to be handled at once
+        self.last_backlog = 0
+        self.max_backlog = 0
+        # seconds between receiving a msg and being done handling it
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add_batch(self, size: int):
+        with self.lock:
+            self.batches += 1
+            self.last_backlog = size
+            self.max_backlog = max(self.max_backlog, size)
+
+    def add_message(self, latency: float):
+        with self.lock:
+            self.messages += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "messages": self.messages,
+                "batches": self.batches,
+                "last_backlog": self.last_backlog,
+                "max_backlog": self.max_backlog,
+                "avg_latency": (
+                    self.total_latency / self.messages if self.messages else 0
+                ),
+                "max_latency": self.max_latency,
+            }
+
+
 class RedisSimplexQueue(Queue):
     """
     Implementation of Queue interface that uses two Redis queues.
@@ -28,6 +139,7 @@ class RedisSimplexQueue(Queue):
         # to keep track of the threads opened by this class to be able to
         # close them later
         self._threads = []
+        self.metrics = ChannelMetrics()
 
     def send(self, serialized_data: str, **argv):
         self.db.publish(self.__send, serialized_data)
@@ -36,33 +148,38 @@ class RedisSimplexQueue(Queue):
         self,
         on_message: Callable[[str], None],
         block: bool = False,
-        sleep_time_in_new_thread: float = 0.001,
+        timeout: float = 1,
+        max_batch_size: int = 100,
         **argv,
     ):
         """Starts listening, if :param: block = True,
-        the method blocks current thread!"""
+        the method blocks current thread!
+        :param timeout: max seconds the listener thread blocks waiting
+        for a message before checking if it was stopped
+        :param max_batch_size: max number of waiting messages the
+        listener thread handles at once
+        """
         if block:
             return self.__listen_blocking(on_message)
         else:
-            return self.__register_handler(
-                on_message, sleep_time_in_new_thread
-            )
+            return self.__register_handler(on_message, timeout, max_batch_size)
 
     def __register_handler(
         self,
         on_message: Callable[[str], None],
-        sleep_time_in_new_thread: float,
+        timeout: float,
+        max_batch_size: int,
     ) -> Thread:
-        # subscribe with given
-        self.__pub.subscribe(
-            **{self.__receive: lambda x: self.__exec_message(x, on_message)}
-        )
-        # creates a new thread
-        # this is simply a wrapper around `get_message()` that runs in a
-        # separate thread
-        self.__pub_sub_thread = self.__pub.run_in_thread(
-            sleep_time=sleep_time_in_new_thread
+        # subscribe without a handler, the listener thread gets the msgs
+        # and passes them to on_message
+        self.__pub.subscribe(self.__receive)
+        self.__pub_sub_thread = QueueListener(
+            self.__pub,
+            lambda batch: self.__exec_batch(batch, on_message),
+            timeout=timeout,
+            max_batch_size=max_batch_size,
         )
+        self.__pub_sub_thread.start()
         self._threads.append(self.__pub_sub_thread)
         return self.__pub_sub_thread
 
@@ -72,7 +189,24 @@ class RedisSimplexQueue(Queue):
         #    self.__pub.subscribe(self.__receive)
 
         for msg in self.__pub.listen():
-            self.__exec_message(msg, on_message)
+            self.__exec_batch([msg], on_message)
+
+    def __exec_batch(
+        self, redis_msgs: List[dict], on_message: Callable[[str], None]
+    ):
+        received = time.time()
+        self.metrics.add_batch(len(redis_msgs))
+        for redis_msg in redis_msgs:
+            self.__exec_message(redis_msg, on_message)
+            self.metrics.add_message(time.time() - received)
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        returns the number of received messages, the backlog and the
+        latency of handling the messages of the channel this queue
+        listens on. latencies are in seconds
+        """
+        return {self.__receive: self.metrics.to_dict()}
 
     def __exec_message(
         self, redis_msg: dict, on_message: Callable[[str], None]
@@ -95,13 +229,12 @@ class RedisSimplexQueue(Queue):
             )
             # unsubscribe from the receive queue
             self.__pub.unsubscribe(self.__receive)
-            self.__pub.close()
-            # and stop thread if it is possible
-            try:
-                if hasattr(self.__pub_sub_thread, "stop"):
-                    self.__pub_sub_thread.stop()
-            except Exception as ex:
-                logger.debug(f"Error when stopping thread: {ex}")
+            # and stop thread if it is possible, it closes the pubsub
+            # once it stops
+            if isinstance(self.__pub_sub_thread, QueueListener):
+                self.__pub_sub_thread.stop()
+            else:
+                self.__pub.close()
             return
         logger.debug(f"New message received! {data}")
 
@@ -5,7 +5,8 @@ Python has None, SQLite has NULL, conversion is automatic in both ways.
 """
 import os
 import sqlite3
-from typing import List, Any, Optional
+from contextlib import contextmanager
+from typing import List, Any, Optional, Dict, Iterable, Tuple
 
 from slips_files.core.output import Output
 from ..model.peer import PeerInfo
@@ -20,16 +21,35 @@ import threading
 class SQLiteDB:
     _lock = threading.RLock()
     name = "Fides SQLiteDB"
-
-    def __init__(self, logger: Output, db_path: str) -> None:
+    # max number of peer ids passed to one IN (...) clause, sqlite
+    # limits the number of params of a query
+    query_chunk_size = 500
+
+    def __init__(
+        self,
+        logger: Output,
+        db_path: str,
+        service_history_max_size: Optional[int] = None,
+        recommendation_history_max_size: Optional[int] = None,
+    ) -> None:
         """
         Initializes the SQLiteDB instance, sets up logging, and connects to the database.
 
         :param logger: Logger for logging debug information.
         :param db_path: Path where the SQLite database will be stored.
+        :param service_history_max_size: Max number of service history
+        records kept per peer, None keeps all of them. The trust
+        evaluation only uses this many of the latest records anyway.
+        :param recommendation_history_max_size: Same as above for the
+        recommendation history.
         """
         self.logger = logger
         self.db_path = db_path
+        self.service_history_max_size = service_history_max_size
+        self.recommendation_history_max_size = recommendation_history_max_size
+        # number of nested transaction() blocks we're in. queries are
+        # only committed once the outermost one exits
+        self.__transaction_depth = 0
         with open(self.db_path, "a") as f:
             f.close()
         sqlite3.connect(self.db_path).close()
@@ -101,93 +121,132 @@ class SQLiteDB:
         # Execute the query
         self.__execute_query(query, params)
 
-    def store_peer_trust_data(self, peer_trust_data: PeerTrustData) -> None:
+    @contextmanager
+    def transaction(self):
+        """
+        Groups all the queries executed inside this block in a single
+        transaction that is committed once the block exits, or rolled
+        back if it raises.
+        """
         with SQLiteDB._lock:
-            # Insert PeerInfo first to ensure the peer exists
-            self.__execute_query(
-                """
-                INSERT OR REPLACE INTO PeerInfo (peerID, ip)
-                VALUES (?, ?);
-            """,
-                (peer_trust_data.info.id, peer_trust_data.info.ip),
-            )
+            self.__transaction_depth += 1
+            try:
+                yield
+            except Exception:
+                self.__transaction_depth -= 1
+                if not self.__transaction_depth:
+                    self.connection.rollback()
+                raise
+            self.__transaction_depth -= 1
+            if not self.__transaction_depth:
+                self.connection.commit()
 
-            # Insert organisations for the peer into the PeerOrganisation table
-            for org_id in peer_trust_data.info.organisations:
-                self.__execute_query(
-                    """
-                    INSERT OR REPLACE INTO PeerOrganisation (peerID, organisationID)
-                    VALUES (?, ?);
-                """,
-                    (peer_trust_data.info.id, org_id),
-                )
+    def store_peer_trust_data(self, peer_trust_data: PeerTrustData) -> None:
+        """
+        Stores or overwrites the trust data and the history of the given
+        peer in a single transaction.
+        """
+        self.store_peers_trust_data([peer_trust_data])
 
-            # Insert PeerTrustData itself
-            self.__execute_query(
-                """
-                INSERT INTO PeerTrustData (
-                    peerID, has_fixed_trust, service_trust, reputation, recommendation_trust,
-                    competence_belief, integrity_belief, initial_reputation_provided_by_count
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-                (
-                    peer_trust_data.info.id,
-                    int(peer_trust_data.has_fixed_trust),
-                    peer_trust_data.service_trust,
-                    peer_trust_data.reputation,
-                    peer_trust_data.recommendation_trust,
-                    peer_trust_data.competence_belief,
-                    peer_trust_data.integrity_belief,
-                    peer_trust_data.initial_reputation_provided_by_count,
-                ),
-            )
+    def store_peers_trust_data(
+        self, peers_trust_data: Iterable[PeerTrustData]
+    ) -> None:
+        """
+        Stores or overwrites the trust data and the history of all the
+        given peers in a single transaction.
+        Only the latest service_history_max_size and
+        recommendation_history_max_size history records of each peer
+        are kept.
+        """
+        with self.transaction():
+            for peer_trust_data in peers_trust_data:
+                self.__store_peer_trust_data(peer_trust_data)
 
-            # Prepare to insert service history and link to PeerTrustData
-            for sh in peer_trust_data.service_history:
-                self.__execute_query(
-                    """
-                    INSERT INTO ServiceHistory (peerID, satisfaction, weight, service_time)
-                    VALUES (?, ?, ?, ?);
-                """,
-                    (
-                        peer_trust_data.info.id,
-                        sh.satisfaction,
-                        sh.weight,
-                        sh.timestamp,
-                    ),
-                )
+    def __store_peer_trust_data(self, peer_trust_data: PeerTrustData) -> None:
+        peer_id = peer_trust_data.info.id
+        # Insert PeerInfo first to ensure the peer exists
+        self.__execute_query(
+            """
+            INSERT OR REPLACE INTO PeerInfo (peerID, ip)
+            VALUES (?, ?);
+        """,
+            (peer_id, peer_trust_data.info.ip),
+        )
 
-                # Insert into PeerTrustServiceHistory
-                self.__execute_query(
-                    """
-                    INSERT INTO PeerTrustServiceHistory (peer_trust_data_id, service_history_id)
-                    VALUES (last_insert_rowid(), last_insert_rowid());
-                """
-                )
+        # Insert organisations for the peer into the PeerOrganisation table
+        self.__execute_many(
+            """
+            INSERT OR REPLACE INTO PeerOrganisation (peerID, organisationID)
+            VALUES (?, ?);
+        """,
+            [
+                (peer_id, org_id)
+                for org_id in peer_trust_data.info.organisations
+            ],
+        )
+
+        # the given trust data and history replace the old ones
+        for table in (
+            "PeerTrustData",
+            "ServiceHistory",
+            "RecommendationHistory",
+        ):
+            self.__delete(table, "peerID = ?", [peer_id])
+
+        self.__execute_query(
+            """
+            INSERT INTO PeerTrustData (
+                peerID, has_fixed_trust, service_trust, reputation, recommendation_trust,
+                competence_belief, integrity_belief, initial_reputation_provided_by_count
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+        """,
+            (
+                peer_id,
+                int(peer_trust_data.has_fixed_trust),
+                peer_trust_data.service_trust,
+                peer_trust_data.reputation,
+                peer_trust_data.recommendation_trust,
+                peer_trust_data.competence_belief,
+                peer_trust_data.integrity_belief,
+                peer_trust_data.initial_reputation_provided_by_count,
+            ),
+        )
 
-            # Prepare to insert recommendation history and link to PeerTrustData
-            for rh in peer_trust_data.recommendation_history:
-                self.__execute_query(
-                    """
-                    INSERT INTO RecommendationHistory (peerID, satisfaction, weight, recommend_time)
-                    VALUES (?, ?, ?, ?);
-                """,
-                    (
-                        peer_trust_data.info.id,
-                        rh.satisfaction,
-                        rh.weight,
-                        rh.timestamp,
-                    ),
+        self.__execute_many(
+            """
+            INSERT INTO ServiceHistory (peerID, satisfaction, weight, service_time)
+            VALUES (?, ?, ?, ?);
+        """,
+            [
+                (peer_id, sh.satisfaction, sh.weight, sh.timestamp)
+                for sh in self.__get_window(
+                    peer_trust_data.service_history,
+                    self.service_history_max_size,
                 )
+            ],
+        )
 
-                # Insert into PeerTrustRecommendationHistory
-                self.__execute_query(
-                    """
-                    INSERT INTO PeerTrustRecommendationHistory (peer_trust_data_id, recommendation_history_id)
-                    VALUES (last_insert_rowid(), last_insert_rowid());
-                """
+        self.__execute_many(
+            """
+            INSERT INTO RecommendationHistory (peerID, satisfaction, weight, recommend_time)
+            VALUES (?, ?, ?, ?);
+        """,
+            [
+                (peer_id, rh.satisfaction, rh.weight, rh.timestamp)
+                for rh in self.__get_window(
+                    peer_trust_data.recommendation_history,
+                    self.recommendation_history_max_size,
                 )
+            ],
+        )
+
+    @staticmethod
+    def __get_window(history: List[Any], max_size: Optional[int]) -> List:
+        """returns the latest max_size records of the given history"""
+        if max_size is None or len(history) <= max_size:
+            return history
+        return history[len(history) - max_size :]
 
     def get_peers_by_minimal_recommendation_trust(
         self, minimal_recommendation_trust: float
@@ -205,44 +264,85 @@ class SQLiteDB:
             query, [minimal_recommendation_trust]
         )
 
-        peer_list = []
-        for row in result_rows:
-            peer_id = row[0]
-            ip = row[1]
-
-            # Get the organisations for the peer using the get_peer_organisations method below
-            organisations = self.get_peer_organisations(peer_id)
-
-            # Create a PeerInfo instance with the retrieved organisations and IP
-            peer_info = PeerInfo(
-                id=peer_id, organisations=organisations, ip=ip
-            )
-            peer_list.append(peer_info)
+        organisations = self.get_peers_organisations(
+            [row[0] for row in result_rows]
+        )
+        return [
+            PeerInfo(id=peer_id, organisations=organisations[peer_id], ip=ip)
+            for peer_id, ip in result_rows
+        ]
 
-        return peer_list
+    def get_peer_trust_data(self, peer_id: str) -> Optional[PeerTrustData]:
+        """
+        Returns the trust data of the given peer or None if there's none.
+        """
+        return self.get_peers_trust_data([peer_id]).get(peer_id)
 
-    def get_peer_trust_data(self, peer_id: str) -> PeerTrustData:
-        # Fetch PeerTrustData along with PeerInfo
-        query_peer_trust = """
-        SELECT ptd.*, pi.peerID, pi.ip
-        FROM PeerTrustData ptd
-        JOIN PeerInfo pi ON ptd.peerID = pi.peerID
-        WHERE ptd.peerID = ?;
+    def get_peers_trust_data(
+        self, peer_ids: List[PeerId]
+    ) -> Dict[PeerId, PeerTrustData]:
         """
-        peer_trust_row = self.__execute_query(query_peer_trust, [peer_id])
+        Loads the trust data of all the given peers using one query per
+        table for every query_chunk_size peers, instead of 4 queries per
+        peer.
 
-        # If no result found, return None
-        if not peer_trust_row:
-            return None
+        :param peer_ids: IDs of the peers to load.
+        :return: {peer_id: PeerTrustData}, peers without trust data
+        aren't included.
+        """
+        peer_ids = list(dict.fromkeys(peer_ids))
+        out = {}
+        for start in range(0, len(peer_ids), self.query_chunk_size):
+            out.update(
+                self.__get_peers_trust_data(
+                    peer_ids[start : start + self.query_chunk_size]
+                )
+            )
+        return out
 
-        peer_trust_row = peer_trust_row[
-            0
-        ]  # Get the first row (since fetchall() returns a list of rows)
+    def __get_peers_trust_data(
+        self, peer_ids: List[PeerId]
+    ) -> Dict[PeerId, PeerTrustData]:
+        placeholders = ",".join("?" for _ in peer_ids)
+        # databases created by older versions may have more than one
+        # row per peer, the latest one is the current trust data
+        trust_rows = self.__execute_query(
+            f"""
+            SELECT ptd.peerID, ptd.has_fixed_trust, ptd.service_trust,
+                ptd.reputation, ptd.recommendation_trust,
+                ptd.competence_belief, ptd.integrity_belief,
+                ptd.initial_reputation_provided_by_count, pi.ip
+            FROM PeerTrustData ptd
+            JOIN PeerInfo pi ON ptd.peerID = pi.peerID
+            WHERE ptd.id IN (
+                SELECT MAX(id) FROM PeerTrustData
+                WHERE peerID IN ({placeholders})
+                GROUP BY peerID
+            );
+            """,
+            peer_ids,
+        )
+        if not trust_rows:
+            return {}
+
+        found_peer_ids = [row[0] for row in trust_rows]
+        organisations = self.get_peers_organisations(found_peer_ids)
+        service_history = self.__get_peers_history(
+            "ServiceHistory",
+            "service_time",
+            ServiceHistoryRecord,
+            found_peer_ids,
+        )
+        recommendation_history = self.__get_peers_history(
+            "RecommendationHistory",
+            "recommend_time",
+            RecommendationHistoryRecord,
+            found_peer_ids,
+        )
 
-        # Unpack PeerTrustData row (adjust indices based on your column order)
-        (
-            trust_data_id,
-            peerID,
+        out = {}
+        for (
+            peer_id,
             has_fixed_trust,
             service_trust,
             reputation,
@@ -250,66 +350,55 @@ class SQLiteDB:
             competence_belief,
             integrity_belief,
             initial_reputation_count,
-            _,
             ip,
-        ) = peer_trust_row
-
-        # Fetch ServiceHistory for the peer
-        query_service_history = """
-        SELECT sh.satisfaction, sh.weight, sh.service_time
-        FROM ServiceHistory sh
-        JOIN PeerTrustServiceHistory pts ON sh.id = pts.service_history_id
-        JOIN PeerTrustData ptd ON pts.peer_trust_data_id = ptd.id
-        WHERE ptd.peerID = ?;
-        """
-        service_history_rows = self.__execute_query(
-            query_service_history, [peer_id]
-        )
-
-        service_history = [
-            ServiceHistoryRecord(
-                satisfaction=row[0], weight=row[1], timestamp=row[2]
+        ) in trust_rows:
+            out[peer_id] = PeerTrustData(
+                info=PeerInfo(
+                    id=peer_id, organisations=organisations[peer_id], ip=ip
+                ),
+                has_fixed_trust=bool(has_fixed_trust),
+                service_trust=service_trust,
+                reputation=reputation,
+                recommendation_trust=recommendation_trust,
+                competence_belief=competence_belief,
+                integrity_belief=integrity_belief,
+                initial_reputation_provided_by_count=initial_reputation_count,
+                service_history=service_history[peer_id],
+                recommendation_history=recommendation_history[peer_id],
             )
-            for row in service_history_rows
-        ]
+        return out
 
-        # Fetch RecommendationHistory for the peer
-        query_recommendation_history = """
-        SELECT rh.satisfaction, rh.weight, rh.recommend_time
-        FROM RecommendationHistory rh
-        JOIN PeerTrustRecommendationHistory ptr ON rh.id = ptr.recommendation_history_id
-        JOIN PeerTrustData ptd ON ptr.peer_trust_data_id = ptd.id
-        WHERE ptd.peerID = ?;
+    def __get_peers_history(
+        self,
+        table: str,
+        time_column: str,
+        record_class: type,
+        peer_ids: List[PeerId],
+    ) -> Dict[PeerId, List[Any]]:
+        """
+        Returns {peer_id: [history records ordered by insertion]} of the
+        given history table for all the given peers.
         """
-        recommendation_history_rows = self.__execute_query(
-            query_recommendation_history, [peer_id]
+        placeholders = ",".join("?" for _ in peer_ids)
+        rows = self.__execute_query(
+            f"""
+            SELECT peerID, satisfaction, weight, {time_column}
+            FROM {table}
+            WHERE peerID IN ({placeholders})
+            ORDER BY id;
+            """,
+            peer_ids,
         )
-
-        recommendation_history = [
-            RecommendationHistoryRecord(
-                satisfaction=row[0], weight=row[1], timestamp=row[2]
+        history = {peer_id: [] for peer_id in peer_ids}
+        for peer_id, satisfaction, weight, timestamp in rows:
+            history[peer_id].append(
+                record_class(
+                    satisfaction=satisfaction,
+                    weight=weight,
+                    timestamp=timestamp,
+                )
             )
-            for row in recommendation_history_rows
-        ]
-
-        # Construct PeerInfo
-        peer_info = PeerInfo(
-            id=peerID, organisations=self.get_peer_organisations(peerID), ip=ip
-        )  # Assuming organisation info is not fetched here.
-
-        # Construct and return PeerTrustData object
-        return PeerTrustData(
-            info=peer_info,
-            has_fixed_trust=bool(has_fixed_trust),
-            service_trust=service_trust,
-            reputation=reputation,
-            recommendation_trust=recommendation_trust,
-            competence_belief=competence_belief,
-            integrity_belief=integrity_belief,
-            initial_reputation_provided_by_count=initial_reputation_count,
-            service_history=service_history,
-            recommendation_history=recommendation_history,
-        )
+        return history
 
     def get_peers_by_organisations(
         self, organisation_ids: List[str]
@@ -403,28 +492,18 @@ class SQLiteDB:
 
         :return: A list of PeerInfo instances.
         """
-        peer_info_list = []
-
         with SQLiteDB._lock:
-            # Step 1: Query the PeerInfo table to get all peer information
-            peer_info_query = "SELECT peerID, ip FROM PeerInfo"
-            peer_info_results = self.__execute_query(peer_info_query)
-
-            # Step 2: For each peer, get the associated organisations from PeerOrganisation table
-            for row in peer_info_results:
-                peer_id = row[0]  # peerID is the first column
-                ip = row[1]  # ip is the second column
-
-                # Step 3: Get associated organisations from PeerOrganisation table
-                organisations = self.get_peer_organisations(peer_id)
-
-                # Step 4: Create the PeerInfo object and add to the list
-                peer_info = PeerInfo(
-                    id=peer_id, organisations=organisations, ip=ip
-                )
-                peer_info_list.append(peer_info)
+            peer_info_results = self.__execute_query(
+                "SELECT peerID, ip FROM PeerInfo"
+            )
+            organisations = self.get_peers_organisations(
+                [row[0] for row in peer_info_results]
+            )
 
-        return peer_info_list
+        return [
+            PeerInfo(id=peer_id, organisations=organisations[peer_id], ip=ip)
+            for peer_id, ip in peer_info_results
+        ]
 
     def get_peer_organisations(self, peer_id: PeerId) -> List[OrganisationId]:
         """
@@ -439,6 +518,29 @@ class SQLiteDB:
         # Extract organisationIDs from the query result and return as a list
         return [row[0] for row in results]
 
+    def get_peers_organisations(
+        self, peer_ids: List[PeerId]
+    ) -> Dict[PeerId, List[OrganisationId]]:
+        """
+        Retrieves the organisations of all the given peers using one query
+        for every query_chunk_size peers.
+
+        :param peer_ids: The peers' IDs.
+        :return: {peer_id: [organisation IDs]}
+        """
+        organisations = {peer_id: [] for peer_id in peer_ids}
+        for start in range(0, len(peer_ids), self.query_chunk_size):
+            chunk = peer_ids[start : start + self.query_chunk_size]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self.__execute_query(
+                "SELECT peerID, organisationID FROM PeerOrganisation "
+                f"WHERE peerID IN ({placeholders})",
+                chunk,
+            )
+            for peer_id, organisation_id in rows:
+                organisations[peer_id].append(organisation_id)
+        return organisations
+
     def __insert_peer_info(self, peer_info: dict) -> None:
         """
         Inserts or updates the given PeerInfo object in the database.
@@ -499,7 +601,8 @@ class SQLiteDB:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
-                self.connection.commit()
+                if not self.__transaction_depth:
+                    self.connection.commit()
                 return cursor.fetchall()
             except Exception as e:
                 self.logger.error(f"Error executing query: {e}")
@@ -507,6 +610,25 @@ class SQLiteDB:
             finally:
                 cursor.close()  # Ensure the cursor is always closed
 
+    def __execute_many(self, query: str, rows: List[Tuple]) -> None:
+        """
+        Executes the given SQL query once per given row of parameters.
+
+        :param query: The SQL query to execute.
+        :param rows: List of parameters, one per execution.
+        """
+        if not rows:
+            return
+        with SQLiteDB._lock:
+            self.__slips_log(f"Executing query {len(rows)} times: {query}")
+            try:
+                self.connection.executemany(query, rows)
+                if not self.__transaction_depth:
+                    self.connection.commit()
+            except Exception as e:
+                self.logger.error(f"Error executing query: {e}")
+                raise
+
     def __save(self, table: str, data: dict) -> None:
         """
         Inserts or replaces data into a given table.
@@ -608,24 +730,6 @@ class SQLiteDB:
             );
             """,
             """
-            CREATE TABLE IF NOT EXISTS PeerTrustServiceHistory (
-                peer_trust_data_id INTEGER,
-                service_history_id INTEGER,
-                PRIMARY KEY (peer_trust_data_id, service_history_id),
-                FOREIGN KEY (peer_trust_data_id) REFERENCES PeerTrustData(id) ON DELETE CASCADE,
-                FOREIGN KEY (service_history_id) REFERENCES ServiceHistory(id) ON DELETE CASCADE
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS PeerTrustRecommendationHistory (
-                peer_trust_data_id INTEGER,
-                recommendation_history_id INTEGER,
-                PRIMARY KEY (peer_trust_data_id, recommendation_history_id),
-                FOREIGN KEY (peer_trust_data_id) REFERENCES PeerTrustData(id) ON DELETE CASCADE,
-                FOREIGN KEY (recommendation_history_id) REFERENCES RecommendationHistory(id) ON DELETE CASCADE
-            );
-            """,
-            """
             CREATE TABLE IF NOT EXISTS ThreatIntelligence (
                 target TEXT PRIMARY KEY,  -- The target of the intelligence (IP, domain, etc.)
                 score REAL NOT NULL CHECK (score >= -1.0 AND score <= 1.0),
@@ -633,6 +737,13 @@ class SQLiteDB:
                 confidentiality REAL -- Optional confidentiality level
             );
             """,
+            # trust data and history are looked up by peer
+            "CREATE INDEX IF NOT EXISTS PeerTrustDataPeer "
+            "ON PeerTrustData (peerID);",
+            "CREATE INDEX IF NOT EXISTS ServiceHistoryPeer "
+            "ON ServiceHistory (peerID);",
+            "CREATE INDEX IF NOT EXISTS RecommendationHistoryPeer "
+            "ON RecommendationHistory (peerID);",
         ]
 
         for query in table_creation_queries:
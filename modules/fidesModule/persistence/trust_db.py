@@ -100,8 +100,12 @@ class SlipsTrustDatabase(TrustDatabase):
 
     def store_peer_trust_matrix(self, trust_matrix: TrustMatrix):
         """Stores trust matrix."""
+        # all peers are written to SQLite in one transaction
+        self.sqldb.store_peers_trust_data(trust_matrix.values())
         for peer in trust_matrix.values():
-            self.store_peer_trust_data(peer)
+            self.db.store_peer_trust_data(
+                peer.info.id, json.dumps(peer.to_dict())
+            )
 
     def get_peer_trust_data(
         self, peer: Union[PeerId, PeerInfo]
@@ -130,7 +134,8 @@ class SlipsTrustDatabase(TrustDatabase):
     ) -> TrustMatrix:
         """Return trust data for each peer from peer_ids."""
         out = {}
-        peer_id = None
+        # peers that aren't in redis, loaded from SQLite at once
+        missing = []
 
         for peer in peer_ids:
             # get PeerID to properly create TrustMatrix
@@ -138,9 +143,18 @@ class SlipsTrustDatabase(TrustDatabase):
                 peer_id = peer
             elif isinstance(peer, PeerInfo):
                 peer_id = peer.id
+            else:
+                continue
 
             # TrustMatrix = Dict[PeerId, PeerTrustData]; here - peer_id: PeerId
-            out[peer_id] = self.get_peer_trust_data(peer_id)
+            if td_json := self.db.get_peer_trust_data(peer_id):
+                out[peer_id] = PeerTrustData(**json.loads(td_json))
+            else:
+                out[peer_id] = None
+                missing.append(peer_id)
+
+        if missing:
+            out.update(self.sqldb.get_peers_trust_data(missing))
         return out
 
     def cache_network_opinion(self, ti: SlipsThreatIntelligence):
@@ -1,6 +1,5 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
-import asyncio
 import contextlib
 import ipaddress
 import json
@@ -12,6 +11,7 @@ from modules.flowalerts.dns import DNS
 from slips_files.common.abstracts.flowalerts_analyzer import (
     IFlowalertsAnalyzer,
 )
+from slips_files.common.data_structures.top_k_counter import TopKCounter
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
 from slips_files.common.flow_classifier import FlowClassifier
@@ -30,6 +30,11 @@ class Conn(IFlowalertsAnalyzer):
         # If 1 flow uploaded this amount of MBs or more,
         # slips will alert data upload
         self.flow_upload_threshold = 100
+        # {(profileid, twid): bytes sent to each daddr in this tw}
+        self.upload_counters: Dict[Tuple[str, str], TopKCounter] = {}
+        # once this many daddrs are counted in a tw, a new daddr
+        # replaces the one with the least bytes sent, see TopKCounter
+        self.max_upload_destinations_per_tw = 1000
         self.read_configuration()
         self.whitelist = self.flowalerts.whitelist
         # how much time to wait when running on interface before reporting
@@ -305,56 +310,44 @@ class Conn(IFlowalertsAnalyzer):
 
         return False
 
-    def get_sent_bytes(
-        self, all_flows: Dict[str, dict]
-    ) -> Dict[str, Tuple[int, List[str], str]]:
+    def count_sent_bytes(self, profileid, twid, flow):
         """
-        Returns a dict of sent bytes to all ips in the all_flows dict
-         {
-            contacted_ip: (
-                sum_of_mbs_sent,
-                [uids],
-                last_ts_of_flow_containging_this_contacted_ip
-            )
-        }
+        Adds the bytes sent in the given flow to the upload counters of
+        its tw, they're evaluated once the tw is closed
         """
-        bytes_sent = {}
-        for uid, flow in all_flows.items():
-            daddr = flow["daddr"]
-            sbytes: int = int(flow.get("sbytes", 0))
-            ts: str = flow.get("starttime", "")
-
-            if self.is_ignored_ip_data_upload(daddr) or not sbytes:
-                continue
-
-            if daddr in bytes_sent:
-                mbs_sent, uids, _ = bytes_sent[daddr]
-                mbs_sent += int(sbytes)
-                uids.append(uid)
-                bytes_sent[daddr] = (mbs_sent, uids, ts)
-            else:
-                bytes_sent[daddr] = (sbytes, [uid], ts)
+        if (
+            not flow.daddr
+            or not flow.sbytes
+            or self.is_ignored_ip_data_upload(flow.daddr)
+        ):
+            return
 
-        return bytes_sent
+        key = (profileid, twid)
+        if key not in self.upload_counters:
+            self.upload_counters[key] = TopKCounter(
+                k=self.max_upload_destinations_per_tw
+            )
+        self.upload_counters[key].add(
+            flow.daddr, int(flow.sbytes), flow.uid, flow.starttime
+        )
 
     def detect_data_upload_in_twid(self, profileid, twid):
         """
         For each contacted ip in this twid,
         check if the total bytes sent to this ip is >= data_exfiltration_threshold
         """
-        all_flows: Dict[str, dict] = self.db.get_all_flows_in_profileid(
-            profileid
+        bytes_sent: TopKCounter = self.upload_counters.pop(
+            (profileid, twid), None
         )
-        if not all_flows:
+        if not bytes_sent:
             return
 
-        bytes_sent: Dict[str, Tuple[int, List[str], str]]
-        bytes_sent = self.get_sent_bytes(all_flows)
-
         for ip, ip_info in bytes_sent.items():
-            ip_info: Tuple[int, List[str], str]
-            bytes_uploaded, uids, ts = ip_info
-            mbs_uploaded = utils.convert_to_mb(bytes_uploaded)
+            ip_info: Tuple[int, List[str], str, int]
+            total, uids, ts, error = ip_info
+            # the error is the total this ip inherited from the one it
+            # replaced in the counter, it's not sent to this ip
+            mbs_uploaded = utils.convert_to_mb(total - error)
             if mbs_uploaded < self.data_exfiltration_threshold:
                 continue
 
@@ -510,12 +503,14 @@ class Conn(IFlowalertsAnalyzer):
         # 30 minutes have passed?
         return diff >= self.conn_without_dns_interface_wait_time
 
-    async def check_connection_without_dns_resolution(
+    def check_connection_without_dns_resolution(
         self, profileid, twid, flow
     ) -> bool:
         """
         Checks if there's a connection to a dstip that has no cached DNS
         answer
+        returns True if the check was deferred to wait for the DNS
+        resolution
         """
         if self.should_ignore_conn_without_dns(flow):
             return False
@@ -532,7 +527,23 @@ class Conn(IFlowalertsAnalyzer):
         # To give time to Slips to read all the files and get all the flows
         # don't alert a Connection Without DNS until 15 seconds has passed
         # in real time from the time of this checking.
-        await asyncio.sleep(15)
+        # connections to the same daddr that arrive meanwhile don't need
+        # their own check
+        return self.flowalerts.defer_check(
+            "connection_without_dns",
+            (profileid, twid, flow.daddr),
+            15,
+            self.confirm_connection_without_dns,
+            profileid,
+            twid,
+            flow,
+        )
+
+    def confirm_connection_without_dns(self, profileid, twid, flow) -> bool:
+        """
+        called 15 seconds after check_connection_without_dns_resolution()
+        didn't find a DNS resolution for the daddr of the given flow
+        """
         if self.db.is_ip_resolved(flow.daddr, 24):
             return False
 
@@ -807,6 +818,12 @@ class Conn(IFlowalertsAnalyzer):
             msg = json.loads(msg["data"])
             profileid = msg["profileid"]
             twid = msg["twid"]
+            # for the ssl and ssh checks to find the conn flow of their
+            # altflows without reading it from the sqlite db
+            self.db.cache_conn_flow(msg["flow"], twid)
+            # for the dns analyzer to know if the answers of a dns flow
+            # were contacted without reading the tw from the sqlite db
+            self.db.add_contacted_ip(profileid, twid, msg["flow"]["daddr"])
             flow = self.classifier.convert_to_flow_obj(msg["flow"])
             flow.interpreted_state = self.db.get_final_state_from_flags(
                 flow.state, flow.pkts
@@ -824,14 +841,10 @@ class Conn(IFlowalertsAnalyzer):
             self.check_different_localnet_usage(
                 twid, flow, what_to_check="srcip"
             )
-            self.flowalerts.create_task(
-                self.check_connection_without_dns_resolution,
-                profileid,
-                twid,
-                flow,
-            )
+            self.check_connection_without_dns_resolution(profileid, twid, flow)
             self.detect_connection_to_multiple_ports(profileid, twid, flow)
             self.check_data_upload(profileid, twid, flow)
+            self.count_sent_bytes(profileid, twid, flow)
 
             self.check_connection_to_local_ip(twid, flow)
             self.check_device_changing_ips(twid, flow)
@@ -841,3 +854,4 @@ class Conn(IFlowalertsAnalyzer):
             profileid = f"{profileid_tw[0]}_{profileid_tw[1]}"
             twid = profileid_tw[-1]
             self.detect_data_upload_in_twid(profileid, twid)
+            self.db.forget_contacted_ips(profileid, twid)
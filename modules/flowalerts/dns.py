@@ -178,10 +178,16 @@ class DNS(IFlowalertsAnalyzer):
         if not other_ip:
             return False
         other_ip = other_ip[0]
+        other_profileid = f"profile_{other_ip}"
         # get the ips contacted by the other_ip
-        contacted_ips = self.db.get_all_contacted_ips_in_profileid_twid(
-            f"profile_{other_ip}", twid
-        )
+        if self.flowalerts.is_profile_in_partition(other_profileid):
+            contacted_ips = self.db.get_contacted_ips(other_profileid, twid)
+        else:
+            # the flows of the other ip are analyzed by another
+            # flowalerts worker, so they're not cached by this one
+            contacted_ips = self.db.get_all_contacted_ips_in_profileid_twid(
+                other_profileid, twid
+            )
         if not contacted_ips:
             return False
 
@@ -225,9 +231,7 @@ class DNS(IFlowalertsAnalyzer):
             # self.print(f'No ips in the answer, so ignoring')
             return True
 
-        contacted_ips = self.db.get_all_contacted_ips_in_profileid_twid(
-            profileid, twid
-        )
+        contacted_ips = self.db.get_contacted_ips(profileid, twid)
 
         # every dns answer is a list of ips that correspond to 1 query,
         # one of these ips should be present in the contacted ips
@@ -2,8 +2,13 @@
 # SPDX-License-Identifier: GPL-2.0-only
 import asyncio
 import inspect
-from asyncio import Task
-from typing import List
+import json
+import time
+import zlib
+from typing import (
+    Dict,
+    Optional,
+)
 
 from slips_files.common.slips_utils import utils
 from slips_files.common.abstracts.async_module import AsyncModule
@@ -16,6 +21,7 @@ from .software import Software
 from .ssh import SSH
 from .ssl import SSL
 from .tunnel import Tunnel
+from slips_files.common.printer import Printer
 from slips_files.core.helpers.whitelist.whitelist import Whitelist
 
 
@@ -27,7 +33,16 @@ class FlowAlerts(AsyncModule):
     )
     authors = ["Kamila Babayeva", "Sebastian Garcia", "Alya Gomaa"]
 
-    def init(self):
+    def init(self, worker_id=0, workers=1):
+        # when there are many flowalerts workers, each one of them only
+        # analyzes the msgs of the profiles of its own partition
+        self.worker_id = worker_id
+        self.workers = workers
+        if self.worker_id:
+            self.name = f"{self.name} {self.worker_id}"
+            self.printer = Printer(self.logger, self.name)
+        # analyzer name -> {"msgs": .., "seconds": ..}
+        self.throughput: Dict[str, Dict[str, float]] = {}
         self.subscribe_to_channels()
         self.whitelist = Whitelist(self.logger, self.db)
         self.dns = DNS(self.db, flowalerts=self)
@@ -39,8 +54,6 @@ class FlowAlerts(AsyncModule):
         self.downloaded_file = DownloadedFile(self.db, flowalerts=self)
         self.tunnel = Tunnel(self.db, flowalerts=self)
         self.conn = Conn(self.db, flowalerts=self)
-        # list of async functions to await before flowalerts shuts down
-        self.tasks: List[Task] = []
 
     def subscribe_to_channels(self):
         channels = (
@@ -61,6 +74,30 @@ class FlowAlerts(AsyncModule):
 
     async def shutdown_gracefully(self):
         self.dns.shutdown_gracefully()
+        # no more flows are coming, no need to wait for the pending checks
+        self.run_due_checks(run_all=True)
+        self.print(
+            f"Deferred checks: {self.get_deferred_checks_stats()}",
+            log_to_logfiles_only=True,
+        )
+        self.print(
+            f"Conn flows cache: {self.db.get_conn_flow_cache_stats()}",
+            log_to_logfiles_only=True,
+        )
+        self.print(
+            f"Contacted IPs cache: "
+            f"{self.db.get_contacted_ips_cache_stats()}",
+            log_to_logfiles_only=True,
+        )
+        self.print(
+            f"Sliding windows: "
+            f"smtp bruteforce {self.smtp.smtp_bruteforce_cache.get_stats()}, "
+            f"ssh password guessing "
+            f"{self.ssh.password_guessing_cache.get_stats()}, "
+            f"ssl recognized flows "
+            f"{self.ssl.ssl_recognized_flows.get_stats()}",
+            log_to_logfiles_only=True,
+        )
         await asyncio.gather(*self.tasks, return_exceptions=True)
 
     def pre_main(self):
@@ -82,6 +119,70 @@ class FlowAlerts(AsyncModule):
             "new_ssl": [self.ssl],
         }
 
+    def get_profileid_of_msg(self, channel: str, msg: dict) -> Optional[str]:
+        """returns the profileid the given msg belongs to, if any"""
+        if channel == "tw_closed":
+            # the data is profile_<ip>_timewindow<n>
+            profile_tw = msg["data"].split("_")
+            return f"{profile_tw[0]}_{profile_tw[1]}"
+
+        try:
+            data = json.loads(msg["data"])
+        except (ValueError, TypeError):
+            return None
+
+        if channel == "new_software":
+            return f"profile_{data['sw_flow']['saddr']}"
+        return data.get("profileid")
+
+    def is_profile_in_partition(self, profileid: Optional[str]) -> bool:
+        """
+        returns True if the given profile is analyzed by this worker.
+        msgs that don't belong to a profile are analyzed by worker 0
+        """
+        if self.workers <= 1:
+            return True
+        if not profileid:
+            return self.worker_id == 0
+        return zlib.crc32(profileid.encode()) % self.workers == self.worker_id
+
+    def is_msg_in_partition(self, channel: str, msg: dict) -> bool:
+        if self.workers <= 1:
+            return True
+        return self.is_profile_in_partition(
+            self.get_profileid_of_msg(channel, msg)
+        )
+
+    def update_throughput(self, analyzer, seconds: float):
+        stats = self.throughput.setdefault(
+            analyzer.name(), {"msgs": 0, "seconds": 0.0}
+        )
+        stats["msgs"] += 1
+        stats["seconds"] += seconds
+
+    def get_throughput_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        returns the msgs handled by each analyzer and the time spent
+        handling them, slowest analyzer first.
+        for async analyzers, only the time until they yield is counted
+        """
+        report = {}
+        for name, stats in sorted(
+            self.throughput.items(),
+            key=lambda item: item[1]["seconds"],
+            reverse=True,
+        ):
+            report[name] = {
+                "msgs": stats["msgs"],
+                "seconds": round(stats["seconds"], 3),
+                "msgs_per_second": (
+                    round(stats["msgs"] / stats["seconds"], 2)
+                    if stats["seconds"]
+                    else 0
+                ),
+            }
+        return report
+
     async def main(self):
         """runs in a loop, waiting for messages in subscribed channels"""
         for channel, analyzers in self.analyzers_map.items():
@@ -89,7 +190,12 @@ class FlowAlerts(AsyncModule):
             if not msg:
                 continue
 
+            if not self.is_msg_in_partition(channel, msg):
+                # another flowalerts worker is analyzing this profile
+                continue
+
             for analyzer in analyzers:
+                start = time.perf_counter()
                 # some analyzers are async functions
                 if inspect.iscoroutinefunction(analyzer.analyze):
                     # analyzer will run normally, until it finishes.
@@ -100,8 +206,9 @@ class FlowAlerts(AsyncModule):
                     # because Async Tasks swallow exceptions.
                     task.add_done_callback(self.handle_exception)
                     # to wait for these functions before flowalerts shuts down
-                    self.tasks.append(task)
+                    self.track_task(task)
                     # Allow the event loop to run the scheduled task
                     await asyncio.sleep(0)
                 else:
                     analyzer.analyze(msg)
+                self.update_throughput(analyzer, time.perf_counter() - start)
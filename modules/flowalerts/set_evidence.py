@@ -1196,8 +1196,11 @@ class SetEvidenceHelper:
 
         self.db.set_evidence(evidence)
 
-    def malicious_ja3s(self, twid, flow, malicious_ja3_dict: dict) -> None:
-        ja3_info: dict = json.loads(malicious_ja3_dict[flow.ja3s])
+    def malicious_ja3s(self, twid, flow, ja3s_info: str) -> None:
+        """
+        :param ja3s_info: info of the ja3s of the given flow from the db
+        """
+        ja3_info: dict = json.loads(ja3s_info)
 
         threat_level: str = ja3_info["threat_level"].upper()
         threat_level: ThreatLevel = ThreatLevel[threat_level]
@@ -1262,8 +1265,11 @@ class SetEvidenceHelper:
 
         self.db.set_evidence(evidence)
 
-    def malicious_ja3(self, twid, flow, malicious_ja3_dict: dict) -> None:
-        ja3_info: dict = json.loads(malicious_ja3_dict[flow.ja3])
+    def malicious_ja3(self, twid, flow, ja3_info: str) -> None:
+        """
+        :param ja3_info: info of the ja3 of the given flow from the db
+        """
+        ja3_info: dict = json.loads(ja3_info)
         threat_level: str = ja3_info["threat_level"].upper()
         threat_level: ThreatLevel = ThreatLevel[threat_level]
 
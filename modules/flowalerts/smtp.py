@@ -6,6 +6,9 @@ import json
 from slips_files.common.abstracts.flowalerts_analyzer import (
     IFlowalertsAnalyzer,
 )
+from slips_files.common.data_structures.sliding_window import (
+    SlidingWindowCounter,
+)
 from slips_files.common.slips_utils import utils
 from slips_files.common.flow_classifier import FlowClassifier
 
@@ -16,9 +19,10 @@ class SMTP(IFlowalertsAnalyzer):
         # we detect an smtp bruteforce
         self.smtp_bruteforce_threshold = 3
         self.classifier = FlowClassifier()
-        # dict to keep track of bad smtp logins to check for bruteforce later
-        # format {profileid: [ts,ts,...]}
-        self.smtp_bruteforce_cache = {}
+        # uids of the bad smtp logins of each profile in the last 10s
+        self.smtp_bruteforce_cache = SlidingWindowCounter(
+            window=10, max_entries_per_key=self.smtp_bruteforce_threshold
+        )
 
     def name(self) -> str:
         return "smtp_analyzer"
@@ -27,43 +31,22 @@ class SMTP(IFlowalertsAnalyzer):
         if "bad smtp-auth user" not in flow.last_reply:
             return False
 
-        try:
-            timestamps, uids = self.smtp_bruteforce_cache[profileid]
-            timestamps.append(flow.starttime)
-            uids.append(flow.uid)
-            self.smtp_bruteforce_cache[profileid] = (timestamps, uids)
-        except KeyError:
-            # first time for this profileid to make bad smtp login
-            self.smtp_bruteforce_cache.update(
-                {profileid: ([flow.starttime], [flow.uid])}
-            )
+        ts = float(utils.convert_format(flow.starttime, "unixtimestamp"))
+        bad_logins = self.smtp_bruteforce_cache.add(profileid, ts, flow.uid)
 
         self.set_evidence.bad_smtp_login(twid, flow)
 
-        timestamps = self.smtp_bruteforce_cache[profileid][0]
-        uids = self.smtp_bruteforce_cache[profileid][1]
-
         # check if 3 bad login attempts happened within 10 seconds or less
-        if len(timestamps) != self.smtp_bruteforce_threshold:
-            return
-
-        # check if they happened within 10 seconds or less
-        diff = utils.get_time_diff(timestamps[0], timestamps[-1])
-
-        if diff > 10:
-            # didnt happen within 10s!
-            # remove the first login from cache so we
-            # can check the next 3 logins
-            self.smtp_bruteforce_cache[profileid][0].pop(0)
-            self.smtp_bruteforce_cache[profileid][1].pop(0)
+        if bad_logins < self.smtp_bruteforce_threshold:
             return
 
+        uids = self.smtp_bruteforce_cache.get_values(profileid)
         self.set_evidence.smtp_bruteforce(
             flow, twid, self.smtp_bruteforce_threshold, uids
         )
 
         # remove all 3 logins that caused this alert
-        self.smtp_bruteforce_cache[profileid] = ([], [])
+        self.smtp_bruteforce_cache.reset(profileid)
 
     def analyze(self, msg):
         if not utils.is_msg_intended_for(msg, "new_smtp"):
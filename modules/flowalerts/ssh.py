@@ -1,11 +1,13 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
-import asyncio
 import json
 
 from slips_files.common.abstracts.flowalerts_analyzer import (
     IFlowalertsAnalyzer,
 )
+from slips_files.common.data_structures.sliding_window import (
+    SlidingWindowCounter,
+)
 from slips_files.common.flow_classifier import FlowClassifier
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
@@ -16,7 +18,10 @@ class SSH(IFlowalertsAnalyzer):
         # after this number of failed ssh logins, we alert pw guessing
         self.pw_guessing_threshold = 20
         self.read_configuration()
-        self.password_guessing_cache = {}
+        # uids of the failed ssh logins of each profile, tw and daddr
+        self.password_guessing_cache = SlidingWindowCounter(
+            window=self.width, max_entries_per_key=self.pw_guessing_threshold
+        )
         self.classifier = FlowClassifier()
 
     def name(self) -> str:
@@ -27,6 +32,7 @@ class SSH(IFlowalertsAnalyzer):
         self.ssh_succesful_detection_threshold = (
             conf.ssh_succesful_detection_threshold()
         )
+        self.width = conf.get_tw_width_as_float()
 
     def detect_successful_ssh_by_slips(
         self, twid, conn_log_flow: dict, ssh_flow
@@ -72,18 +78,27 @@ class SSH(IFlowalertsAnalyzer):
         )
         return True
 
-    async def check_successful_ssh(self, twid, flow):
+    def check_successful_ssh(self, twid, flow, retry=True):
         """
         Function to check if an SSH connection logged in successfully
+        :param retry: if the conn.log flow of the given ssh flow isn't
+        read yet, check again in 15 seconds
         """
         # this is the ssh flow read from conn.log not ssh.log
         conn_log_flow = utils.get_original_conn_flow(flow, self.db)
 
         if not conn_log_flow:
-            await asyncio.sleep(15)
-            conn_log_flow = utils.get_original_conn_flow(flow, self.db)
-            if not conn_log_flow:
-                return
+            if retry:
+                self.flowalerts.defer_check(
+                    "successful_ssh",
+                    flow.uid,
+                    15,
+                    self.check_successful_ssh,
+                    twid,
+                    flow,
+                    False,
+                )
+            return
 
         # it's true in zeek json files, T in zeke tab files
         if flow.auth_success in ["true", "T"]:
@@ -102,19 +117,14 @@ class SSH(IFlowalertsAnalyzer):
 
         cache_key = f"{profileid}-{twid}-{flow.daddr}"
         # update the number of times this ip performed a failed ssh login
-        if cache_key in self.password_guessing_cache:
-            self.password_guessing_cache[cache_key].append(flow.uid)
-        else:
-            self.password_guessing_cache = {cache_key: [flow.uid]}
-
-        conn_count = len(self.password_guessing_cache[cache_key])
+        ts = float(utils.convert_format(flow.starttime, "unixtimestamp"))
+        conn_count = self.password_guessing_cache.add(cache_key, ts, flow.uid)
 
         if conn_count >= self.pw_guessing_threshold:
-
-            uids = self.password_guessing_cache[cache_key]
+            uids = self.password_guessing_cache.get_values(cache_key)
             self.set_evidence.pw_guessing(flow, twid, uids)
             # reset the counter
-            del self.password_guessing_cache[cache_key]
+            self.password_guessing_cache.reset(cache_key)
 
     async def analyze(self, msg):
         if not utils.is_msg_intended_for(msg, "new_ssh"):
@@ -125,5 +135,5 @@ class SSH(IFlowalertsAnalyzer):
         twid = msg["twid"]
         flow = self.classifier.convert_to_flow_obj(msg["flow"])
 
-        self.flowalerts.create_task(self.check_successful_ssh, twid, flow)
+        self.check_successful_ssh(twid, flow)
         self.check_ssh_password_guessing(profileid, twid, flow)
@@ -3,15 +3,15 @@
 # SPDX-License-Identifier: GPL-2.0-only
 import asyncio
 import json
-from typing import Union, Optional, List, Dict, Tuple
+from typing import Union, Optional, List
 import re
-import bisect
-import time
-from multiprocessing import Lock
 import tldextract
 from slips_files.common.abstracts.flowalerts_analyzer import (
     IFlowalertsAnalyzer,
 )
+from slips_files.common.data_structures.sliding_window import (
+    SlidingWindowCounter,
+)
 from slips_files.common.flow_classifier import FlowClassifier
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
@@ -22,9 +22,12 @@ from slips_files.core.flows.zeek import SSL
 class SSL(IFlowalertsAnalyzer):
     def init(self):
         self.classifier = FlowClassifier()
-        self.ssl_recognized_flows: Dict[Tuple[str, str], List[float]] = {}
-        self.ts_of_last_ssl_recognized_flows_cleanup = time.time()
-        self.ssl_recognized_flows_lock = Lock()
+        # timestamps of the ssl flows recognized by zeek per
+        # (saddr, daddr). non-ssl port 443 conns are matched against the
+        # 5 mins before and after them
+        self.ssl_recognized_flows = SlidingWindowCounter(
+            window=10 * 60, max_keys=100000, max_entries_per_key=1000
+        )
 
     def name(self) -> str:
         return "ssl_analyzer"
@@ -83,13 +86,11 @@ class SSL(IFlowalertsAnalyzer):
             # we don't have info about this flow's ja3 or ja3s fingerprint
             return
 
-        # get the dict of malicious ja3 stored in our db
-        malicious_ja3_dict = self.db.get_all_blacklisted_ja3()
-        if flow.ja3 in malicious_ja3_dict:
-            self.set_evidence.malicious_ja3(twid, flow, malicious_ja3_dict)
+        if ja3_info := self.db.is_blacklisted_ja3(flow.ja3):
+            self.set_evidence.malicious_ja3(twid, flow, ja3_info)
 
-        if flow.ja3s in malicious_ja3_dict:
-            self.set_evidence.malicious_ja3s(twid, flow, malicious_ja3_dict)
+        if ja3s_info := self.db.is_blacklisted_ja3(flow.ja3s):
+            self.set_evidence.malicious_ja3s(twid, flow, ja3s_info)
 
     def detect_incompatible_cn(self, twid, flow):
         """
@@ -160,38 +161,13 @@ class SSL(IFlowalertsAnalyzer):
         2 flows match if they share the src and dst IPs
         """
 
-        # Handle the case where the key might not exist
-        try:
-            sorted_timestamps_of_past_ssl_flows = self.ssl_recognized_flows[
-                (flow.saddr, flow.daddr)
-            ]
-        except KeyError:
-            return []
-
-        # Find the left and right boundaries
-        left_idx = bisect.bisect_left(
-            sorted_timestamps_of_past_ssl_flows, start
+        return self.ssl_recognized_flows.get_timestamps_in_range(
+            (flow.saddr, flow.daddr), start, end
         )
-        right_idx = bisect.bisect_right(
-            sorted_timestamps_of_past_ssl_flows, end
-        )
-
-        return sorted_timestamps_of_past_ssl_flows[left_idx:right_idx]
 
     def keep_track_of_ssl_flow(self, flow, key) -> None:
         """keeps track of the given ssl flow in ssl_recognized_flows"""
-        # we're using locks here because this is a part of an asyncio
-        # function and there's another garbage collector that may be
-        # modifying the dict at the same time.
-        self.ssl_recognized_flows_lock.acquire()
-        try:
-            ts_list = self.ssl_recognized_flows[key]
-            # to store the ts sorted for faster lookups
-            bisect.insort(ts_list, float(flow.starttime))
-        except KeyError:
-            self.ssl_recognized_flows[key] = [float(flow.starttime)]
-
-        self.ssl_recognized_flows_lock.release()
+        self.ssl_recognized_flows.add(key, float(flow.starttime))
 
     async def check_non_ssl_port_443_conns(
         self, twid, flow, timeout_reached=False
@@ -388,47 +364,6 @@ class SSL(IFlowalertsAnalyzer):
             return
         self.set_evidence.cn_url_mismatch(twid, cn, flow)
 
-    def remove_old_entries_from_ssl_recognized_flows(self) -> None:
-        """
-        the goal of this is to not have the ssl_recognized_flows dict
-        growing forever, so here we remove all timestamps older than the last
-        one-5 mins (zeek time)
-        meaning, it ensures that all lists have max 5mins worth of timestamps
-        changes the ssl_recognized_flows to the cleaned one
-        """
-        # Runs every 5 mins real time, to reduce unnecessary cleanups every
-        # 1s
-        now = time.time()
-        time_since_last_cleanup = utils.get_time_diff(
-            self.ts_of_last_ssl_recognized_flows_cleanup,
-            now,
-            "minutes",
-        )
-
-        if time_since_last_cleanup < 5:
-            return
-
-        clean_ssl_recognized_flows = {}
-        for ips, timestamps in self.ssl_recognized_flows.items():
-            ips: Tuple[str, str]
-            timestamps: List[float]
-
-            end: float = float(timestamps[-1])
-            start = end - 5 * 60
-
-            left = bisect.bisect_right(timestamps, start)
-            right = bisect.bisect_left(timestamps, end)
-            # thats the range we wanna remove from the list bc it's too old
-            garbage = timestamps[left:right]
-            clean_ssl_recognized_flows[ips] = [
-                ts for ts in timestamps if ts not in garbage
-            ]
-
-        self.ssl_recognized_flows_lock.acquire()
-        self.ssl_recognized_flows = clean_ssl_recognized_flows
-        self.ssl_recognized_flows_lock.release()
-        self.ts_of_last_ssl_recognized_flows_cleanup = now
-
     async def analyze(self, msg: dict):
         if utils.is_msg_intended_for(msg, "new_ssl"):
             msg = json.loads(msg["data"])
@@ -449,7 +384,6 @@ class SSL(IFlowalertsAnalyzer):
             twid = msg["twid"]
             flow = msg["flow"]
             flow = self.classifier.convert_to_flow_obj(flow)
-            self.remove_old_entries_from_ssl_recognized_flows()
             self.flowalerts.create_task(
                 self.check_non_ssl_port_443_conns, twid, flow
             )
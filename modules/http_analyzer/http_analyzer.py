@@ -4,12 +4,12 @@ import asyncio
 import json
 import urllib
 import requests
-from typing import Union, Dict, Optional, List, Tuple
-import time
-import bisect
-from multiprocessing import Lock
+from typing import Union, Dict, Optional, List
 
 from modules.http_analyzer.set_evidence import SetEvidenceHelper
+from slips_files.common.data_structures.sliding_window import (
+    SlidingWindowCounter,
+)
 from slips_files.common.flow_classifier import FlowClassifier
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
@@ -35,7 +35,6 @@ class HTTPAnalyzer(AsyncModule):
             "new_flow": self.c3,
         }
         self.set_evidence = SetEvidenceHelper(self.db)
-        self.connections_counter = {}
         self.empty_connections_threshold = 4
         # this is a list of hosts known to be resolved by malware
         # to check your internet connection
@@ -50,6 +49,11 @@ class HTTPAnalyzer(AsyncModule):
             "gmail.com",
         ]
         self.read_configuration()
+        # uids of the empty connections to each of the above hosts
+        self.connections_counter = SlidingWindowCounter(
+            window=self.width,
+            max_entries_per_key=self.empty_connections_threshold,
+        )
         self.executable_mime_types = [
             "application/x-msdownload",
             "application/x-ms-dos-executable",
@@ -62,9 +66,12 @@ class HTTPAnalyzer(AsyncModule):
             "application/x-dosexec",
         ]
         self.classifier = FlowClassifier()
-        self.http_recognized_flows: Dict[Tuple[str, str], List[float]] = {}
-        self.ts_of_last_cleanup_of_http_recognized_flows = time.time()
-        self.http_recognized_flows_lock = Lock()
+        # timestamps of the http flows recognized by zeek per
+        # (saddr, daddr). non-http port 80 conns are matched against the
+        # 5 mins before and after them
+        self.http_recognized_flows = SlidingWindowCounter(
+            window=10 * 60, max_keys=100000, max_entries_per_key=1000
+        )
         self.condition = asyncio.Condition()
 
     def read_configuration(self):
@@ -72,6 +79,7 @@ class HTTPAnalyzer(AsyncModule):
         self.pastebin_downloads_threshold = (
             conf.get_pastebin_download_threshold()
         )
+        self.width = conf.get_tw_width_as_float()
 
     def detect_executable_mime_types(self, twid, flow) -> bool:
         """
@@ -128,15 +136,10 @@ class HTTPAnalyzer(AsyncModule):
                 flow.host in [host, f"www.{host}"]
                 and flow.request_body_len == 0
             ):
-                try:
-                    # this host has past connections, add to counter
-                    uids, connections = self.connections_counter[host]
-                    connections += 1
-                    uids.append(flow.uid)
-                    self.connections_counter[host] = (uids, connections)
-                except KeyError:
-                    # first empty connection to this host
-                    self.connections_counter.update({host: ([flow.uid], 1)})
+                ts = float(
+                    utils.convert_format(flow.starttime, "unixtimestamp")
+                )
+                connections = self.connections_counter.add(host, ts, flow.uid)
                 break
         else:
             # it's an http connection to a domain that isn't
@@ -144,13 +147,13 @@ class HTTPAnalyzer(AsyncModule):
             # ignore it
             return False
 
-        uids, connections = self.connections_counter[host]
         if connections != self.empty_connections_threshold:
             return False
 
+        uids = self.connections_counter.get_values(host)
         self.set_evidence.multiple_empty_connections(flow, host, uids, twid)
         # reset the counter
-        self.connections_counter[host] = ([], 0)
+        self.connections_counter.reset(host)
         return True
 
     def check_incompatible_user_agent(self, profileid, twid, flow):
@@ -392,9 +395,11 @@ class HTTPAnalyzer(AsyncModule):
         self.set_evidence.pastebin_downloads(flow, twid)
         return True
 
-    async def check_weird_http_method(self, msg: Dict[str, str]):
+    def check_weird_http_method(self, msg: Dict[str, str], retry=True):
         """
         detect weird http methods in zeek's weird.log
+        :param retry: if the conn.log flow of the given weird flow isn't
+        read yet, check again in 15 seconds
         """
         flow = self.classifier.convert_to_flow_obj(msg["flow"])
         twid = msg["twid"]
@@ -405,27 +410,22 @@ class HTTPAnalyzer(AsyncModule):
         conn_log_flow: Optional[dict]
         conn_log_flow = utils.get_original_conn_flow(flow, self.db)
         if not conn_log_flow:
-            await asyncio.sleep(15)
-            conn_log_flow = utils.get_original_conn_flow(flow, self.db)
-            if not conn_log_flow:
-                return
+            if retry:
+                self.defer_check(
+                    "weird_http_method",
+                    flow.uid,
+                    15,
+                    self.check_weird_http_method,
+                    msg,
+                    False,
+                )
+            return
 
         self.set_evidence.weird_http_method(twid, flow, conn_log_flow)
 
     def keep_track_of_http_flow(self, flow, key) -> None:
         """keeps track of the given http flow in http_recognized_flows"""
-        # we're using locks here because this is a part of an asyncio
-        # function and there's another garbage collector that may be
-        # modifying the dict at the same time.
-        self.http_recognized_flows_lock.acquire()
-        try:
-            ts_list = self.http_recognized_flows[key]
-            # to store the ts sorted for faster lookups
-            bisect.insort(ts_list, float(flow.starttime))
-        except KeyError:
-            self.http_recognized_flows[key] = [float(flow.starttime)]
-
-        self.http_recognized_flows_lock.release()
+        self.http_recognized_flows.add(key, float(flow.starttime))
 
     def is_http_proto_recognized_by_zeek(self, flow) -> bool:
         """
@@ -456,24 +456,10 @@ class HTTPAnalyzer(AsyncModule):
         2 flows match if they share the src and dst IPs
         """
 
-        # Handle the case where the key might not exist
-        try:
-            sorted_timestamps_of_past_http_flows = self.http_recognized_flows[
-                (flow.saddr, flow.daddr)
-            ]
-        except KeyError:
-            return []
-
-        # Find the left and right boundaries
-        left_idx = bisect.bisect_left(
-            sorted_timestamps_of_past_http_flows, start
-        )
-        right_idx = bisect.bisect_right(
-            sorted_timestamps_of_past_http_flows, end
+        return self.http_recognized_flows.get_timestamps_in_range(
+            (flow.saddr, flow.daddr), start, end
         )
 
-        return sorted_timestamps_of_past_http_flows[left_idx:right_idx]
-
     async def check_non_http_port_80_conns(
         self, twid, flow, timeout_reached=False
     ):
@@ -579,49 +565,20 @@ class HTTPAnalyzer(AsyncModule):
         async with self.condition:
             self.condition.notify_all()
 
-    def remove_old_entries_from_http_recognized_flows(self) -> None:
-        """
-        the goal of this is to not have the http_recognized_flows dict
-        growing forever, so here we remove all timestamps older than the last
-        one-5 mins (zeek time)
-        meaning, it ensures that all lists have max 5mins worth of timestamps
-        changes the http_recognized_flows to the cleaned one
-        """
-        # Runs every 5 mins real time, to reduce unnecessary cleanups every
-        # 1s
-        now = time.time()
-        time_since_last_cleanup = utils.get_time_diff(
-            self.ts_of_last_cleanup_of_http_recognized_flows,
-            now,
-            "minutes",
-        )
-
-        if time_since_last_cleanup < 5:
-            return
-
-        clean_http_recognized_flows = {}
-        for ips, timestamps in self.http_recognized_flows.items():
-            ips: Tuple[str, str]
-            timestamps: List[float]
-
-            end: float = float(timestamps[-1])
-            start = end - 5 * 60
-
-            left = bisect.bisect_right(timestamps, start)
-            right = bisect.bisect_left(timestamps, end)
-            # thats the range we wanna remove from the list bc it's too old
-            garbage = timestamps[left:right]
-            clean_http_recognized_flows[ips] = [
-                ts for ts in timestamps if ts not in garbage
-            ]
-
-        self.http_recognized_flows_lock.acquire()
-        self.http_recognized_flows = clean_http_recognized_flows
-        self.http_recognized_flows_lock.release()
-        self.ts_of_last_cleanup_of_http_recognized_flows = now
-
     async def shutdown_gracefully(self):
         """wait for all the tasks created by self.create_task()"""
+        self.run_due_checks(run_all=True)
+        self.print(
+            f"Conn flows cache: {self.db.get_conn_flow_cache_stats()}",
+            log_to_logfiles_only=True,
+        )
+        self.print(
+            f"Sliding windows: "
+            f"empty connections {self.connections_counter.get_stats()}, "
+            f"http recognized flows "
+            f"{self.http_recognized_flows.get_stats()}",
+            log_to_logfiles_only=True,
+        )
         await asyncio.gather(*self.tasks, return_exceptions=True)
 
     def pre_main(self):
@@ -662,10 +619,13 @@ class HTTPAnalyzer(AsyncModule):
 
         if msg := self.get_msg("new_weird"):
             msg = json.loads(msg["data"])
-            await self.check_weird_http_method(msg)
+            self.check_weird_http_method(msg)
 
         if msg := self.get_msg("new_flow"):
             msg = json.loads(msg["data"])
             twid = msg["twid"]
+            # for check_weird_http_method() to find the conn flow of
+            # weird.log flows without reading it from the sqlite db
+            self.db.cache_conn_flow(msg["flow"], twid)
             flow = self.classifier.convert_to_flow_obj(msg["flow"])
             self.create_task(self.check_non_http_port_80_conns, twid, flow)
@@ -631,7 +631,7 @@ class Trust(IModule):
         if hasattr(self, "pigeon"):
             self.pigeon.send_signal(signal.SIGINT)
         if hasattr(self, "trust_db"):
-            self.trust_db.__del__()
+            self.trust_db.close()
 
     def pre_main(self):
         utils.drop_root_privs()
@@ -663,6 +663,9 @@ class Trust(IModule):
         if msg := self.get_msg(self.gopy_channel):
             self.gopy_callback(msg)
 
+        # commit the reports received in the last burst
+        self.trust_db.commit_if_due()
+
         ret_code = self.pigeon.poll()
         if ret_code not in (None, 0):
             # The pigeon stopped with some error
@@ -9,6 +9,11 @@ from slips_files.core.output import Output
 
 class TrustDB:
     name = "P2P Trust DB"
+    # peers send reports in bursts, writes are committed once this many
+    # are pending or once commit_interval seconds passed since the last
+    # commit, instead of committing each one
+    commit_batch_size = 100
+    commit_interval = 1
 
     def __init__(
         self,
@@ -19,6 +24,9 @@ class TrustDB:
         """create a database connection to a SQLite database"""
         self.printer = Printer(logger, self.name)
         self.conn = sqlite3.connect(db_file)
+        self.closed = False
+        self.pending_writes = 0
+        self.last_commit_time = time.time()
         if drop_tables_on_startup:
             self.print("Dropping tables")
             self.delete_tables()
@@ -28,6 +36,17 @@ class TrustDB:
         # self.get_opinion_on_ip("zzz")
 
     def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        commits the pending writes and closes the db. the calls after
+        the first one do nothing
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.commit()
         self.conn.close()
 
     def print(self, *args, **kwargs):
@@ -79,6 +98,51 @@ class TrustDB:
             "network_score REAL NOT NULL, "
             "update_time DATE NOT NULL);"
         )
+        self.create_indexes()
+
+    def create_indexes(self):
+        """
+        indexes the columns used to look up the reports about an IP and
+        the latest ip, reliability and reputation of their reporters
+        """
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS reports_reported_key "
+            "ON reports (reported_key, key_type, update_time);"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS peer_ips_peerid "
+            "ON peer_ips (peerid, update_time);"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS go_reliability_peerid "
+            "ON go_reliability (peerid, update_time);"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS slips_reputation_ipaddress "
+            "ON slips_reputation (ipaddress, update_time);"
+        )
+
+    def commit(self):
+        """commits all the pending writes"""
+        self.conn.commit()
+        self.pending_writes = 0
+        self.last_commit_time = time.time()
+
+    def commit_if_due(self, new_writes: int = 0):
+        """
+        commits the pending writes if there are too many of them or if
+        they have been pending for too long. should be called
+        periodically so pending writes don't wait for the next burst
+        :param new_writes: number of writes done since the last call
+        """
+        self.pending_writes += new_writes
+        if not self.pending_writes:
+            return
+        if (
+            self.pending_writes >= self.commit_batch_size
+            or time.time() - self.last_commit_time >= self.commit_interval
+        ):
+            self.commit()
 
     def delete_tables(self):
         self.conn.execute("DROP TABLE IF EXISTS opinion_cache;")
@@ -98,7 +162,7 @@ class TrustDB:
             "VALUES (?, ?, ?, ?);",
             parameters,
         )
-        self.conn.commit()
+        self.commit_if_due(1)
 
     def insert_go_reliability(
         self, peerid: str, reliability: float, timestamp: int = None
@@ -112,7 +176,7 @@ class TrustDB:
             "VALUES (?, ?, ?);",
             parameters,
         )
-        self.conn.commit()
+        self.commit_if_due(1)
 
     def insert_go_ip_pairing(
         self, peerid: str, ip: str, timestamp: int = None
@@ -126,7 +190,7 @@ class TrustDB:
             "VALUES (?, ?, ?);",
             parameters,
         )
-        self.conn.commit()
+        self.commit_if_due(1)
 
     def insert_new_go_data(self, reports: list):
         self.conn.executemany(
@@ -135,7 +199,7 @@ class TrustDB:
             "VALUES (?, ?, ?, ?, ?, ?)",
             reports,
         )
-        self.conn.commit()
+        self.commit_if_due(len(reports))
 
     def insert_new_go_report(
         self,
@@ -168,7 +232,7 @@ class TrustDB:
             "VALUES (?, ?, ?, ?, ?, ?)",
             parameters,
         )
-        self.conn.commit()
+        self.commit_if_due(1)
 
     def update_cached_network_opinion(
         self,
@@ -184,7 +248,7 @@ class TrustDB:
             "VALUES (?, ?, ?, ?, ?, strftime('%s','now'));",
             (key_type, reported_key, score, confidence, network_score),
         )
-        self.conn.commit()
+        self.commit()
 
     def get_cached_network_opinion(self, key_type: str, reported_key: str):
         cache_cur = self.conn.execute(
@@ -254,7 +318,8 @@ class TrustDB:
             "FROM go_reliability "
             "WHERE peerid = ? "
             "ORDER BY update_time DESC "
-            "LIMIT 1;"
+            "LIMIT 1;",
+            (reporter_peerid,),
         )
         if res := go_reliability_cur.fetchone():
             return res[0]
@@ -280,46 +345,40 @@ class TrustDB:
         """
         Returns a list of tuples, where each tuple contains the report score, report confidence,
         reporter reliability, reporter score, and reporter confidence for a given IP address.
+        The reports are ignored if their reporter had the reported IP at
+        the time of the report, or if the reporter has no known ip,
+        reliability or reputation.
+        All of this is done in a single indexed query instead of 3 extra
+        queries per report.
         """
-        reports = self.get_reports_for_ip(ipaddress)
-        reporters_scores = []
-
-        for (
-            reporter_peerid,
-            report_timestamp,
-            report_score,
-            report_confidence,
-            reported_ip,
-        ) in reports:
-            reporter_ipaddress = self.get_reporter_ip(
-                reporter_peerid, report_timestamp
-            )
-            if reporter_ipaddress == ipaddress:
-                continue
-
-            reporter_reliability = self.get_reporter_reliability(
-                reporter_peerid
-            )
-            if reporter_reliability is None:
-                continue
-
-            reporter_score, reporter_confidence = self.get_reporter_reputation(
-                reporter_ipaddress
-            )
-            if reporter_score is None or reporter_confidence is None:
-                continue
-
-            reporters_scores.append(
-                (
-                    report_score,
-                    report_confidence,
-                    reporter_reliability,
-                    reporter_score,
-                    reporter_confidence,
-                )
-            )
-
-        return reporters_scores
+        opinion_cur = self.conn.execute(
+            "SELECT reports.score, reports.confidence, "
+            "       go_reliability.reliability, "
+            "       slips_reputation.score, slips_reputation.confidence "
+            "FROM reports "
+            # the ip of the reporter at the time of the report
+            "JOIN peer_ips ON peer_ips.id = ("
+            "    SELECT id FROM peer_ips "
+            "    WHERE peerid = reports.reporter_peerid "
+            "      AND update_time <= reports.update_time "
+            "    ORDER BY update_time DESC LIMIT 1) "
+            # the latest reliability of the reporter
+            "JOIN go_reliability ON go_reliability.id = ("
+            "    SELECT id FROM go_reliability "
+            "    WHERE peerid = reports.reporter_peerid "
+            "    ORDER BY update_time DESC LIMIT 1) "
+            # the latest reputation of the ip of the reporter
+            "JOIN slips_reputation ON slips_reputation.id = ("
+            "    SELECT id FROM slips_reputation "
+            "    WHERE ipaddress = peer_ips.ipaddress "
+            "    ORDER BY update_time DESC LIMIT 1) "
+            "WHERE reports.reported_key = ? "
+            "  AND reports.key_type = 'ip' "
+            "  AND peer_ips.ipaddress != ? "
+            "ORDER BY reports.update_time DESC;",
+            (ipaddress, ipaddress),
+        )
+        return opinion_cur.fetchall()
 
 
 if __name__ == "__main__":
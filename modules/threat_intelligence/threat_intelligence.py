@@ -6,9 +6,11 @@ import os
 import json
 import threading
 import time
+from collections import deque
 from uuid import uuid4
 import validators
 from typing import (
+    Deque,
     Dict,
     List,
     Union,
@@ -43,6 +45,14 @@ class ThreatIntel(IModule, URLhaus, Spamhaus):
         " are in a malicious list of IPs"
     )
     authors = ["Frantisek Strasak, Sebastian Garcia, Alya Gomaa"]
+    # max number of lookups to keep while waiting for the TI feeds to
+    # load, the oldest ones are evaluated right away once it's reached
+    max_deferred_lookups = 100000
+    # seconds to wait for the TI feeds before evaluating the deferred
+    # lookups with whatever is loaded
+    ti_ready_timeout = 20 * 60
+    # how often to check the db for the readiness of the TI feeds
+    ti_ready_check_interval = 5
 
     def init(self):
         """Initializes the ThreatIntel module. This includes setting up database
@@ -62,12 +72,20 @@ class ThreatIntel(IModule, URLhaus, Spamhaus):
         self.separator = self.db.get_field_separator()
         self.c1 = self.db.subscribe("give_threat_intelligence")
         self.c2 = self.db.subscribe("new_downloaded_file")
+        self.c3 = self.db.subscribe("ti_ready")
         self.channels = {
             "give_threat_intelligence": self.c1,
             "new_downloaded_file": self.c2,
+            "ti_ready": self.c3,
         }
         self.__read_configuration()
         self.get_all_blacklisted_ip_ranges()
+        # lookups received before the remote TI feeds are loaded when
+        # wait_for_TI_to_finish is enabled
+        self.deferred_lookups: Deque[dict] = deque()
+        self.ti_ready = False
+        self.start_time = time.time()
+        self.last_ti_ready_check = 0
         self.urlhaus = URLhaus(self.db)
         self.spamhaus = Spamhaus(self.db)
         self.pending_queries = multiprocessing.Queue()
@@ -127,6 +145,7 @@ class ThreatIntel(IModule, URLhaus, Spamhaus):
             Union[IPv4Network, IPv6Network, IPv4Address, IPv6Address]
         ]
         self.client_ips = conf.client_ips()
+        self.wait_for_ti = conf.wait_for_TI_to_finish()
 
     def set_evidence_malicious_asn(
         self,
@@ -1791,6 +1810,136 @@ class ThreatIntel(IModule, URLhaus, Spamhaus):
             return False
         return True
 
+    def is_ti_ready(self) -> bool:
+        """Returns whether the remote TI feeds are loaded.
+        The update manager signals it in the ti_ready channel, the db is
+        checked periodically too in case the signal was sent before this
+        module subscribed, or if the update manager is disabled.
+        The TI is considered ready after ti_ready_timeout seconds
+        regardless, so the deferred lookups don't wait forever.
+        """
+        if self.ti_ready:
+            return True
+
+        now = time.time()
+        if now - self.last_ti_ready_check < self.ti_ready_check_interval:
+            return False
+        self.last_ti_ready_check = now
+
+        if (
+            self.db.is_ti_ready()
+            or "update_manager" in self.db.get_disabled_modules()
+            or now - self.start_time >= self.ti_ready_timeout
+        ):
+            self.handle_ti_ready()
+        return self.ti_ready
+
+    def handle_ti_ready(self):
+        """Called every time the update manager is done updating the
+        remote TI feeds.
+        Reloads the cached IP ranges since the feeds may have new ones,
+        and evaluates the lookups that were deferred until the TI is ready.
+        """
+        self.ti_ready = True
+        self.get_all_blacklisted_ip_ranges()
+        deferred_lookups = len(self.deferred_lookups)
+        while self.deferred_lookups:
+            self.handle_lookup(self.deferred_lookups.popleft())
+
+        if deferred_lookups:
+            self.print(
+                f"TI feeds are ready. Evaluated {deferred_lookups} "
+                f"lookups that were waiting for them.",
+                2,
+                0,
+            )
+
+    def defer_lookup(self, data: dict):
+        """Keeps the given lookup until the remote TI feeds are loaded"""
+        if len(self.deferred_lookups) >= self.max_deferred_lookups:
+            # don't let the deferred lookups grow unbounded, evaluate
+            # the oldest one with whatever TI is loaded
+            self.handle_lookup(self.deferred_lookups.popleft())
+        self.deferred_lookups.append(data)
+
+    def shutdown_gracefully(self):
+        """
+        evaluates the lookups that are still waiting for the TI feeds
+        with whatever TI is loaded, since slips is stopping
+        """
+        deferred_lookups = len(self.deferred_lookups)
+        while self.deferred_lookups:
+            self.handle_lookup(self.deferred_lookups.popleft())
+
+        if deferred_lookups:
+            self.print(
+                f"Evaluated {deferred_lookups} lookups that were waiting "
+                f"for the TI feeds before stopping.",
+                log_to_logfiles_only=True,
+            )
+
+    def handle_lookup(self, data: dict):
+        """Looks up the IP, domain or URL in the given msg of the
+        give_threat_intelligence channel and sets evidence if it's
+        malicious"""
+        profileid = data.get("profileid")
+        twid = data.get("twid")
+        timestamp = data.get("stime")
+        uid = data.get("uid")
+        protocol = data.get("proto")
+        daddr = data.get("daddr")
+        # these 2 are only available when looking up dns answers
+        # the query is needed when a malicious answer is found,
+        # for more detailed description of the evidence
+        is_dns_response = data.get("is_dns_response")
+        dns_query = data.get("dns_query")
+        # this is the IP/domain that we want the TI for.
+        to_lookup = data.get("to_lookup", "")
+        # detect the type given because sometimes,
+        # http.log host field has ips OR domains
+        type_ = utils.detect_ioc_type(to_lookup)
+
+        # ip_state can be "srcip" or "dstip"
+        ip_state = data.get("ip_state")
+        if type_ == "ip":
+            ip = to_lookup
+            if self.should_lookup(ip, protocol, ip_state):
+                self.is_malicious_ip(
+                    ip,
+                    uid,
+                    daddr,
+                    timestamp,
+                    profileid,
+                    twid,
+                    ip_state,
+                    dns_query=dns_query,
+                    is_dns_response=is_dns_response,
+                )
+                self.ip_belongs_to_blacklisted_range(
+                    ip, uid, daddr, timestamp, profileid, twid, ip_state
+                )
+                self.ip_has_blacklisted_asn(
+                    ip,
+                    uid,
+                    timestamp,
+                    profileid,
+                    twid,
+                    is_dns_response=is_dns_response,
+                )
+        elif type_ == "domain":
+            if is_dns_response:
+                self.is_malicious_cname(
+                    dns_query, to_lookup, uid, timestamp, profileid, twid
+                )
+            else:
+                self.is_malicious_domain(
+                    to_lookup, uid, timestamp, profileid, twid
+                )
+        elif type_ == "url":
+            self.is_malicious_url(
+                to_lookup, uid, timestamp, daddr, profileid, twid
+            )
+
     def pre_main(self):
         utils.drop_root_privs()
         # Load the local Threat Intelligence files that are
@@ -1802,72 +1951,28 @@ class ThreatIntel(IModule, URLhaus, Spamhaus):
             "own_malicious_JARM.csv",
             "known_fp_md5_hashes.csv",
         )
-        for local_file in local_files:
-            self.update_local_file(local_file)
+        updated = [
+            self.update_local_file(local_file) for local_file in local_files
+        ]
+        if any(updated):
+            self.db.publish_ti_feeds_generation()
 
         self.pending_circllu_calls_thread.start()
 
     def main(self):
+        if self.get_msg("ti_ready"):
+            self.handle_ti_ready()
+        elif self.deferred_lookups:
+            # in case the ti_ready msg was missed
+            self.is_ti_ready()
+
         # The channel can receive an IP address or a domain name
         if msg := self.get_msg("give_threat_intelligence"):
             data = json.loads(msg["data"])
-            profileid = data.get("profileid")
-            twid = data.get("twid")
-            timestamp = data.get("stime")
-            uid = data.get("uid")
-            protocol = data.get("proto")
-            daddr = data.get("daddr")
-            # these 2 are only available when looking up dns answers
-            # the query is needed when a malicious answer is found,
-            # for more detailed description of the evidence
-            is_dns_response = data.get("is_dns_response")
-            dns_query = data.get("dns_query")
-            # this is the IP/domain that we want the TI for.
-            to_lookup = data.get("to_lookup", "")
-            # detect the type given because sometimes,
-            # http.log host field has ips OR domains
-            type_ = utils.detect_ioc_type(to_lookup)
-
-            # ip_state can be "srcip" or "dstip"
-            ip_state = data.get("ip_state")
-            if type_ == "ip":
-                ip = to_lookup
-                if self.should_lookup(ip, protocol, ip_state):
-                    self.is_malicious_ip(
-                        ip,
-                        uid,
-                        daddr,
-                        timestamp,
-                        profileid,
-                        twid,
-                        ip_state,
-                        dns_query=dns_query,
-                        is_dns_response=is_dns_response,
-                    )
-                    self.ip_belongs_to_blacklisted_range(
-                        ip, uid, daddr, timestamp, profileid, twid, ip_state
-                    )
-                    self.ip_has_blacklisted_asn(
-                        ip,
-                        uid,
-                        timestamp,
-                        profileid,
-                        twid,
-                        is_dns_response=is_dns_response,
-                    )
-            elif type_ == "domain":
-                if is_dns_response:
-                    self.is_malicious_cname(
-                        dns_query, to_lookup, uid, timestamp, profileid, twid
-                    )
-                else:
-                    self.is_malicious_domain(
-                        to_lookup, uid, timestamp, profileid, twid
-                    )
-            elif type_ == "url":
-                self.is_malicious_url(
-                    to_lookup, uid, timestamp, daddr, profileid, twid
-                )
+            if self.wait_for_ti and not self.is_ti_ready():
+                self.defer_lookup(data)
+            else:
+                self.handle_lookup(data)
 
         if msg := self.get_msg("new_downloaded_file"):
             file_info: dict = json.loads(msg["data"])
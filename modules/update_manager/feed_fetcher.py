@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import (
+    Dict,
+    Optional,
+)
+from urllib.parse import urlparse
+
+import requests
+
+
+@dataclass
+class FetchResult:
+    url: str
+    # where the body of the response is written
+    path: str
+    # one of FeedFetcher.statuses
+    status: str
+    e_tag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # number of bytes written to path
+    size: int = 0
+    # seconds it took to download the feed, including retries
+    download_time: float = 0
+    error: str = ""
+
+
+class FeedFetcher:
+    """
+    Downloads remote TI feeds concurrently.
+    Each request is conditional, it sends the e-tag and the Last-Modified
+    of the cached version of the feed, so servers that support it reply
+    with 304 instead of sending feeds that didn't change.
+    Bodies are streamed to disk instead of being kept in memory.
+    The number of concurrent downloads from the same host is capped.
+    """
+
+    # the feed changed and was written to disk
+    MODIFIED = "modified"
+    # the server says the cached version of the feed is up to date
+    NOT_MODIFIED = "not_modified"
+    FAILED = "failed"
+    statuses = (MODIFIED, NOT_MODIFIED, FAILED)
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 2,
+        timeout: float = 5,
+        retries: int = 5,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+        # {host: semaphore}, created in the event loop that uses them
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(
+                self.max_connections_per_host
+            )
+        return self.host_semaphores[host]
+
+    @staticmethod
+    def _get_conditional_headers(
+        e_tag: Optional[str], last_modified: Optional[str]
+    ) -> Dict[str, str]:
+        headers = {}
+        if e_tag:
+            headers["If-None-Match"] = e_tag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _write_to_disk(self, response: requests.Response, path: str) -> int:
+        """
+        streams the body of the given response to the given path.
+        the body is written to a temporary file first, so a half
+        downloaded feed never replaces a complete one
+        returns the number of written bytes
+        """
+        size = 0
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as feed:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                feed.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+        return size
+
+    def _download(
+        self,
+        url: str,
+        path: str,
+        e_tag: Optional[str],
+        last_modified: Optional[str],
+    ) -> FetchResult:
+        """blocking download, runs in a worker thread"""
+        start = time.time()
+        result = FetchResult(url=url, path=path, status=self.FAILED)
+        headers = self._get_conditional_headers(e_tag, last_modified)
+        for _ in range(self.retries):
+            try:
+                with requests.get(
+                    url, headers=headers, timeout=self.timeout, stream=True
+                ) as response:
+                    if response.status_code == 304:
+                        result.status = self.NOT_MODIFIED
+                        break
+
+                    if response.status_code != 200:
+                        result.error = (
+                            f"An error occurred while downloading the file "
+                            f"{url}. status code: {response.status_code}."
+                        )
+                        continue
+
+                    result.e_tag = response.headers.get("ETag")
+                    result.last_modified = response.headers.get(
+                        "Last-Modified"
+                    )
+                    result.size = self._write_to_disk(response, path)
+                    result.status = self.MODIFIED
+                    result.error = ""
+                    break
+            except requests.exceptions.Timeout:
+                result.error = (
+                    f"Timeout reached while downloading the file {url}."
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                result.error = (
+                    f"Connection error while downloading the file {url}."
+                )
+
+        result.download_time = time.time() - start
+        return result
+
+    async def fetch(
+        self,
+        url: str,
+        path: str,
+        e_tag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> FetchResult:
+        """
+        downloads the given url to the given path if it changed since the
+        version with the given e-tag and last-modified was downloaded
+        """
+        async with self._get_host_semaphore(url):
+            return await asyncio.to_thread(
+                self._download, url, path, e_tag, last_modified
+            )
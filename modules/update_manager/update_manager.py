@@ -9,7 +9,6 @@ import time
 import traceback
 from asyncio import Task
 from typing import (
-    IO,
     Optional,
     Tuple,
     Dict,
@@ -22,6 +21,10 @@ from exclusiveprocess import (
     CannotAcquireLock,
 )
 
+from modules.update_manager.feed_fetcher import (
+    FeedFetcher,
+    FetchResult,
+)
 from modules.update_manager.timer_manager import InfiniteTimer
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.abstracts.module import IModule
@@ -80,6 +83,9 @@ class UpdateManager(IModule):
         self.ignored_IoCs = ("email", "url", "file_hash", "file")
         # to track how many times an ip is present in different blacklists
         self.ips_ctr = {}
+        # max number of IoCs parsed from a TI feed that are kept in memory
+        # before storing them in the db
+        self.ti_feed_chunk_size = 10000
         self.first_time_reading_files = False
         # store the responses of the files that should be updated when their
         # update period passed
@@ -106,6 +112,7 @@ class UpdateManager(IModule):
         conf = ConfigParser()
 
         self.update_period = conf.update_period()
+        self.max_connections_per_host = conf.ti_max_connections_per_host()
 
         self.path_to_remote_ti_files = conf.remote_ti_data_path()
         if not os.path.exists(self.path_to_remote_ti_files):
@@ -431,45 +438,14 @@ class UpdateManager(IModule):
             if not response:
                 return False
 
-            # Get the E-TAG of this file to compare with current files
-            ti_file_info: dict = self.db.get_ti_feed_info(file_to_download)
-            old_e_tag = ti_file_info.get("e-tag", "")
-            # Check now if E-TAG of file in github is same as downloaded
-            # file here.
-            new_e_tag = self.get_e_tag(response)
-            if not new_e_tag:
-                # use last modified instead
-                cached_last_modified = ti_file_info.get("Last-Modified", "")
-                new_last_modified = self.get_last_modified(response)
-
-                if not new_last_modified:
-                    self.log(
-                        f"Error updating {file_to_download}."
-                        f" Doesn't have an e-tag or Last-Modified field."
-                    )
-                    return False
-
-                # use last modified date instead of e-tag
-                if new_last_modified != cached_last_modified:
-                    self.responses[file_to_download] = response
-                    return True
-                else:
-                    self.mark_feed_as_updated(file_to_download)
-                    return False
-
-            if old_e_tag != new_e_tag:
-                # Our TI file is old. Download the new one.
-                # we'll be storing this e-tag in our database
+            if self.is_changed_on_server(
+                file_to_download,
+                self.get_e_tag(response),
+                self.get_last_modified(response),
+            ):
                 self.responses[file_to_download] = response
                 return True
-
-            else:
-                # old_e_tag == new_e_tag
-                # update period passed but the file hasnt changed on the
-                # server, no need to update
-                # Store the update time like we downloaded it anyway
-                self.mark_feed_as_updated(file_to_download)
-                return False
+            return False
 
         except Exception:
             exception_line = sys.exc_info()[2].tb_lineno
@@ -479,6 +455,85 @@ class UpdateManager(IModule):
             self.print(traceback.format_exc(), 0, 1)
         return False
 
+    def is_changed_on_server(
+        self, file_to_download: str, new_e_tag, new_last_modified
+    ) -> bool:
+        """
+        Compares the e-tag, or the Last-Modified if there's no e-tag, of
+        the given file on the server with the ones of our cached version
+        of it. If it didn't change, the file is marked as updated.
+        """
+        ti_file_info: dict = self.db.get_ti_feed_info(file_to_download)
+        if new_e_tag:
+            changed = ti_file_info.get("e-tag", "") != new_e_tag
+        elif new_last_modified:
+            # use last modified date instead of e-tag
+            cached_last_modified = ti_file_info.get("Last-Modified", "")
+            changed = cached_last_modified != new_last_modified
+        else:
+            self.log(
+                f"Error updating {file_to_download}."
+                f" Doesn't have an e-tag or Last-Modified field."
+            )
+            return False
+
+        if not changed:
+            # update period passed but the file hasnt changed on the
+            # server, no need to update
+            # Store the update time like we downloaded it anyway
+            self.mark_feed_as_updated(file_to_download)
+        return changed
+
+    def is_new_feed_version(self, fetched: FetchResult) -> bool:
+        """
+        checks whether the given downloaded feed should be parsed
+        """
+        if fetched.status == FeedFetcher.FAILED:
+            self.print(f"{fetched.error} Aborting.", 0, 1)
+            return False
+
+        if fetched.status == FeedFetcher.NOT_MODIFIED:
+            self.mark_feed_as_updated(fetched.url)
+            return False
+
+        # servers that don't support conditional requests send the
+        # feed anyway
+        if self.is_changed_on_server(
+            fetched.url, fetched.e_tag, fetched.last_modified
+        ):
+            return True
+
+        self.delete_downloaded_feed(fetched.path)
+        return False
+
+    def get_feed_path(self, feed_link: str) -> str:
+        """returns the path the given remote feed is downloaded to"""
+        return os.path.join(
+            self.path_to_remote_ti_files, feed_link.split("/")[-1]
+        )
+
+    async def fetch_feed(self, fetcher: FeedFetcher, feed_link: str):
+        """
+        downloads the given feed if it changed since the last time we
+        downloaded it
+        """
+        ti_file_info: dict = self.db.get_ti_feed_info(feed_link)
+        return await fetcher.fetch(
+            feed_link,
+            self.get_feed_path(feed_link),
+            e_tag=ti_file_info.get("e-tag"),
+            last_modified=ti_file_info.get("Last-Modified"),
+        )
+
+    @staticmethod
+    def delete_downloaded_feed(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # this happens in integration tests, when another test deletes
+            # the file while this one is updating it, ignore it
+            pass
+
     def get_e_tag(self, response):
         """
         :param response: the output of a request done with requests library
@@ -616,26 +671,19 @@ class UpdateManager(IModule):
         self.db.add_ssl_sha1_to_ioc(malicious_ssl_certs)
         return True
 
-    async def update_ti_file(self, link_to_download: str) -> bool:
+    async def update_ti_file(self, fetched: FetchResult) -> bool:
         """
-        Update remote TI files, JA3 feeds and SSL feeds by writing them to
-        disk and parsing them
+        Parse the downloaded remote TI files, JA3 feeds and SSL feeds
         """
+        link_to_download: str = fetched.url
+        full_path: str = fetched.path
         try:
             self.log(f"Updating the remote file {link_to_download}")
-            response = self.responses[link_to_download]
-            file_name_to_download = link_to_download.split("/")[-1]
-
-            # first download the file and save it locally
-            full_path = os.path.join(
-                self.path_to_remote_ti_files, file_name_to_download
-            )
-            self.write_file_to_disk(response, full_path)
-
-            # File is updated in the server and was in our database.
-            # Delete previous iocs of this file.
-            self.db.delete_feed_entries(link_to_download)
+            parse_start = time.time()
 
+            # no need to delete the previous iocs of this file first,
+            # parsing it replaces them with the new ones without leaving
+            # the feed empty while it's being parsed
             # ja3 files and ti_files are parsed differently, check which file is this
             # is it ja3 feed?
             if link_to_download in self.ja3_feeds and not self.parse_ja3_feed(
@@ -674,23 +722,23 @@ class UpdateManager(IModule):
 
             # Store the new etag and time of file in the database
             file_info = {
-                "e-tag": self.get_e_tag(response),
+                "e-tag": fetched.e_tag or False,
                 "time": time.time(),
-                "Last-Modified": self.get_last_modified(response),
+                "Last-Modified": fetched.last_modified or False,
+                "size": fetched.size,
+                "download_time": round(fetched.download_time, 3),
+                "parse_time": round(time.time() - parse_start, 3),
             }
             self.mark_feed_as_updated(link_to_download, extra_info=file_info)
             self.log(
-                f"Successfully updated the remote file {link_to_download}"
+                f"Successfully updated the remote file {link_to_download}. "
+                f"Downloaded {file_info['size']} bytes in "
+                f"{file_info['download_time']}s, parsed in "
+                f"{file_info['parse_time']}s."
             )
 
             # done parsing the file, delete it from disk
-            try:
-                os.remove(full_path)
-            except FileNotFoundError:
-                # this happens in integration tests, when another test deletes
-                # the file while this one is updating it, ignore it
-                pass
-
+            self.delete_downloaded_feed(full_path)
             return True
 
         except Exception:
@@ -942,7 +990,7 @@ class UpdateManager(IModule):
                         }
                     )
 
-            self.db.add_ips_to_ioc(malicious_ips_dict)
+            self.db.add_ips_to_ioc(malicious_ips_dict, feed=filename)
             return True
 
         if "hole.cert.pl" in link_to_download:
@@ -980,7 +1028,7 @@ class UpdateManager(IModule):
                             "tags": tags,
                         }
                     )
-            self.db.add_domains_to_ioc(malicious_domains_dict)
+            self.db.add_domains_to_ioc(malicious_domains_dict, feed=filename)
             return True
 
     def get_description_column_index(self, header):
@@ -1381,23 +1429,54 @@ class UpdateManager(IModule):
             return False
         return True
 
+    def get_number_of_parsed_iocs(self) -> int:
+        """
+        returns the number of IoCs parsed from the current TI feed that
+        aren't stored in the db yet
+        """
+        return (
+            len(self.malicious_ips_dict)
+            + len(self.malicious_domains_dict)
+            + len(self.malicious_ip_ranges)
+        )
+
+    def store_parsed_iocs(self, ti_file_name: str):
+        """
+        stores the IoCs parsed so far from the given feed in the db and
+        frees them from memory
+        """
+        counts: Dict[str, int] = self.db.add_feed_iocs(
+            ti_file_name,
+            ips=self.malicious_ips_dict,
+            domains=self.malicious_domains_dict,
+            ip_ranges=self.malicious_ip_ranges,
+        )
+        for action, count in counts.items():
+            self.feed_update_counts[action] += count
+
+        self.malicious_ips_dict = {}
+        self.malicious_domains_dict = {}
+        self.malicious_ip_ranges = {}
+
     def parse_ti_feed(self, feed_link: str, ti_file_path: str) -> bool:
         """
-        Read all the files holding IP addresses and a description and put the
-        info in a large dict.
-        This also helps in having unique ioc across files
+        Read all the files holding IP addresses and a description and
+        store them in the db in chunks of ti_feed_chunk_size IoCs.
+        Only the IoCs that were added, changed or removed since the
+        previous version of the feed are written to the db.
         :param feed_link: this link that has the IOCs we're
         currently parsing, used for getting the threat_level
         :param ti_file_path: this is the path where the saved file
         from the link is downloaded
         """
-        # try:
         if not self.is_valid_ti_file(ti_file_path):
             return False
 
         if "json" in ti_file_path:
             return self.parse_json_ti_feed(feed_link, ti_file_path)
 
+        # the separator and the columns are detected once per feed from
+        # its first lines
         structure: Tuple[int] = self.get_feed_structure(ti_file_path)
         if not structure:
             return False
@@ -1406,54 +1485,51 @@ class UpdateManager(IModule):
         self.malicious_ips_dict = {}
         self.malicious_domains_dict = {}
         self.malicious_ip_ranges = {}
+        self.feed_update_counts = {"added": 0, "changed": 0}
+        handlers = {
+            "domain": self.extract_domain_info,
+            "ip": self.extract_ip_info,
+            "ip_range": self.extract_ip_range_info,
+        }
+        ti_file_name: str = ti_file_path.split("/")[-1]
+        self.db.start_feed_update(ti_file_name)
 
-        feed: IO = open(ti_file_path)
-        while line := feed.readline():
-            if self.is_ignored_line(line):
-                continue
+        with open(ti_file_path) as feed:
+            for line in feed:
+                if self.is_ignored_line(line):
+                    continue
 
-            line = self.normalize_line(ti_file_path, line)
-            ioc, description = self.extract_ioc_from_line(
-                line,
-                line_fields,
-                separator,
-                data_col,
-                description_col,
-                ti_file_path,
-            )
+                line = self.normalize_line(ti_file_path, line)
+                ioc, description = self.extract_ioc_from_line(
+                    line,
+                    line_fields,
+                    separator,
+                    data_col,
+                    description_col,
+                    ti_file_path,
+                )
 
-            if not self.is_valid_ioc_and_description(
-                ioc, description, ti_file_path
-            ):
-                continue
+                if not self.is_valid_ioc_and_description(
+                    ioc, description, ti_file_path
+                ):
+                    continue
 
-            data_type = utils.detect_ioc_type(ioc)
-            handlers = {
-                "domain": self.extract_domain_info,
-                "ip": self.extract_ip_info,
-                "ip_range": self.extract_ip_range_info,
-            }
+                data_type = utils.detect_ioc_type(ioc)
+                handlers[data_type](ioc, ti_file_name, feed_link, description)
 
-            ti_file_name: str = ti_file_path.split("/")[-1]
-            handlers[data_type](ioc, ti_file_name, feed_link, description)
+                if self.get_number_of_parsed_iocs() >= self.ti_feed_chunk_size:
+                    self.store_parsed_iocs(ti_file_name)
 
-        self.db.add_ips_to_ioc(self.malicious_ips_dict)
-        self.db.add_domains_to_ioc(self.malicious_domains_dict)
-        self.db.add_ip_range_to_ioc(self.malicious_ip_ranges)
-        feed.close()
+        self.store_parsed_iocs(ti_file_name)
+        removed: int = self.db.finish_feed_update(ti_file_name)
+        self.log(
+            f"Updated the IoCs of {ti_file_name}: "
+            f"{self.feed_update_counts['added']} added, "
+            f"{self.feed_update_counts['changed']} changed, "
+            f"{removed} removed."
+        )
         return True
 
-        # except Exception:
-        #     exception_line = sys.exc_info()[2].tb_lineno
-        #     self.print(
-        #         f"Problem while updating {feed_link} line "
-        #         f"{exception_line}",
-        #         0,
-        #         1,
-        #     )
-        #     self.print(traceback.format_exc(), 0, 1)
-        #     return False
-
     def check_if_update_org(self, file):
         """checks if we should update organizations' info
         based on the hash of thegiven file"""
@@ -1700,38 +1776,40 @@ class UpdateManager(IModule):
             # this run (self.url_feeds, self.ja3_feeds, self.ssl_feeds)
             self.delete_unused_cached_remote_feeds()
 
+            feeds_to_fetch = []
             for file_to_download in files_to_download:
-                if self.should_update(file_to_download, self.update_period):
-                    # failed to get the response, either a server problem
-                    # or the file is up to date so the response isn't needed
-                    # either way __check_if_update handles the error printing
-
-                    # this run wasn't started with existing ti files in the db
-                    self.first_time_reading_files = True
-
-                    # every function call to update_TI_file is now running
-                    # concurrently instead of serially
-                    # so when a server's taking a while to give us the TI
-                    # feed, we proceed to download the next file instead of
-                    # being idle
-                    task = asyncio.create_task(
-                        self.update_ti_file(file_to_download)
-                    )
-                    task.add_done_callback(self.handle_exception)
+                if self.did_update_period_pass(
+                    self.update_period, file_to_download
+                ):
+                    feeds_to_fetch.append(file_to_download)
+                else:
+                    # Update period hasn't passed yet, but the file is
+                    # in our db
+                    self.loaded_ti_files += 1
+
+            # all feeds are downloaded concurrently, each one is parsed
+            # as soon as it's downloaded while the rest are still
+            # downloading. semaphores are bound to the event loop, so use
+            # a new fetcher for each update
+            fetcher = FeedFetcher(
+                max_connections_per_host=self.max_connections_per_host
+            )
+            for fetch in asyncio.as_completed(
+                [self.fetch_feed(fetcher, feed) for feed in feeds_to_fetch]
+            ):
+                fetched: FetchResult = await fetch
+                if not self.is_new_feed_version(fetched):
+                    continue
+                # this run wasn't started with existing ti files in the db
+                self.first_time_reading_files = True
+                await self.update_ti_file(fetched)
+
             #######################################################
             # in case of riskiq files, we don't have a link for them in ti_files, We update these files using their API
             # check if we have a username and api key and a week has passed since we last updated
             if self.should_update("riskiq_domains", self.riskiq_update_period):
                 self.update_riskiq_feed()
 
-            # wait for all TI files to update
-            try:
-                await task
-            except (UnboundLocalError, asyncio.exceptions.CancelledError):
-                # in case all our files are updated, we don't
-                # have task defined, skip
-                pass
-
             self.db.set_loaded_ti_files(self.loaded_ti_files)
             self.print_duplicate_ip_summary()
             self.loaded_ti_files = 0
@@ -1740,18 +1818,26 @@ class UpdateManager(IModule):
 
     async def update_ti_files(self):
         """
-        Update TI files and store them in database before slips starts
+        Update TI files and store them in the database in the background.
+        signals that the TI is ready once done, even if some feeds
+        failed, so that the lookups deferred by the TI module don't wait
+        forever
         """
         # create_task is used to run update() function
         # concurrently instead of serially
         self.update_finished: Task = asyncio.create_task(self.update())
         self.update_finished.add_done_callback(self.handle_exception)
-
-        await self.update_finished
-        self.print(
-            f"{self.db.get_loaded_ti_feeds_number()} "
-            f"TI files successfully loaded."
-        )
+        try:
+            await self.update_finished
+            self.print(
+                f"{self.db.get_loaded_ti_feeds_number()} "
+                f"TI files successfully loaded."
+            )
+        finally:
+            # processes reload their in-memory copy of the IoCs once,
+            # after all feeds are updated, instead of after each feed
+            self.db.publish_ti_feeds_generation()
+            self.db.set_ti_ready()
 
     def shutdown_gracefully(self):
         # terminating the timer for the process to be killed
@@ -1776,7 +1862,8 @@ class UpdateManager(IModule):
                 return True
         except CannotAcquireLock:
             # another instance of slips is updating TI files, tranco
-            # whitelists and mac db
+            # whitelists and mac db, use the feeds it already cached
+            self.db.set_ti_ready()
             return 1
 
     def main(self):
@@ -548,16 +548,17 @@ class Main:
             # if slips is given a .rdb file, don't load the
             # modules as we don't need them
             if not self.args.db:
-                # update local files before starting modules
-                # if wait_for_TI_to_finish is set to true in the config file,
-                # slips will wait untill all TI files are updated before
-                # starting the rest of the modules
-                self.proc_man.start_update_manager(
-                    local_files=True,
-                    ti_feeds=self.conf.wait_for_TI_to_finish(),
-                )
+                # update local files before starting modules, they're
+                # small and needed by the profiler and the whitelist.
+                # the remote TI feeds are updated in the background by the
+                # update manager module, if wait_for_TI_to_finish is set
+                # to true in the config file, the TI module defers the
+                # lookups until all TI files are updated
+                self.proc_man.start_update_manager(local_files=True)
+                self.db.set_startup_phase("local_files_updated")
                 self.print("Starting modules", 1, 0)
                 self.proc_man.load_modules()
+                self.db.set_startup_phase("modules_started")
                 # give outputprocess time to print all the started modules
                 time.sleep(0.5)
                 self.proc_man.print_disabled_modules()
@@ -581,12 +582,14 @@ class Main:
             self.metadata_man.add_metadata_if_enabled()
 
             self.input_process = self.proc_man.start_input_process()
+            self.db.set_startup_phase("input_started")
 
             # obtain the list of active processes
             self.proc_man.processes = multiprocessing.active_children()
 
             self.db.store_pid("slips.py", int(self.pid))
             self.metadata_man.set_input_metadata()
+            self.profilers_manager.print_startup_profile()
 
             # warn about unused open redis servers
             open_servers = len(self.redis_man.get_open_redis_servers())
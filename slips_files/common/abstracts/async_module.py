@@ -4,9 +4,12 @@ import asyncio
 from asyncio import Task
 from typing import (
     Callable,
-    List,
+    Dict,
+    Hashable,
+    Set,
 )
 from slips_files.common.abstracts.module import IModule
+from slips_files.common.data_structures.timer_wheel import TimerWheel
 
 
 class AsyncModule(IModule):
@@ -18,8 +21,12 @@ class AsyncModule(IModule):
 
     def __init__(self, *args, **kwargs):
         IModule.__init__(self, *args, **kwargs)
-        # list of async functions to await before flowalerts shuts down
-        self.tasks: List[Task] = []
+        # async functions to await before the module shuts down. tasks
+        # are removed once done
+        self.tasks: Set[Task] = set()
+        # checks that should run again after a while, e.g. once the
+        # conn.log flow of an altflow is read
+        self.deferred_checks = TimerWheel()
 
     def init(self, **kwargs): ...
 
@@ -35,10 +42,54 @@ class AsyncModule(IModule):
         # Allow the event loop to run the scheduled task
         # await asyncio.sleep(0)
 
-        # to wait for these functions before flowalerts shuts down
-        self.tasks.append(task)
+        self.track_task(task)
         return task
 
+    def track_task(self, task: Task):
+        """
+        keeps a reference to the given task to await it before the
+        module shuts down, until it's done
+        """
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def defer_check(
+        self, check: str, key: Hashable, delay: float, func: Callable, *args
+    ) -> bool:
+        """
+        calls func(*args) once delay seconds passed, from the main loop
+        of the module.
+        instead of having a task per flow sleeping until it's time for
+        its check, checks are stored in a timer wheel and the due ones
+        are run in batches.
+        :param check: name of the check, e.g. "successful_ssh"
+        :param key: what's checked, e.g. a daddr or a uid. if a check
+        with the same name and key is already pending, this one is
+        dropped
+        returns False if the check was dropped
+        """
+        return self.deferred_checks.schedule((check, key), delay, func, *args)
+
+    def run_due_checks(self, run_all=False):
+        """
+        runs the deferred checks that are due
+        :param run_all: run all pending checks even if they're not due
+        yet, e.g. on shutdown
+        """
+        if run_all:
+            due = self.deferred_checks.pop_all()
+        else:
+            due = self.deferred_checks.advance()
+        for func, args in due:
+            try:
+                func(*args)
+            except Exception:
+                self.print_traceback()
+
+    def get_deferred_checks_stats(self) -> Dict[str, int]:
+        """returns the number of pending, dropped and run checks"""
+        return self.deferred_checks.get_stats()
+
     def handle_exception(self, task):
         """
         in asyncmodules we use Async.Task to run some of the functions
@@ -94,12 +145,15 @@ class AsyncModule(IModule):
         while True:
             try:
                 if self.should_stop():
+                    self.export_channel_metrics(force=True)
                     self.run_async_function(self.shutdown_gracefully)
                     return
 
+                self.run_due_checks()
                 # if a module's main() returns 1, it means there's an
                 # error and it needs to stop immediately
                 error: bool = self.run_async_function(self.main)
+                self.export_channel_metrics()
                 if error:
                     self.run_async_function(self.shutdown_gracefully)
                     return
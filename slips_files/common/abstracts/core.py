@@ -36,6 +36,7 @@ class ICore(IModule, Process):
             # this should be defined in every core file
             # this won't run in a loop because it's not a module
             self.main()
+            self.export_channel_metrics(force=True)
             self.shutdown_gracefully()
 
         except KeyboardInterrupt:
@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
 import sys
+import time
 import traceback
 import warnings
 from abc import ABC, abstractmethod
@@ -9,6 +10,9 @@ from typing import (
     Dict,
     Optional,
 )
+from slips_files.common.performance_profilers.channel_metrics import (
+    ChannelMetrics,
+)
 from slips_files.common.printer import Printer
 from slips_files.core.output import Output
 from slips_files.common.slips_utils import utils
@@ -27,6 +31,8 @@ class IModule(ABC, Process):
     authors = ["Template Author"]
     # should be filled with the channels each module subscribes to
     channels = {}
+    # how often the channel metrics of the module are stored in the db
+    channel_metrics_export_interval = 10
 
     def __init__(
         self,
@@ -46,6 +52,8 @@ class IModule(ABC, Process):
         self.printer = Printer(self.logger, self.name)
         self.db = DBManager(self.logger, self.output_dir, self.redis_port)
         self.keyboard_int_ctr = 0
+        self.channel_metrics = ChannelMetrics()
+        self.channel_metrics_exported_at = time.time()
         self.init(**kwargs)
         # should after the module's init() so the module has a chance to
         # set its own channels
@@ -136,10 +144,38 @@ class IModule(ABC, Process):
         if utils.is_msg_intended_for(message, channel):
             self.channel_tracker[channel]["msg_received"] = True
             self.db.incr_msgs_received_in_channel(self.name, channel)
+            # core files like the profiler don't return to a main loop
+            # after each msg, so this is where their metrics are exported
+            self.export_channel_metrics()
+            self.channel_metrics.msg_received(
+                channel, message.get("published_at")
+            )
             return message
 
         self.channel_tracker[channel]["msg_received"] = False
 
+    def export_channel_metrics(self, force=False):
+        """
+        stores the msgs received and processed by this module in each
+        channel in the db, once every channel_metrics_export_interval
+        seconds
+        :param force: export them even if the interval didn't pass yet,
+        e.g. on shutdown
+        """
+        # the last received msg is done being processed by now
+        self.channel_metrics.msg_processed()
+        now = time.time()
+        if (
+            not force
+            and now - self.channel_metrics_exported_at
+            < self.channel_metrics_export_interval
+        ):
+            return
+        self.channel_metrics_exported_at = now
+        self.db.store_channel_metrics(
+            self.name, self.channel_metrics.get_stats()
+        )
+
     def print_traceback(self):
         exception_line = sys.exc_info()[2].tb_lineno
         self.print(f"Problem in line {exception_line}", 0, 1)
@@ -166,10 +202,12 @@ class IModule(ABC, Process):
         while True:
             try:
                 if self.should_stop():
+                    self.export_channel_metrics(force=True)
                     self.shutdown_gracefully()
                     return
 
                 error: bool = self.main()
+                self.export_channel_metrics()
                 if error:
                     self.shutdown_gracefully()
                     return
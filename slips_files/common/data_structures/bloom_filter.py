@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import hashlib
+import math
+from typing import (
+    Iterable,
+    Iterator,
+)
+
+
+class BloomFilter:
+    """
+    Fixed size set of strings that can answer "is this string in the set"
+    using a lot less memory than a python set, at the cost of false
+    positives.
+    Items can't be removed or listed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        :param capacity: number of items that can be added before the
+        false positive rate exceeds error_rate
+        :param error_rate: probability of a false positive
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # number of bits, and number of bits set per item, that give
+        # the given error rate for the given capacity
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        )
+        self.number_of_hashes = max(
+            1, round(self.size / capacity * math.log(2))
+        )
+        self.bits = bytearray(math.ceil(self.size / 8))
+        # number of added items
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _get_positions(self, item: str) -> Iterator[int]:
+        # double hashing, derives all the positions from one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.number_of_hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for position in self._get_positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._get_positions(item)
+        )
@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+from types import MappingProxyType
+from typing import (
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+from slips_files.common.data_structures.trie import Trie
+
+
+def normalize_domain(domain: str) -> str:
+    """lowercases the given domain and removes its trailing dot"""
+    return domain.lower().rstrip(".")
+
+
+def normalize_hash(hash_: str) -> str:
+    """hashes are case insensitive, and some feeds pad them"""
+    return hash_.strip().lower()
+
+
+class DomainMatcher:
+    """
+    Matches domains against the blacklisted ones, either exactly or as
+    subdomains of a blacklisted domain
+    """
+
+    def __init__(self, domains: Dict[str, str]):
+        """
+        :param domains: {domain: json.dumps{'source':..,'tags':..,
+                                    'threat_level':... ,'description'}}
+        """
+        # the info of each domain is kept as the given str and is only
+        # parsed when it's matched
+        self.exact: Dict[str, str] = {}
+        self.trie = Trie()
+        for domain, domain_info in domains.items():
+            domain = normalize_domain(domain)
+            self.exact[domain] = domain_info
+            self.trie.insert(domain, domain_info)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def match(self, domain: str) -> Tuple[Optional[str], bool]:
+        """
+        returns a tuple (domain_info, is_subdomain)
+        domain_info is None if neither the given domain nor any of its
+        parent domains are blacklisted
+        """
+        domain = normalize_domain(domain)
+        if domain_info := self.exact.get(domain):
+            return domain_info, False
+
+        found, domain_info = self.trie.search(domain)
+        if found:
+            return domain_info, True
+        return None, False
+
+
+class IoCSnapshot:
+    """
+    In-memory copy of the IoCs of the TI feeds, used by one process to
+    lookup domains and hashes without asking the cache db every time.
+
+    Each type of IoC is read from the db the first time it's looked up,
+    then kept until the snapshot is replaced by one of a newer
+    generation of the feeds.
+    """
+
+    # types of IoCs matched as domains, all others are matched as hashes
+    domain_types = ("domains",)
+
+    def __init__(
+        self, generation: int, loaders: Dict[str, Callable[[], Dict]]
+    ):
+        """
+        :param generation: the generation of the feeds this snapshot
+        is a copy of
+        :param loaders: {ioc type: function that returns all the IoCs of
+        this type from the db as {ioc: info}}
+        """
+        self.generation = generation
+        self.loaders = loaders
+        self.matchers: Dict[str, object] = {}
+
+    def _get_matcher(self, ioc_type: str):
+        if ioc_type not in self.matchers:
+            iocs: Dict[str, str] = self.loaders[ioc_type]() or {}
+            if ioc_type in self.domain_types:
+                self.matchers[ioc_type] = DomainMatcher(iocs)
+            else:
+                # read-only, the same snapshot is used by all the
+                # lookups of the process
+                self.matchers[ioc_type] = MappingProxyType(
+                    {normalize_hash(ioc): info for ioc, info in iocs.items()}
+                )
+        return self.matchers[ioc_type]
+
+    def match_domain(
+        self, domain: str, ioc_type: str = "domains"
+    ) -> Tuple[Optional[str], bool]:
+        """
+        returns a tuple (domain_info, is_subdomain), check
+        DomainMatcher.match()
+        """
+        if not domain:
+            return None, False
+        return self._get_matcher(ioc_type).match(domain)
+
+    def match_hash(self, ioc_type: str, hash_: str) -> Optional[str]:
+        """returns the info of the given hash if it's blacklisted"""
+        if not hash_:
+            return None
+        return self._get_matcher(ioc_type).get(normalize_hash(hash_))
+
+    def get_stats(self) -> Dict[str, int]:
+        """returns the number of loaded IoCs of each type"""
+        return {
+            ioc_type: len(matcher)
+            for ioc_type, matcher in self.matchers.items()
+        }
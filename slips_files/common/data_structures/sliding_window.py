@@ -0,0 +1,140 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import bisect
+import sys
+from collections import (
+    OrderedDict,
+    deque,
+)
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+# (timestamp, value)
+Entry = Tuple[float, Any]
+
+
+class SlidingWindowCounter:
+    """
+    Keeps the (timestamp, value) entries of each key that are at most
+    window seconds older than the newest entry of that key, e.g. the
+    uids of the failed logins of each profile in the last 10 seconds.
+
+    Entries are kept in a deque per key sorted by timestamp, so
+    expiring old entries only pops them from the left of the deque
+    instead of scanning all of them.
+
+    Memory is bounded by max_keys, the least recently updated key is
+    evicted once it's exceeded, and by max_entries_per_key, the oldest
+    entries of a key are dropped once it's exceeded.
+
+    Timestamps are in the time of the flows (e.g. zeek time), not in
+    the time of the machine running slips.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_keys: int = 10000,
+        max_entries_per_key: Optional[int] = None,
+    ):
+        self.window = window
+        self.max_keys = max_keys
+        self.max_entries_per_key = max_entries_per_key
+        self.entries: OrderedDict[Hashable, Deque[Entry]] = OrderedDict()
+        self.stats = {
+            # entries older than the window
+            "expired": 0,
+            # entries dropped because their key had max_entries_per_key
+            "dropped": 0,
+            # keys evicted because there were max_keys keys
+            "evicted_keys": 0,
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self.entries
+
+    def _expire(self, entries: Deque[Entry]):
+        oldest_allowed = entries[-1][0] - self.window
+        while entries[0][0] < oldest_allowed:
+            entries.popleft()
+            self.stats["expired"] += 1
+
+    def add(self, key: Hashable, ts: float, value=None) -> int:
+        """
+        adds an entry to the given key and expires its entries that are
+        out of the window
+        returns the number of entries of this key in the window
+        """
+        entries = self.entries.get(key)
+        if entries is None:
+            entries = deque(maxlen=self.max_entries_per_key)
+            self.entries[key] = entries
+            if len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+                self.stats["evicted_keys"] += 1
+        self.entries.move_to_end(key)
+
+        if entries.maxlen is not None and len(entries) == entries.maxlen:
+            # appending to a full deque silently drops the oldest entry
+            self.stats["dropped"] += 1
+            if ts < entries[0][0]:
+                # older than all the kept entries
+                return len(entries)
+            if ts < entries[-1][0]:
+                # insert() raises on full deques
+                entries.popleft()
+
+        if not entries or ts >= entries[-1][0]:
+            entries.append((ts, value))
+        else:
+            # flows don't always arrive in order
+            bisect.insort(entries, (ts, value), key=lambda entry: entry[0])
+
+        self._expire(entries)
+        return len(entries)
+
+    def count(self, key: Hashable) -> int:
+        return len(self.entries.get(key, ()))
+
+    def get_values(self, key: Hashable) -> List:
+        """returns the values of the given key sorted by their timestamp"""
+        return [value for _, value in self.entries.get(key, ())]
+
+    def get_timestamps_in_range(
+        self, key: Hashable, start: float, end: float
+    ) -> List[float]:
+        """
+        returns the timestamps of the given key that are >= start and
+        <= end
+        """
+        entries = self.entries.get(key)
+        if not entries:
+            return []
+
+        left = bisect.bisect_left(entries, start, key=lambda entry: entry[0])
+        right = bisect.bisect_right(entries, end, key=lambda entry: entry[0])
+        return [entries[i][0] for i in range(left, right)]
+
+    def reset(self, key: Hashable):
+        """removes all the entries of the given key"""
+        self.entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "keys": len(self.entries),
+            "entries": sum(len(entries) for entries in self.entries.values()),
+            # approximate, doesn't include the size of the values
+            "memory_bytes": sys.getsizeof(self.entries)
+            + sum(sys.getsizeof(entries) for entries in self.entries.values()),
+        }
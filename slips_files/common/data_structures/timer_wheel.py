@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import time
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+# (deadline, function to call, its args)
+Timer = Tuple[float, Callable, tuple]
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel of functions to call after a delay.
+
+    Each timer is stored in the slot of the tick after its deadline, so
+    advancing the wheel only looks at the slots of the ticks that passed
+    since the last advance instead of at all the pending timers.
+    Timers due more than one round of the wheel later stay in their slot
+    until their round comes.
+
+    There can only be one pending timer per key, scheduling a timer with
+    the key of a pending one is ignored.
+    """
+
+    def __init__(self, resolution: float = 1, number_of_slots: int = 64):
+        """
+        :param resolution: seconds per tick. timers run at most this
+        number of seconds late
+        :param number_of_slots: number of ticks in one round of the wheel
+        """
+        self.resolution = resolution
+        self.slots: List[Dict[Hashable, Timer]] = [
+            {} for _ in range(number_of_slots)
+        ]
+        # keys of the pending timers
+        self.pending: Set[Hashable] = set()
+        # the last tick the wheel was advanced to
+        self.current_tick: Optional[int] = None
+        self.stats = {
+            "scheduled": 0,
+            "deduplicated": 0,
+            "fired": 0,
+            "max_pending": 0,
+        }
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __contains__(self, key: Hashable):
+        return key in self.pending
+
+    def _get_tick(self, timestamp: float) -> int:
+        return int(timestamp // self.resolution)
+
+    def schedule(
+        self,
+        key: Hashable,
+        delay: float,
+        func: Callable,
+        *args,
+        now: Optional[float] = None,
+    ) -> bool:
+        """
+        schedules func(*args) to be returned by advance() once delay
+        seconds passed
+        returns False if a timer with the same key is already pending
+        """
+        if key in self.pending:
+            self.stats["deduplicated"] += 1
+            return False
+
+        now = time.time() if now is None else now
+        if self.current_tick is None:
+            self.current_tick = self._get_tick(now)
+
+        deadline = now + delay
+        # the timer is put in the tick after its deadline, so it's always
+        # due once the wheel reaches its slot. and never in a slot the
+        # wheel already passed
+        tick = max(self._get_tick(deadline) + 1, self.current_tick + 1)
+        slot = tick % len(self.slots)
+        self.slots[slot][key] = (deadline, func, args)
+        self.pending.add(key)
+        self.stats["scheduled"] += 1
+        self.stats["max_pending"] = max(
+            self.stats["max_pending"], len(self.pending)
+        )
+        return True
+
+    def _pop_due_in_slot(
+        self, slot: int, now: float
+    ) -> List[Tuple[Callable, tuple]]:
+        due = []
+        timers = self.slots[slot]
+        for key, (deadline, func, args) in list(timers.items()):
+            if deadline <= now:
+                del timers[key]
+                self.pending.discard(key)
+                due.append((func, args))
+        return due
+
+    def advance(
+        self, now: Optional[float] = None
+    ) -> List[Tuple[Callable, tuple]]:
+        """
+        removes the timers that are due and returns them as a list of
+        (func, args) ordered by tick, so they can be run in one batch
+        """
+        now = time.time() if now is None else now
+        tick = self._get_tick(now)
+        if self.current_tick is None:
+            self.current_tick = tick
+        if tick <= self.current_tick or not self.pending:
+            self.current_tick = max(tick, self.current_tick)
+            return []
+
+        due = []
+        # if more than a round passed, every slot is visited once
+        ticks_passed = min(tick - self.current_tick, len(self.slots))
+        for passed_tick in range(tick - ticks_passed + 1, tick + 1):
+            due.extend(
+                self._pop_due_in_slot(passed_tick % len(self.slots), now)
+            )
+        self.current_tick = tick
+        self.stats["fired"] += len(due)
+        return due
+
+    def pop_all(self) -> List[Tuple[Callable, tuple]]:
+        """removes all pending timers and returns them, e.g. on shutdown"""
+        timers = []
+        for slot in self.slots:
+            timers.extend(slot.values())
+            slot.clear()
+        self.pending.clear()
+        timers.sort(key=lambda timer: timer[0])
+        self.stats["fired"] += len(timers)
+        return [(func, args) for _, func, args in timers]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "pending": len(self.pending)}
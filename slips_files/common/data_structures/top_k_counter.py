@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import heapq
+from itertools import count
+from typing import (
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+class TopKCounter:
+    """
+    Sums amounts per key, keeping at most k keys.
+
+    Uses the Space-Saving algorithm: once k keys are counted, a new key
+    replaces the key with the smallest total and inherits that total,
+    so a key that's added after the counter is full is always counted.
+    The inherited total is kept as the error of the new key, its real
+    total is between total - error and total. The totals and the number
+    of the replaced keys are kept in the overflow.
+
+    Each counted key keeps the ids of the first max_ids_per_key
+    additions, e.g. flow uids, and the timestamp of its last addition.
+    """
+
+    def __init__(self, k: int = 1000, max_ids_per_key: int = 100):
+        self.k = k
+        self.max_ids_per_key = max_ids_per_key
+        # {key: [total, [ids], last ts, error]}
+        self.counters: Dict[Hashable, list] = {}
+        self.overflow = {"total": 0, "keys": 0}
+        # min-heap of (total, insertion order, key) with one entry per
+        # counted key. totals only grow, so an entry's total may be
+        # smaller than the current one, it's updated once it's popped
+        self.heap: List[Tuple[int, int, Hashable]] = []
+        self.insertion_order = count()
+
+    def __len__(self):
+        return len(self.counters)
+
+    def __contains__(self, key: Hashable):
+        return key in self.counters
+
+    def _pop_smallest_key(self) -> Hashable:
+        """removes the key with the smallest total from the heap"""
+        while True:
+            total, _, key = self.heap[0]
+            current_total = self.counters[key][0]
+            if total == current_total:
+                heapq.heappop(self.heap)
+                return key
+            heapq.heapreplace(
+                self.heap, (current_total, next(self.insertion_order), key)
+            )
+
+    def add(self, key: Hashable, amount: int, id_=None, ts=None):
+        if key in self.counters:
+            counter = self.counters[key]
+            counter[0] += amount
+            if id_ is not None and len(counter[1]) < self.max_ids_per_key:
+                counter[1].append(id_)
+            counter[2] = ts
+            return
+
+        # the total inherited from the replaced key
+        error = 0
+        if len(self.counters) >= self.k:
+            error = self.counters.pop(self._pop_smallest_key())[0]
+            self.overflow["total"] += error
+            self.overflow["keys"] += 1
+
+        ids = [] if id_ is None else [id_]
+        total = amount + error
+        self.counters[key] = [total, ids, ts, error]
+        heapq.heappush(self.heap, (total, next(self.insertion_order), key))
+
+    def get(self, key: Hashable) -> Optional[Tuple[int, List, object, int]]:
+        """
+        returns (total, ids, last ts, error) of the given key if it's
+        counted
+        """
+        if counter := self.counters.get(key):
+            return tuple(counter)
+        return None
+
+    def items(self):
+        """yields (key, (total, ids, last ts, error)) of all the counted
+        keys"""
+        for key, counter in self.counters.items():
+            yield key, tuple(counter)
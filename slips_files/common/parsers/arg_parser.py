@@ -293,6 +293,13 @@ class ArgumentParser(argparse.ArgumentParser):
             required=False,
             help="Read flows from a module other than input process.",
         )
+        self.add_argument(
+            "--profile-startup",
+            action="store_true",
+            required=False,
+            help="Print how long each startup phase and the import of each "
+            "module took",
+        )
         self.add_argument(
             "--no-recurse",
             action="store_true",
@@ -147,6 +147,78 @@ class ConfigParser(object):
     def popup_alerts(self):
         return self.read_configuration("detection", "popup_alerts", False)
 
+    def _read_number(self, section, name, default_value, type_=float):
+        value = self.read_configuration(section, name, default_value)
+        try:
+            return type_(value)
+        except (ValueError, TypeError):
+            return default_value
+
+    def use_redis_streams(self) -> bool:
+        return self.read_configuration(
+            "parameters", "use_redis_streams", False
+        )
+
+    def redis_streams_maxlen(self) -> int:
+        """max number of msgs kept in each redis stream"""
+        return max(
+            self._read_number(
+                "parameters", "redis_streams_maxlen", 100000, type_=int
+            ),
+            1,
+        )
+
+    def redis_streams_batch_size(self) -> int:
+        """max number of msgs a module reads from a stream at once"""
+        return max(
+            self._read_number(
+                "parameters", "redis_streams_batch_size", 100, type_=int
+            ),
+            1,
+        )
+
+    def max_flows_backlog(self) -> int:
+        """
+        max number of flows the slowest module can be behind before the
+        profiler pauses, 0 means never pause
+        """
+        return max(
+            self._read_number(
+                "parameters", "max_flows_backlog", 10000, type_=int
+            ),
+            0,
+        )
+
+    def alerts_buffer_size(self) -> int:
+        """max bytes buffered before writing to alerts.log/json"""
+        return self._read_number(
+            "detection", "alerts_buffer_size", 65536, type_=int
+        )
+
+    def alerts_flush_interval(self) -> float:
+        """in seconds"""
+        return self._read_number("detection", "alerts_flush_interval", 1)
+
+    def alerts_rotation_size(self) -> int:
+        """returns the size in bytes, 0 means no rotation"""
+        size_in_mbs = self._read_number("detection", "alerts_rotation_size", 0)
+        return int(size_in_mbs * 1024 * 1024)
+
+    def alerts_rotation_period(self) -> float:
+        """returns the period in seconds, 0 means no rotation"""
+        hrs = self._read_number("detection", "alerts_rotation_period", 0)
+        return hrs * 3600
+
+    def alerts_rotation_backups(self) -> int:
+        return self._read_number(
+            "detection", "alerts_rotation_backups", 5, type_=int
+        )
+
+    def alerts_fsync(self) -> str:
+        return str(
+            self.read_configuration("detection", "alerts_fsync", "never")
+        ).lower()
+
     def export_labeled_flows(self):
         return self.read_configuration(
             "parameters", "export_labeled_flows", False
@@ -415,6 +487,14 @@ class ConfigParser(object):
             threshold = 500
         return threshold
 
+    def flowalerts_workers(self) -> int:
+        """
+        number of processes flowalerts runs in, each one analyzes the
+        flows of a partition of the profiles
+        """
+        workers = self._read_number("flowalerts", "workers", 1, type_=int)
+        return max(workers, 1)
+
     def get_ml_mode(self):
         return self.read_configuration("flowmldetection", "mode", "test")
 
@@ -486,6 +566,30 @@ class ConfigParser(object):
             update_period = 86400  # 1 day
         return update_period
 
+    def ti_max_connections_per_host(self) -> int:
+        """max number of concurrent TI feed downloads from the same host"""
+        return max(
+            self._read_number(
+                "threatintelligence",
+                "TI_max_connections_per_host",
+                2,
+                type_=int,
+            ),
+            1,
+        )
+
+    def ti_requests_dedup_interval(self) -> float:
+        """
+        seconds during which the same IoC isn't sent to the TI and p2p
+        modules again for the same profile and tw. 0 disables it
+        """
+        return max(
+            self._read_number(
+                "threatintelligence", "TI_requests_dedup_interval", 60
+            ),
+            0,
+        )
+
     def vt_api_key_file(self):
         return self.read_configuration("virustotal", "api_key_file", None)
 
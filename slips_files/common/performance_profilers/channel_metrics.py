@@ -0,0 +1,207 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import bisect
+import time
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+# upper bounds in seconds of the buckets of the processing time and
+# publish-to-consume lag histograms. the last bucket is +Inf
+HISTOGRAM_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    10,
+    60,
+    300,
+)
+
+
+class Histogram:
+    """
+    a prometheus-like histogram with fixed buckets, only keeps the
+    number of observations in each bucket, their sum and their max
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        # the last one is for observations bigger than all buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self) -> dict:
+        # cumulative, the same way prometheus expects them
+        cumulative = {}
+        total = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative[str(bucket)] = total
+        cumulative["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0,
+            "buckets": cumulative,
+        }
+
+
+class ChannelMetrics:
+    """
+    Keeps the number of msgs received and processed by a module in each
+    channel, how long processing them took, and how long they waited
+    between being published and being received by the module (the lag).
+
+    The processing of a msg is considered done once the module asks for
+    the next msg or finishes the current iteration of its main loop.
+    """
+
+    def __init__(self):
+        self.received: Dict[str, int] = {}
+        self.processed: Dict[str, int] = {}
+        self.processing_time: Dict[str, Histogram] = {}
+        self.lag: Dict[str, Histogram] = {}
+        # (channel, time it was received) of the msg being processed
+        self.in_progress: Optional[Tuple[str, float]] = None
+
+    def msg_received(self, channel: str, published_at: Optional[float]):
+        now = time.time()
+        self.msg_processed(now)
+        self.received[channel] = self.received.get(channel, 0) + 1
+        if published_at is not None:
+            self.lag.setdefault(channel, Histogram()).observe(
+                max(now - published_at, 0)
+            )
+        self.in_progress = (channel, now)
+
+    def msg_processed(self, now: Optional[float] = None):
+        """marks the msg that's being processed, if any, as processed"""
+        if self.in_progress is None:
+            return
+        channel, received_at = self.in_progress
+        self.in_progress = None
+        now = now or time.time()
+        self.processed[channel] = self.processed.get(channel, 0) + 1
+        self.processing_time.setdefault(channel, Histogram()).observe(
+            now - received_at
+        )
+
+    def get_stats(self) -> Dict[str, dict]:
+        """returns {channel: {received: .., processed: .., lag: ..,
+        processing_time: ..}}"""
+        stats = {}
+        for channel, received in self.received.items():
+            stats[channel] = {
+                "received": received,
+                "processed": self.processed.get(channel, 0),
+                "processing_time": self.processing_time.get(
+                    channel, Histogram()
+                ).to_dict(),
+                "lag": self.lag.get(channel, Histogram()).to_dict(),
+            }
+        return stats
+
+
+def _prometheus_histogram(
+    lines: List[str], metric: str, labels: str, histogram: dict
+):
+    for bucket, count in histogram["buckets"].items():
+        lines.append(f'{metric}_bucket{{{labels},le="{bucket}"}} {count}')
+    lines.append(f"{metric}_sum{{{labels}}} {histogram['sum']}")
+    lines.append(f"{metric}_count{{{labels}}} {histogram['count']}")
+
+
+def to_prometheus_text(
+    metrics: Dict[str, Dict[str, dict]],
+    published: Dict[str, int],
+    backpressure: Optional[dict] = None,
+) -> str:
+    """
+    converts the channel metrics of all modules to the prometheus text
+    exposition format
+    :param metrics: {module: {channel: stats}} as returned by
+    ChannelMetrics.get_stats() of each module
+    :param published: {channel: number of msgs published in it}
+    :param backpressure: how many times and for how long the profiler
+    waited for slow modules, see Backpressure.get_stats()
+    """
+    lines = [
+        "# HELP slips_channel_published_total msgs published in a channel",
+        "# TYPE slips_channel_published_total counter",
+    ]
+    for channel, count in sorted(published.items()):
+        lines.append(
+            f'slips_channel_published_total{{channel="{channel}"}} {count}'
+        )
+
+    counters = (
+        ("received", "msgs received by a module in a channel"),
+        ("processed", "msgs processed by a module in a channel"),
+        ("backlog", "msgs published and not yet received by a module"),
+    )
+    for counter, description in counters:
+        metric = f"slips_module_{counter}"
+        if counter != "backlog":
+            metric += "_total"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(
+            f"# TYPE {metric} "
+            f"{'gauge' if counter == 'backlog' else 'counter'}"
+        )
+        for module, channels in sorted(metrics.items()):
+            for channel, stats in sorted(channels.items()):
+                lines.append(
+                    f'{metric}{{module="{module}",channel="{channel}"}} '
+                    f"{stats[counter]}"
+                )
+
+    histograms = (
+        ("processing_time", "seconds spent processing a msg"),
+        ("lag", "seconds between publishing and receiving a msg"),
+    )
+    for histogram, description in histograms:
+        metric = f"slips_module_{histogram}_seconds"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        for module, channels in sorted(metrics.items()):
+            for channel, stats in sorted(channels.items()):
+                _prometheus_histogram(
+                    lines,
+                    metric,
+                    f'module="{module}",channel="{channel}"',
+                    stats[histogram],
+                )
+
+    if backpressure:
+        lines.extend(
+            [
+                "# HELP slips_profiler_throttled_total times the profiler "
+                "paused waiting for slow modules",
+                "# TYPE slips_profiler_throttled_total counter",
+                f"slips_profiler_throttled_total {backpressure['throttled']}",
+                "# HELP slips_profiler_throttled_seconds_total seconds the "
+                "profiler spent paused waiting for slow modules",
+                "# TYPE slips_profiler_throttled_seconds_total counter",
+                f"slips_profiler_throttled_seconds_total "
+                f"{backpressure['throttled_seconds']}",
+            ]
+        )
+    return "\n".join(lines) + "\n"
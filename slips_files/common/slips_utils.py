@@ -132,10 +132,7 @@ class Utils(object):
     @staticmethod
     def get_original_conn_flow(altflow, db) -> Optional[dict]:
         """Returns the original conn.log of the given altflow"""
-        original_conn_flow = db.get_flow(altflow.uid)
-        original_flow_uid = next(iter(original_conn_flow))
-        if original_conn_flow[original_flow_uid]:
-            return json.loads(original_conn_flow[original_flow_uid])
+        return db.get_conn_flow(altflow.uid)
 
     @staticmethod
     def is_ip_in_client_ips(ip_to_check: str, client_ips: List) -> bool:
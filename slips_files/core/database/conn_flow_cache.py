@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+from collections import OrderedDict
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+)
+
+
+class ConnFlowCache:
+    """
+    Per-process LRU of the conn flows of the current and previous time
+    windows, keyed by uid.
+
+    Used to find the conn.log flow of an altflow (ssl, ssh, http...) with
+    the same uid without reading and parsing it from the sqlite db. It's
+    filled by the modules from the new_flow msgs they already receive.
+    Flows of time windows older than the previous one are evicted once
+    the first flow of a new time window is added.
+    """
+
+    def __init__(self, maxsize: int = 20000):
+        self.maxsize = maxsize
+        # {uid: (tw number, flow)}
+        self.flows: OrderedDict[str, Tuple[int, dict]] = OrderedDict()
+        # the newest tw number seen
+        self.latest_tw = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            # lookups of the misses in the sqlite db
+            "db_hits": 0,
+            "db_misses": 0,
+        }
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __contains__(self, uid: str):
+        return uid in self.flows
+
+    @staticmethod
+    def _get_tw_number(twid: str) -> int:
+        return int(twid.replace("timewindow", ""))
+
+    def _evict_old_timewindows(self):
+        old_uids = [
+            uid
+            for uid, (tw_number, _) in self.flows.items()
+            if tw_number < self.latest_tw - 1
+        ]
+        for uid in old_uids:
+            del self.flows[uid]
+        self.stats["evictions"] += len(old_uids)
+
+    def add(self, flow: dict, twid: str):
+        """
+        :param flow: the conn flow as sent in the new_flow channel,
+        asdict() of the flow obj
+        :param twid: the tw of the flow, e.g. timewindow1
+        """
+        uid = flow.get("uid")
+        if not uid:
+            return
+
+        tw_number = self._get_tw_number(twid)
+        if tw_number > self.latest_tw:
+            self.latest_tw = tw_number
+            self._evict_old_timewindows()
+        elif tw_number < self.latest_tw - 1:
+            # a late flow of a tw we're not keeping anymore
+            return
+
+        self.flows[uid] = (tw_number, flow)
+        self.flows.move_to_end(uid)
+        if len(self.flows) > self.maxsize:
+            self.flows.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, uid: str) -> Optional[dict]:
+        """returns the cached conn flow with the given uid, if any"""
+        entry = self.flows.get(uid)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.flows.move_to_end(uid)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def record_db_lookup(self, found: bool):
+        """records the result of looking up a missed uid in the db"""
+        self.stats["db_hits" if found else "db_misses"] += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0
+        return {
+            **self.stats,
+            "size": len(self.flows),
+            "hit_rate": round(hit_rate, 3),
+        }
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+from collections import OrderedDict
+from typing import (
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from slips_files.common.data_structures.bloom_filter import BloomFilter
+
+ContactedIPs = Union[Set[str], BloomFilter]
+
+
+class ContactedIPsCache:
+    """
+    Per-process sets of the IPs contacted by each profile in each
+    time window.
+
+    The sets are filled by the modules from the new_flow msgs they
+    already receive, and dropped when the tw is closed. The contacted IPs
+    of tws that aren't cached are read from the sqlite db once, then
+    kept in the cache.
+
+    Once the set of a tw exceeds max_exact_ips, it's replaced by a bloom
+    filter. A bloom filter may say an IP was contacted when it wasn't,
+    but never the other way around.
+    """
+
+    def __init__(
+        self,
+        max_timewindows: int = 10000,
+        max_exact_ips: int = 50000,
+        bloom_filter_capacity: int = 1000000,
+    ):
+        self.max_timewindows = max_timewindows
+        self.max_exact_ips = max_exact_ips
+        self.bloom_filter_capacity = bloom_filter_capacity
+        # {(profileid, twid): contacted ips}
+        self.timewindows: OrderedDict[Tuple[str, str], ContactedIPs] = (
+            OrderedDict()
+        )
+        self.stats = {
+            "hits": 0,
+            # lookups of tws that had to be read from the db
+            "misses": 0,
+            "evictions": 0,
+            "bloom_filters": 0,
+        }
+
+    def __len__(self):
+        return len(self.timewindows)
+
+    def __contains__(self, key: Tuple[str, str]):
+        return key in self.timewindows
+
+    def _get_or_create(self, profileid: str, twid: str) -> ContactedIPs:
+        key = (profileid, twid)
+        if key not in self.timewindows:
+            self.timewindows[key] = set()
+            if len(self.timewindows) > self.max_timewindows:
+                self.timewindows.popitem(last=False)
+                self.stats["evictions"] += 1
+        self.timewindows.move_to_end(key)
+        return self.timewindows[key]
+
+    def _to_bloom_filter(self, key: Tuple[str, str]):
+        bloom_filter = BloomFilter(self.bloom_filter_capacity)
+        bloom_filter.update(self.timewindows[key])
+        self.timewindows[key] = bloom_filter
+        self.stats["bloom_filters"] += 1
+
+    def add(self, profileid: str, twid: str, ips: Iterable[str]):
+        contacted_ips = self._get_or_create(profileid, twid)
+        contacted_ips.update(ip for ip in ips if ip)
+        if (
+            isinstance(contacted_ips, set)
+            and len(contacted_ips) > self.max_exact_ips
+        ):
+            self._to_bloom_filter((profileid, twid))
+
+    def get(self, profileid: str, twid: str) -> Optional[ContactedIPs]:
+        """
+        returns the IPs contacted in the given tw, or None if the tw
+        isn't cached
+        """
+        key = (profileid, twid)
+        contacted_ips = self.timewindows.get(key)
+        if contacted_ips is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.timewindows.move_to_end(key)
+        self.stats["hits"] += 1
+        return contacted_ips
+
+    def forget(self, profileid: str, twid: str):
+        self.timewindows.pop((profileid, twid), None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "timewindows": len(self.timewindows)}
@@ -1,13 +1,24 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
+import json
 from typing import (
     List,
     Dict,
+    Optional,
 )
 
 from slips_files.common.printer import Printer
 from slips_files.core.database.redis_db.database import RedisDB
 from slips_files.core.database.sqlite_db.database import SQLiteDB
+from slips_files.core.database.lookup_cache import (
+    LookupCache,
+    MISSING,
+)
+from slips_files.core.database.conn_flow_cache import ConnFlowCache
+from slips_files.core.database.contacted_ips_cache import (
+    ContactedIPsCache,
+    ContactedIPs,
+)
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.core.structures.evidence import Evidence
 from slips_files.core.structures.alerts import Alert
@@ -39,6 +50,14 @@ class DBManager:
         self.rdb = RedisDB(
             self.logger, redis_port, start_redis_server, **kwargs
         )
+        # shared by all DBManagers of this process
+        self.lookup_cache = LookupCache(self.rdb)
+        # conn flows of the current and previous tws of this module,
+        # used to find the conn flow of altflows
+        self.conn_flows = ConnFlowCache()
+        # ips contacted in each profile and tw, used to correlate dns
+        # answers with connections
+        self.contacted_ips = ContactedIPsCache()
 
         # in some rare cases we don't wanna create the sqlite db from scratch,
         # like when using -S to stop the daemon, we just wanna connect to
@@ -79,8 +98,11 @@ class DBManager:
     def is_running_non_stop(self, *args, **kwargs):
         return self.rdb.is_running_non_stop(*args, **kwargs)
 
-    def get_ip_info(self, *args, **kwargs):
-        return self.rdb.get_ip_info(*args, **kwargs)
+    def get_ip_info(self, ip):
+        return self.lookup_cache.get("get_ip_info", self.rdb.get_ip_info, ip)
+
+    def get_ips_info(self, *args, **kwargs):
+        return self.rdb.get_ips_info(*args, **kwargs)
 
     def set_new_ip(self, *args, **kwargs):
         return self.rdb.set_new_ip(*args, **kwargs)
@@ -91,6 +113,15 @@ class DBManager:
     def is_known_fp_md5_hash(self, *args, **kwargs):
         return self.rdb.is_known_fp_md5_hash(*args, **kwargs)
 
+    def get_ti_feeds_generation(self, *args, **kwargs):
+        return self.rdb.get_ti_feeds_generation(*args, **kwargs)
+
+    def publish_ti_feeds_generation(self, *args, **kwargs):
+        return self.rdb.publish_ti_feeds_generation(*args, **kwargs)
+
+    def get_ioc_snapshot_stats(self, *args, **kwargs):
+        return self.rdb.get_ioc_snapshot_stats(*args, **kwargs)
+
     def ask_for_ip_info(self, *args, **kwargs):
         return self.rdb.ask_for_ip_info(*args, **kwargs)
 
@@ -174,8 +205,10 @@ class DBManager:
     def store_p2p_report(self, *args, **kwargs):
         return self.rdb.store_p2p_report(*args, **kwargs)
 
-    def get_dns_resolution(self, *args, **kwargs):
-        return self.rdb.get_dns_resolution(*args, **kwargs)
+    def get_dns_resolution(self, ip):
+        return self.lookup_cache.get(
+            "get_dns_resolution", self.rdb.get_dns_resolution, ip
+        )
 
     def is_ip_resolved(self, *args, **kwargs):
         return self.rdb.is_ip_resolved(*args, **kwargs)
@@ -279,8 +312,8 @@ class DBManager:
     def get_all_zeek_files(self, *args, **kwargs):
         return self.rdb.get_all_zeek_files(*args, **kwargs)
 
-    def get_gateway_ip(self, *args, **kwargs):
-        return self.rdb.get_gateway_ip(*args, **kwargs)
+    def get_gateway_ip(self):
+        return self.lookup_cache.get("get_gateway_ip", self.rdb.get_gateway_ip)
 
     def get_gateway_mac(self, *args, **kwargs):
         return self.rdb.get_gateway_mac(*args, **kwargs)
@@ -330,6 +363,9 @@ class DBManager:
     def store_pid(self, *args, **kwargs):
         return self.rdb.store_pid(*args, **kwargs)
 
+    def delete_pid(self, *args, **kwargs):
+        return self.rdb.delete_pid(*args, **kwargs)
+
     def get_pids(self, *args, **kwargs):
         return self.rdb.get_pids(*args, **kwargs)
 
@@ -448,14 +484,24 @@ class DBManager:
     def is_evidence_processed(self, *args, **kwargs):
         return self.rdb.is_evidence_processed(*args, **kwargs)
 
+    def are_evidence_processed(self, *args, **kwargs):
+        return self.rdb.are_evidence_processed(*args, **kwargs)
+
+    def store_processed_evidence(self, *args, **kwargs):
+        return self.rdb.store_processed_evidence(*args, **kwargs)
+
     def delete_evidence(self, *args, **kwargs):
         return self.rdb.delete_evidence(*args, **kwargs)
 
     def cache_whitelisted_evidence_id(self, *args, **kwargs):
         return self.rdb.cache_whitelisted_evidence_id(*args, **kwargs)
 
-    def is_whitelisted_evidence(self, *args, **kwargs):
-        return self.rdb.is_whitelisted_evidence(*args, **kwargs)
+    def is_whitelisted_evidence(self, evidence_id):
+        return self.lookup_cache.get(
+            "is_whitelisted_evidence",
+            self.rdb.is_whitelisted_evidence,
+            evidence_id,
+        )
 
     def remove_whitelisted_evidence(self, *args, **kwargs):
         return self.rdb.remove_whitelisted_evidence(*args, **kwargs)
@@ -463,6 +509,9 @@ class DBManager:
     def get_profileid_twid_alerts(self, *args, **kwargs):
         return self.rdb.get_profileid_twid_alerts(*args, **kwargs)
 
+    def get_alerted_tws(self, *args, **kwargs):
+        return self.rdb.get_alerted_tws(*args, **kwargs)
+
     def get_twid_evidence(self, *args, **kwargs):
         return self.rdb.get_twid_evidence(*args, **kwargs)
 
@@ -487,6 +536,9 @@ class DBManager:
     def give_threat_intelligence(self, *args, **kwargs):
         return self.rdb.give_threat_intelligence(*args, **kwargs)
 
+    def get_suppressed_requests(self, *args, **kwargs):
+        return self.rdb.get_suppressed_requests(*args, **kwargs)
+
     def delete_ips_from_ioc_ips(self, *args, **kwargs):
         return self.rdb.delete_ips_from_ioc_ips(*args, **kwargs)
 
@@ -532,6 +584,9 @@ class DBManager:
     def is_blacklisted_jarm(self, *args, **kwargs):
         return self.rdb.is_blacklisted_jarm(*args, **kwargs)
 
+    def is_blacklisted_ja3(self, *args, **kwargs):
+        return self.rdb.is_blacklisted_ja3(*args, **kwargs)
+
     def is_blacklisted_ip(self, *args, **kwargs):
         return self.rdb.is_blacklisted_ip(*args, **kwargs)
 
@@ -544,6 +599,18 @@ class DBManager:
     def delete_feed_entries(self, *args, **kwargs):
         return self.rdb.delete_feed_entries(*args, **kwargs)
 
+    def start_feed_update(self, *args, **kwargs):
+        return self.rdb.start_feed_update(*args, **kwargs)
+
+    def add_feed_iocs(self, *args, **kwargs):
+        return self.rdb.add_feed_iocs(*args, **kwargs)
+
+    def finish_feed_update(self, *args, **kwargs):
+        return self.rdb.finish_feed_update(*args, **kwargs)
+
+    def get_feeds_memory_usage(self, *args, **kwargs):
+        return self.rdb.get_feeds_memory_usage(*args, **kwargs)
+
     def is_profile_malicious(self, *args, **kwargs):
         return self.rdb.is_profile_malicious(*args, **kwargs)
 
@@ -589,17 +656,56 @@ class DBManager:
     def get_msgs_received_at_runtime(self, *args, **kwargs):
         return self.rdb.get_msgs_received_at_runtime(*args, **kwargs)
 
+    def get_msgs_received_in_channel(self, *args, **kwargs):
+        return self.rdb.get_msgs_received_in_channel(*args, **kwargs)
+
+    def store_backpressure_stats(self, *args, **kwargs):
+        return self.rdb.store_backpressure_stats(*args, **kwargs)
+
+    def get_backpressure_stats(self, *args, **kwargs):
+        return self.rdb.get_backpressure_stats(*args, **kwargs)
+
     def get_msgs_published_in_channel(self, *args, **kwargs):
         return self.rdb.get_msgs_published_in_channel(*args, **kwargs)
 
+    def get_msgs_published_at_runtime(self, *args, **kwargs):
+        return self.rdb.get_msgs_published_at_runtime(*args, **kwargs)
+
+    def store_channel_metrics(self, *args, **kwargs):
+        return self.rdb.store_channel_metrics(*args, **kwargs)
+
+    def get_channel_metrics(self, *args, **kwargs):
+        return self.rdb.get_channel_metrics(*args, **kwargs)
+
     def get_dhcp_flows(self, *args, **kwargs):
         return self.rdb.get_dhcp_flows(*args, **kwargs)
 
     def set_dhcp_flow(self, *args, **kwargs):
         return self.rdb.set_dhcp_flow(*args, **kwargs)
 
-    def get_timewindow(self, *args, **kwargs):
-        return self.rdb.get_timewindow(*args, **kwargs)
+    def get_timewindow(self, flowtime, profileid) -> str:
+        """
+        returns the tw the given flowtime belongs to.
+        the boundaries of the last tw of each profile are cached, so
+        consecutive flows of the same tw don't hit the db
+        """
+        flowtime = float(flowtime)
+        cached = self.lookup_cache.get_cached("get_timewindow", profileid)
+        if cached is not MISSING:
+            twid, tw_start, tw_end = cached
+            if tw_start <= flowtime < tw_end:
+                return twid
+
+        twid, tw_start = self.rdb.get_timewindow_and_start(flowtime, profileid)
+        self.lookup_cache.set(
+            "get_timewindow",
+            profileid,
+            (twid, tw_start, tw_start + self.rdb.width),
+        )
+        return twid
+
+    def get_lookup_cache_stats(self, *args, **kwargs):
+        return self.rdb.get_lookup_cache_stats(*args, **kwargs)
 
     def add_out_http(self, *args, **kwargs):
         return self.rdb.add_out_http(*args, **kwargs)
@@ -622,6 +728,9 @@ class DBManager:
     def get_all_flows_in_profileid_twid(self, *args, **kwargs):
         return self.sqlite.get_all_flows_in_profileid_twid(*args, **kwargs)
 
+    def get_flows_page_in_profileid_twid(self, *args, **kwargs):
+        return self.sqlite.get_flows_page_in_profileid_twid(*args, **kwargs)
+
     def get_all_flows_in_profileid(self, *args, **kwargs):
         return self.sqlite.get_all_flows_in_profileid(*args, **kwargs)
 
@@ -636,6 +745,40 @@ class DBManager:
             *args, **kwargs
         )
 
+    def add_contacted_ip(self, profileid: str, twid: str, daddr: str):
+        """
+        keeps the daddr of a flow received in the new_flow channel in
+        memory, so get_contacted_ips() doesn't have to read all the flows
+        of the tw from the sqlite db
+        """
+        self.contacted_ips.add(profileid, twid, (daddr,))
+
+    def get_contacted_ips(self, profileid: str, twid: str) -> ContactedIPs:
+        """
+        returns the IPs contacted in the given profile and tw, only
+        supports checking whether an IP is in it.
+        the contacted ips of tws that aren't cached by this module are
+        read from the sqlite db
+        """
+        contacted_ips = self.contacted_ips.get(profileid, twid)
+        if contacted_ips is None:
+            self.contacted_ips.add(
+                profileid,
+                twid,
+                self.sqlite.get_all_contacted_ips_in_profileid_twid(
+                    profileid, twid
+                ),
+            )
+            contacted_ips = self.contacted_ips.get(profileid, twid)
+        return contacted_ips
+
+    def forget_contacted_ips(self, profileid: str, twid: str):
+        """called when the given tw is closed"""
+        self.contacted_ips.forget(profileid, twid)
+
+    def get_contacted_ips_cache_stats(self) -> Dict[str, int]:
+        return self.contacted_ips.get_stats()
+
     def mark_profile_and_timewindow_as_blocked(self, *args, **kwargs):
         return self.rdb.mark_profile_and_timewindow_as_blocked(*args, **kwargs)
 
@@ -826,8 +969,12 @@ class DBManager:
     def set_ipv4_of_profile(self, *args, **kwargs):
         return self.rdb.set_ipv4_of_profile(*args, **kwargs)
 
-    def get_mac_vendor_from_profile(self, *args, **kwargs):
-        return self.rdb.get_mac_vendor_from_profile(*args, **kwargs)
+    def get_mac_vendor_from_profile(self, profileid):
+        return self.lookup_cache.get(
+            "get_mac_vendor_from_profile",
+            self.rdb.get_mac_vendor_from_profile,
+            profileid,
+        )
 
     def label_flows_causing_alert(self, evidence_ids: List[str]):
         """
@@ -875,6 +1022,30 @@ class DBManager:
         """returns the raw flow as read from the log file"""
         return self.sqlite.get_flow(*args, **kwargs)
 
+    def cache_conn_flow(self, flow: dict, twid: str):
+        """
+        keeps the given flow received in the new_flow channel in memory,
+        so get_conn_flow() doesn't have to read it from the sqlite db
+        """
+        self.conn_flows.add(flow, twid)
+
+    def get_conn_flow(self, uid: str) -> Optional[dict]:
+        """
+        returns the conn flow with the given uid as a dict.
+        checks the flows cached by this module first
+        """
+        if flow := self.conn_flows.get(uid):
+            return flow
+
+        flow = self.sqlite.get_conn_flow(uid)
+        self.conn_flows.record_db_lookup(bool(flow))
+        if not flow:
+            return None
+        return json.loads(flow)
+
+    def get_conn_flow_cache_stats(self) -> Dict[str, float]:
+        return self.conn_flows.get_stats()
+
     def add_flow(self, flow, profileid: str, twid: str, label="benign"):
         # stores it in the db
         self.sqlite.add_flow(flow, profileid, twid, label=label)
@@ -886,6 +1057,24 @@ class DBManager:
     def get_slips_start_time(self):
         return self.rdb.get_slips_start_time()
 
+    def set_startup_phase(self, *args, **kwargs):
+        return self.rdb.set_startup_phase(*args, **kwargs)
+
+    def get_startup_phases(self, *args, **kwargs):
+        return self.rdb.get_startup_phases(*args, **kwargs)
+
+    def set_module_startup_times(self, *args, **kwargs):
+        return self.rdb.set_module_startup_times(*args, **kwargs)
+
+    def get_modules_startup_times(self, *args, **kwargs):
+        return self.rdb.get_modules_startup_times(*args, **kwargs)
+
+    def set_ti_ready(self, *args, **kwargs):
+        return self.rdb.set_ti_ready(*args, **kwargs)
+
+    def is_ti_ready(self, *args, **kwargs):
+        return self.rdb.is_ti_ready(*args, **kwargs)
+
     def set_slips_internal_time(self, ts):
         return self.rdb.set_slips_internal_time(ts)
 
@@ -946,8 +1135,10 @@ class DBManager:
     def get_branch(self, *args, **kwargs):
         return self.rdb.get_branch(*args, **kwargs)
 
-    def get_tw_limits(self, *args, **kwargs):
-        return self.rdb.get_tw_limits(*args, **kwargs)
+    def get_tw_limits(self, profileid, twid):
+        return self.lookup_cache.get(
+            "get_tw_limits", self.rdb.get_tw_limits, profileid, twid
+        )
 
     def close(self, *args, **kwargs):
         self.rdb.r.close()
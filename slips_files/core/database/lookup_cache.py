@@ -0,0 +1,277 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+)
+
+# returned by TTLCache.get() when the key isn't cached. None can't be
+# used because some lookups legitimately return None
+MISSING = object()
+
+
+@dataclass
+class CachePolicy:
+    # max number of cached keys, least recently used keys are evicted first
+    maxsize: int
+    # seconds a cached value is valid for
+    ttl: float
+    # whether to cache falsy results like None, {} and False
+    cache_falsy: bool = True
+
+
+class TTLCache:
+    """
+    LRU cache with a time to live per entry that keeps track of its
+    hits and misses
+    """
+
+    def __init__(self, policy: CachePolicy):
+        self.policy = policy
+        # {key: (expiry time, value)}
+        self.entries: OrderedDict[Hashable, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        expiry, value = entry
+        if expiry < time.time():
+            del self.entries[key]
+            self.misses += 1
+            return MISSING
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value):
+        if not value and not self.policy.cache_falsy:
+            return
+        self.entries[key] = (time.time() + self.policy.ttl, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.policy.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """removes the given key, or all keys if no key is given"""
+        self.invalidations += 1
+        if key is None:
+            self.entries.clear()
+            return
+        self.entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.entries),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class LookupCache:
+    """
+    Per-process cache of read-only DB lookups that are repeatedly done
+    for the same keys, e.g. the info of the same IP or the gateway IP.
+
+    There's one instance per redis port per process, shared by all the
+    DBManagers of that process.
+
+    DB methods that modify a cached value publish the name of the lookup
+    and the key they modified in the cache invalidation channel. A
+    thread in every process that uses the cache listens on this channel
+    and drops the invalidated entries.
+    Entries also expire after the TTL of their lookup as a safety net.
+    """
+
+    # default policy per cached lookup
+    policies = {
+        "get_ip_info": CachePolicy(maxsize=10000, ttl=300),
+        "get_dns_resolution": CachePolicy(maxsize=10000, ttl=300),
+        "is_whitelisted_evidence": CachePolicy(maxsize=10000, ttl=3600),
+        # the gateway is only set once, dont cache it until it's set
+        "get_gateway_ip": CachePolicy(maxsize=1, ttl=300, cache_falsy=False),
+        "get_mac_vendor_from_profile": CachePolicy(maxsize=10000, ttl=300),
+        # tw limits and boundaries never change once the tw is created
+        "get_tw_limits": CachePolicy(
+            maxsize=10000, ttl=3600, cache_falsy=False
+        ),
+        "get_timewindow": CachePolicy(maxsize=10000, ttl=3600),
+    }
+    # how often to store the hit/miss stats of this process in the db
+    stats_interval = 60
+    _instances = {}
+
+    def __new__(cls, rdb):
+        """one instance per redis port per process"""
+        key = (os.getpid(), rdb.redis_port)
+        if key not in cls._instances:
+            # forked children shouldn't use the cache or the pubsub
+            # connection of their parent
+            cls._instances = {
+                k: v for k, v in cls._instances.items() if k[0] == os.getpid()
+            }
+            instance = super().__new__(cls)
+            instance._init(rdb)
+            cls._instances[key] = instance
+        return cls._instances[key]
+
+    def _init(self, rdb):
+        self.rdb = rdb
+        self.caches: Dict[str, TTLCache] = {
+            lookup: TTLCache(policy)
+            for lookup, policy in self.policies.items()
+        }
+        # the invalidation thread and the process modify the caches
+        # concurrently
+        self.lock = threading.Lock()
+        self.listener = None
+        # set when we can no longer receive invalidations
+        self.disabled = False
+        self.last_stats_time = time.time()
+
+    def _start_listener(self):
+        """
+        starts the thread that listens for invalidations the first
+        time the cache is used
+        """
+        pubsub = self.rdb.r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(
+            **{
+                self.rdb.channels.CACHE_INVALIDATION: (
+                    self._handle_invalidation
+                )
+            }
+        )
+        self.listener = pubsub.run_in_thread(
+            sleep_time=1,
+            daemon=True,
+            exception_handler=self._handle_listener_error,
+        )
+
+    def _handle_invalidation(self, msg: dict):
+        # [(lookup, key)], see RedisDB.invalidate_cached_keys()
+        for lookup, key in json.loads(msg["data"]):
+            self.invalidate(lookup, key)
+
+    def _handle_listener_error(self, exception, pubsub, thread):
+        """
+        we can't know what was modified while the listener is
+        down, so stop caching instead of serving stale values
+        """
+        self.disabled = True
+        with self.lock:
+            for cache in self.caches.values():
+                cache.invalidate()
+        thread.stop()
+
+    @staticmethod
+    def _get_key(args: tuple) -> Hashable:
+        return args[0] if len(args) == 1 else args
+
+    def invalidate(self, lookup: str, key=None):
+        """
+        drops the cached value of the given key of the given lookup in
+        this process only
+        :param key: key to invalidate, None invalidates all keys
+        """
+        if cache := self.caches.get(lookup):
+            if isinstance(key, list):
+                key = tuple(key)
+            with self.lock:
+                cache.invalidate(key)
+
+    @classmethod
+    def invalidate_in_this_process(cls, redis_port: int, lookup: str, key):
+        """
+        drops the given key from the cache of this process right away,
+        instead of waiting for the msg in the invalidation channel
+        """
+        if instance := cls._instances.get((os.getpid(), redis_port)):
+            instance.invalidate(lookup, key)
+
+    def get_cached(self, lookup: str, key: Hashable):
+        """returns the cached value of the given key or MISSING"""
+        if self.disabled:
+            return MISSING
+        if self.listener is None:
+            self._start_listener()
+        self._store_stats_periodically()
+        with self.lock:
+            return self.caches[lookup].get(key)
+
+    def get_generation(self, lookup: str) -> int:
+        """
+        returns a number that changes each time the given lookup is
+        invalidated
+        """
+        return self.caches[lookup].invalidations
+
+    def set(
+        self,
+        lookup: str,
+        key: Hashable,
+        value,
+        generation: Optional[int] = None,
+    ):
+        """
+        :param generation: the generation of the lookup before
+        loading the given value. if the lookup was invalidated while
+        loading, the value may be stale and isn't cached
+        """
+        if self.disabled:
+            return
+        with self.lock:
+            cache = self.caches[lookup]
+            if generation is not None and cache.invalidations != generation:
+                return
+            cache.set(key, value)
+
+    def get(self, lookup: str, loader: Callable, *args) -> Any:
+        """
+        returns the cached result of the given lookup, calls
+        loader(*args) if it's not cached
+        """
+        key = self._get_key(args)
+        value = self.get_cached(lookup, key)
+        if value is MISSING:
+            generation: int = self.get_generation(lookup)
+            value = loader(*args)
+            self.set(lookup, key, value, generation)
+        # callers may modify the returned dicts and lists
+        if isinstance(value, (dict, list)):
+            return deepcopy(value)
+        return value
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {
+                lookup: cache.get_stats()
+                for lookup, cache in self.caches.items()
+            }
+
+    def _store_stats_periodically(self):
+        now = time.time()
+        if now - self.last_stats_time < self.stats_interval:
+            return
+        self.last_stats_time = now
+        self.rdb.store_lookup_cache_stats(os.getpid(), self.get_stats())
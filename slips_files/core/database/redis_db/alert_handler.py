@@ -4,6 +4,7 @@ import time
 import json
 from typing import (
     List,
+    Set,
     Tuple,
     Optional,
     Dict,
@@ -53,7 +54,7 @@ class AlertHandler:
 
     def get_malicious_profiles(self):
         """returns profiles that generated an alert"""
-        self.r.smembers(self.constants.MALICIOUS_PROFILES)
+        return self.r.smembers(self.constants.MALICIOUS_PROFILES)
 
     def set_evidence_causing_alert(self, alert: Alert):
         """
@@ -284,6 +285,40 @@ class AlertHandler:
     def is_evidence_processed(self, evidence_id: str) -> bool:
         return self.r.sismember(self.constants.PROCESSED_EVIDENCE, evidence_id)
 
+    def are_evidence_processed(self, evidence_ids: List[str]) -> List[bool]:
+        """
+        same as is_evidence_processed() but checks all the given ids in
+        one round trip
+        """
+        pipe = self.r.pipeline(transaction=False)
+        for evidence_id in evidence_ids:
+            pipe.sismember(self.constants.PROCESSED_EVIDENCE, evidence_id)
+        return [bool(processed) for processed in pipe.execute()]
+
+    def store_processed_evidence(
+        self,
+        evidence_id: str,
+        profileid: str,
+        twid: str,
+        threat_level: float,
+    ):
+        """
+        marks the given evidence as processed and increments the
+        accumulated threat level of its profileid and twid in one
+        pipelined round trip
+        :param threat_level: the weighted threat level of the evidence,
+        0 if the evidence shouldn't be added to the accumulated threat level
+        """
+        pipe = self.r.pipeline(transaction=False)
+        pipe.sadd(self.constants.PROCESSED_EVIDENCE, evidence_id)
+        if threat_level:
+            pipe.zincrby(
+                self.constants.ACCUMULATED_THREAT_LEVELS,
+                threat_level,
+                f"{profileid}_{twid}",
+            )
+        pipe.execute()
+
     def delete_evidence(self, profileid, twid, evidence_id: str):
         """
         Deletes an evidence from the database
@@ -303,6 +338,7 @@ class AlertHandler:
         # before deleteEvidence is called, so we need to keep track of
         # whitelisted evidence ids
         self.r.sadd(self.constants.WHITELISTED_EVIDENCE, evidence_id)
+        self.invalidate_cached("is_whitelisted_evidence", evidence_id)
 
     def is_whitelisted_evidence(self, evidence_id):
         """
@@ -340,6 +376,20 @@ class AlertHandler:
         alerts: dict = json.loads(alerts)
         return alerts
 
+    def get_alerted_tws(self, profileid: str, twids: List[str]) -> Set[str]:
+        """
+        returns the given TWs of the given profile that have alerts using
+        one round trip to redis instead of one per TW
+        """
+        pipe = self.r.pipeline(transaction=False)
+        for twid in twids:
+            pipe.hget(f"{profileid}_{twid}", "alerts")
+        return {
+            twid
+            for twid, alerts in zip(twids, pipe.execute())
+            if alerts and json.loads(alerts)
+        }
+
     def get_twid_evidence(self, profileid: str, twid: str) -> Dict[str, dict]:
         """Get the evidence for this TW for this Profile"""
         evidence: Dict[str, dict] = self.r.hgetall(
@@ -471,6 +521,7 @@ class AlertHandler:
             score_confidence = cached_ip_info
 
         self.rcache.hset("IPsInfo", ip, json.dumps(score_confidence))
+        self.invalidate_cached("get_ip_info", ip)
 
     def update_threat_level(
         self, profileid: str, threat_level: str, confidence: float
@@ -13,6 +13,13 @@ class Constants:
     IOC_JA3 = "IoC_JA3"
     IOC_JARM = "IoC_JARM"
     IOC_SSL = "IoC_SSL"
+    # the IoCs each feed added to IoC_ips, IoC_domains and IoC_ip_ranges
+    IOC_FEED_MEMBERS = "IoC_feed_members"
+    # approximate number of bytes each feed uses in the IoC_* keys
+    TI_FEEDS_MEMORY = "TI_feeds_memory"
+    # incremented every time the IoCs of the TI feeds change, so that
+    # processes know when to reload their in-memory copy of them
+    TI_FEEDS_GENERATION = "TI_feeds_generation"
     LABELED_AS_MALICIOUS = "labeled_as_malicious"
     # used to cache url info by the virustotal module only
     VT_CACHED_URL_INFO = "virustotal_cached_url_info"
@@ -50,6 +57,12 @@ class Constants:
     P2P_REPORTS = "p2p_reports"
     ORGANIZATIONS_PORTS = "organization_port"
     SLIPS_START_TIME = "slips_start_time"
+    # seconds it took slips to reach each startup phase
+    STARTUP_PHASES = "startup_phases"
+    # seconds each module took to be imported and initialized
+    MODULES_STARTUP_TIMES = "modules_startup_times"
+    # set once the remote TI feeds are loaded
+    TI_READY = "ti_ready"
     USED_FTP_PORTS = "used_ftp_ports"
     SLIPS_INTERNAL_TIME = "slips_internal_time"
     WARDEN_INFO = "Warden"
@@ -66,8 +79,15 @@ class Constants:
     NUMBER_OF_ALERTS = "number_of_alerts"
     KNOWN_FPS = "known_fps"
     WILL_SLIPS_HAVE_MORE_FLOWS = "will_slips_have_more_flows"
+    LOOKUP_CACHE_STATS = "lookup_cache_stats"
+    # msgs received and processed by each module in each channel
+    CHANNEL_METRICS = "channel_metrics"
+    # how many times and for how long the profiler waited for slow modules
+    BACKPRESSURE_STATS = "backpressure_stats"
 
 
 class Channels:
     DNS_INFO_CHANGE = "dns_info_change"
     NEW_ALERT = "new_alert"
+    CACHE_INVALIDATION = "cache_invalidation"
+    TI_READY = "ti_ready"
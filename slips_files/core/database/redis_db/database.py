@@ -11,8 +11,14 @@ from slips_files.core.database.redis_db.ioc_handler import IoCHandler
 from slips_files.core.database.redis_db.alert_handler import AlertHandler
 from slips_files.core.database.redis_db.profile_handler import ProfileHandler
 from slips_files.core.database.redis_db.p2p_handler import P2PHandler
+from slips_files.core.database.lookup_cache import LookupCache
+from slips_files.core.database.redis_db.stream_subscription import (
+    StreamSubscription,
+    get_stream_key,
+)
 
 import os
+import multiprocessing
 import signal
 import redis
 import time
@@ -22,6 +28,7 @@ import ipaddress
 import sys
 import validators
 from typing import (
+    Any,
     List,
     Dict,
     Optional,
@@ -81,14 +88,58 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         "new_tunnel",
         "check_jarm_hash",
         "control_channel",
+        "ti_ready",
         "new_module_flow" "cpu_profile",
         "memory_profile",
         "fides2network",
         "network2fides",
         "fides2slips",
         "slips2fides",
-        "iris_internal"
+        "iris_internal",
+    }
+    # msgs of these channels carry the time they were published in, to
+    # be able to measure how far behind the modules reading them are.
+    # msgs of the rest of the channels are published as is because some
+    # of them are read by programs other than slips modules,
+    # e.g. the p2p go client
+    timestamped_channels = {
+        "tw_modified",
+        "evidence_added",
+        "new_ip",
+        "new_flow",
+        "new_dns",
+        "new_http",
+        "new_ssl",
+        "new_profile",
+        "give_threat_intelligence",
+        "new_letters",
+        "tw_closed",
+        "new_blocking",
+        "new_ssh",
+        "new_notice",
+        "new_url",
+        "new_downloaded_file",
+        "new_service",
+        "new_arp",
+        "new_MAC",
+        "new_smtp",
+        "new_alert",
+        "new_dhcp",
+        "new_weird",
+        "new_software",
+        "new_tunnel",
+        "export_evidence",
     }
+    # high volume channels that are published to redis streams instead
+    # of pub/sub when use_redis_streams is enabled
+    stream_channels = {
+        "new_flow",
+        "new_dns",
+        "new_letters",
+        "tw_modified",
+    }
+    # separates the publish time from the msg
+    publish_time_separator = "\x1f"
     separator = "_"
     normal_label = "benign"
     malicious_label = "malicious"
@@ -205,6 +256,12 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         cls.disabled_detections: List[str] = conf.disabled_detections()
         cls.width = conf.get_tw_width_as_float()
         cls.client_ips: List[str] = conf.client_ips()
+        cls.ti_requests_dedup_interval: float = (
+            conf.ti_requests_dedup_interval()
+        )
+        cls.use_redis_streams: bool = conf.use_redis_streams()
+        cls.redis_streams_maxlen: int = conf.redis_streams_maxlen()
+        cls.redis_streams_batch_size: int = conf.redis_streams_batch_size()
 
     @classmethod
     def set_slips_internal_time(cls, timestamp):
@@ -380,22 +437,221 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         now = time.time()
         cls.r.set(cls.constants.SLIPS_START_TIME, now)
 
+    def set_startup_phase(self, phase: str):
+        """
+        stores the number of seconds it took slips to reach the given
+        startup phase, e.g. "input_started". only the first time each
+        phase is reached is stored
+        """
+        start_time = self.get_slips_start_time()
+        elapsed = time.time() - float(start_time) if start_time else 0
+        self.r.hsetnx(self.constants.STARTUP_PHASES, phase, round(elapsed, 3))
+
+    def get_startup_phases(self) -> Dict[str, float]:
+        """
+        returns the seconds it took slips to reach each startup phase
+        e.g. {"modules_started": 0.6, "first_flow_processed": 1.2}
+        """
+        phases = self.r.hgetall(self.constants.STARTUP_PHASES)
+        return {phase: float(elapsed) for phase, elapsed in phases.items()}
+
+    def set_module_startup_times(self, module: str, times: Dict[str, float]):
+        """
+        :param times: seconds it took to import and to initialize the
+        given module. e.g. {"import": 1.2, "init": 0.1}
+        """
+        self.r.hset(
+            self.constants.MODULES_STARTUP_TIMES, module, json.dumps(times)
+        )
+
+    def get_modules_startup_times(self) -> Dict[str, Dict[str, float]]:
+        modules = self.r.hgetall(self.constants.MODULES_STARTUP_TIMES)
+        return {module: json.loads(times) for module, times in modules.items()}
+
+    def set_ti_ready(self):
+        """
+        Signals that the remote TI feeds are loaded, or that loading them
+        is done by another slips instance.
+        Called every time the update manager is done updating the feeds
+        """
+        self.r.set(self.constants.TI_READY, time.time())
+        self.set_startup_phase("ti_ready")
+        self.publish(self.channels.TI_READY, "ready")
+
+    def is_ti_ready(self) -> bool:
+        return bool(self.r.get(self.constants.TI_READY))
+
     def publish(self, channel, msg):
         """Publish a msg in the given channel"""
         # keeps track of how many msgs were published in the given channel
         self.r.hincrby(self.constants.MSGS_PUBLISHED_AT_RUNTIME, channel, 1)
+        if self.is_stream_channel(channel):
+            self.r.xadd(
+                get_stream_key(channel),
+                {"data": msg, "published_at": time.time()},
+                maxlen=self.redis_streams_maxlen,
+                approximate=True,
+            )
+            return
+
+        if channel in self.timestamped_channels:
+            msg = (
+                f"{self.publish_time_separator}{time.time()}"
+                f"{self.publish_time_separator}{msg}"
+            )
         self.r.publish(channel, msg)
 
+    def is_stream_channel(self, channel: str) -> bool:
+        """
+        returns True if the msgs of the given channel are published to a
+        redis stream instead of pub/sub
+        """
+        return self.use_redis_streams and channel in self.stream_channels
+
+    def get_streams_lag(self) -> Dict[str, Dict[str, int]]:
+        """
+        returns the number of msgs in each stream that each module didn't
+        read yet.
+        :returns: {channel: {module: lag}}. modules are only included if
+        redis knows their lag, it doesn't when the stream was trimmed
+        past msgs they didn't read
+        """
+        if not self.use_redis_streams:
+            return {}
+
+        lags = {}
+        for channel in self.stream_channels:
+            try:
+                groups = self.r.xinfo_groups(get_stream_key(channel))
+            except redis.exceptions.ResponseError:
+                # the stream doesn't exist yet
+                continue
+            lags[channel] = {
+                group["name"]: group["lag"]
+                for group in groups
+                # redis < 7 doesn't report the lag
+                if group.get("lag") is not None
+            }
+        return lags
+
+    def remove_publish_time(self, message: Optional[dict]) -> Optional[dict]:
+        """
+        removes the publish time added by publish() from the data of the
+        given msg and stores it in msg["published_at"]
+        """
+        if not message:
+            return message
+        data = message.get("data")
+        if isinstance(data, str) and data.startswith(
+            self.publish_time_separator
+        ):
+            _, published_at, data = data.split(self.publish_time_separator, 2)
+            message["data"] = data
+            message["published_at"] = float(published_at)
+        return message
+
+    def invalidate_cached(self, lookup: str, key=None):
+        """
+        tells all processes to drop their cached result of the given
+        lookup for the given key. see LookupCache.
+        :param lookup: name of the cached DBManager method
+        e.g. get_ip_info
+        :param key: the args of the lookup, None invalidates all keys
+        """
+        self.invalidate_cached_keys([(lookup, key)])
+
+    def invalidate_cached_keys(self, invalidations: List[Tuple[str, Any]]):
+        """
+        same as invalidate_cached() for several lookups and keys, using
+        one msg, so methods that modify many cached values don't publish
+        one msg for each
+        :param invalidations: [(lookup, key)] to invalidate
+        """
+        if not invalidations:
+            return
+        for lookup, key in invalidations:
+            LookupCache.invalidate_in_this_process(
+                self.redis_port, lookup, key
+            )
+        self.r.publish(
+            self.channels.CACHE_INVALIDATION, json.dumps(invalidations)
+        )
+
+    def store_lookup_cache_stats(self, pid: int, stats: dict):
+        """stores the hits and misses of the lookup cache of a process"""
+        self.r.hset(
+            self.constants.LOOKUP_CACHE_STATS, str(pid), json.dumps(stats)
+        )
+
+    def get_lookup_cache_stats(self) -> Dict[str, dict]:
+        """returns {pid: {lookup: {hits: .., misses: ..}}}"""
+        stats = self.r.hgetall(self.constants.LOOKUP_CACHE_STATS)
+        return {pid: json.loads(s) for pid, s in stats.items()}
+
     def get_msgs_published_in_channel(self, channel: str) -> int:
         """returns the number of msgs published in a channel"""
         return self.r.hget(self.constants.MSGS_PUBLISHED_AT_RUNTIME, channel)
 
+    def store_channel_metrics(self, module: str, metrics: Dict[str, dict]):
+        """
+        stores the msgs received and processed by the given module in each
+        channel, see ChannelMetrics.get_stats()
+        """
+        self.r.hset(
+            self.constants.CHANNEL_METRICS, module, json.dumps(metrics)
+        )
+
+    def get_channel_metrics(self) -> Dict[str, Dict[str, dict]]:
+        """
+        returns {module: {channel: stats}} of all modules. the stats
+        of each channel include the backlog, the msgs published in the
+        channel and not yet received by the module
+        """
+        published = self.r.hgetall(self.constants.MSGS_PUBLISHED_AT_RUNTIME)
+        streams_lag = self.get_streams_lag()
+        metrics = {}
+        for module, stats in self.r.hgetall(
+            self.constants.CHANNEL_METRICS
+        ).items():
+            metrics[module] = json.loads(stats)
+            for channel, channel_stats in metrics[module].items():
+                lag = streams_lag.get(channel, {}).get(module)
+                if lag is not None:
+                    # the consumer group knows exactly how many msgs
+                    # this module didn't read
+                    channel_stats["backlog"] = lag
+                    continue
+                channel_stats["backlog"] = max(
+                    int(published.get(channel, 0)) - channel_stats["received"],
+                    0,
+                )
+        return metrics
+
+    def get_msgs_published_at_runtime(self) -> Dict[str, int]:
+        """returns {channel: number of msgs published in it}"""
+        return {
+            channel: int(count)
+            for channel, count in self.r.hgetall(
+                self.constants.MSGS_PUBLISHED_AT_RUNTIME
+            ).items()
+        }
+
     def subscribe(self, channel: str, ignore_subscribe_messages=True):
         """Subscribe to channel"""
         # For when a TW is modified
         if channel not in self.supported_channels:
             return False
 
+        if self.is_stream_channel(channel):
+            # each module is a consumer group of the stream. modules run in
+            # processes named after them, see ModuleLauncher
+            return StreamSubscription(
+                self.r,
+                channel,
+                multiprocessing.current_process().name,
+                batch_size=self.redis_streams_batch_size,
+            )
+
         self.pubsub = self.r.pubsub()
         self.pubsub.subscribe(
             channel, ignore_subscribe_messages=ignore_subscribe_messages
@@ -418,7 +674,9 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         and never receive a new msg
         """
         try:
-            return channel.get_message(timeout=timeout)
+            return self.remove_publish_time(
+                channel.get_message(timeout=timeout)
+            )
         except redis.exceptions.ConnectionError as ex:
             # make sure we log the error only once
             if not self.is_connection_error_logged():
@@ -459,6 +717,23 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         data = self.rcache.hget(self.constants.IPS_INFO, ip)
         return json.loads(data) if data else None
 
+    def get_ips_info(self, ips: List[str]) -> Dict[str, Optional[dict]]:
+        """
+        Returns information about the given IPs from IPsInfo key using
+        one hmget per chunk of IPs instead of one hget per IP
+        :return: {ip: info dict or None if there's no info about the ip}
+        """
+        ips = list(ips)
+        chunk_size = 1000
+        info = {}
+        for i in range(0, len(ips), chunk_size):
+            chunk = ips[i : i + chunk_size]
+            for ip, data in zip(
+                chunk, self.rcache.hmget(self.constants.IPS_INFO, chunk)
+            ):
+                info[ip] = json.loads(data) if data else None
+        return info
+
     def _get_from_ip_info(self, ip: str, info_to_get: str):
         """
         :param ip: the key to get from the ip info hash
@@ -476,7 +751,7 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
             return
         return info
 
-    def set_new_ip(self, ip: str):
+    def set_new_ip(self, ip: str, invalidate_cache: bool = True):
         """
         1- Stores this new IP in the IPs hash
         2- Publishes in the channels that there is a new IP, and that we want
@@ -484,6 +759,8 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         Sometimes it can happend that the ip comes as an IP object, but when
         accessed as str, it is automatically
         converted to str
+        :param invalidate_cache: False if the caller invalidates the
+        cached info of this ip itself
         """
         data = self.get_ip_info(ip)
         if data is False:
@@ -493,6 +770,8 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
             # must be '{}', an empty dictionary! if not the logic breaks.
             # We use the empty dictionary to find if an IP exists or not
             self.rcache.hset(self.constants.IPS_INFO, ip, "{}")
+            if invalidate_cache:
+                self.invalidate_cached("get_ip_info", ip)
             # Publish that there is a new IP ready in the channel
             self.publish("new_ip", ip)
 
@@ -520,6 +799,11 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
             # dont ask p2p about your own ip
             return
 
+        if self.was_recently_asked(
+            "p2p_data_request", (str(profileid), str(twid), str(ip))
+        ):
+            return
+
         # ask other peers their opinion about this IP
         cache_age = 1000
         # the p2p module is expecting these 2 keys
@@ -638,7 +922,9 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         """
         return self.r.hget(self.constants.ANALYSIS, "output_dir")
 
-    def set_ip_info(self, ip: str, to_store: dict):
+    def set_ip_info(
+        self, ip: str, to_store: dict, invalidate_cache: bool = True
+    ):
         """
         Store information for this IP
         We receive a dictionary, such as {
@@ -646,12 +932,15 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         store for this IP.
         If it was not there before we store it. If it was there before, we
         overwrite it
+        :param invalidate_cache: False if the caller invalidates the
+        cached info of this ip itself, see invalidate_cached_keys()
         """
         # Get the previous info already stored
         cached_ip_info = self.get_ip_info(ip)
         if not cached_ip_info:
             # This IP is not in the dictionary, add it first:
-            self.set_new_ip(ip)
+            # its cached info is invalidated once the given info is stored
+            self.set_new_ip(ip, invalidate_cache=False)
             cached_ip_info = {}
 
         # make sure we don't already have the same info about this IP in our db
@@ -665,6 +954,8 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         self.rcache.hset(
             self.constants.IPS_INFO, ip, json.dumps(cached_ip_info)
         )
+        if invalidate_cache:
+            self.invalidate_cached("get_ip_info", ip)
         if is_new_info:
             self.r.publish("ip_info_change", ip)
 
@@ -768,6 +1059,7 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
 
     def delete_dns_resolution(self, ip):
         self.r.hdel(self.constants.DNS_RESOLUTION, ip)
+        self.invalidate_cached("get_dns_resolution", ip)
 
     def should_store_resolution(
         self, query: str, answers: list, qtype_name: str
@@ -829,6 +1121,8 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         # List of IPs to associate with the given domain
         ips_to_add = []
         cnames = []
+        # the cached lookups of all the answers are invalidated in 1 msg
+        invalidations = []
 
         for answer in answers:
             if self.is_txt_record(answer):
@@ -878,10 +1172,16 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
             # we store ALL dns resolutions seen since starting slips
             # store with the IP as the key
             self.r.hset(self.constants.DNS_RESOLUTION, answer, ip_info)
-            self.set_ip_info(answer, {"DNS_resolution": domains})
+            self.set_ip_info(
+                answer, {"DNS_resolution": domains}, invalidate_cache=False
+            )
+            invalidations.extend(
+                [("get_dns_resolution", answer), ("get_ip_info", answer)]
+            )
             # these ips will be associated with the query in our db
             if not utils.is_ignored_ip(answer):
                 ips_to_add.append(answer)
+        self.invalidate_cached_keys(invalidations)
 
         # For each CNAME in the answer
         # store it in DomainsInfo in the cache db (used for kalipso)
@@ -1225,6 +1525,8 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
             or (address_type == "Vendor" and not self.get_gateway_mac_vendor())
         ):
             self.r.hset(self.constants.DEFAULT_GATEWAY, address_type, address)
+            if address_type == "IP":
+                self.invalidate_cached("get_gateway_ip")
 
     def get_domain_resolution(self, domain) -> List[str]:
         """
@@ -1347,6 +1649,11 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         """
         self.r.hset(self.constants.PIDS, process, pid)
 
+    def delete_pid(self, process: str):
+        """removes the given process from the stored PIDs, e.g. if the
+        module failed to start"""
+        self.r.hdel(self.constants.PIDS, process)
+
     def get_pids(self) -> dict:
         """returns a dict with module names as keys and PIDs as values"""
         return self.r.hgetall(self.constants.PIDS)
@@ -1622,6 +1929,31 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler, P2PHandler):
         channel by 1"""
         self.r.hincrby(f"{module}_msgs_received_at_runtime", channel, 1)
 
+    def get_msgs_received_in_channel(self, channel: str) -> Dict[str, int]:
+        """
+        returns how many msgs each running module read from the given
+        channel, modules that aren't subscribed to it aren't included
+        :returns: {module_name: number_of_msgs, ...}
+        """
+        modules = list(self.get_pids())
+        pipe = self.r.pipeline()
+        for module in modules:
+            pipe.hget(f"{module}_msgs_received_at_runtime", channel)
+        return {
+            module: int(received)
+            for module, received in zip(modules, pipe.execute())
+            if received is not None
+        }
+
+    def store_backpressure_stats(self, stats: dict):
+        """stores how many times and for how long the profiler was paused
+        waiting for slow modules"""
+        self.r.set(self.constants.BACKPRESSURE_STATS, json.dumps(stats))
+
+    def get_backpressure_stats(self) -> dict:
+        stats = self.r.get(self.constants.BACKPRESSURE_STATS)
+        return json.loads(stats) if stats else {}
+
     def get_msgs_received_at_runtime(self, module: str) -> Dict[str, int]:
         """
         returns a list of channels this module is subscribed to, and how
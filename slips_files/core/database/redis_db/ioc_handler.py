@@ -1,19 +1,34 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
+import hashlib
 import json
+import threading
+import time
+from itertools import islice
 from typing import (
+    Callable,
     Dict,
+    Hashable,
+    Iterable,
+    Iterator,
     List,
     Tuple,
     Union,
     Optional,
 )
 
-from slips_files.common.data_structures.trie import Trie
+from slips_files.common.data_structures.ioc_snapshot import IoCSnapshot
+from slips_files.core.database.lookup_cache import (
+    MISSING,
+    CachePolicy,
+    TTLCache,
+)
 
-# for future developers, remember to invalidate_trie_cache() on every
+# for future developers, remember to _invalidate_ioc_snapshot() on every
 # change to the self.constants.IOC_DOMAINS key or slips will keep using an
-# invalid cache to lookup malicious domains
+# invalid cache to lookup malicious domains, and to
+# publish_ti_feeds_generation() once done changing them so that the
+# other processes reload theirs
 
 
 class IoCHandler:
@@ -24,38 +39,125 @@ class IoCHandler:
     """
 
     name = "DB"
+    # max number of IoCs sent to the cache db in one pipeline when
+    # loading feeds. one huge hmset blocks all other clients of the cache
+    # db until it's done, while one hset per IoC is a round trip per IoC
+    bulk_load_chunk_size = 5000
+
+    # seconds between checks of the generation of the TI feeds in the
+    # db. a process keeps using its IoC snapshot until it notices that
+    # a new generation was published
+    ioc_snapshot_check_interval = 5
+    # seconds during which the same TI or p2p request about the same IoC
+    # in the same profile and tw isn't published again. read from
+    # slips.yaml, 0 publishes all requests
+    ti_requests_dedup_interval = 0
+    # max number of recently published requests remembered
+    recently_asked_max_size = 100000
 
     def __init__(self):
-        # used for faster domain lookups
-        self.trie = None
-        self.is_trie_cached = False
-
-    def _build_trie(self):
-        """Retrieve domains from Redis and construct the trie."""
-        self.trie = Trie()
-        ioc_domains: Dict[str, str] = self.rcache.hgetall(
-            self.constants.IOC_DOMAINS
+        # in-memory copy of the IoCs used for faster lookups
+        self.ioc_snapshot = None
+        self.last_ioc_generation_check = 0
+        # the profiler threads publish requests concurrently
+        self.recently_asked_lock = threading.Lock()
+        self.recently_asked = TTLCache(
+            CachePolicy(
+                maxsize=self.recently_asked_max_size,
+                ttl=self.ti_requests_dedup_interval,
+            )
         )
-        for domain, domain_info in ioc_domains.items():
-            domain: str
-            domain_info: str
-            # domain_info is something like this
-            # {"description": "['hack''malware''phishing']",
-            # "source": "OCD-Datalake-russia-ukraine_IOCs-ALL.csv",
-            # "threat_level": "medium",
-            # "tags": ["Russia-UkraineIoCs"]}
+        # {channel: number of requests that weren't published because
+        # they were recently published}
+        self.suppressed_requests: Dict[str, int] = {}
+
+    def was_recently_asked(self, channel: str, request: Hashable) -> bool:
+        """
+        returns True if the given request was published in the given
+        channel less than ti_requests_dedup_interval seconds ago.
+        otherwise, remembers the request as published now.
+        """
+        if not self.ti_requests_dedup_interval:
+            return False
 
-            # store parsed domain info
-            self.trie.insert(domain, json.loads(domain_info))
-        self.is_trie_cached = True
+        key = (channel, request)
+        with self.recently_asked_lock:
+            if self.recently_asked.get(key) is not MISSING:
+                self.suppressed_requests[channel] = (
+                    self.suppressed_requests.get(channel, 0) + 1
+                )
+                return True
+            self.recently_asked.set(key, True)
+            return False
 
-    def _invalidate_trie_cache(self):
+    def get_suppressed_requests(self) -> Dict[str, int]:
         """
-        Invalidate the trie cache.
-        used whenever IOC_DOMAINS key is updated.
+        returns the number of TI and p2p requests of this process that
+        weren't published because they were recently published
         """
-        self.trie = None
-        self.is_trie_cached = False
+        with self.recently_asked_lock:
+            return dict(self.suppressed_requests)
+
+    def _get_ioc_snapshot_loaders(self) -> Dict[str, Callable[[], Dict]]:
+        return {
+            "domains": self.get_all_blacklisted_domains,
+            "known_fp_md5": self.get_known_fp_md5_hashes,
+            "ja3": self.get_all_blacklisted_ja3,
+            "jarm": self.get_all_blacklisted_jarm,
+            "ssl": self.get_all_blacklisted_ssl,
+        }
+
+    def _get_ioc_snapshot(self) -> IoCSnapshot:
+        """
+        returns the IoC snapshot of this process, replaces it if a new
+        generation of the TI feeds was published since it was taken
+        """
+        now = time.time()
+        if (
+            self.ioc_snapshot is not None
+            and now - self.last_ioc_generation_check
+            < self.ioc_snapshot_check_interval
+        ):
+            return self.ioc_snapshot
+
+        self.last_ioc_generation_check = now
+        generation: int = self.get_ti_feeds_generation()
+        if (
+            self.ioc_snapshot is None
+            or self.ioc_snapshot.generation != generation
+        ):
+            self.ioc_snapshot = IoCSnapshot(
+                generation, self._get_ioc_snapshot_loaders()
+            )
+        return self.ioc_snapshot
+
+    def _invalidate_ioc_snapshot(self):
+        """
+        Drops the IoC snapshot of this process only.
+        used whenever this process modifies the IoCs, other processes
+        reload their snapshots once publish_ti_feeds_generation() is
+        called.
+        """
+        self.ioc_snapshot = None
+
+    def get_ti_feeds_generation(self) -> int:
+        return int(self.rcache.get(self.constants.TI_FEEDS_GENERATION) or 0)
+
+    def publish_ti_feeds_generation(self) -> int:
+        """
+        Signals to all processes that the IoCs of the TI feeds changed
+        and that their IoC snapshots should be reloaded.
+        should be called once loading feeds is done, not per loaded
+        feed, so processes don't reload a snapshot while it's being
+        modified.
+        returns the new generation
+        """
+        self._invalidate_ioc_snapshot()
+        return self.rcache.incr(self.constants.TI_FEEDS_GENERATION)
+
+    def get_ioc_snapshot_stats(self) -> Dict[str, int]:
+        """returns the number of IoCs of each type loaded in memory"""
+        return self._get_ioc_snapshot().get_stats()
 
     def set_loaded_ti_files(self, number_of_loaded_files: int):
         """
@@ -69,29 +171,288 @@ class IoCHandler:
         """
         return self.r.get(self.constants.LOADED_TI_FILES) or 0
 
+    def _get_feed_ioc_keys(self) -> Tuple[str, ...]:
+        """returns the IoC_* keys where the IoCs of each feed are tracked"""
+        return (
+            self.constants.IOC_IPS,
+            self.constants.IOC_DOMAINS,
+            self.constants.IOC_IP_RANGES,
+        )
+
+    def _get_feed_members_key(self, ioc_key: str, feed: str) -> str:
+        """
+        returns the key of the hash of the IoCs the given feed added to
+        the given IoC_* key. the hash is {ioc: digest of the ioc info}
+        """
+        return f"{self.constants.IOC_FEED_MEMBERS}:{ioc_key}:{feed}"
+
+    def _get_feed_loading_key(self, ioc_key: str, feed: str) -> str:
+        """
+        returns the key where the IoCs of the version of the feed that
+        is being loaded are tracked until the feed is fully loaded
+        """
+        return f"{self._get_feed_members_key(ioc_key, feed)}:loading"
+
+    @staticmethod
+    def _get_digest(ioc_info: str) -> str:
+        return hashlib.blake2b(ioc_info.encode(), digest_size=8).hexdigest()
+
+    def _get_chunks(self, items: Iterable) -> Iterator[list]:
+        """splits the given items into lists of bulk_load_chunk_size"""
+        items = iter(items)
+        while chunk := list(islice(items, self.bulk_load_chunk_size)):
+            yield chunk
+
+    def _get_feed_memory(self, feed: str) -> Dict[str, int]:
+        """
+        returns the approximate number of bytes the given feed uses in
+        each IoC_* key. e.g. {"IoC_ips": 1024, "IoC_domains": 0}
+        """
+        memory = self.rcache.hget(self.constants.TI_FEEDS_MEMORY, feed)
+        return json.loads(memory) if memory else {}
+
+    def _set_feed_memory(self, feed: str, ioc_key: str, size: int):
+        memory: Dict[str, int] = self._get_feed_memory(feed)
+        memory[ioc_key] = size
+        self.rcache.hset(
+            self.constants.TI_FEEDS_MEMORY, feed, json.dumps(memory)
+        )
+
+    def get_feeds_memory_usage(self) -> Dict[str, int]:
+        """
+        returns the approximate number of bytes the IoCs of each feed use
+        in the cache db. e.g. {"AIP_attackers.csv": 4096}
+        """
+        return {
+            feed: sum(json.loads(memory).values())
+            for feed, memory in self.rcache.hgetall(
+                self.constants.TI_FEEDS_MEMORY
+            ).items()
+        }
+
+    def _hset_in_chunks(self, ioc_key: str, iocs: Dict[str, str]):
+        """
+        Stores the given IoCs in the given hash using pipelines of
+        bulk_load_chunk_size commands, so other clients of the cache db
+        don't wait for all the IoCs to be stored
+        """
+        for chunk in self._get_chunks(iocs.items()):
+            pipe = self.rcache.pipeline(transaction=False)
+            for ioc, ioc_info in chunk:
+                pipe.hset(ioc_key, ioc, ioc_info)
+            pipe.execute()
+
+    def _iter_feed_iocs(self, ioc_key: str, feed: str) -> Iterator[str]:
+        """
+        yields the IoCs that the given feed added to the given key.
+        uses hscan instead of loading them all at once to not block the
+        db on huge feeds
+        """
+        if ioc_key in self._get_feed_memory(feed):
+            for ioc, _ in self.rcache.hscan_iter(
+                self._get_feed_members_key(ioc_key, feed),
+                count=self.bulk_load_chunk_size,
+            ):
+                yield ioc
+            return
+
+        # feeds cached before we kept track of the IoCs of each feed
+        for ioc, ioc_info in self.rcache.hscan_iter(
+            ioc_key, count=self.bulk_load_chunk_size
+        ):
+            if feed in json.loads(ioc_info)["source"]:
+                yield ioc
+
+    def _delete_feed_iocs(self, ioc_key: str, feed: str, iocs: List[str]):
+        """
+        Deletes the given IoCs of the given feed from the given key in
+        chunks. IoCs that were overwritten by another feed since they
+        were added by the given feed are kept.
+        """
+        for chunk in self._get_chunks(iocs):
+            to_delete = [
+                ioc
+                for ioc, ioc_info in zip(
+                    chunk, self.rcache.hmget(ioc_key, chunk)
+                )
+                if ioc_info and feed in json.loads(ioc_info)["source"]
+            ]
+            if to_delete:
+                self.rcache.hdel(ioc_key, *to_delete)
+
+    def _start_feed_update(self, ioc_key: str, feed: str):
+        loading_key: str = self._get_feed_loading_key(ioc_key, feed)
+        # leftovers of an update that was interrupted
+        self.rcache.unlink(loading_key, f"{loading_key}:size")
+
+    def _update_feed_iocs(
+        self, ioc_key: str, feed: str, iocs: Dict[str, str]
+    ) -> Dict[str, int]:
+        """
+        Stores a chunk of the IoCs of the given feed that is being
+        updated. Only the IoCs that are new or whose info changed since
+        the previous version of the feed are written to the given key.
+        If an IoC was already given in a previous chunk of the same
+        update, the first one is kept.
+        returns the number of added and changed IoCs
+        """
+        counts = {"added": 0, "changed": 0}
+        members_key: str = self._get_feed_members_key(ioc_key, feed)
+        loading_key: str = self._get_feed_loading_key(ioc_key, feed)
+        for chunk in self._get_chunks(iocs.items()):
+            chunk_iocs: List[str] = [ioc for ioc, _ in chunk]
+            pipe = self.rcache.pipeline(transaction=False)
+            pipe.hmget(loading_key, chunk_iocs)
+            pipe.hmget(members_key, chunk_iocs)
+            pipe.hmget(ioc_key, chunk_iocs)
+            already_loaded, old_digests, stored = pipe.execute()
+
+            size = 0
+            for (ioc, ioc_info), loaded, old_digest, stored_info in zip(
+                chunk, already_loaded, old_digests, stored
+            ):
+                if loaded:
+                    continue
+                digest: str = self._get_digest(ioc_info)
+                pipe.hset(loading_key, ioc, digest)
+                size += len(ioc) + len(ioc_info)
+                if digest == old_digest:
+                    # unchanged since the previous version of the feed.
+                    # still rewritten if another feed overwrote it since,
+                    # otherwise it'd be deleted once that feed drops it
+                    if (
+                        stored_info
+                        and feed in json.loads(stored_info)["source"]
+                    ):
+                        continue
+                    pipe.hset(ioc_key, ioc, ioc_info)
+                    continue
+                pipe.hset(ioc_key, ioc, ioc_info)
+                counts["changed" if old_digest else "added"] += 1
+            pipe.incrby(f"{loading_key}:size", size)
+            pipe.execute()
+        return counts
+
+    def _finish_feed_update(self, ioc_key: str, feed: str) -> int:
+        """
+        Deletes the IoCs of the previous version of the given feed that
+        aren't in the new one, and replaces the IoCs tracked for the feed
+        with the new ones.
+        returns the number of deleted IoCs
+        """
+        members_key: str = self._get_feed_members_key(ioc_key, feed)
+        loading_key: str = self._get_feed_loading_key(ioc_key, feed)
+
+        removed = []
+        for chunk in self._get_chunks(self._iter_feed_iocs(ioc_key, feed)):
+            for ioc, loaded in zip(
+                chunk, self.rcache.hmget(loading_key, chunk)
+            ):
+                if not loaded:
+                    removed.append(ioc)
+        self._delete_feed_iocs(ioc_key, feed, removed)
+
+        size = int(self.rcache.get(f"{loading_key}:size") or 0)
+        # swap the IoCs tracked for this feed with the new ones
+        # atomically. unlink frees the old ones in the background
+        pipe = self.rcache.pipeline(transaction=True)
+        pipe.unlink(members_key, f"{loading_key}:size")
+        if self.rcache.exists(loading_key):
+            pipe.rename(loading_key, members_key)
+        pipe.execute()
+        self._set_feed_memory(feed, ioc_key, size)
+        return len(removed)
+
+    def start_feed_update(self, feed: str):
+        """
+        Starts replacing the IoCs of the given feed with the ones of a
+        new version of it. The new IoCs are given in chunks to
+        add_feed_iocs(), and finish_feed_update() is called once all of
+        them are given.
+        Lookups keep matching the previous version of the feed until
+        each of its IoCs is replaced.
+        :param feed: the name of the feed file
+        """
+        for ioc_key in self._get_feed_ioc_keys():
+            self._start_feed_update(ioc_key, feed)
+
+    def add_feed_iocs(
+        self,
+        feed: str,
+        ips: Optional[Dict[str, str]] = None,
+        domains: Optional[Dict[str, str]] = None,
+        ip_ranges: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, int]:
+        """
+        Stores a chunk of the IoCs of the given feed that is being
+        updated using start_feed_update()
+        the given dicts are {ioc: json.dumps{'source':..,'tags':..,
+                                    'threat_level':... ,'description'}}
+        returns the number of added and changed IoCs
+        """
+        counts = {"added": 0, "changed": 0}
+        for ioc_key, iocs in (
+            (self.constants.IOC_IPS, ips),
+            (self.constants.IOC_DOMAINS, domains),
+            (self.constants.IOC_IP_RANGES, ip_ranges),
+        ):
+            if not iocs:
+                continue
+            for action, count in self._update_feed_iocs(
+                ioc_key, feed, iocs
+            ).items():
+                counts[action] += count
+
+        if domains:
+            self._invalidate_ioc_snapshot()
+        return counts
+
+    def finish_feed_update(self, feed: str) -> int:
+        """
+        Deletes the IoCs of the previous version of the given feed that
+        weren't given to add_feed_iocs() since start_feed_update()
+        returns the number of deleted IoCs
+        """
+        removed = sum(
+            self._finish_feed_update(ioc_key, feed)
+            for ioc_key in self._get_feed_ioc_keys()
+        )
+        self._invalidate_ioc_snapshot()
+        return removed
+
+    def _load_iocs(
+        self, ioc_key: str, iocs: Dict[str, str], feed: Optional[str] = None
+    ):
+        """
+        Stores the given IoCs in the given IoC_* key
+        :param feed: the name of the feed the given IoCs are read from.
+        if given, the IoCs are considered the full content of the feed,
+        and the IoCs of the previous version of the feed that are no
+        longer in it are deleted after the new ones are stored.
+        """
+        if not feed:
+            self._hset_in_chunks(ioc_key, iocs)
+            return
+
+        self._start_feed_update(ioc_key, feed)
+        self._update_feed_iocs(ioc_key, feed, iocs)
+        self._finish_feed_update(ioc_key, feed)
+
     def delete_feed_entries(self, url: str):
         """
-        Delete all entries in
-         IoC_domains and IoC_ips that contain the given feed as source
+        Delete all entries in IoC_domains, IoC_ips and IoC_ip_ranges that
+        contain the given feed as source
         """
         # get the feed name from the given url
         feed_to_delete = url.split("/")[-1]
-        # get all domains that are read from TI files in our db
-        ioc_domains = self.rcache.hgetall(self.constants.IOC_DOMAINS)
-        for domain, domain_description in ioc_domains.items():
-            domain_description = json.loads(domain_description)
-            if feed_to_delete in domain_description["source"]:
-                # this entry has the given feed as source, delete it
-                self.rcache.hdel(self.constants.IOC_DOMAINS, domain)
-                self._invalidate_trie_cache()
-
-        # get all IPs that are read from TI files in our db
-        ioc_ips = self.rcache.hgetall(self.constants.IOC_IPS)
-        for ip, ip_description in ioc_ips.items():
-            ip_description = json.loads(ip_description)
-            if feed_to_delete in ip_description["source"]:
-                # this entry has the given feed as source, delete it
-                self.rcache.hdel(self.constants.IOC_IPS, ip)
+        for ioc_key in self._get_feed_ioc_keys():
+            iocs = list(self._iter_feed_iocs(ioc_key, feed_to_delete))
+            self._delete_feed_iocs(ioc_key, feed_to_delete, iocs)
+            self.rcache.unlink(
+                self._get_feed_members_key(ioc_key, feed_to_delete)
+            )
+        self.rcache.hdel(self.constants.TI_FEEDS_MEMORY, feed_to_delete)
+        self._invalidate_ioc_snapshot()
 
     def delete_ti_feed(self, file):
         self.rcache.hdel(self.constants.TI_FILES_INFO, file)
@@ -155,7 +516,19 @@ class IoCHandler:
             # sometimes we want to send the dns query/answer to check it for
             # blacklisted ips/domains
             data_to_send.update(extra_info)
-        self.publish(self.constants.GIVE_TI, json.dumps(data_to_send))
+
+        # the same IoC is usually seen in many flows of the same tw,
+        # e.g. the top destinations of a host. the TI module only needs
+        # to check it once in a while
+        request = (
+            str(profileid),
+            str(twid),
+            ip_state,
+            str(lookup),
+            json.dumps(extra_info, sort_keys=True) if extra_info else "",
+        )
+        if not self.was_recently_asked(self.constants.GIVE_TI, request):
+            self.publish(self.constants.GIVE_TI, json.dumps(data_to_send))
         return data_to_send
 
     def set_ti_feed_info(self, file, data):
@@ -169,11 +542,15 @@ class IoCHandler:
 
     def store_known_fp_md5_hashes(self, fps: Dict[str, List[str]]):
         self.rcache.hmset(self.constants.KNOWN_FPS, fps)
+        self._invalidate_ioc_snapshot()
+
+    def get_known_fp_md5_hashes(self) -> Dict[str, str]:
+        return self.rcache.hgetall(self.constants.KNOWN_FPS)
 
     def is_known_fp_md5_hash(self, hash: str) -> Optional[str]:
         """returns the description of the given hash if it is a FP. and
-        returns Fals eif the hash is not a FP"""
-        return self.rcache.hmget(self.constants.KNOWN_FPS, hash)
+        returns None if the hash is not a FP"""
+        return self._get_ioc_snapshot().match_hash("known_fp_md5", hash)
 
     def delete_ips_from_ioc_ips(self, ips: List[str]):
         """
@@ -186,45 +563,58 @@ class IoCHandler:
         Delete old domains from IoC
         """
         self.rcache.hdel(self.constants.IOC_DOMAINS, *domains)
-        self._invalidate_trie_cache()
+        self._invalidate_ioc_snapshot()
 
-    def add_ips_to_ioc(self, ips_and_description: Dict[str, str]) -> None:
+    def add_ips_to_ioc(
+        self, ips_and_description: Dict[str, str], feed: Optional[str] = None
+    ) -> None:
         """
         Store a group of IPs in the db as they were obtained from an IoC source
         :param ips_and_description: is {ip: json.dumps{'source':..,
                                                         'tags':..,
                                                         'threat_level':... ,
                                                         'description':...}}
-
+        :param feed: name of the feed, if the given IPs are all the IPs
+        of this feed. the IPs of the previous version of the feed that
+        aren't given are deleted.
         """
-        if ips_and_description:
-            self.rcache.hmset(self.constants.IOC_IPS, ips_and_description)
+        self._load_iocs(self.constants.IOC_IPS, ips_and_description, feed)
 
-    def add_domains_to_ioc(self, domains_and_description: dict) -> None:
+    def add_domains_to_ioc(
+        self, domains_and_description: dict, feed: Optional[str] = None
+    ) -> None:
         """
         Store a group of domains in the db as they were obtained from
         an IoC source
         :param domains_and_description: is
         {domain: json.dumps{'source':..,'tags':..,
             'threat_level':... ,'description'}}
+        :param feed: name of the feed, if the given domains are all the
+        domains of this feed. the domains of the previous version of the
+        feed that aren't given are deleted.
         """
-        if domains_and_description:
-            self.rcache.hmset(
-                self.constants.IOC_DOMAINS, domains_and_description
-            )
-            self._invalidate_trie_cache()
+        if not (domains_and_description or feed):
+            return
+        self._load_iocs(
+            self.constants.IOC_DOMAINS, domains_and_description, feed
+        )
+        self._invalidate_ioc_snapshot()
 
-    def add_ip_range_to_ioc(self, malicious_ip_ranges: dict) -> None:
+    def add_ip_range_to_ioc(
+        self, malicious_ip_ranges: dict, feed: Optional[str] = None
+    ) -> None:
         """
         Store a group of IP ranges in the db as they were obtained from an IoC source
         :param malicious_ip_ranges: is
         {range: json.dumps{'source':..,'tags':..,
          'threat_level':... ,'description'}}
+        :param feed: name of the feed, if the given ranges are all the
+        ranges of this feed. the ranges of the previous version of the
+        feed that aren't given are deleted.
         """
-        if malicious_ip_ranges:
-            self.rcache.hmset(
-                self.constants.IOC_IP_RANGES, malicious_ip_ranges
-            )
+        self._load_iocs(
+            self.constants.IOC_IP_RANGES, malicious_ip_ranges, feed
+        )
 
     def add_asn_to_ioc(self, blacklisted_ASNs: dict):
         """
@@ -233,8 +623,7 @@ class IoCHandler:
         {asn: json.dumps{'source':..,'tags':..,
             'threat_level':... ,'description'}}
         """
-        if blacklisted_ASNs:
-            self.rcache.hmset(self.constants.IOC_ASN, blacklisted_ASNs)
+        self._load_iocs(self.constants.IOC_ASN, blacklisted_ASNs)
 
     def add_ja3_to_ioc(self, ja3: dict) -> None:
         """
@@ -244,6 +633,7 @@ class IoCHandler:
 
         """
         self.rcache.hmset(self.constants.IOC_JA3, ja3)
+        self._invalidate_ioc_snapshot()
 
     def add_jarm_to_ioc(self, jarm: dict) -> None:
         """
@@ -252,6 +642,7 @@ class IoCHandler:
                             'threat_level':... ,'description'}}
         """
         self.rcache.hmset(self.constants.IOC_JARM, jarm)
+        self._invalidate_ioc_snapshot()
 
     def add_ssl_sha1_to_ioc(self, malicious_ssl_certs):
         """
@@ -260,15 +651,24 @@ class IoCHandler:
                                     'threat_level':... ,'description'}}
         """
         self.rcache.hmset(self.constants.IOC_SSL, malicious_ssl_certs)
+        self._invalidate_ioc_snapshot()
 
     def is_blacklisted_asn(self, asn) -> bool:
         return self.rcache.hget(self.constants.IOC_ASN, asn)
 
-    def is_blacklisted_jarm(self, jarm_hash: str):
+    def is_blacklisted_jarm(self, jarm_hash: str) -> Optional[str]:
         """
         search for the given hash in the malicious hashes stored in the db
         """
-        return self.rcache.hget(self.constants.IOC_JARM, jarm_hash)
+        return self._get_ioc_snapshot().match_hash("jarm", jarm_hash)
+
+    def is_blacklisted_ja3(self, ja3: str) -> Optional[str]:
+        """
+        returns the info of the given ja3 or ja3s if it's blacklisted
+        as json.dumps{'source':..,'tags':..,
+                      'threat_level':... ,'description'}
+        """
+        return self._get_ioc_snapshot().match_hash("ja3", ja3)
 
     def is_blacklisted_ip(self, ip: str) -> Union[Dict[str, str], bool]:
         """
@@ -285,38 +685,9 @@ class IoCHandler:
         return False if ip_info is None else json.loads(ip_info)
 
     def is_blacklisted_ssl(self, sha1):
-        info = self.rcache.hmget(self.constants.IOC_SSL, sha1)[0]
+        info = self._get_ioc_snapshot().match_hash("ssl", sha1)
         return False if info is None else info
 
-    def _match_exact_domain(self, domain: str) -> Optional[Dict[str, str]]:
-        """checks if the given domain is blacklisted.
-        checks only the exact given domain, no subdomains"""
-        domain_description = self.rcache.hget(
-            self.constants.IOC_DOMAINS, domain
-        )
-        if not domain_description:
-            return
-        return json.loads(domain_description)
-
-    def _match_subdomain(self, domain: str) -> Optional[Dict[str, str]]:
-        """
-        Checks if we have any blacklisted domain that is a part of the
-        given domain
-        Uses a cached trie for optimization.
-        """
-        # the goal here is we dont retrieve that huge amount of domains
-        # from the db on every domain lookup
-        # so we retrieve once, put em in a trie (aka cache them in memory),
-        # keep using them from that data structure until a new domain is
-        # added to the db, when that happens we invalidate the cache,
-        # rebuild the trie, and keep using it from there.
-        if not self.is_trie_cached:
-            self._build_trie()
-
-        found, domain_info = self.trie.search(domain)
-        if found:
-            return domain_info
-
     def is_blacklisted_domain(
         self, domain: str
     ) -> Union[Tuple[Dict[str, str], bool], bool]:
@@ -327,14 +698,18 @@ class IoCHandler:
         bool: True if we found a match for exactly the given
         domain False if we matched a subdomain
         """
-        if match := self._match_exact_domain(domain):
-            is_subdomain = False
-            return match, is_subdomain
-
-        if match := self._match_subdomain(domain):
-            is_subdomain = True
-            return match, is_subdomain
-        return False, False
+        # the goal here is we dont retrieve that huge amount of domains
+        # from the db on every domain lookup
+        # so we retrieve once, put em in a trie (aka cache them in memory),
+        # keep using them from that data structure until a new generation
+        # of the feeds is published, when that happens we rebuild the
+        # trie, and keep using it from there.
+        domain_info, is_subdomain = self._get_ioc_snapshot().match_domain(
+            domain
+        )
+        if not domain_info:
+            return False, False
+        return json.loads(domain_info), is_subdomain
 
     def get_all_blacklisted_ip_ranges(self) -> dict:
         """
@@ -362,6 +737,13 @@ class IoCHandler:
         """
         return self.rcache.hgetall(self.constants.IOC_JA3)
 
+    def get_all_blacklisted_jarm(self) -> Dict[str, str]:
+        return self.rcache.hgetall(self.constants.IOC_JARM)
+
+    def get_all_blacklisted_ssl(self) -> Dict[str, str]:
+        """returns all the malicious SHA1 SSL fingerprints"""
+        return self.rcache.hgetall(self.constants.IOC_SSL)
+
     def is_profile_malicious(self, profileid: str) -> str:
         return (
             self.r.hget(profileid, self.constants.LABELED_AS_MALICIOUS)
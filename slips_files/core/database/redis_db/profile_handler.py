@@ -85,6 +85,16 @@ class ProfileHandler:
         """
         This function returns the TW in the database where the flow belongs.
         Returns the time window id
+        """
+        tw_id, _ = self.get_timewindow_and_start(flowtime, profileid)
+        return tw_id
+
+    def get_timewindow_and_start(
+        self, flowtime, profileid
+    ) -> Tuple[str, float]:
+        """
+        Same as get_timewindow() but returns the start time of the
+        returned tw too
         DISCLAIMER:
 
             if the given flowtime is == the starttime of a tw, it will
@@ -131,7 +141,7 @@ class ProfileHandler:
         tw_id: str = f"timewindow{tw_number}"
 
         self.add_new_tw(profileid, tw_id, tw_start)
-        return tw_id
+        return tw_id, tw_start
 
     def add_out_http(
         self,
@@ -1241,6 +1251,9 @@ class ProfileHandler:
                 # now we're sure that the vendor of the given mac addr,
                 # is the vendor of this profileid
                 self.r.hset(profileid, "MAC_vendor", mac_vendor)
+                self.invalidate_cached(
+                    "get_mac_vendor_from_profile", profileid
+                )
                 return True
 
         return False
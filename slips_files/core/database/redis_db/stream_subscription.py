@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+from collections import deque
+from typing import (
+    Deque,
+    List,
+    Optional,
+    Tuple,
+)
+
+import redis
+
+
+def get_stream_key(channel: str) -> str:
+    """the key of the redis stream the msgs of the given channel go to"""
+    return f"{channel}_stream"
+
+
+class StreamSubscription:
+    """
+    Reads the msgs of a channel that's published to a redis stream
+    instead of pub/sub, see RedisDB.publish().
+
+    Has the same get_message() as redis' PubSub objects, so modules read
+    from it using IModule.get_msg() the same way they read from pub/sub
+    channels.
+
+    Each module is a consumer group of the stream, so every module gets
+    all the msgs, and a restarted module continues from the last msg it
+    acknowledged instead of losing the msgs published while it was down.
+    Msgs are read in batches of batch_size and a batch is acknowledged
+    once the module asks for the msg after the last one of it.
+    """
+
+    def __init__(
+        self,
+        r: redis.Redis,
+        channel: str,
+        group: str,
+        batch_size: int = 100,
+    ):
+        self.r = r
+        self.channel = channel
+        self.stream = get_stream_key(channel)
+        self.group = group
+        self.batch_size = batch_size
+        # msgs read from the stream and not yet returned by get_message()
+        self.batch: Deque[Tuple[str, dict]] = deque()
+        # ids of the returned msgs of the current batch, acked once
+        # the next batch is read
+        self.to_ack: List[str] = []
+        # first re-read the msgs this group read and didn't ack before,
+        # e.g. before the module was restarted
+        self.last_id = "0"
+        self.create_group()
+
+    def create_group(self):
+        try:
+            # $ to receive only the msgs published from now on, like
+            # pub/sub
+            self.r.xgroup_create(
+                self.stream, self.group, id="$", mkstream=True
+            )
+        except redis.exceptions.ResponseError as e:
+            # the group already exists, e.g. the module was restarted
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def ack(self):
+        if self.to_ack:
+            self.r.xack(self.stream, self.group, *self.to_ack)
+            self.to_ack = []
+
+    def read_batch(self, timeout: float):
+        self.ack()
+        block = int(timeout * 1000)
+        response = self.r.xreadgroup(
+            self.group,
+            self.group,
+            {self.stream: self.last_id},
+            count=self.batch_size,
+            # 0 would block forever
+            block=block or None,
+        )
+        msgs = response[0][1] if response else []
+        if self.last_id == "0" and not msgs:
+            # no unacked msgs left, read the new ones from now on
+            self.last_id = ">"
+        self.batch.extend(msgs)
+
+    def get_message(self, timeout: float = 0.0) -> Optional[dict]:
+        if not self.batch:
+            self.read_batch(timeout)
+
+        while self.batch:
+            msg_id, fields = self.batch.popleft()
+            self.to_ack.append(msg_id)
+            # unacked msgs that were trimmed from the stream because of
+            # its maxlen have no fields
+            if fields:
+                break
+        else:
+            return None
+
+        return {
+            "type": "message",
+            "pattern": None,
+            "channel": self.channel,
+            "data": fields["data"],
+            "published_at": float(fields["published_at"]),
+        }
@@ -1,7 +1,12 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
 from datetime import datetime
-from typing import List, Dict
+from typing import (
+    List,
+    Dict,
+    Optional,
+    Tuple,
+)
 import os.path
 import sqlite3
 import json
@@ -73,6 +78,11 @@ class SQLiteDB:
         }
         for table_name, schema in table_schema.items():
             self.create_table(table_name, schema)
+        # the web interface reads the flows of one profile and tw at a time
+        self.execute(
+            "CREATE INDEX IF NOT EXISTS flows_profileid_twid "
+            "ON flows (profileid, twid)"
+        )
 
     def _init_db(self):
         """
@@ -127,6 +137,74 @@ class SQLiteDB:
             res[uid] = json.loads(flow)
         return res
 
+    def get_flows_page_in_profileid_twid(
+        self,
+        profileid: str,
+        twid: str,
+        offset: int = 0,
+        limit: int = -1,
+        search: str = "",
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, int, Dict[str, dict]]:
+        """
+        returns one page of the flows of the given profile and tw
+        :param limit: max number of flows to return, -1 returns all
+        :param search: only return flows that have a field value
+        containing this text
+        :param sort_by: the flow field to sort the flows by, e.g. "ts"
+        :param filters: {field: value} only return flows whose fields
+        are equal to the given values, case-insensitive
+        :return: the total number of flows in the tw, the number of
+        flows matching the search and filters and {uid: flow} of the
+        requested page
+        """
+        condition = "profileid = ? AND twid = ?"
+        params = [profileid, twid]
+        self.execute(f"SELECT COUNT(*) FROM flows WHERE {condition}", params)
+        total = self.fetchone()[0]
+
+        if search:
+            # match the values only, not the keys of the json flow
+            condition += (
+                " AND EXISTS (SELECT 1 FROM json_each(flow) "
+                "WHERE json_each.value LIKE ? ESCAPE '\\')"
+            )
+            params.append(f"%{self.escape_like(search)}%")
+        for field, value in (filters or {}).items():
+            # the field is passed as a param, it can't inject anything
+            condition += " AND json_extract(flow, ?) LIKE ? ESCAPE '\\'"
+            params.extend([f"$.{field}", self.escape_like(value)])
+
+        if search or filters:
+            self.execute(
+                f"SELECT COUNT(*) FROM flows WHERE {condition}", params
+            )
+            matching = self.fetchone()[0]
+        else:
+            matching = total
+
+        query = f"SELECT uid, flow FROM flows WHERE {condition}"
+        if sort_by:
+            # the field is passed as a param, it can't inject anything
+            direction = "DESC" if descending else "ASC"
+            query += f" ORDER BY json_extract(flow, ?) {direction}"
+            params.append(f"$.{sort_by}")
+        query += " LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        self.execute(query, params)
+
+        flows = {uid: json.loads(flow) for uid, flow in self.fetchall()}
+        return total, matching, flows
+
+    @staticmethod
+    def escape_like(text: str) -> str:
+        """escapes the wildcards of the given text to use it in LIKE"""
+        return (
+            text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+
     def get_all_flows_in_profileid(self, profileid) -> Dict[str, dict]:
         """
         Return a list of all the flows in this profileid
@@ -230,14 +308,26 @@ class SQLiteDB:
         Returns the flow with the given uid
         the flow returned is read from conn.log
         """
-        condition = f'uid = "{uid}"'
+        query = "SELECT flow FROM flows WHERE uid = ?"
+        params = (uid,)
         if twid:
-            condition += f'AND twid = "{twid}"'
+            query += " AND twid = ?"
+            params += (twid,)
 
-        res = self.select("flows", condition=condition)
-        res = res[0][1] if res else {}
+        self.execute(query, params)
+        res = self.fetchone()
+        res = res[0] if res else {}
         return {uid: res}
 
+    def get_conn_flow(self, uid: str) -> Optional[str]:
+        """
+        Returns the json of the conn flow with the given uid, or None.
+        uses the uid primary key index of the flows table
+        """
+        self.execute("SELECT flow FROM flows WHERE uid = ?", (uid,))
+        res = self.fetchone()
+        return res[0] if res else None
+
     def add_flow(self, flow, profileid: str, twid: str, label="benign"):
         if hasattr(flow, "aid"):
             parameters = (
@@ -21,10 +21,11 @@
 # stratosphere@aic.fel.cvut.cz
 
 import json
+from copy import copy
 from typing import (
-    List,
     Dict,
     Optional,
+    Iterable,
 )
 from datetime import datetime
 from os import path
@@ -41,6 +42,8 @@ from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
 from slips_files.core.helpers.whitelist.whitelist import Whitelist
 from slips_files.core.helpers.notify import Notify
+from slips_files.core.helpers.evidence_ledger import EvidenceLedger
+from slips_files.core.helpers.buffered_writer import BufferedWriter
 from slips_files.common.abstracts.core import ICore
 from slips_files.core.structures.evidence import (
     dict_to_evidence,
@@ -81,20 +84,24 @@ class EvidenceHandler(ICore):
 
         self.c1 = self.db.subscribe("evidence_added")
         self.c2 = self.db.subscribe("new_blame")
+        self.c3 = self.db.subscribe("tw_closed")
         self.channels = {
             "evidence_added": self.c1,
             "new_blame": self.c2,
+            "tw_closed": self.c3,
         }
+        # keeps the alert state of each profile and tw in memory so
+        # we dont have to reload all the tw evidence from the db for
+        # every new evidence
+        self.ledger = EvidenceLedger(self.db)
 
         # clear output/alerts.log
         self.logfile = self.clean_file(self.output_dir, "alerts.log")
-        utils.change_logfiles_ownership(self.logfile.name, self.UID, self.GID)
 
         self.is_running_non_stop = self.db.is_running_non_stop()
 
         # clear output/alerts.json
         self.jsonfile = self.clean_file(self.output_dir, "alerts.json")
-        utils.change_logfiles_ownership(self.jsonfile.name, self.UID, self.GID)
         # this list will have our local and public ips when using -i
         self.our_ips = utils.get_own_ips()
         self.formatter = EvidenceFormatter(self.db)
@@ -119,18 +126,35 @@ class EvidenceHandler(ICore):
         self.UID = conf.get_UID()
 
         self.popup_alerts = conf.popup_alerts()
+        self.alerts_buffer_size: int = conf.alerts_buffer_size()
+        self.alerts_flush_interval: float = conf.alerts_flush_interval()
+        self.alerts_rotation_size: int = conf.alerts_rotation_size()
+        self.alerts_rotation_period: float = conf.alerts_rotation_period()
+        self.alerts_rotation_backups: int = conf.alerts_rotation_backups()
+        self.alerts_fsync: str = conf.alerts_fsync()
         # In docker, disable alerts no matter what slips.yaml says
         if IS_IN_A_DOCKER_CONTAINER:
             self.popup_alerts = False
 
-    def clean_file(self, output_dir, file_to_clean):
+    def clean_file(self, output_dir, file_to_clean) -> BufferedWriter:
         """
-        Clear the file if exists and return an open handle to it
+        Clear the file if exists and return a buffered writer to it
         """
         logfile_path = os.path.join(output_dir, file_to_clean)
         if path.exists(logfile_path):
             open(logfile_path, "w").close()
-        return open(logfile_path, "a")
+        return BufferedWriter(
+            logfile_path,
+            buffer_size=self.alerts_buffer_size,
+            flush_interval=self.alerts_flush_interval,
+            rotation_size=self.alerts_rotation_size,
+            rotation_period=self.alerts_rotation_period,
+            rotation_backups=self.alerts_rotation_backups,
+            fsync=self.alerts_fsync,
+            on_open=lambda file: utils.change_logfiles_ownership(
+                file, self.UID, self.GID
+            ),
+        )
 
     def handle_unable_to_log(self):
         self.print("Error logging evidence/alert.")
@@ -145,8 +169,7 @@ class EvidenceHandler(ICore):
             return
 
         try:
-            json.dump(idmef_alert, self.jsonfile)
-            self.jsonfile.write("\n")
+            self.jsonfile.write(json.dumps(idmef_alert))
         except KeyboardInterrupt:
             return True
         except Exception:
@@ -180,8 +203,7 @@ class EvidenceHandler(ICore):
                     )
                 }
             )
-            json.dump(idmef_evidence, self.jsonfile)
-            self.jsonfile.write("\n")
+            self.jsonfile.write(json.dumps(idmef_evidence))
         except KeyboardInterrupt:
             return True
         except Exception:
@@ -193,11 +215,9 @@ class EvidenceHandler(ICore):
         logging is enabled.
         """
         try:
-            # write to alerts.log
+            # write to alerts.log, the writer adds the trailing newline
+            # and flushes once enough lines are buffered
             self.logfile.write(data)
-            if not data.endswith("\n"):
-                self.logfile.write("\n")
-            self.logfile.flush()
         except KeyboardInterrupt:
             return True
         except Exception:
@@ -232,26 +252,26 @@ class EvidenceHandler(ICore):
         # log to alerts.json
         self.add_alert_to_json_log_file(alert)
 
+    def log_writers_stats(self):
+        for writer in (self.logfile, self.jsonfile):
+            stats: dict = writer.get_stats()
+            self.print(
+                f"{os.path.basename(writer.name)}: "
+                f"{stats['lines']} lines written in "
+                f"{stats['flushes']} flushes. "
+                f"Avg write latency: "
+                f"{stats['avg_write_latency'] * 1000:.2f}ms, "
+                f"max: {stats['max_write_latency'] * 1000:.2f}ms. "
+                f"Backlog: {stats['backlog_lines']} lines.",
+                2,
+                0,
+            )
+
     def shutdown_gracefully(self):
+        self.log_writers_stats()
         self.logfile.close()
         self.jsonfile.close()
 
-    def get_evidence_that_were_part_of_a_past_alert(
-        self, profileid: str, twid: str
-    ) -> List[str]:
-        """
-        returns a list of evidence <ids that were part of an alert in the
-        given timewindow
-        """
-        past_alerts: dict = self.db.get_profileid_twid_alerts(profileid, twid)
-        try:
-            past_evidence_ids = list(past_alerts.values())[0]
-            past_evidence_ids: List[str] = json.loads(past_evidence_ids)
-        except IndexError:
-            # no past evidence
-            past_evidence_ids = []
-        return past_evidence_ids
-
     def is_evidence_done_by_others(self, evidence: Evidence) -> bool:
         # given all the tw evidence, we should only
         # consider evidence that makes this given
@@ -266,45 +286,28 @@ class EvidenceHandler(ICore):
         filters and returns all the evidence for this profile in this TW
         returns the dict with filtered evidence
         """
-        tw_evidence: Dict[str, dict] = self.db.get_twid_evidence(
-            profileid, twid
-        )
-        if not tw_evidence:
+        # the ledger only has evidence that came to the evidence_added
+        # channel, were processed here and weren't whitelisted.
+        # sometimes the db has evidence that didn't come yet to this
+        # process, and they would be alerted without checking the
+        # whitelist if we read them from the db.
+        ledger = self.ledger.get(profileid, twid)
+        if not ledger.evidence:
             return
 
-        past_evidence_ids: List[str] = (
-            self.get_evidence_that_were_part_of_a_past_alert(profileid, twid)
-        )
-
         filtered_evidence = {}
-
-        for id, evidence in tw_evidence.items():
-            id: str
-            evidence: str
-            evidence: dict = json.loads(evidence)
-            evidence: Evidence = dict_to_evidence(evidence)
-
-            if self.is_filtered_evidence(evidence, past_evidence_ids):
-                continue
-
-            if self.db.is_whitelisted_evidence(id):
-                continue
-
-            # delete not processed evidence
-            # sometimes the db has evidence that didn't come yet to evidence.py
-            # and they are alerted without checking the whitelist!
-            # to fix this, we keep track of processed evidence
-            # that came to new_evidence channel and were processed by it.
-            # so they are ready to be a part of an alert
-            if not self.db.is_evidence_processed(id):
+        for evidence in ledger.evidence.values():
+            evidence: Evidence
+            if self.is_filtered_evidence(
+                evidence, ledger.alerted_evidence_ids
+            ):
                 continue
-
             filtered_evidence[evidence.id] = evidence
 
         return filtered_evidence
 
     def is_filtered_evidence(
-        self, evidence: Evidence, past_evidence_ids: List[str]
+        self, evidence: Evidence, past_evidence_ids: Iterable[str]
     ):
         """
         filters the following
@@ -389,11 +392,20 @@ class EvidenceHandler(ICore):
         if self.popup_alerts:
             self.show_popup(alert)
 
+        self.ledger.mark_as_alerted(
+            str(alert.profile),
+            str(alert.timewindow),
+            list(evidence_causing_the_alert.keys()),
+        )
+
         is_blocked: bool = self.decide_blocking(alert.profile.ip)
         if is_blocked:
             self.db.mark_profile_and_timewindow_as_blocked(
                 str(alert.profile), str(alert.timewindow)
             )
+            self.ledger.mark_as_blocked(
+                str(alert.profile), str(alert.timewindow)
+            )
         self.log_alert(alert, blocked=is_blocked)
 
     def decide_blocking(self, ip_to_block: str) -> bool:
@@ -440,17 +452,28 @@ class EvidenceHandler(ICore):
         # consider it as  valid evidence. this filtering is not done in the db
         self.db.increment_attack_counter(attacker, victim, evidence_type.name)
 
-    def update_accumulated_threat_level(self, evidence: Evidence) -> float:
+    def update_accumulated_threat_level(
+        self, evidence: Evidence, filtered: bool
+    ) -> float:
         """
-        update the accumulated threat level of the profileid and twid of
-        the given evidence and return the updated value
+        adds the given evidence to the ledger, updates the accumulated
+        threat level of the profileid and twid of the given evidence
+        and returns the updated value.
+        the db is updated in the same pipelined round trip that marks
+        the evidence as processed.
+        :param filtered: filtered evidence don't add to the accumulated
+        threat level
         """
-        evidence_threat_level: float = self.get_threat_level(evidence)
-        return self.db.update_accumulated_threat_level(
+        evidence_threat_level: float = (
+            0 if filtered else self.get_threat_level(evidence)
+        )
+        self.db.store_processed_evidence(
+            evidence.id,
             str(evidence.profile),
             str(evidence.timewindow),
             evidence_threat_level,
         )
+        return self.ledger.add_evidence(evidence, evidence_threat_level)
 
     def show_popup(self, alert: Alert):
         alert_description: str = self.formatter.get_printable_alert(alert)
@@ -483,6 +506,11 @@ class EvidenceHandler(ICore):
 
     def main(self):
         while not self.should_stop():
+            # make sure buffered evidence don't stay in memory for
+            # long if no new evidence arrive
+            self.logfile.flush_if_due()
+            self.jsonfile.flush_if_due()
+
             if msg := self.get_msg("evidence_added"):
                 msg["data"]: str
                 evidence: dict = json.loads(msg["data"])
@@ -492,13 +520,9 @@ class EvidenceHandler(ICore):
                 evidence_type: EvidenceType = evidence.evidence_type
                 timestamp: str = evidence.timestamp
 
-                # FP whitelisted alerts happen when the db returns an evidence
-                # that isn't processed in this channel, in the tw_evidence
-                # below.
-                # to avoid this, we only alert about processed evidence
-                self.db.mark_evidence_as_processed(evidence.id)
                 # Ignore evidence if IP is whitelisted
                 if self.whitelist.is_whitelisted_evidence(evidence):
+                    self.db.mark_evidence_as_processed(evidence.id)
                     self.db.cache_whitelisted_evidence_id(evidence.id)
                     # Modules add evidence to the db before
                     # reaching this point, now remove evidence from db so
@@ -513,6 +537,10 @@ class EvidenceHandler(ICore):
                     )
                 flow_datetime = utils.convert_format(timestamp, "iso")
 
+                # the ledger keeps the evidence as it was set in the db,
+                # the threat level is only added to the description of
+                # the logged evidence
+                evidence_to_alert: Evidence = copy(evidence)
                 evidence: Evidence = (
                     self.formatter.add_threat_level_to_evidence_description(
                         evidence
@@ -530,20 +558,19 @@ class EvidenceHandler(ICore):
                     evidence.profile.ip, evidence.victim, evidence_type
                 )
 
-                past_evidence_ids: List[str] = (
-                    self.get_evidence_that_were_part_of_a_past_alert(
-                        profileid, twid
+                ledger = self.ledger.get(profileid, twid)
+                # FP whitelisted alerts happen when an evidence that isn't
+                # processed in this channel is alerted. to avoid this,
+                # we only alert about processed evidence, aka the ones
+                # in the ledger.
+                accumulated_threat_level: float = (
+                    self.update_accumulated_threat_level(
+                        evidence_to_alert,
+                        self.is_filtered_evidence(
+                            evidence, ledger.alerted_evidence_ids
+                        ),
                     )
                 )
-                # filtered evidence dont add to the acc threat level
-                if not self.is_filtered_evidence(evidence, past_evidence_ids):
-                    accumulated_threat_level: float = (
-                        self.update_accumulated_threat_level(evidence)
-                    )
-                else:
-                    accumulated_threat_level: float = (
-                        self.db.get_accumulated_threat_level(profileid, twid)
-                    )
 
                 # add to alerts.json
                 self.add_evidence_to_json_log_file(
@@ -556,9 +583,7 @@ class EvidenceHandler(ICore):
 
                 # if the profile was already blocked in
                 # this twid, we shouldn't alert
-                profile_already_blocked = self.db.is_blocked_profile_and_tw(
-                    profileid, twid
-                )
+                profile_already_blocked: bool = ledger.blocked
                 # This is the part to detect if the accumulated
                 # evidence was enough for generating a detection
                 # The detection should be done in attacks per minute.
@@ -574,7 +599,7 @@ class EvidenceHandler(ICore):
                     tw_evidence: Dict[str, Evidence]
                     tw_evidence = self.get_evidence_for_tw(profileid, twid)
                     if tw_evidence:
-                        tw_start, tw_end = self.db.get_tw_limits(
+                        tw_start, tw_end = self.ledger.get_tw_limits(
                             profileid, twid
                         )
                         evidence.timewindow.start_time = tw_start
@@ -589,6 +614,13 @@ class EvidenceHandler(ICore):
                         )
                         self.handle_new_alert(alert, tw_evidence)
 
+            if msg := self.get_msg("tw_closed"):
+                # the alert state of closed tws is no longer needed in
+                # memory, it'll be reloaded from the db if an evidence
+                # arrives late for this tw
+                profileid_tw: str = msg["data"]
+                self.ledger.evict(profileid_tw)
+
             if msg := self.get_msg("new_blame"):
                 data = msg["data"]
                 try:
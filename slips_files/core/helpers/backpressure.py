@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import time
+from typing import (
+    Callable,
+    Dict,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from slips_files.common.printer import Printer
+from slips_files.core.output import Output
+
+
+class Backpressure:
+    """
+    Slows down the profiler when the modules reading the given channel
+    fall behind.
+
+    Redis keeps the msgs published and not yet read by a subscriber in
+    the output buffer of that subscriber's connection, and disconnects
+    the subscriber once the buffer is too big. so when the slowest module
+    has more than max_backlog msgs waiting, the profiler stops
+    processing flows until that module gets back under half of it.
+
+    Modules that stop reading msgs altogether (e.g. they crashed) for
+    stall_timeout seconds are ignored from then on, so they can't block
+    the analysis forever.
+    """
+
+    name = "Backpressure"
+
+    def __init__(
+        self,
+        logger: Output,
+        db,
+        channel: str = "new_flow",
+        max_backlog: int = 10000,
+        check_interval: float = 1,
+        stall_timeout: float = 60,
+    ):
+        self.printer = Printer(logger, self.name)
+        self.db = db
+        self.channel = channel
+        # 0 disables the backpressure
+        self.max_backlog = max_backlog
+        self.resume_backlog = max_backlog // 2
+        self.check_interval = check_interval
+        self.stall_timeout = stall_timeout
+        self.last_check = 0.0
+        self.stalled_modules: Set[str] = set()
+        self.stats = {
+            # number of times the profiler was paused
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+            "max_backlog": 0,
+            "slowest_module": None,
+        }
+
+    def print(self, *args, **kwargs):
+        return self.printer.print(*args, **kwargs)
+
+    def get_backlog(self) -> Tuple[Optional[str], int, int]:
+        """
+        returns the name of the slowest module reading self.channel, the
+        number of msgs it didn't read yet, and the number of msgs it read
+        """
+        published = self.db.get_msgs_published_in_channel(self.channel)
+        published = int(published) if published else 0
+        slowest, backlog, received = None, 0, 0
+        for module, module_received in self.db.get_msgs_received_in_channel(
+            self.channel
+        ).items():
+            if module in self.stalled_modules:
+                continue
+            module_backlog = published - module_received
+            if slowest is None or module_backlog > backlog:
+                slowest, backlog, received = (
+                    module,
+                    module_backlog,
+                    module_received,
+                )
+        return slowest, backlog, received
+
+    def wait_for_slow_modules(self, should_stop: Callable[[], bool]):
+        """
+        blocks until the slowest module is back under half of
+        max_backlog, if it's over max_backlog.
+        is meant to be called before processing each flow, only checks
+        the backlog once every check_interval seconds
+        :param should_stop: returns True when slips is stopping, to stop
+        waiting
+        """
+        if not self.max_backlog:
+            return
+        now = time.time()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+
+        module, backlog, received = self.get_backlog()
+        if backlog > self.stats["max_backlog"]:
+            self.stats["max_backlog"] = backlog
+            self.stats["slowest_module"] = module
+        if backlog <= self.max_backlog:
+            return
+
+        self.stats["throttled"] += 1
+        self.print(
+            f"{module} is {backlog} msgs behind in {self.channel}. "
+            f"Pausing the processing of flows.",
+            2,
+            0,
+        )
+        paused_at = now
+        last_progress = now
+        while backlog > self.resume_backlog and not should_stop():
+            time.sleep(self.check_interval)
+            last_received = received
+            last_module = module
+            module, backlog, received = self.get_backlog()
+            now = time.time()
+            if module != last_module or received != last_received:
+                last_progress = now
+            elif now - last_progress >= self.stall_timeout:
+                self.stalled_modules.add(module)
+                self.print(
+                    f"{module} didn't read any msg from {self.channel} "
+                    f"in {self.stall_timeout}s. Not waiting for it anymore.",
+                    0,
+                    1,
+                )
+                last_progress = now
+                module, backlog, received = self.get_backlog()
+
+        self.stats["throttled_seconds"] += time.time() - paused_at
+        self.last_check = time.time()
+        self.db.store_backpressure_stats(self.get_stats())
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "throttled_seconds": round(self.stats["throttled_seconds"], 3),
+            "stalled_modules": sorted(self.stalled_modules),
+        }
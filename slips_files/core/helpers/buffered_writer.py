@@ -0,0 +1,191 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import os
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+
+class BufferedWriter:
+    """
+    Writes lines to a log file in batches instead of issuing a write
+    syscall per line.
+    Lines are buffered in memory and flushed to disk once the buffer
+    reaches buffer_size bytes or once flush_interval seconds passed
+    since the last flush, whichever comes first.
+    The file can optionally be rotated by size or by age.
+    """
+
+    # when to fsync the file
+    # never: leave it to the OS
+    # rotation: only before the file is rotated or closed
+    # flush: after every flush
+    fsync_policies = ("never", "rotation", "flush")
+
+    def __init__(
+        self,
+        path: str,
+        buffer_size: int = 64 * 1024,
+        flush_interval: float = 1,
+        rotation_size: int = 0,
+        rotation_period: float = 0,
+        rotation_backups: int = 5,
+        fsync: str = "never",
+        on_open: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        :param buffer_size: max number of buffered bytes before flushing
+        :param flush_interval: max number of seconds a line stays in
+        the buffer
+        :param rotation_size: rotate the file once it reaches this
+        number of bytes. 0 disables size based rotation
+        :param rotation_period: rotate the file once it's older than
+        this number of seconds. 0 disables time based rotation
+        :param rotation_backups: number of rotated files to keep
+        :param fsync: one of fsync_policies
+        :param on_open: called with the path of the file each time
+        it's (re)opened, e.g. to change its ownership
+        """
+        self.path = path
+        self.name = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.rotation_size = rotation_size
+        self.rotation_period = rotation_period
+        self.rotation_backups = max(rotation_backups, 1)
+        self.fsync = fsync if fsync in self.fsync_policies else "never"
+        self.on_open = on_open
+
+        self.buffer: List[str] = []
+        self.buffered_bytes = 0
+        self.last_flush_time = time.time()
+        self.closed = False
+        self.stats = {
+            "lines": 0,
+            "flushes": 0,
+            "rotations": 0,
+            "bytes_written": 0,
+            "total_write_latency": 0.0,
+            "max_write_latency": 0.0,
+        }
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, "a")
+        self.opened_at = time.time()
+        self.file_size = os.path.getsize(self.path)
+        if self.on_open:
+            self.on_open(self.path)
+
+    def write(self, line: str):
+        """buffers the given line, flushes if the buffer is full"""
+        if not line.endswith("\n"):
+            line += "\n"
+        self.buffer.append(line)
+        # the number of chars is a good enough estimate of the
+        # number of bytes here
+        self.buffered_bytes += len(line)
+        self.stats["lines"] += 1
+        if self.buffered_bytes >= self.buffer_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        flushes the buffer if flush_interval passed since the last flush
+        should be called periodically so buffered lines don't stay in
+        memory for too long when no new lines are written
+        """
+        if (
+            self.buffer
+            and time.time() - self.last_flush_time >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """writes all the buffered lines to disk in a single write"""
+        self.last_flush_time = time.time()
+        if not self.buffer or self.closed:
+            return
+
+        if self._should_rotate():
+            self.rotate()
+
+        data = "".join(self.buffer)
+        self.buffer.clear()
+        self.buffered_bytes = 0
+
+        start = time.time()
+        self.file.write(data)
+        self.file.flush()
+        if self.fsync == "flush":
+            os.fsync(self.file.fileno())
+        latency = time.time() - start
+
+        self.file_size += len(data)
+        self.stats["flushes"] += 1
+        self.stats["bytes_written"] += len(data)
+        self.stats["total_write_latency"] += latency
+        self.stats["max_write_latency"] = max(
+            self.stats["max_write_latency"], latency
+        )
+
+    def _should_rotate(self) -> bool:
+        if self.rotation_size and self.file_size >= self.rotation_size:
+            return True
+        if (
+            self.rotation_period
+            and time.time() - self.opened_at >= self.rotation_period
+        ):
+            return True
+        return False
+
+    def rotate(self):
+        """
+        renames the current file to <path>.1, shifting older backups
+        e.g. <path>.1 to <path>.2, and opens a new empty file
+        """
+        if self.fsync != "never":
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+        oldest = f"{self.path}.{self.rotation_backups}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for backup_number in range(self.rotation_backups - 1, 0, -1):
+            backup = f"{self.path}.{backup_number}"
+            if os.path.exists(backup):
+                os.rename(backup, f"{self.path}.{backup_number + 1}")
+        os.rename(self.path, f"{self.path}.1")
+
+        self.stats["rotations"] += 1
+        self._open()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        returns the write latency and the current backlog of this writer
+        latencies are in seconds
+        """
+        flushes = self.stats["flushes"]
+        return {
+            **self.stats,
+            "avg_write_latency": (
+                self.stats["total_write_latency"] / flushes if flushes else 0
+            ),
+            "backlog_lines": len(self.buffer),
+            "backlog_bytes": self.buffered_bytes,
+        }
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        if self.fsync != "never":
+            os.fsync(self.file.fileno())
+        self.file.close()
+        self.closed = True
@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import json
+from collections import OrderedDict
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import (
+    Dict,
+    Set,
+    Tuple,
+    Optional,
+    List,
+)
+
+from slips_files.core.structures.evidence import (
+    Evidence,
+    dict_to_evidence,
+)
+
+
+@dataclass
+class TimewindowLedger:
+    """
+    The alert state of one profile and timewindow as seen by the
+    EvidenceHandler
+    """
+
+    # processed and not whitelisted evidence, {evidence_id: Evidence}
+    evidence: Dict[str, Evidence] = field(default_factory=dict)
+    # ids of the evidence that were already part of an alert in this tw
+    alerted_evidence_ids: Set[str] = field(default_factory=set)
+    accumulated_threat_level: float = 0
+    blocked: bool = False
+    tw_limits: Optional[Tuple[float, float]] = None
+
+
+class EvidenceLedger:
+    """
+    In-memory, per profile and timewindow record of the evidence
+    processed by the EvidenceHandler.
+    It is updated incrementally for each evidence that arrives in the
+    evidence_added channel, so deciding whether to alert doesn't
+    require reloading and re-parsing all the evidence of the tw from
+    the db.
+    The db is only read once per tw, the first time the tw is seen
+    (or seen again after being evicted).
+    """
+
+    # max number of profile_tws kept in memory, the least recently used
+    # ones are evicted and reloaded from the db if needed again
+    max_timewindows = 10000
+
+    def __init__(self, db):
+        self.db = db
+        self.timewindows: OrderedDict[str, TimewindowLedger] = OrderedDict()
+
+    @staticmethod
+    def _get_key(profileid: str, twid: str) -> str:
+        return f"{profileid}_{twid}"
+
+    def __len__(self):
+        return len(self.timewindows)
+
+    def __contains__(self, profileid_twid: str) -> bool:
+        return profileid_twid in self.timewindows
+
+    def _get_alerted_evidence_ids(self, profileid: str, twid: str) -> Set[str]:
+        """
+        returns the ids of all evidence that were part of any past alert
+        in the given tw
+        """
+        past_alerts: Dict[str, str] = self.db.get_profileid_twid_alerts(
+            profileid, twid
+        )
+        alerted = set()
+        for evidence_ids in past_alerts.values():
+            alerted.update(json.loads(evidence_ids))
+        return alerted
+
+    def _get_processed_evidence(
+        self, profileid: str, twid: str
+    ) -> Dict[str, Evidence]:
+        """
+        returns the evidence of the given tw that were already processed
+        by the evidence handler. this is only needed when a tw is
+        reloaded after being evicted from the ledger.
+        """
+        tw_evidence: Dict[str, str] = self.db.get_twid_evidence(
+            profileid, twid
+        )
+        if not tw_evidence:
+            return {}
+
+        processed: List[bool] = self.db.are_evidence_processed(
+            list(tw_evidence.keys())
+        )
+        evidence = {}
+        for (evidence_id, serialized), is_processed in zip(
+            tw_evidence.items(), processed
+        ):
+            if not is_processed:
+                continue
+            evidence[evidence_id] = dict_to_evidence(json.loads(serialized))
+        return evidence
+
+    def _load(self, profileid: str, twid: str) -> TimewindowLedger:
+        """reads the alert state of the given tw from the db"""
+        return TimewindowLedger(
+            evidence=self._get_processed_evidence(profileid, twid),
+            alerted_evidence_ids=self._get_alerted_evidence_ids(
+                profileid, twid
+            ),
+            accumulated_threat_level=self.db.get_accumulated_threat_level(
+                profileid, twid
+            ),
+            blocked=self.db.is_blocked_profile_and_tw(profileid, twid),
+        )
+
+    def get(self, profileid: str, twid: str) -> TimewindowLedger:
+        """
+        returns the ledger of the given tw, loads it from the db if it's
+        not in memory
+        """
+        key = self._get_key(profileid, twid)
+        if key in self.timewindows:
+            self.timewindows.move_to_end(key)
+            return self.timewindows[key]
+
+        ledger = self._load(profileid, twid)
+        self.timewindows[key] = ledger
+        if len(self.timewindows) > self.max_timewindows:
+            self.timewindows.popitem(last=False)
+        return ledger
+
+    def add_evidence(self, evidence: Evidence, threat_level: float) -> float:
+        """
+        adds the given processed evidence to its tw and increments the
+        accumulated threat level of the tw by the given threat_level
+        returns the updated accumulated threat level
+        """
+        ledger = self.get(str(evidence.profile), str(evidence.timewindow))
+        ledger.evidence[evidence.id] = evidence
+        ledger.accumulated_threat_level += threat_level
+        return ledger.accumulated_threat_level
+
+    def get_tw_limits(self, profileid: str, twid: str) -> Tuple[float, float]:
+        """returns the cached start and end time of the given tw"""
+        ledger = self.get(profileid, twid)
+        if not ledger.tw_limits:
+            ledger.tw_limits = self.db.get_tw_limits(profileid, twid)
+        return ledger.tw_limits
+
+    def mark_as_alerted(
+        self, profileid: str, twid: str, evidence_ids: List[str]
+    ):
+        """
+        marks the given evidence as part of an alert and resets the
+        accumulated threat level of the tw, the same way the db does
+        when an alert is set
+        """
+        ledger = self.get(profileid, twid)
+        ledger.alerted_evidence_ids.update(evidence_ids)
+        ledger.accumulated_threat_level = 0
+
+    def mark_as_blocked(self, profileid: str, twid: str):
+        self.get(profileid, twid).blocked = True
+
+    def evict(self, profileid_twid: str):
+        """removes the given closed tw from memory"""
+        self.timewindows.pop(profileid_twid, None)
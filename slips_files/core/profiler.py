@@ -36,6 +36,7 @@ from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
 from slips_files.common.abstracts.core import ICore
 from slips_files.common.style import green
+from slips_files.core.helpers.backpressure import Backpressure
 from slips_files.core.helpers.flow_handler import FlowHandler
 from slips_files.core.helpers.symbols_handler import SymbolHandler
 from slips_files.core.helpers.whitelist.whitelist import Whitelist
@@ -89,6 +90,11 @@ class Profiler(ICore, IObservable):
         self.whitelist = Whitelist(self.logger, self.db)
         self.read_configuration()
         self.symbol = SymbolHandler(self.logger, self.db)
+        # pauses the processing of flows when the modules reading them
+        # fall too far behind
+        self.backpressure = Backpressure(
+            self.logger, self.db, max_backlog=self.max_flows_backlog
+        )
         # there has to be a timeout or it will wait forever and never
         # receive a new line
         self.timeout = 0.0000001
@@ -113,6 +119,9 @@ class Profiler(ICore, IObservable):
         # that queue will be used in 4 different threads. the 3 profilers
         # and main().
         self.pending_flows_queue_lock = threading.Lock()
+        # used to record when the first flow is processed in the startup
+        # phases
+        self.processed_first_flow = False
 
     def read_configuration(self):
         conf = ConfigParser()
@@ -125,6 +134,7 @@ class Profiler(ICore, IObservable):
             Union[IPv4Network, IPv6Network, IPv4Address, IPv6Address]
         ]
         self.client_ips = conf.client_ips()
+        self.max_flows_backlog = conf.max_flows_backlog()
 
     def convert_starttime_to_epoch(self, starttime) -> str:
         try:
@@ -644,6 +654,9 @@ class Profiler(ICore, IObservable):
                 self.add_flow_to_profile(flow)
                 self.handle_setting_local_net(flow)
                 self.db.increment_processed_flows()
+                if not self.processed_first_flow:
+                    self.processed_first_flow = True
+                    self.db.set_startup_phase("first_flow_processed")
             except Exception as e:
                 self.print_traceback()
                 self.print(
@@ -673,10 +686,21 @@ class Profiler(ICore, IObservable):
         self.profiler_queue.close()
 
         self.db.set_new_incoming_flows(False)
+        self.db.store_backpressure_stats(self.backpressure.get_stats())
+        self.print(
+            f"Waited for slow modules: {self.backpressure.get_stats()}",
+            log_to_logfiles_only=True,
+        )
         self.print(
             f"Stopping. Total lines read: {self.rec_lines}",
             log_to_logfiles_only=True,
         )
+        if suppressed := self.db.get_suppressed_requests():
+            self.print(
+                f"Requests not sent again to the TI and P2P modules "
+                f"because the same IoC was recently sent: {suppressed}",
+                log_to_logfiles_only=True,
+            )
         self.mark_process_as_done_processing()
 
     def pre_main(self):
@@ -713,6 +737,9 @@ class Profiler(ICore, IObservable):
                 # function returns
                 return 1
 
+            self.backpressure.wait_for_slow_modules(
+                self.termination_event.is_set
+            )
             self.pending_flows_queue_lock.acquire()
             self.flows_to_process_q.put(msg)
             self.pending_flows_queue_lock.release()
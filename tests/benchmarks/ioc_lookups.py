@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""
+Measures the number of IoC lookups per second an IoCSnapshot does
+usage: python3 -m tests.benchmarks.ioc_lookups [number of IoCs]
+"""
+import hashlib
+import json
+import sys
+import time
+from functools import partial
+from typing import (
+    Callable,
+    Dict,
+)
+
+from slips_files.common.data_structures.ioc_snapshot import IoCSnapshot
+
+LOOKUPS = 200_000
+
+
+def get_iocs(number_of_iocs: int) -> Dict[str, Dict[str, str]]:
+    info = json.dumps(
+        {
+            "source": "benchmark.csv",
+            "threat_level": "medium",
+            "description": "",
+            "tags": [],
+        }
+    )
+    return {
+        "domains": {
+            f"malicious{i}.example{i % 100}.com": info
+            for i in range(number_of_iocs)
+        },
+        "known_fp_md5": {
+            hashlib.md5(str(i).encode()).hexdigest(): "benign"
+            for i in range(number_of_iocs)
+        },
+    }
+
+
+def measure(lookup: Callable, keys: list) -> float:
+    """returns the number of lookups per second"""
+    start = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    return len(keys) / (time.perf_counter() - start)
+
+
+def main():
+    number_of_iocs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    iocs = get_iocs(number_of_iocs)
+
+    start = time.perf_counter()
+    snapshot = IoCSnapshot(
+        1, {ioc_type: partial(iocs.get, ioc_type) for ioc_type in iocs}
+    )
+    snapshot.match_domain("warmup.com")
+    snapshot.match_hash("known_fp_md5", "warmup")
+    print(
+        f"loaded {number_of_iocs} domains and {number_of_iocs} hashes in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+
+    domains = list(iocs["domains"])
+    hashes = list(iocs["known_fp_md5"])
+    cases = {
+        "exact domain": domains,
+        "subdomain": [f"www.{domain}" for domain in domains],
+        "unknown domain": [f"benign{i}.org" for i in range(len(domains))],
+        "known hash": hashes,
+        "unknown hash": [hash_[::-1] for hash_ in hashes],
+    }
+    for case, keys in cases.items():
+        keys = (keys * (LOOKUPS // len(keys) + 1))[:LOOKUPS]
+        lookup = (
+            snapshot.match_domain
+            if "domain" in case
+            else lambda hash_: snapshot.match_hash("known_fp_md5", hash_)
+        )
+        print(f"{case}: {measure(lookup, keys):,.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main()
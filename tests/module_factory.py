@@ -26,6 +26,7 @@ from slips_files.core.helpers.notify import Notify
 from modules.flowalerts.dns import DNS
 from modules.flowalerts.downloaded_file import DownloadedFile
 from slips_files.core.helpers.symbols_handler import SymbolHandler
+from slips_files.core.helpers.evidence_ledger import EvidenceLedger
 from slips_files.core.database.redis_db.profile_handler import ProfileHandler
 from modules.flowalerts.notice import Notice
 from modules.flowalerts.smtp import SMTP
@@ -66,6 +67,7 @@ from slips_files.core.database.redis_db.ioc_handler import IoCHandler
 from slips_files.core.helpers.checker import Checker
 from modules.timeline.timeline import Timeline
 from modules.cesnet.cesnet import CESNET
+from modules.exporting_alerts.stix_exporter import StixExporter
 from modules.riskiq.riskiq import RiskIQ
 from slips_files.common.markov_chains import Matrix
 from slips_files.core.structures.evidence import (
@@ -593,6 +595,25 @@ class ModuleFactory:
         handler.channels = Channels()
         return handler
 
+    def create_stix_exporter_obj(self, output_dir: str):
+        def read_configuration(stix):
+            stix.export_to = ["stix"]
+            stix.push_delay = 3600
+            return True
+
+        db = Mock()
+        db.is_running_non_stop.return_value = True
+        with patch.object(
+            StixExporter,
+            "read_configuration",
+            autospec=True,
+            side_effect=read_configuration,
+        ):
+            stix = StixExporter(self.logger, db)
+        stix.stix_filename = os.path.join(output_dir, "STIX_data.json")
+        stix.print = Mock()
+        return stix
+
     @patch(MODULE_DB_MANAGER, name="mock_db")
     def create_cesnet_obj(self, mock_db):
         output_dir = "dummy_output_dir"
@@ -619,8 +640,13 @@ class ModuleFactory:
             logger, output_dir, redis_port, termination_event
         )
         handler.db = mock_db
+        handler.ledger.db = mock_db
         return handler
 
+    @patch(MODULE_DB_MANAGER, name="mock_db")
+    def create_evidence_ledger_obj(self, mock_db):
+        return EvidenceLedger(mock_db)
+
     @patch(MODULE_DB_MANAGER, name="mock_db")
     def create_evidence_formatter_obj(self, mock_db):
         return EvidenceFormatter(mock_db)
@@ -656,11 +682,13 @@ class ModuleFactory:
     def create_alert_handler_obj(self):
         alert_handler = AlertHandler()
         alert_handler.constants = Constants()
+        alert_handler.invalidate_cached = Mock()
         return alert_handler
 
     def create_profile_handler_obj(self):
         handler = ProfileHandler()
         handler.constants = Constants()
+        handler.invalidate_cached = Mock()
         handler.r = Mock()
         handler.rcache = Mock()
         handler.separator = "_"
@@ -531,3 +531,57 @@ def test_get_evidence_causing_alert(profileid, twid, alert_id, expected_alert):
         f"{profileid}_{twid}", "alerts"
     )
     assert result == expected_alert
+
+
+@pytest.mark.parametrize(
+    "threat_level, expected_zincrby_calls",
+    [
+        # Testcase 1: evidence adds to the accumulated threat level
+        (0.5, 1),
+        # Testcase 2: filtered evidence doesn't
+        (0, 0),
+    ],
+)
+def test_store_processed_evidence(threat_level, expected_zincrby_calls):
+    alert_handler = ModuleFactory().create_alert_handler_obj()
+    alert_handler.r = MagicMock()
+    pipe = alert_handler.r.pipeline.return_value
+
+    alert_handler.store_processed_evidence(
+        "evidence1", "profile_1.1.1.1", "timewindow1", threat_level
+    )
+
+    pipe.sadd.assert_called_once_with(
+        alert_handler.constants.PROCESSED_EVIDENCE, "evidence1"
+    )
+    assert pipe.zincrby.call_count == expected_zincrby_calls
+    pipe.execute.assert_called_once()
+    alert_handler.r.sadd.assert_not_called()
+
+
+def test_are_evidence_processed():
+    alert_handler = ModuleFactory().create_alert_handler_obj()
+    alert_handler.r = MagicMock()
+    pipe = alert_handler.r.pipeline.return_value
+    pipe.execute.return_value = [1, 0]
+
+    assert alert_handler.are_evidence_processed(["ev1", "ev2"]) == [
+        True,
+        False,
+    ]
+    assert pipe.sismember.call_count == 2
+
+
+def test_get_alerted_tws():
+    alert_handler = ModuleFactory().create_alert_handler_obj()
+    alert_handler.r = MagicMock()
+    pipe = alert_handler.r.pipeline.return_value
+    pipe.execute.return_value = ['{"alert1": ["ev1"]}', None, "{}"]
+
+    result = alert_handler.get_alerted_tws(
+        "profile_1.1.1.1", ["timewindow1", "timewindow2", "timewindow3"]
+    )
+
+    assert result == {"timewindow1"}
+    assert pipe.hget.call_count == 3
+    pipe.hget.assert_any_call("profile_1.1.1.1_timewindow2", "alerts")
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/core/helpers/backpressure.py"""
+from unittest.mock import Mock, patch
+
+from slips_files.core.helpers.backpressure import Backpressure
+
+SLEEP = "slips_files.core.helpers.backpressure.time.sleep"
+
+
+def create_backpressure(received, published=100, **kwargs):
+    """
+    :param received: list of {module: msgs received} returned by each
+    call to get_msgs_received_in_channel()
+    """
+    db = Mock()
+    db.get_msgs_published_in_channel.return_value = str(published)
+    db.get_msgs_received_in_channel.side_effect = received
+    backpressure = Backpressure(Mock(), db, check_interval=0, **kwargs)
+    backpressure.print = Mock()
+    return backpressure
+
+
+def test_get_backlog():
+    backpressure = create_backpressure([{"Flow Alerts": 90, "Timeline": 40}])
+    assert backpressure.get_backlog() == ("Timeline", 60, 40)
+
+
+def test_no_wait_under_max_backlog():
+    backpressure = create_backpressure([{"Timeline": 95}], max_backlog=10)
+    with patch(SLEEP) as sleep:
+        backpressure.wait_for_slow_modules(lambda: False)
+    sleep.assert_not_called()
+    assert backpressure.get_stats()["throttled"] == 0
+    assert backpressure.get_stats()["max_backlog"] == 5
+
+
+def test_wait_until_the_slowest_module_catches_up():
+    backpressure = create_backpressure(
+        [{"Timeline": 50}, {"Timeline": 80}, {"Timeline": 96}],
+        max_backlog=10,
+    )
+    with patch(SLEEP) as sleep:
+        backpressure.wait_for_slow_modules(lambda: False)
+    # resumes once it's under half of max_backlog
+    assert sleep.call_count == 2
+    stats = backpressure.get_stats()
+    assert stats["throttled"] == 1
+    assert stats["max_backlog"] == 50
+    assert stats["slowest_module"] == "Timeline"
+    backpressure.db.store_backpressure_stats.assert_called_once()
+
+
+def test_stalled_modules_are_ignored():
+    backpressure = create_backpressure(
+        [{"Timeline": 50, "ARP": 99}] * 3,
+        max_backlog=10,
+        stall_timeout=0,
+    )
+    with patch(SLEEP):
+        backpressure.wait_for_slow_modules(lambda: False)
+    assert backpressure.get_stats()["stalled_modules"] == ["Timeline"]
+
+
+def test_stop_waiting_when_slips_stops():
+    backpressure = create_backpressure([{"Timeline": 0}], max_backlog=10)
+    with patch(SLEEP) as sleep:
+        backpressure.wait_for_slow_modules(lambda: True)
+    sleep.assert_not_called()
+    assert backpressure.get_stats()["throttled"] == 1
+
+
+def test_disabled():
+    backpressure = create_backpressure([{"Timeline": 0}], max_backlog=0)
+    backpressure.wait_for_slow_modules(lambda: False)
+    backpressure.db.get_msgs_received_in_channel.assert_not_called()
@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from slips_files.core.helpers.buffered_writer import BufferedWriter
+
+
+def read(path) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def test_write_is_buffered(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = BufferedWriter(path, buffer_size=1024, flush_interval=60)
+    writer.write("line1")
+    writer.write("line2\n")
+    assert read(path) == ""
+    assert writer.get_stats()["backlog_lines"] == 2
+
+    writer.flush()
+    assert read(path) == "line1\nline2\n"
+    assert writer.get_stats()["backlog_lines"] == 0
+    writer.close()
+
+
+def test_flush_when_buffer_is_full(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = BufferedWriter(path, buffer_size=10, flush_interval=60)
+    writer.write("12345")
+    assert read(path) == ""
+    writer.write("67890")
+    assert read(path) == "12345\n67890\n"
+    assert writer.get_stats()["flushes"] == 1
+    writer.close()
+
+
+def test_flush_if_due(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = BufferedWriter(path, buffer_size=1024, flush_interval=5)
+    with patch("time.time", return_value=writer.last_flush_time + 1):
+        writer.write("line")
+        writer.flush_if_due()
+    assert read(path) == ""
+
+    with patch("time.time", return_value=writer.last_flush_time + 6):
+        writer.flush_if_due()
+    assert read(path) == "line\n"
+    writer.close()
+
+
+def test_close_flushes(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = BufferedWriter(path, buffer_size=1024, flush_interval=60)
+    writer.write("line")
+    writer.close()
+    assert read(path) == "line\n"
+    # closing twice shouldn't fail
+    writer.close()
+
+
+def test_rotation_by_size(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = BufferedWriter(
+        path,
+        buffer_size=1,
+        flush_interval=60,
+        rotation_size=10,
+        rotation_backups=2,
+    )
+    for line in ("first_line", "second_line", "third_line", "fourth_line"):
+        writer.write(line)
+    writer.close()
+
+    assert read(path) == "fourth_line\n"
+    assert read(f"{path}.1") == "third_line\n"
+    assert read(f"{path}.2") == "second_line\n"
+    # only 2 backups are kept
+    assert not os.path.exists(f"{path}.3")
+    assert writer.get_stats()["rotations"] == 3
+
+
+def test_rotation_by_time(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = BufferedWriter(
+        path, buffer_size=1, flush_interval=60, rotation_period=3600
+    )
+    writer.write("old")
+    with patch("time.time", return_value=writer.opened_at + 3601):
+        writer.write("new")
+    writer.close()
+    assert read(f"{path}.1") == "old\n"
+    assert read(path) == "new\n"
+
+
+def test_on_open_is_called_after_rotation(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    on_open = Mock()
+    writer = BufferedWriter(
+        path, buffer_size=1, rotation_size=1, on_open=on_open
+    )
+    writer.write("a")
+    writer.write("b")
+    writer.close()
+    assert on_open.call_count == 2
+    on_open.assert_called_with(path)
+
+
+@pytest.mark.parametrize(
+    "fsync, expected_fsync_calls",
+    [
+        # testcase1: fsync after each flush and on close
+        ("flush", 3),
+        # testcase2: fsync only on close
+        ("rotation", 1),
+        # testcase3: never fsync
+        ("never", 0),
+        # testcase4: invalid policies default to never
+        ("invalid", 0),
+    ],
+)
+def test_fsync_policy(tmp_path, fsync, expected_fsync_calls):
+    path = str(tmp_path / "alerts.log")
+    with patch("os.fsync") as mock_fsync:
+        writer = BufferedWriter(path, buffer_size=1, fsync=fsync)
+        writer.write("a")
+        writer.write("b")
+        writer.close()
+    assert mock_fsync.call_count == expected_fsync_calls
@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/common/performance_profilers/channel_metrics.py"""
+from unittest.mock import patch
+
+from slips_files.common.performance_profilers.channel_metrics import (
+    ChannelMetrics,
+    Histogram,
+    to_prometheus_text,
+)
+
+TIME = "slips_files.common.performance_profilers.channel_metrics.time.time"
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    stats = histogram.to_dict()
+    assert stats["buckets"] == {"1": 2, "5": 3, "+Inf": 4}
+    assert stats["count"] == 4
+    assert stats["sum"] == 14.5
+    assert stats["max"] == 10
+
+
+def test_msgs_are_processed_when_the_next_one_is_received():
+    metrics = ChannelMetrics()
+    with patch(TIME, side_effect=[100, 102, 103]):
+        metrics.msg_received("new_flow", published_at=99)
+        metrics.msg_received("new_dns", published_at=None)
+        metrics.msg_processed()
+
+    stats = metrics.get_stats()
+    assert stats["new_flow"]["received"] == 1
+    assert stats["new_flow"]["processed"] == 1
+    assert stats["new_flow"]["lag"]["sum"] == 1
+    assert stats["new_flow"]["processing_time"]["sum"] == 2
+    assert stats["new_dns"]["processed"] == 1
+    assert stats["new_dns"]["processing_time"]["sum"] == 1
+    # msgs without a publish time have no lag
+    assert stats["new_dns"]["lag"]["count"] == 0
+
+
+def test_to_prometheus_text():
+    metrics = ChannelMetrics()
+    with patch(TIME, side_effect=[100, 100.5]):
+        metrics.msg_received("new_flow", published_at=100)
+        metrics.msg_processed()
+    stats = metrics.get_stats()
+    stats["new_flow"]["backlog"] = 2
+
+    text = to_prometheus_text({"Flow Alerts": stats}, {"new_flow": 3})
+    assert 'slips_channel_published_total{channel="new_flow"} 3' in text
+    assert (
+        'slips_module_received_total{module="Flow Alerts",'
+        'channel="new_flow"} 1' in text
+    )
+    assert (
+        'slips_module_backlog{module="Flow Alerts",channel="new_flow"} 2'
+        in text
+    )
+    assert (
+        "slips_module_processing_time_seconds_bucket"
+        '{module="Flow Alerts",channel="new_flow",le="1"} 1' in text
+    )
+    assert "# TYPE slips_module_lag_seconds histogram" in text
@@ -349,44 +349,122 @@ def test_is_ignored_ip_data_upload(ip_address, expected_result):
     assert conn.is_ignored_ip_data_upload(ip_address) is expected_result
 
 
+def get_upload_flow(uid_, daddr, sbytes, starttime):
+    return Conn(
+        starttime=starttime,
+        uid=uid_,
+        saddr="192.168.1.2",
+        daddr=daddr,
+        dur=1,
+        proto="tcp",
+        appproto="",
+        sport="0",
+        dport="0",
+        spkts=0,
+        dpkts=0,
+        sbytes=sbytes,
+        dbytes=0,
+        smac="",
+        dmac="",
+        state="",
+        history="",
+    )
+
+
+def test_count_sent_bytes():
+    conn = ModuleFactory().create_conn_analyzer_obj()
+    conn.gateway = "192.168.1.1"
+    flows = [
+        get_upload_flow("uid1", "8.8.8.8", 1024, "2023-11-01 12:00:00"),
+        get_upload_flow("uid2", "8.8.8.8", 2048, "2023-11-01 12:02:00"),
+        # no sbytes
+        get_upload_flow("uid3", "8.8.4.4", 0, "2023-11-01 12:03:00"),
+        # the gateway is ignored
+        get_upload_flow("uid4", "192.168.1.1", 2048, "2023-11-01 12:04:00"),
+    ]
+    for flow in flows:
+        conn.count_sent_bytes(profileid, twid, flow)
+
+    bytes_sent = conn.upload_counters[(profileid, twid)]
+    assert dict(bytes_sent.items()) == {
+        "8.8.8.8": (3072, ["uid1", "uid2"], "2023-11-01 12:02:00", 0)
+    }
+
+
 @pytest.mark.parametrize(
-    "all_flows, expected_bytes_sent",
+    "sbytes, expected_call_count",
     [
-        (  # Testcase 1: Normal flows with data
-            {
-                "uid1": {
-                    "daddr": "8.8.8.8",
-                    "sbytes": 1024,
-                    "starttime": "2023-11-01 12:00:00",
-                },
-                "uid2": {
-                    "daddr": "8.8.8.8",
-                    "sbytes": 2048,
-                    "starttime": "2023-11-01 12:02:00",
-                },
-            },
-            {"8.8.8.8": (3072, ["uid1", "uid2"], "2023-11-01 12:02:00")},
-        ),
-        (  # Testcase 2: Flows with no 'sbytes'
-            {
-                "uid1": {
-                    "daddr": "8.8.8.8",
-                    "starttime": "2023-11-01 12:00:00",
-                },
-                "uid2": {
-                    "daddr": "8.8.4.4",
-                    "sbytes": 2048,
-                    "starttime": "2023-11-01 12:02:00",
-                },
-            },
-            {"8.8.4.4": (2048, ["uid2"], "2023-11-01 12:02:00")},
-        ),
+        # Testcase1: Exceeds threshold
+        (600 * 1024 * 1024, 1),
+        # Testcase2: Below threshold
+        (10 * 1024 * 1024, 0),
     ],
 )
-def test_get_sent_bytes(all_flows, expected_bytes_sent):
+def test_detect_data_upload_in_twid(mocker, sbytes, expected_call_count):
     conn = ModuleFactory().create_conn_analyzer_obj()
-    bytes_sent = conn.get_sent_bytes(all_flows)
-    assert bytes_sent == expected_bytes_sent
+    conn.data_exfiltration_threshold = 500
+    mock_set_evidence = mocker.patch(
+        "modules.flowalerts.set_evidence.SetEvidenceHelper.data_exfiltration"
+    )
+    flow = get_upload_flow("uid1", "8.8.8.8", sbytes, "1726249372.312124")
+    conn.count_sent_bytes(profileid, twid, flow)
+
+    conn.detect_data_upload_in_twid(profileid, twid)
+    assert mock_set_evidence.call_count == expected_call_count
+    # the counters of closed tws are dropped
+    assert (profileid, twid) not in conn.upload_counters
+
+
+def test_detect_data_upload_to_a_daddr_seen_after_the_counter_is_full(
+    mocker,
+):
+    conn = ModuleFactory().create_conn_analyzer_obj()
+    conn.data_exfiltration_threshold = 500
+    mock_set_evidence = mocker.patch(
+        "modules.flowalerts.set_evidence.SetEvidenceHelper.data_exfiltration"
+    )
+    ts = "1726249372.312124"
+    for i in range(conn.max_upload_destinations_per_tw):
+        flow = get_upload_flow(
+            f"uid{i}", f"8.8.{i // 256}.{i % 256}", 1024 * 1024, ts
+        )
+        conn.count_sent_bytes(profileid, twid, flow)
+    # 600MBs split into flows smaller than the ones sent to the other ips
+    for i in range(1200):
+        flow = get_upload_flow(f"exfil{i}", "1.2.3.4", 512 * 1024, ts)
+        conn.count_sent_bytes(profileid, twid, flow)
+
+    conn.detect_data_upload_in_twid(profileid, twid)
+    mock_set_evidence.assert_called_once()
+    ip, mbs_uploaded = mock_set_evidence.call_args[0][:2]
+    assert ip == "1.2.3.4"
+    # only the bytes sent to this ip, not the ones it inherited
+    assert mbs_uploaded == utils.convert_to_mb(1200 * 512 * 1024)
+
+
+def test_inherited_bytes_dont_trigger_data_upload_evidence(mocker):
+    conn = ModuleFactory().create_conn_analyzer_obj()
+    conn.data_exfiltration_threshold = 500
+    conn.max_upload_destinations_per_tw = 2
+    mock_set_evidence = mocker.patch(
+        "modules.flowalerts.set_evidence.SetEvidenceHelper.data_exfiltration"
+    )
+    ts = "1726249372.312124"
+    mb = 1024 * 1024
+    conn.count_sent_bytes(
+        profileid, twid, get_upload_flow("uid1", "1.1.1.1", 600 * mb, ts)
+    )
+    conn.count_sent_bytes(
+        profileid, twid, get_upload_flow("uid2", "2.2.2.2", 700 * mb, ts)
+    )
+    # replaces 1.1.1.1 and inherits its 600MBs
+    conn.count_sent_bytes(
+        profileid, twid, get_upload_flow("uid3", "3.3.3.3", 1, ts)
+    )
+
+    conn.detect_data_upload_in_twid(profileid, twid)
+    mock_set_evidence.assert_called_once()
+    assert mock_set_evidence.call_args[0][0] == "2.2.2.2"
 
 
 @pytest.mark.parametrize(
@@ -1123,3 +1201,26 @@ def test_check_connection_to_local_ip(
     )
     conn.check_connection_to_local_ip(twid, flow)
     assert conn.set_evidence.conn_to_private_ip.call_count == expected_calls
+
+
+def test_check_connection_without_dns_resolution_is_deferred_once():
+    conn = ModuleFactory().create_conn_analyzer_obj()
+    conn.should_ignore_conn_without_dns = Mock(return_value=False)
+    conn.is_interface_timeout_reached = Mock(return_value=True)
+    conn.check_if_resolution_was_made_by_different_version = Mock(
+        return_value=False
+    )
+    conn.is_well_known_org = Mock(return_value=False)
+    conn.set_evidence.conn_without_dns = Mock()
+    conn.db.is_ip_resolved.return_value = False
+    flow = Mock(daddr=daddr)
+
+    assert conn.check_connection_without_dns_resolution(profileid, twid, flow)
+    # another conn to the same daddr while the first check is pending
+    assert not conn.check_connection_without_dns_resolution(
+        profileid, twid, flow
+    )
+    conn.set_evidence.conn_without_dns.assert_not_called()
+
+    conn.flowalerts.run_due_checks(run_all=True)
+    conn.set_evidence.conn_without_dns.assert_called_once_with(twid, flow)
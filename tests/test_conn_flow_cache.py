@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/core/database/conn_flow_cache.py"""
+from slips_files.core.database.conn_flow_cache import ConnFlowCache
+
+
+def get_flow(uid: str) -> dict:
+    return {"uid": uid, "sbytes": 10, "dbytes": 20}
+
+
+def test_hit_and_miss():
+    cache = ConnFlowCache()
+    cache.add(get_flow("C1"), "timewindow1")
+    assert cache.get("C1") == get_flow("C1")
+    assert cache.get("C2") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_flows_without_uid_are_ignored():
+    cache = ConnFlowCache()
+    cache.add({"uid": ""}, "timewindow1")
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = ConnFlowCache(maxsize=2)
+    cache.add(get_flow("C1"), "timewindow1")
+    cache.add(get_flow("C2"), "timewindow1")
+    # C1 is now the most recently used
+    cache.get("C1")
+    cache.add(get_flow("C3"), "timewindow1")
+    assert "C2" not in cache
+    assert "C1" in cache
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_only_current_and_previous_timewindows_are_kept():
+    cache = ConnFlowCache()
+    cache.add(get_flow("C1"), "timewindow1")
+    cache.add(get_flow("C2"), "timewindow2")
+    assert "C1" in cache
+
+    cache.add(get_flow("C3"), "timewindow3")
+    assert "C1" not in cache
+    assert "C2" in cache
+    assert "C3" in cache
+
+    # late flows of old tws aren't cached
+    cache.add(get_flow("C4"), "timewindow1")
+    assert "C4" not in cache
+
+
+def test_record_db_lookup():
+    cache = ConnFlowCache()
+    cache.record_db_lookup(True)
+    cache.record_db_lookup(False)
+    cache.record_db_lookup(False)
+    stats = cache.get_stats()
+    assert stats["db_hits"] == 1
+    assert stats["db_misses"] == 2
@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""
+Unit test for slips_files/core/database/contacted_ips_cache.py and
+slips_files/common/data_structures/bloom_filter.py
+"""
+from slips_files.common.data_structures.bloom_filter import BloomFilter
+from slips_files.core.database.contacted_ips_cache import ContactedIPsCache
+
+profileid = "profile_192.168.1.1"
+twid = "timewindow1"
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter(capacity=1000)
+    bloom_filter.update(f"10.0.{i // 256}.{i % 256}" for i in range(1000))
+    assert len(bloom_filter) == 1000
+    assert all(
+        f"10.0.{i // 256}.{i % 256}" in bloom_filter for i in range(1000)
+    )
+    false_positives = sum(
+        f"172.16.{i // 256}.{i % 256}" in bloom_filter for i in range(1000)
+    )
+    assert false_positives < 10
+
+
+def test_add_and_get():
+    cache = ContactedIPsCache()
+    assert cache.get(profileid, twid) is None
+    cache.add(profileid, twid, ["8.8.8.8", "1.1.1.1", ""])
+    assert cache.get(profileid, twid) == {"8.8.8.8", "1.1.1.1"}
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_forget():
+    cache = ContactedIPsCache()
+    cache.add(profileid, twid, ["8.8.8.8"])
+    cache.forget(profileid, twid)
+    assert (profileid, twid) not in cache
+
+
+def test_least_recently_used_tws_are_evicted():
+    cache = ContactedIPsCache(max_timewindows=2)
+    cache.add(profileid, "timewindow1", ["8.8.8.8"])
+    cache.add(profileid, "timewindow2", ["8.8.8.8"])
+    cache.get(profileid, "timewindow1")
+    cache.add(profileid, "timewindow3", ["8.8.8.8"])
+    assert (profileid, "timewindow2") not in cache
+    assert (profileid, "timewindow1") in cache
+
+
+def test_big_tws_are_kept_in_bloom_filters():
+    cache = ContactedIPsCache(max_exact_ips=2, bloom_filter_capacity=100)
+    cache.add(profileid, twid, ["8.8.8.8", "1.1.1.1"])
+    assert isinstance(cache.get(profileid, twid), set)
+
+    cache.add(profileid, twid, ["9.9.9.9"])
+    contacted_ips = cache.get(profileid, twid)
+    assert isinstance(contacted_ips, BloomFilter)
+    assert "8.8.8.8" in contacted_ips
+    assert "9.9.9.9" in contacted_ips
+
+    cache.add(profileid, twid, ["4.4.4.4"])
+    assert "4.4.4.4" in cache.get(profileid, twid)
+    assert cache.get_stats()["bloom_filters"] == 1
@@ -283,3 +283,61 @@ def test_update_max_threat_level(
     assert (
         db.update_max_threat_level(profileid, cur_threat_level) == expected_max
     )
+
+
+def test_msgs_carry_their_publish_time():
+    db = ModuleFactory().create_db_manager_obj(6394, flush_db=True)
+    channel = db.subscribe("new_flow")
+    # the subscribe msg
+    db.get_message(channel, timeout=1)
+    db.publish("new_flow", json.dumps({"flow": {}}))
+    msg = db.get_message(channel, timeout=1)
+    assert msg["data"] == json.dumps({"flow": {}})
+    assert time.time() - msg["published_at"] < 5
+
+
+def test_get_channel_metrics():
+    db = ModuleFactory().create_db_manager_obj(6395, flush_db=True)
+    for _ in range(3):
+        db.publish("new_flow", "msg")
+    db.store_channel_metrics("Flow Alerts", {"new_flow": {"received": 1}})
+    assert db.get_channel_metrics() == {
+        "Flow Alerts": {"new_flow": {"received": 1, "backlog": 2}}
+    }
+
+
+def test_redis_streams():
+    db = ModuleFactory().create_db_manager_obj(6396, flush_db=True)
+    db.rdb.use_redis_streams = True
+    subscription = db.subscribe("new_flow")
+    db.publish("new_flow", "msg")
+    msg = db.get_message(subscription)
+    assert msg["channel"] == "new_flow"
+    assert msg["data"] == "msg"
+    assert db.rdb.get_streams_lag()["new_flow"] == {"MainProcess": 0}
+
+
+def test_set_dns_resolution_invalidates_the_cache_in_one_msg():
+    db = ModuleFactory().create_db_manager_obj(6397, flush_db=True)
+    pubsub = db.rdb.r.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(db.rdb.channels.CACHE_INVALIDATION)
+    db.set_dns_resolution(
+        "example.com",
+        ["1.1.1.1", "2.2.2.2"],
+        time.time(),
+        "uid1",
+        "A",
+        "192.168.1.1",
+        "timewindow1",
+    )
+    msgs = []
+    while msg := pubsub.get_message(timeout=1):
+        msgs.append(json.loads(msg["data"]))
+    assert msgs == [
+        [
+            ["get_dns_resolution", "1.1.1.1"],
+            ["get_ip_info", "1.1.1.1"],
+            ["get_dns_resolution", "2.2.2.2"],
+            ["get_ip_info", "2.2.2.2"],
+        ]
+    ]
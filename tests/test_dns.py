@@ -195,7 +195,7 @@ def test_is_connection_made_by_different_version(
     contacted_ips, other_ip, expected_result
 ):
     dns = ModuleFactory().create_dns_analyzer_obj()
-    dns.db.get_all_contacted_ips_in_profileid_twid.return_value = contacted_ips
+    dns.db.get_contacted_ips.return_value = set(contacted_ips)
     dns.db.get_the_other_ip_version.return_value = other_ip
 
     assert (
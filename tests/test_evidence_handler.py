@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: GPL-2.0-only
 import pytest
 import os
-from unittest.mock import Mock, patch, call
+from unittest.mock import Mock, patch
 
 from slips_files.core.structures.alerts import Alert
 from slips_files.core.structures.evidence import (
@@ -47,6 +47,7 @@ def test_shutdown_gracefully():
     evidence_handler = ModuleFactory().create_evidence_handler_obj()
     evidence_handler.logfile = Mock()
     evidence_handler.jsonfile = Mock()
+    evidence_handler.log_writers_stats = Mock()
 
     evidence_handler.shutdown_gracefully()
 
@@ -54,32 +55,6 @@ def test_shutdown_gracefully():
     evidence_handler.jsonfile.close.assert_called_once()
 
 
-@pytest.mark.parametrize(
-    "profileid, twid, past_alerts, expected_output",
-    [
-        # testcase1: No past alerts
-        ("profile1_192.168.1.1", "timewindow1", {}, []),
-        # testcase2: One past alert
-        (
-            "profile2_10.0.0.1",
-            "timewindow2",
-            {"alert1": '["evidence1", "evidence2"]'},
-            ["evidence1", "evidence2"],
-        ),
-    ],
-)
-def test_get_evidence_that_were_part_of_a_past_alert(
-    profileid, twid, past_alerts, expected_output
-):
-    evidence_handler = ModuleFactory().create_evidence_handler_obj()
-    evidence_handler.db.get_profileid_twid_alerts.return_value = past_alerts
-
-    result = evidence_handler.get_evidence_that_were_part_of_a_past_alert(
-        profileid, twid
-    )
-    assert result == expected_output
-
-
 @pytest.mark.parametrize(
     "profile_ip, timewindow, tw_evidence, block",
     [
@@ -145,18 +120,21 @@ def test_clean_file(output_dir, file_to_clean, file_exists):
     evidence_handler = ModuleFactory().create_evidence_handler_obj()
     with patch("os.path.exists") as mock_exists, patch(
         "builtins.open"
-    ) as mock_open:
+    ) as mock_open, patch(
+        "slips_files.core.evidence_handler.BufferedWriter"
+    ) as mock_writer:
         mock_exists.return_value = file_exists
-        mock_file = Mock()
-        mock_open.return_value = mock_file
 
         result = evidence_handler.clean_file(output_dir, file_to_clean)
 
         expected_path = os.path.join(output_dir, file_to_clean)
         mock_exists.assert_called_once_with(expected_path)
-        mock_open.assert_called_with(expected_path, "a")
-
-        assert result == mock_file
+        if file_exists:
+            mock_open.assert_called_once_with(expected_path, "w")
+        else:
+            mock_open.assert_not_called()
+        assert mock_writer.call_args[0][0] == expected_path
+        assert result == mock_writer.return_value
 
 
 @pytest.mark.parametrize(
@@ -173,9 +151,7 @@ def test_add_to_log_file(data):
     mock_file = Mock()
     evidence_handler.logfile = mock_file
     evidence_handler.add_to_log_file(data)
-    assert mock_file.write.call_count == 2
-    mock_file.write.assert_has_calls([call(data), call("\n")])
-    mock_file.flush.assert_called_once()
+    mock_file.write.assert_called_once_with(data)
 
 
 @pytest.mark.parametrize(
@@ -225,10 +201,10 @@ def test_add_alert_to_json_log_file(
     evidence_handler = ModuleFactory().create_evidence_handler_obj()
     evidence_handler.jsonfile = mock_file
     evidence_handler.idmefv2.convert_to_idmef_alert = Mock(return_value=True)
-    with patch("json.dump") as mock_json_dump:
+    with patch("json.dumps", return_value="{}") as mock_json_dumps:
         evidence_handler.add_alert_to_json_log_file(alert)
-        mock_json_dump.assert_called_once()
-    mock_file.write.assert_any_call("\n")
+        mock_json_dumps.assert_called_once()
+    mock_file.write.assert_called_once_with("{}")
 
 
 def test_show_popup():
@@ -504,3 +480,40 @@ def test_log_alert(
     evidence_handler.add_alert_to_json_log_file.assert_called_once()
     assert flow_datetime in evidence_handler.add_to_log_file.call_args[0][0]
     assert str(twid) in evidence_handler.add_to_log_file.call_args[0][0]
+
+
+def test_get_evidence_for_tw_skips_alerted_evidence():
+    evidence_handler = ModuleFactory().create_evidence_handler_obj()
+    evidence_handler.db.get_profileid_twid_alerts.return_value = {}
+    evidence_handler.db.get_twid_evidence.return_value = {}
+    evidence_handler.db.get_accumulated_threat_level.return_value = 0
+    evidence_handler.db.is_blocked_profile_and_tw.return_value = False
+
+    def get_evidence(evidence_id):
+        return Evidence(
+            evidence_type=EvidenceType.ARP_SCAN,
+            description="",
+            attacker=Attacker(
+                direction="SRC",
+                ioc_type=IoCType.IP,
+                value="192.168.1.1",
+            ),
+            threat_level=ThreatLevel.INFO,
+            profile=ProfileID("192.168.1.1"),
+            timewindow=TimeWindow(1),
+            uid=[],
+            timestamp=datetime.now().strftime("%Y/%m/%d %H:%M:%S.%f%z"),
+            id=evidence_id,
+        )
+
+    evidence_handler.update_accumulated_threat_level(get_evidence("1"), False)
+    evidence_handler.ledger.mark_as_alerted(
+        "profile_192.168.1.1", "timewindow1", ["1"]
+    )
+    evidence_handler.update_accumulated_threat_level(get_evidence("2"), False)
+
+    tw_evidence = evidence_handler.get_evidence_for_tw(
+        "profile_192.168.1.1", "timewindow1"
+    )
+    assert list(tw_evidence.keys()) == ["2"]
+    assert evidence_handler.db.store_processed_evidence.call_count == 2
@@ -0,0 +1,144 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import json
+
+import pytest
+
+from slips_files.common.slips_utils import utils
+from slips_files.core.structures.evidence import (
+    Evidence,
+    ProfileID,
+    EvidenceType,
+    TimeWindow,
+    Attacker,
+    IoCType,
+    Direction,
+    ThreatLevel,
+)
+from tests.module_factory import ModuleFactory
+
+
+def get_evidence(evidence_id: str, twid: int = 1) -> Evidence:
+    return Evidence(
+        evidence_type=EvidenceType.ARP_SCAN,
+        description="ARP scan detected",
+        attacker=Attacker(
+            direction=Direction.SRC,
+            ioc_type=IoCType.IP,
+            value="192.168.1.1",
+        ),
+        threat_level=ThreatLevel.MEDIUM,
+        profile=ProfileID(ip="192.168.1.1"),
+        timewindow=TimeWindow(number=twid),
+        uid=["uid1"],
+        timestamp="2023/04/01 10:00:00.000000+0000",
+        id=evidence_id,
+    )
+
+
+def get_ledger():
+    ledger = ModuleFactory().create_evidence_ledger_obj()
+    ledger.db.get_profileid_twid_alerts.return_value = {}
+    ledger.db.get_twid_evidence.return_value = {}
+    ledger.db.get_accumulated_threat_level.return_value = 0
+    ledger.db.is_blocked_profile_and_tw.return_value = False
+    return ledger
+
+
+@pytest.mark.parametrize(
+    "past_alerts, expected_output",
+    [
+        # testcase1: No past alerts
+        ({}, set()),
+        # testcase2: One past alert
+        (
+            {"alert1": '["evidence1", "evidence2"]'},
+            {"evidence1", "evidence2"},
+        ),
+        # testcase3: Many past alerts
+        (
+            {"alert1": '["evidence1"]', "alert2": '["evidence3"]'},
+            {"evidence1", "evidence3"},
+        ),
+    ],
+)
+def test_get_alerted_evidence_ids(past_alerts, expected_output):
+    ledger = get_ledger()
+    ledger.db.get_profileid_twid_alerts.return_value = past_alerts
+    assert (
+        ledger._get_alerted_evidence_ids("profile_192.168.1.1", "timewindow1")
+        == expected_output
+    )
+
+
+def test_get_loads_from_db_once():
+    ledger = get_ledger()
+    ledger.db.get_accumulated_threat_level.return_value = 2.5
+    ledger.db.is_blocked_profile_and_tw.return_value = True
+
+    tw = ledger.get("profile_192.168.1.1", "timewindow1")
+    ledger.get("profile_192.168.1.1", "timewindow1")
+
+    assert tw.accumulated_threat_level == 2.5
+    assert tw.blocked
+    ledger.db.get_profileid_twid_alerts.assert_called_once()
+    ledger.db.get_accumulated_threat_level.assert_called_once()
+
+
+def test_get_only_loads_processed_evidence():
+    ledger = get_ledger()
+    processed, not_processed = get_evidence("1"), get_evidence("2")
+    ledger.db.get_twid_evidence.return_value = {
+        "1": json.dumps(utils.to_dict(processed)),
+        "2": json.dumps(utils.to_dict(not_processed)),
+    }
+    ledger.db.are_evidence_processed.return_value = [True, False]
+
+    tw = ledger.get("profile_192.168.1.1", "timewindow1")
+    assert list(tw.evidence.keys()) == ["1"]
+
+
+def test_add_evidence():
+    ledger = get_ledger()
+    assert ledger.add_evidence(get_evidence("1"), 0.5) == 0.5
+    assert ledger.add_evidence(get_evidence("2"), 0.25) == 0.75
+    tw = ledger.get("profile_192.168.1.1", "timewindow1")
+    assert set(tw.evidence) == {"1", "2"}
+
+
+def test_mark_as_alerted():
+    ledger = get_ledger()
+    ledger.add_evidence(get_evidence("1"), 0.5)
+    ledger.mark_as_alerted("profile_192.168.1.1", "timewindow1", ["1"])
+    tw = ledger.get("profile_192.168.1.1", "timewindow1")
+    assert tw.accumulated_threat_level == 0
+    assert tw.alerted_evidence_ids == {"1"}
+
+
+def test_get_tw_limits_is_cached():
+    ledger = get_ledger()
+    ledger.db.get_tw_limits.return_value = (10.0, 3610.0)
+    for _ in range(3):
+        limits = ledger.get_tw_limits("profile_192.168.1.1", "timewindow1")
+    assert limits == (10.0, 3610.0)
+    ledger.db.get_tw_limits.assert_called_once()
+
+
+def test_evict():
+    ledger = get_ledger()
+    ledger.add_evidence(get_evidence("1"), 0.5)
+    assert "profile_192.168.1.1_timewindow1" in ledger
+    ledger.evict("profile_192.168.1.1_timewindow1")
+    assert "profile_192.168.1.1_timewindow1" not in ledger
+
+
+def test_least_recently_used_tw_is_evicted():
+    ledger = get_ledger()
+    ledger.max_timewindows = 2
+    ledger.get("profile_192.168.1.1", "timewindow1")
+    ledger.get("profile_192.168.1.1", "timewindow2")
+    # timewindow1 is now the most recently used
+    ledger.get("profile_192.168.1.1", "timewindow1")
+    ledger.get("profile_192.168.1.1", "timewindow3")
+    assert len(ledger) == 2
+    assert "profile_192.168.1.1_timewindow2" not in ledger
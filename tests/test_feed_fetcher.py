@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for modules/update_manager/feed_fetcher.py"""
+import asyncio
+import threading
+import time
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+import pytest
+
+from modules.update_manager.feed_fetcher import FeedFetcher
+
+FEED = b"1.2.3.4,malicious\nexample.com,phishing\n"
+E_TAG = '"v1"'
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.active_requests = 0
+        self.max_active_requests = 0
+        # seconds each response takes
+        self.delay = 0
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active_requests += 1
+            server.max_active_requests = max(
+                server.max_active_requests, server.active_requests
+            )
+        time.sleep(server.delay)
+        try:
+            if self.path == "/missing.txt":
+                self.send_response(404)
+                self.end_headers()
+            elif self.headers.get("If-None-Match") == E_TAG:
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header("ETag", E_TAG)
+                self.send_header("Content-Length", str(len(FEED)))
+                self.end_headers()
+                self.wfile.write(FEED)
+        finally:
+            with server.lock:
+                server.active_requests -= 1
+
+
+@pytest.fixture
+def feed_server():
+    server = FeedServer(("127.0.0.1", 0), FeedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get_url(server, path="/feed.txt"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+async def test_fetch_downloads_feed(feed_server, tmp_path):
+    path = str(tmp_path / "feed.txt")
+    result = await FeedFetcher().fetch(get_url(feed_server), path)
+
+    assert result.status == FeedFetcher.MODIFIED
+    assert result.e_tag == E_TAG
+    assert result.size == len(FEED)
+    assert result.download_time > 0
+    with open(path, "rb") as feed:
+        assert feed.read() == FEED
+
+
+async def test_fetch_not_modified(feed_server, tmp_path):
+    path = tmp_path / "feed.txt"
+    result = await FeedFetcher().fetch(
+        get_url(feed_server), str(path), e_tag=E_TAG
+    )
+    assert result.status == FeedFetcher.NOT_MODIFIED
+    assert not path.exists()
+
+
+async def test_fetch_failed(feed_server, tmp_path):
+    fetcher = FeedFetcher(retries=2)
+    result = await fetcher.fetch(
+        get_url(feed_server, "/missing.txt"), str(tmp_path / "missing.txt")
+    )
+    assert result.status == FeedFetcher.FAILED
+    assert "404" in result.error
+
+
+async def test_concurrent_downloads_per_host_are_capped(feed_server, tmp_path):
+    feed_server.delay = 0.2
+    fetcher = FeedFetcher(max_connections_per_host=2)
+    results = await asyncio.gather(
+        *[
+            fetcher.fetch(
+                get_url(feed_server, f"/feed{i}.txt"),
+                str(tmp_path / f"feed{i}.txt"),
+            )
+            for i in range(5)
+        ]
+    )
+    assert all(result.status == FeedFetcher.MODIFIED for result in results)
+    assert feed_server.max_active_requests == 2
@@ -1,7 +1,12 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from threading import Thread
-from modules.fidesModule.messaging.redis_simplex_queue import RedisSimplexQueue, RedisDuplexQueue
+import time
+from modules.fidesModule.messaging.redis_simplex_queue import (
+    QueueListener,
+    RedisSimplexQueue,
+    RedisDuplexQueue,
+)
 
 @pytest.fixture
 def mock_db():
@@ -39,20 +44,71 @@ def test_listen_blocking(simplex_queue, mock_channels):
 
 def test_listen_non_blocking(simplex_queue, mock_channels):
     on_message = MagicMock()
+    pubsub = mock_channels["receive_channel"]
+    pubsub.get_message.side_effect = [
+        {"data": "message_1"},
+        {"data": "message_2"},
+        None,
+    ] + [None] * 100
 
-    # Mock `run_in_thread` to return a real thread-like object
-    mock_thread = Thread(target=lambda: None)
-    mock_channels["receive_channel"].run_in_thread.return_value = mock_thread
-
-    # Call the listen method
-    thread = simplex_queue.listen(on_message, block=False)
+    thread = simplex_queue.listen(on_message, block=False, timeout=0.01)
 
-    # Assert that the returned thread is a Thread instance
     assert isinstance(thread, Thread)
+    pubsub.subscribe.assert_called_once_with("receive_channel")
+    # the first msg is waited for, the rest are drained without blocking
+    pubsub.get_message.assert_any_call(timeout=0.01)
+    pubsub.get_message.assert_any_call(timeout=0)
+
+    for _ in range(100):
+        if on_message.call_count == 2:
+            break
+        time.sleep(0.01)
+    thread.stop()
+    thread.join()
+    on_message.assert_any_call("message_1")
+    on_message.assert_any_call("message_2")
+
+    metrics = simplex_queue.get_metrics()["receive_channel"]
+    assert metrics["messages"] == 2
+    assert metrics["batches"] == 1
+    assert metrics["max_backlog"] == 2
+
+
+def test_queue_listener_max_batch_size():
+    pubsub = MagicMock()
+    pubsub.get_message.return_value = {"data": "message"}
+    listener = QueueListener(pubsub, MagicMock(), max_batch_size=3)
+    assert len(listener.get_batch()) == 3
+
+
+def test_queue_listener_timeout():
+    pubsub = MagicMock()
+    pubsub.get_message.return_value = None
+    listener = QueueListener(pubsub, MagicMock(), timeout=5)
+    assert listener.get_batch() == []
+    pubsub.get_message.assert_called_once_with(timeout=5)
+
+def test_queue_listener_closes_the_pubsub_when_stopped():
+    pubsub = MagicMock()
+    pubsub.get_message.return_value = None
+    listener = QueueListener(pubsub, MagicMock(), timeout=0.01)
+    listener.start()
+    listener.stop()
+    listener.join()
+    pubsub.close.assert_called_once()
+
+
+def test_stop_process_msg_closes_the_pubsub_once(simplex_queue, mock_channels):
+    pubsub = mock_channels["receive_channel"]
+    pubsub.get_message.side_effect = [{"data": "stop_process"}] + [None] * 100
+
+    thread = simplex_queue.listen(MagicMock(), block=False, timeout=0.01)
+    thread.join(timeout=1)
+
+    assert not thread.is_alive()
+    pubsub.unsubscribe.assert_called_once_with("receive_channel")
+    pubsub.close.assert_called_once()
 
-    # Clean up the created thread to avoid side effects
-    if thread.is_alive():
-        thread.join()
 
 def test_exec_message(simplex_queue):
     on_message = MagicMock()
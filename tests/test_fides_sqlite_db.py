@@ -337,3 +337,70 @@ def test_get_peer_organisations(db):
     assert set(result) == set(
         organisations
     )  # Ensure all organisations are returned, order does not matter
+
+
+def create_peer_trust_data(peer_id, service_history=(), **kwargs):
+    return PeerTrustData(
+        info=PeerInfo(id=peer_id, organisations=["org1"], ip="10.0.0.1"),
+        has_fixed_trust=False,
+        service_trust=kwargs.get("service_trust", 0.5),
+        reputation=0.5,
+        recommendation_trust=0.5,
+        competence_belief=0.5,
+        integrity_belief=0.5,
+        initial_reputation_provided_by_count=1,
+        service_history=list(service_history),
+        recommendation_history=[],
+    )
+
+
+def test_get_peers_trust_data(db):
+    db.query_chunk_size = 2
+    db.store_peers_trust_data(
+        [create_peer_trust_data(f"peer{i}") for i in range(5)]
+    )
+
+    result = db.get_peers_trust_data(
+        ["peer0", "peer3", "peer4", "nonexistent_peer"]
+    )
+
+    assert set(result) == {"peer0", "peer3", "peer4"}
+    assert result["peer3"].info.organisations == ["org1"]
+
+
+def test_store_peer_trust_data_overwrites_old_data(db):
+    history = [
+        ServiceHistoryRecord(satisfaction=0.5, weight=1.0, timestamp=1.0)
+    ]
+    db.store_peer_trust_data(create_peer_trust_data("peer1", history))
+    db.store_peer_trust_data(
+        create_peer_trust_data("peer1", history, service_trust=0.9)
+    )
+
+    result = db.get_peer_trust_data("peer1")
+    assert result.service_trust == 0.9
+    assert len(result.service_history) == 1
+
+
+def test_store_peer_trust_data_keeps_a_bounded_history():
+    db = SQLiteDB(MagicMock(), ":memory:", service_history_max_size=2)
+    history = [
+        ServiceHistoryRecord(satisfaction=0.5, weight=1.0, timestamp=ts)
+        for ts in (1.0, 2.0, 3.0)
+    ]
+    db.store_peer_trust_data(create_peer_trust_data("peer1", history))
+
+    result = db.get_peer_trust_data("peer1")
+    assert [record.timestamp for record in result.service_history] == [
+        2.0,
+        3.0,
+    ]
+
+
+def test_transaction_is_rolled_back_on_error(db):
+    with pytest.raises(ValueError):
+        with db.transaction():
+            db.store_peer_trust_data(create_peer_trust_data("peer1"))
+            raise ValueError
+
+    assert db.get_peer_trust_data("peer1") is None
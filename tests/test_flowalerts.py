@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for modules/flowalerts/flowalerts.py"""
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from tests.module_factory import ModuleFactory
+
+
+@pytest.mark.parametrize(
+    "channel, data, expected_profileid",
+    [
+        (
+            "tw_closed",
+            "profile_192.168.1.1_timewindow1",
+            "profile_192.168.1.1",
+        ),
+        (
+            "new_flow",
+            json.dumps({"profileid": "profile_192.168.1.2", "flow": {}}),
+            "profile_192.168.1.2",
+        ),
+        (
+            "new_software",
+            json.dumps({"sw_flow": {"saddr": "192.168.1.3"}}),
+            "profile_192.168.1.3",
+        ),
+        ("new_flow", json.dumps({"flow": {}}), None),
+    ],
+)
+def test_get_profileid_of_msg(channel, data, expected_profileid):
+    flowalerts = ModuleFactory().create_flowalerts_obj()
+    assert (
+        flowalerts.get_profileid_of_msg(channel, {"data": data})
+        == expected_profileid
+    )
+
+
+def test_profiles_are_partitioned_between_workers():
+    flowalerts = ModuleFactory().create_flowalerts_obj()
+    flowalerts.workers = 3
+    profiles = [f"profile_10.0.0.{i}" for i in range(100)]
+    owners = []
+    for profileid in profiles:
+        owners_of_profile = []
+        for worker_id in range(flowalerts.workers):
+            flowalerts.worker_id = worker_id
+            if flowalerts.is_profile_in_partition(profileid):
+                owners_of_profile.append(worker_id)
+        # each profile is analyzed by exactly 1 worker
+        assert len(owners_of_profile) == 1
+        owners.append(owners_of_profile[0])
+    # all workers get some profiles
+    assert set(owners) == {0, 1, 2}
+
+
+@pytest.mark.parametrize(
+    "worker_id, expected_result",
+    [
+        (0, True),
+        (1, False),
+    ],
+)
+def test_msgs_without_a_profile_go_to_the_first_worker(
+    worker_id, expected_result
+):
+    flowalerts = ModuleFactory().create_flowalerts_obj()
+    flowalerts.workers = 2
+    flowalerts.worker_id = worker_id
+    msg = {"data": json.dumps({"flow": {}})}
+    assert flowalerts.is_msg_in_partition("new_flow", msg) is expected_result
+
+
+def test_get_throughput_report():
+    flowalerts = ModuleFactory().create_flowalerts_obj()
+    fast = Mock()
+    fast.name.return_value = "fast"
+    slow = Mock()
+    slow.name.return_value = "slow"
+    flowalerts.update_throughput(fast, 0.5)
+    flowalerts.update_throughput(fast, 0.5)
+    flowalerts.update_throughput(slow, 4)
+
+    report = flowalerts.get_throughput_report()
+    assert list(report) == ["slow", "fast"]
+    assert report["fast"] == {"msgs": 2, "seconds": 1.0, "msgs_per_second": 2}
@@ -419,7 +419,7 @@ def test_read_configuration_valid(mocker, config_value):
         ),
     ],
 )
-async def test_check_weird_http_method(mocker, flow_name, evidence_expected):
+def test_check_weird_http_method(mocker, flow_name, evidence_expected):
     http_analyzer = ModuleFactory().create_http_analyzer_obj()
     http_analyzer.set_evidence.weird_http_method = Mock()
     mocker.spy(http_analyzer.set_evidence, "weird_http_method")
@@ -442,7 +442,10 @@ async def test_check_weird_http_method(mocker, flow_name, evidence_expected):
         "slips_files.common.slips_utils.utils.get_original_conn_flow"
     ) as mock_get_original_conn_flow:
         mock_get_original_conn_flow.side_effect = [None, {"flow": {}}]
-        await http_analyzer.check_weird_http_method(msg)
+        http_analyzer.check_weird_http_method(msg)
+        # the conn.log flow isn't read yet, the check is deferred
+        http_analyzer.set_evidence.weird_http_method.assert_not_called()
+        http_analyzer.run_due_checks(run_all=True)
 
     if evidence_expected:
         http_analyzer.set_evidence.weird_http_method.assert_called_once()
@@ -510,7 +513,7 @@ def test_check_multiple_empty_connections(
                 resp_fuids="",
             )
             http_analyzer.check_multiple_empty_connections(twid, flow)
-        assert http_analyzer.connections_counter[host] == ([], 0)
+        assert host not in http_analyzer.connections_counter
 
 
 @pytest.mark.parametrize(
@@ -761,7 +764,9 @@ def test_search_http_recognized_flows_for_ts_range(
     # set up the http_recognized_flows and verify the search function
     # returns the correct timestamps
     analyzer = ModuleFactory().create_http_analyzer_obj()
-    analyzer.http_recognized_flows = http_recognized_flows
+    for key, timestamps in http_recognized_flows.items():
+        for ts in timestamps:
+            analyzer.http_recognized_flows.add(key, ts)
     flow = Mock(saddr=flow_info["saddr"], daddr=flow_info["daddr"])
     result = analyzer.search_http_recognized_flows_for_ts_range(
         flow, start, end
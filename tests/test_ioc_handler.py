@@ -89,6 +89,49 @@ def test_give_threat_intelligence(
     assert result == expected_data
 
 
+def test_give_threat_intelligence_dedups_recent_requests(mocker):
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.ti_requests_dedup_interval = 60
+    ioc_handler.recently_asked.policy.ttl = 60
+    ioc_handler.publish = mocker.Mock()
+    args = ("profile_1.1.1.1", "timewindow1", "dstip", 1, "uid", "8.8.8.8")
+
+    ioc_handler.give_threat_intelligence(*args, lookup="8.8.8.8")
+    ioc_handler.give_threat_intelligence(*args, lookup="8.8.8.8")
+    # different IoC
+    ioc_handler.give_threat_intelligence(*args, lookup="9.9.9.9")
+    # same IoC in another tw
+    ioc_handler.give_threat_intelligence(
+        "profile_1.1.1.1",
+        "timewindow2",
+        "dstip",
+        1,
+        "uid",
+        "8.8.8.8",
+        lookup="8.8.8.8",
+    )
+
+    assert ioc_handler.publish.call_count == 3
+    assert ioc_handler.get_suppressed_requests() == {
+        "give_threat_intelligence": 1
+    }
+
+
+def test_give_threat_intelligence_republishes_after_interval(mocker):
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.ti_requests_dedup_interval = 60
+    ioc_handler.recently_asked.policy.ttl = 60
+    ioc_handler.publish = mocker.Mock()
+    args = ("profile_1.1.1.1", "timewindow1", "dstip", 1, "uid", "8.8.8.8")
+    time = mocker.patch("time.time", return_value=1000)
+
+    ioc_handler.give_threat_intelligence(*args, lookup="8.8.8.8")
+    time.return_value += 61
+    ioc_handler.give_threat_intelligence(*args, lookup="8.8.8.8")
+
+    assert ioc_handler.publish.call_count == 2
+
+
 @pytest.mark.parametrize(
     "sha1, expected_result",
     [
@@ -104,11 +147,29 @@ def test_give_threat_intelligence(
 )
 def test_is_blacklisted_ssl(mocker, sha1, expected_result):
     ioc_handler = ModuleFactory().create_ioc_handler_obj()
-    ioc_handler.rcache.hmget.return_value = [expected_result]
+    ioc_handler.rcache.get.return_value = "1"
+    ioc_handler.rcache.hgetall.return_value = (
+        {sha1: expected_result} if expected_result else {}
+    )
     result = ioc_handler.is_blacklisted_ssl(sha1)
     assert result == expected_result
 
 
+def test_fingerprint_feeds_are_loaded_once_per_generation():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.rcache.get.return_value = "1"
+    ioc_handler.rcache.hgetall.return_value = {"ABC123": "info"}
+
+    for _ in range(3):
+        assert ioc_handler.is_blacklisted_ja3("abc123") == "info"
+        assert ioc_handler.is_blacklisted_jarm("def456") is None
+
+    # once per fingerprint feed
+    assert ioc_handler.rcache.hgetall.call_count == 2
+    ioc_handler.rcache.hgetall.assert_any_call(ioc_handler.constants.IOC_JA3)
+    ioc_handler.rcache.hgetall.assert_any_call(ioc_handler.constants.IOC_JARM)
+
+
 @pytest.mark.parametrize(
     "file, expected_file_info",
     [
@@ -261,3 +322,260 @@ def test_set_feed_last_update_time(mocker, file, time, expected_data):
     ioc_handler.rcache.hset.assert_called_with(
         "TI_files_info", file, expected_data_json
     )
+
+
+def test_add_ips_to_ioc_in_chunks():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.bulk_load_chunk_size = 2
+    pipe = ioc_handler.rcache.pipeline.return_value
+    ips = {f"1.1.1.{i}": json.dumps({"source": "feed.txt"}) for i in range(5)}
+    ioc_handler.add_ips_to_ioc(ips)
+
+    assert pipe.hset.call_count == 5
+    # 2 full chunks and the remaining ip
+    assert pipe.execute.call_count == 3
+
+
+def test_add_feed_iocs_only_writes_changes():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    pipe = ioc_handler.rcache.pipeline.return_value
+    unchanged_info = json.dumps({"source": "feed.txt"})
+    changed_info = json.dumps({"source": "feed.txt", "threat_level": "high"})
+    new_info = json.dumps({"source": "feed.txt", "threat_level": "low"})
+    pipe.execute.side_effect = [
+        [
+            # 4.4.4.4 was given in a previous chunk of this update
+            [None, None, None, "digest"],
+            # digests of the previous version of the feed
+            [
+                ioc_handler._get_digest(unchanged_info),
+                "old digest",
+                None,
+                None,
+            ],
+            # the stored info of each ioc
+            [unchanged_info, None, None, None],
+        ],
+        None,
+    ]
+    counts = ioc_handler.add_feed_iocs(
+        "feed.txt",
+        ips={
+            "1.1.1.1": unchanged_info,
+            "2.2.2.2": changed_info,
+            "3.3.3.3": new_info,
+            "4.4.4.4": new_info,
+        },
+    )
+    assert counts == {"added": 1, "changed": 1}
+    pipe.hset.assert_any_call("IoC_ips", "2.2.2.2", changed_info)
+    pipe.hset.assert_any_call("IoC_ips", "3.3.3.3", new_info)
+    written_iocs = [
+        call.args[1]
+        for call in pipe.hset.call_args_list
+        if call.args[0] == "IoC_ips"
+    ]
+    assert written_iocs == ["2.2.2.2", "3.3.3.3"]
+
+
+class FakePipeline:
+    def __init__(self, r):
+        self.r = r
+        self.queued = []
+
+    def __getattr__(self, cmd):
+        return lambda *args: self.queued.append((getattr(self.r, cmd), args))
+
+    def execute(self):
+        results = [cmd(*args) for cmd, args in self.queued]
+        self.queued = []
+        return results
+
+
+class FakeRedis:
+    """the hash and string cmds of redis used to update the feeds"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    def hscan_iter(self, key, count=None):
+        return iter(list(self.data.get(key, {}).items()))
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def incrby(self, key, amount):
+        self.data[key] = int(self.data.get(key) or 0) + amount
+
+    def unlink(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def exists(self, key):
+        return key in self.data
+
+    def rename(self, key, new_key):
+        self.data[new_key] = self.data.pop(key)
+
+
+def update_feed(ioc_handler, feed, ips):
+    ioc_handler.start_feed_update(feed)
+    ioc_handler.add_feed_iocs(
+        feed, ips={ip: json.dumps({"source": feed}) for ip in ips}
+    )
+    ioc_handler.finish_feed_update(feed)
+
+
+def test_ioc_listed_by_two_feeds_is_kept_when_one_drops_it():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.rcache = FakeRedis()
+    update_feed(ioc_handler, "a.txt", ["1.1.1.1"])
+    # b.txt overwrites the source of 1.1.1.1
+    update_feed(ioc_handler, "b.txt", ["1.1.1.1"])
+    # 1.1.1.1 didn't change in a.txt, but it's a.txt's again
+    update_feed(ioc_handler, "a.txt", ["1.1.1.1"])
+    update_feed(ioc_handler, "b.txt", [])
+
+    assert ioc_handler.rcache.hget("IoC_ips", "1.1.1.1") == json.dumps(
+        {"source": "a.txt"}
+    )
+
+
+def test_finish_feed_update_deletes_removed_iocs():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    pipe = ioc_handler.rcache.pipeline.return_value
+    ioc_handler.rcache.hget.return_value = json.dumps({"IoC_ips": 10})
+    ioc_handler.rcache.get.return_value = "20"
+    ioc_handler.rcache.exists.return_value = True
+    members_key = "IoC_feed_members:IoC_ips:feed.txt"
+    ioc_handler.rcache.hscan_iter.return_value = iter(
+        [("1.1.1.1", "digest"), ("2.2.2.2", "digest"), ("3.3.3.3", "d")]
+    )
+
+    def hmget(key, iocs):
+        if key == f"{members_key}:loading":
+            # only 3.3.3.3 is in the new version of the feed
+            return ["digest" if ioc == "3.3.3.3" else None for ioc in iocs]
+        # 2.2.2.2 was overwritten by another feed since
+        return [
+            json.dumps(
+                {"source": "other.txt" if ioc == "2.2.2.2" else "feed.txt"}
+            )
+            for ioc in iocs
+        ]
+
+    ioc_handler.rcache.hmget.side_effect = hmget
+    removed = ioc_handler._finish_feed_update("IoC_ips", "feed.txt")
+
+    assert removed == 2
+    ioc_handler.rcache.hdel.assert_called_once_with("IoC_ips", "1.1.1.1")
+    pipe.rename.assert_called_once_with(f"{members_key}:loading", members_key)
+    ioc_handler.rcache.hset.assert_called_once_with(
+        "TI_feeds_memory", "feed.txt", json.dumps({"IoC_ips": 20})
+    )
+
+
+def test_delete_feed_entries_of_untracked_feed():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    # feeds cached by older versions have no memory info
+    ioc_handler.rcache.hget.return_value = None
+    ioc_handler.rcache.hscan_iter.side_effect = lambda key, count: iter(
+        [
+            ("1.1.1.1", json.dumps({"source": "feed.txt"})),
+            ("2.2.2.2", json.dumps({"source": "other.txt"})),
+        ]
+    )
+    ioc_handler.rcache.hmget.side_effect = lambda key, iocs: [
+        json.dumps({"source": "feed.txt"}) for _ in iocs
+    ]
+    ioc_handler.delete_feed_entries("https://example.com/feed.txt")
+
+    ioc_handler.rcache.hdel.assert_any_call("IoC_ips", "1.1.1.1")
+    ioc_handler.rcache.hdel.assert_called_with("TI_feeds_memory", "feed.txt")
+
+
+def test_get_feeds_memory_usage():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.rcache.hgetall.return_value = {
+        "feed.txt": json.dumps({"IoC_ips": 10, "IoC_domains": 5}),
+    }
+    assert ioc_handler.get_feeds_memory_usage() == {"feed.txt": 15}
+
+
+@pytest.mark.parametrize(
+    "domain, expected_result",
+    [
+        # Testcase 1: exact match
+        ("example.com", ({"source": "feed1"}, False)),
+        # Testcase 2: subdomain match
+        ("www.example.com", ({"source": "feed1"}, True)),
+        # Testcase 3: no match
+        ("example.org", (False, False)),
+    ],
+)
+def test_is_blacklisted_domain(domain, expected_result):
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.rcache.get.return_value = "1"
+    ioc_handler.rcache.hgetall.return_value = {
+        "example.com": json.dumps({"source": "feed1"})
+    }
+    assert ioc_handler.is_blacklisted_domain(domain) == expected_result
+
+
+def test_is_known_fp_md5_hash():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.rcache.get.return_value = "1"
+    ioc_handler.rcache.hgetall.return_value = {"abc123": "desc"}
+    assert ioc_handler.is_known_fp_md5_hash("abc123") == "desc"
+    assert ioc_handler.is_known_fp_md5_hash("def456") is None
+
+
+def test_ioc_snapshot_is_reloaded_on_new_generation(mocker):
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.rcache.get.return_value = "1"
+    ioc_handler.rcache.hgetall.return_value = {
+        "example.com": json.dumps({"source": "feed1"})
+    }
+    time = mocker.patch("time.time", return_value=1000)
+    assert ioc_handler.is_blacklisted_domain("example.com")[0]
+
+    # another process loaded a new version of the feeds
+    ioc_handler.rcache.get.return_value = "2"
+    ioc_handler.rcache.hgetall.return_value = {}
+    # the generation isn't checked again before the interval passes
+    assert ioc_handler.is_blacklisted_domain("example.com")[0]
+
+    time.return_value += ioc_handler.ioc_snapshot_check_interval
+    assert ioc_handler.is_blacklisted_domain("example.com") == (
+        False,
+        False,
+    )
+    assert ioc_handler.rcache.hgetall.call_count == 2
+
+
+def test_publish_ti_feeds_generation():
+    ioc_handler = ModuleFactory().create_ioc_handler_obj()
+    ioc_handler.ioc_snapshot = snapshot = object()
+    ioc_handler.rcache.incr.return_value = 2
+
+    assert ioc_handler.publish_ti_feeds_generation() == 2
+    assert ioc_handler.ioc_snapshot is not snapshot
+    ioc_handler.rcache.incr.assert_called_once_with(
+        ioc_handler.constants.TI_FEEDS_GENERATION
+    )
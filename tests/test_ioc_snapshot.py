@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/common/data_structures/ioc_snapshot.py"""
+from unittest.mock import Mock
+
+import pytest
+
+from slips_files.common.data_structures.ioc_snapshot import IoCSnapshot
+
+
+def create_snapshot(domains=None, hashes=None):
+    return IoCSnapshot(
+        1,
+        {
+            "domains": Mock(return_value=domains or {}),
+            "known_fp_md5": Mock(return_value=hashes or {}),
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "domain, expected_result",
+    [
+        # Testcase 1: exact match
+        ("example.com", ("info1", False)),
+        # Testcase 2: subdomain of a blacklisted domain
+        ("www.example.com", ("info1", True)),
+        # Testcase 3: case and trailing dot are ignored
+        ("WWW.Example.COM.", ("info1", True)),
+        # Testcase 4: exact match of a blacklisted subdomain
+        ("mail.google.com", ("info2", False)),
+        # Testcase 5: parent of a blacklisted domain
+        ("google.com", (None, False)),
+        # Testcase 6: not blacklisted
+        ("example.org", (None, False)),
+        # Testcase 7: empty domain
+        ("", (None, False)),
+    ],
+)
+def test_match_domain(domain, expected_result):
+    snapshot = create_snapshot(
+        domains={"Example.com": "info1", "mail.google.com.": "info2"}
+    )
+    assert snapshot.match_domain(domain) == expected_result
+
+
+def test_match_hash():
+    snapshot = create_snapshot(hashes={"ABCDEF\n": "desc"})
+    assert snapshot.match_hash("known_fp_md5", "abcdef") == "desc"
+    assert snapshot.match_hash("known_fp_md5", "123456") is None
+    assert snapshot.match_hash("known_fp_md5", None) is None
+
+
+def test_iocs_are_loaded_once_per_type():
+    snapshot = create_snapshot(domains={"example.com": "info"})
+    snapshot.match_domain("a.com")
+    snapshot.match_domain("b.com")
+
+    snapshot.loaders["domains"].assert_called_once()
+    snapshot.loaders["known_fp_md5"].assert_not_called()
+    assert snapshot.get_stats() == {"domains": 1}
@@ -0,0 +1,166 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+import json
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from slips_files.core.database.lookup_cache import (
+    LookupCache,
+    TTLCache,
+    CachePolicy,
+    MISSING,
+)
+from slips_files.core.database.redis_db.constants import Channels
+
+
+def get_lookup_cache(port: int) -> LookupCache:
+    rdb = Mock()
+    rdb.redis_port = port
+    rdb.channels = Channels()
+    return LookupCache(rdb)
+
+
+def test_ttl_cache_hit_and_miss():
+    cache = TTLCache(CachePolicy(maxsize=10, ttl=60))
+    assert cache.get("1.1.1.1") is MISSING
+    cache.set("1.1.1.1", {"asn": "google"})
+    assert cache.get("1.1.1.1") == {"asn": "google"}
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_ttl_cache_expiry():
+    cache = TTLCache(CachePolicy(maxsize=10, ttl=60))
+    cache.set("key", "value")
+    with patch("time.time", return_value=cache.entries["key"][0] + 1):
+        assert cache.get("key") is MISSING
+    assert "key" not in cache.entries
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(CachePolicy(maxsize=2, ttl=60))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # a is now the most recently used
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get_stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize(
+    "cache_falsy, value, expected_size",
+    [
+        (True, None, 1),
+        (False, None, 0),
+        (False, "192.168.1.1", 1),
+    ],
+)
+def test_ttl_cache_falsy_values(cache_falsy, value, expected_size):
+    cache = TTLCache(CachePolicy(maxsize=10, ttl=60, cache_falsy=cache_falsy))
+    cache.set("key", value)
+    assert len(cache.entries) == expected_size
+
+
+def test_ttl_cache_invalidate():
+    cache = TTLCache(CachePolicy(maxsize=10, ttl=60))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is MISSING
+    assert cache.get("b") == 2
+    cache.invalidate()
+    assert cache.entries == {}
+
+
+def test_one_instance_per_port_per_process():
+    assert get_lookup_cache(7001) is get_lookup_cache(7001)
+    assert get_lookup_cache(7001) is not get_lookup_cache(7002)
+
+
+def test_get_only_calls_the_loader_once():
+    lookup_cache = get_lookup_cache(7003)
+    loader = Mock(return_value={"geocountry": "CZ"})
+    for _ in range(3):
+        ip_info = lookup_cache.get("get_ip_info", loader, "1.1.1.1")
+        # modifying the returned value shouldn't modify the cache
+        ip_info["geocountry"] = "modified"
+
+    loader.assert_called_once_with("1.1.1.1")
+    assert lookup_cache.get("get_ip_info", loader, "1.1.1.1") == {
+        "geocountry": "CZ"
+    }
+    # the invalidation listener is started on first use
+    lookup_cache.rdb.r.pubsub.return_value.run_in_thread.assert_called_once()
+
+
+def test_invalidation_msg():
+    lookup_cache = get_lookup_cache(7004)
+    loader = Mock(side_effect=["aa:bb", "cc:dd"])
+    lookup_cache.get("get_mac_vendor_from_profile", loader, "profile_1")
+    ip_info_loader = Mock(side_effect=[{"asn": 1}, {"asn": 2}])
+    lookup_cache.get("get_ip_info", ip_info_loader, "8.8.8.8")
+    # several lookups are invalidated in one msg
+    lookup_cache._handle_invalidation(
+        {
+            "data": json.dumps(
+                [
+                    ["get_mac_vendor_from_profile", "profile_1"],
+                    ["get_ip_info", "8.8.8.8"],
+                ]
+            )
+        }
+    )
+    assert (
+        lookup_cache.get("get_mac_vendor_from_profile", loader, "profile_1")
+        == "cc:dd"
+    )
+    assert lookup_cache.get("get_ip_info", ip_info_loader, "8.8.8.8") == {
+        "asn": 2
+    }
+
+
+def test_invalidate_in_this_process():
+    lookup_cache = get_lookup_cache(7005)
+    loader = Mock(return_value=(1.0, 3601.0))
+    lookup_cache.get("get_tw_limits", loader, "profile_1", "timewindow1")
+    LookupCache.invalidate_in_this_process(
+        7005, "get_tw_limits", ["profile_1", "timewindow1"]
+    )
+    lookup_cache.get("get_tw_limits", loader, "profile_1", "timewindow1")
+    assert loader.call_count == 2
+
+
+def test_value_invalidated_while_loading_isnt_cached():
+    lookup_cache = get_lookup_cache(7006)
+
+    def loader(ip):
+        # another process modifies the ip info while we're reading it
+        lookup_cache.invalidate("get_ip_info", ip)
+        return {"stale": True}
+
+    lookup_cache.get("get_ip_info", loader, "1.1.1.1")
+    assert lookup_cache.get_cached("get_ip_info", "1.1.1.1") is MISSING
+
+
+def test_listener_error_disables_the_cache():
+    lookup_cache = get_lookup_cache(7007)
+    loader = Mock(return_value="1.1.1.1")
+    lookup_cache.get("get_gateway_ip", loader)
+    lookup_cache._handle_listener_error(Exception(), Mock(), Mock())
+    lookup_cache.get("get_gateway_ip", loader)
+    lookup_cache.get("get_gateway_ip", loader)
+    assert loader.call_count == 3
+
+
+def test_stats_are_stored_periodically():
+    lookup_cache = get_lookup_cache(7008)
+    lookup_cache.last_stats_time = 0
+    lookup_cache.get("get_gateway_ip", Mock(return_value="1.1.1.1"))
+    lookup_cache.rdb.store_lookup_cache_stats.assert_called_once()
+    pid, stats = lookup_cache.rdb.store_lookup_cache_stats.call_args[0]
+    assert pid == os.getpid()
+    assert "get_gateway_ip" in stats
@@ -1,5 +1,7 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
+import json
+
 import pytest
 from unittest.mock import (
     patch,
@@ -31,9 +33,10 @@ def test_set_analysis_end_date(
         enable_metadata
     )
 
-    utils.convert_format = Mock(return_value=expected_end_date)
-
-    with patch("builtins.open", create=True) as mock_open:
+    with (
+        patch.object(utils, "convert_format", return_value=expected_end_date),
+        patch("builtins.open", create=True) as mock_open,
+    ):
         result = metadata_manager.set_analysis_end_date("dummy_end_date")
 
         assert result == expected_end_date
@@ -199,3 +202,22 @@ def test_update_slips_stats_in_the_db(
         metadata_manager.main.db.set_slips_internal_time.call_args_list
         == expected_set_slips_internal_time_call_args
     )
+
+
+def test_set_startup_phases(tmp_path):
+    metadata_manager = ModuleFactory().create_metadata_manager_obj()
+    metadata_manager.enable_metadata = True
+    metadata_manager.info_path = str(tmp_path / "info.txt")
+    phases = {"first_flow_processed": 1.5, "modules_started": 0.5}
+    metadata_manager.main.db.get_startup_phases.return_value = phases
+
+    assert metadata_manager.set_startup_phases() == phases
+    metadata_manager.main.db.set_input_metadata.assert_called_once_with(
+        {"startup_phases": json.dumps(phases)}
+    )
+    with open(metadata_manager.info_path) as f:
+        assert f.read() == (
+            "Startup phases (seconds since slips started):\n"
+            "\tmodules_started: 0.5\n"
+            "\tfirst_flow_processed: 1.5\n"
+        )
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: GPL-2.0-only
 import pytest
 from unittest.mock import Mock, patch
+from managers.module_launcher import ModuleLauncher
 from managers.process_manager import ProcessManager
 from tests.module_factory import ModuleFactory
 from slips_files.common.slips_utils import utils
@@ -241,10 +242,10 @@ def test_get_analysis_time(
     end_date_str, start_time_str, expected_analysis_time
 ):
     process_manager = ModuleFactory().create_process_manager_obj()
-    utils.convert_format = Mock(return_value=end_date_str)
     process_manager.main.db.get_slips_start_time.return_value = start_time_str
 
-    analysis_time = process_manager.get_analysis_time()
+    with patch.object(utils, "convert_format", return_value=end_date_str):
+        analysis_time = process_manager.get_analysis_time()
 
     assert analysis_time == (expected_analysis_time, end_date_str)
 
@@ -509,3 +510,150 @@ def test_start_update_manager(
     )
     assert mock_update_manager.print.called is print_called
     assert mock_asyncio_run.called is asyncio_called
+
+
+def test_get_module_manifest(tmp_path):
+    process_manager = ModuleFactory().create_process_manager_obj()
+    path = tmp_path / "dummy.py"
+    path.write_text(
+        "import some_heavy_dependency\n"
+        "class Helper:\n"
+        "    name = 'not a module'\n"
+        "class Dummy(IModule):\n"
+        "    name = 'Dummy'\n"
+        "    description = ('Detects '\n"
+        "                   'dummies')\n"
+    )
+    assert process_manager.get_module_manifest(str(path)) == {
+        "class": "Dummy",
+        "name": "Dummy",
+        "description": "Detects dummies",
+    }
+
+
+def test_get_modules_reads_manifests():
+    process_manager = ModuleFactory().create_process_manager_obj()
+    process_manager.modules_to_ignore = ["template"]
+    modules, failed = process_manager.get_modules()
+    assert failed == 0
+    assert "Template" not in modules
+    assert modules["Threat Intelligence"] == {
+        "module": "modules.threat_intelligence.threat_intelligence",
+        "class_name": "ThreatIntel",
+        "description": "Check if the source IP or destination IP"
+        " are in a malicious list of IPs",
+    }
+    assert list(modules)[0] == "Blocking"
+
+
+def test_load_modules_waits_for_modules_to_be_ready():
+    process_manager = ModuleFactory().create_process_manager_obj()
+    process_manager.get_modules = Mock(
+        return_value=(
+            {
+                "ARP": {
+                    "module": "modules.arp.arp",
+                    "class_name": "ARP",
+                    "description": "Detect ARP attacks",
+                }
+            },
+            0,
+        )
+    )
+    process_manager.print_started_module = Mock()
+    with patch("managers.process_manager.ModuleLauncher") as mock_launcher:
+        mock_launcher.return_value.pid = 123
+        mock_launcher.return_value.name = "ARP"
+        mock_launcher.return_value.failed.is_set.return_value = False
+        process_manager.load_modules()
+
+    launcher = mock_launcher.return_value
+    assert mock_launcher.call_args.args[:3] == (
+        "ARP",
+        "modules.arp.arp",
+        "ARP",
+    )
+    launcher.start.assert_called_once()
+    launcher.ready.wait.assert_called_once()
+    process_manager.main.db.store_pid.assert_called_once_with("ARP", 123)
+
+
+def test_load_modules_reports_modules_that_failed_to_start():
+    process_manager = ModuleFactory().create_process_manager_obj()
+    process_manager.get_modules = Mock(
+        return_value=(
+            {
+                "ARP": {
+                    "module": "modules.arp.arp",
+                    "class_name": "ARP",
+                    "description": "Detect ARP attacks",
+                }
+            },
+            1,
+        )
+    )
+    process_manager.print_started_module = Mock()
+    with patch("managers.process_manager.ModuleLauncher") as mock_launcher:
+        mock_launcher.return_value.pid = 123
+        mock_launcher.return_value.name = "ARP"
+        mock_launcher.return_value.failed.is_set.return_value = True
+        assert process_manager.load_modules() == []
+
+    process_manager.print_started_module.assert_not_called()
+    process_manager.main.db.delete_pid.assert_called_once_with("ARP")
+    # the one that failed to be read and the one that failed to start
+    assert process_manager.failed_to_load_modules == 2
+
+
+def test_module_launcher_imports_module_in_its_process():
+    module_class = Mock()
+    launcher = ModuleLauncher(
+        "ARP", "modules.arp.arp", "ARP", Mock(), "output", 6379, Mock()
+    )
+    with patch(
+        "managers.module_launcher.importlib.import_module",
+        return_value=Mock(ARP=module_class),
+    ) as mock_import:
+        launcher.run()
+
+    mock_import.assert_called_once_with("modules.arp.arp")
+    module = module_class.return_value
+    module.db.set_module_startup_times.assert_called_once()
+    module.run.assert_called_once()
+    assert launcher.ready.is_set()
+    assert not launcher.failed.is_set()
+
+
+def test_module_launcher_import_error():
+    launcher = ModuleLauncher(
+        "ARP", "modules.arp.arp", "ARP", Mock(), "output", 6379, Mock()
+    )
+    with patch(
+        "managers.module_launcher.importlib.import_module",
+        side_effect=ImportError("No module named 'scapy'"),
+    ):
+        launcher.run()
+    assert launcher.ready.is_set()
+    assert launcher.failed.is_set()
+
+
+@pytest.mark.parametrize(
+    "module_name, workers, expected_workers",
+    [
+        # modules that don't support workers
+        ("ARP", 3, [("ARP", {})]),
+        ("Flow Alerts", 1, [("Flow Alerts", {})]),
+        (
+            "Flow Alerts",
+            2,
+            [
+                ("Flow Alerts", {"worker_id": 0, "workers": 2}),
+                ("Flow Alerts 1", {"worker_id": 1, "workers": 2}),
+            ],
+        ),
+    ],
+)
+def test_get_module_workers(module_name, workers, expected_workers):
+    process_manager = ModuleFactory().create_process_manager_obj()
+    process_manager.main.conf.flowalerts_workers.return_value = workers
+    assert process_manager.get_module_workers(module_name) == expected_workers
@@ -569,6 +569,7 @@ def test_shutdown_gracefully(monkeypatch):
     profiler = ModuleFactory().create_profiler_obj()
     profiler.print = Mock()
     profiler.mark_process_as_done_processing = Mock()
+    profiler.db.get_suppressed_requests.return_value = {}
     profiler.rec_lines = 100
 
     # monkeypatch.setattr(profiler, "print", Mock())
@@ -52,11 +52,12 @@ def test_log_redis_server_pid_normal_ports(
     redis_manager.main.args.daemon = is_daemon
     redis_manager.main.args.save = save_db
     redis_manager.remove_old_logline = Mock()
-    slips_files.common.slips_utils.utils.convert_format = Mock(
-        return_value="Date"
-    )
-
     with (
+        patch.object(
+            slips_files.common.slips_utils.utils,
+            "convert_format",
+            return_value="Date",
+        ),
         patch("builtins.open", mock_open()) as mock_file,
         patch("os.getpid", return_value="os_pid"),
     ):
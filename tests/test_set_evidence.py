@@ -1463,7 +1463,7 @@ def test_malicious_ja3s(attacker_ip, threat_level, profile_ip, ja3s):
     set_ev.malicious_ja3s(
         twid="timewindow9",
         flow=flow,
-        malicious_ja3_dict=malicious_ja3_dict,
+        ja3s_info=malicious_ja3_dict[ja3s],
     )
 
     assert set_ev.db.set_evidence.call_count == 2
@@ -1531,7 +1531,7 @@ def test_malicious_ja3(attacker_ip, threat_level, description, tags, ja3):
     set_ev.malicious_ja3(
         twid="timewindow10",
         flow=flow,
-        malicious_ja3_dict=malicious_ja3_dict,
+        ja3_info=malicious_ja3_dict[ja3],
     )
 
     assert set_ev.db.set_evidence.call_count == 1
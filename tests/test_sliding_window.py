@@ -0,0 +1,74 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/common/data_structures/sliding_window.py"""
+import pytest
+
+from slips_files.common.data_structures.sliding_window import (
+    SlidingWindowCounter,
+)
+
+
+@pytest.mark.parametrize(
+    "timestamps, expected_count",
+    [
+        # all within the window
+        ([0, 5, 10], 3),
+        # the first one is out of the window of the last one
+        ([0, 6, 11], 2),
+        # out of order, 3 is still within the window of 12
+        ([12, 3, 5], 3),
+    ],
+)
+def test_add(timestamps, expected_count):
+    window = SlidingWindowCounter(window=10)
+    for ts in timestamps:
+        count = window.add("key", ts)
+    assert count == expected_count
+    assert window.count("key") == expected_count
+
+
+def test_values_are_sorted_by_timestamp():
+    window = SlidingWindowCounter(window=10)
+    window.add("key", 2, "uid2")
+    window.add("key", 1, "uid1")
+    window.add("key", 3, "uid3")
+    assert window.get_values("key") == ["uid1", "uid2", "uid3"]
+
+
+def test_max_entries_per_key():
+    window = SlidingWindowCounter(window=10, max_entries_per_key=2)
+    window.add("key", 1, "uid1")
+    window.add("key", 2, "uid2")
+    window.add("key", 3, "uid3")
+    assert window.get_values("key") == ["uid2", "uid3"]
+    # older than all the kept entries
+    window.add("key", 0, "uid0")
+    assert window.get_values("key") == ["uid2", "uid3"]
+    assert window.get_stats()["dropped"] == 2
+
+
+def test_least_recently_updated_keys_are_evicted():
+    window = SlidingWindowCounter(window=10, max_keys=2)
+    window.add("a", 1)
+    window.add("b", 1)
+    window.add("a", 2)
+    window.add("c", 1)
+    assert "b" not in window
+    assert "a" in window
+    assert window.get_stats()["evicted_keys"] == 1
+
+
+def test_get_timestamps_in_range():
+    window = SlidingWindowCounter(window=100)
+    for ts in (1.0, 2.0, 3.0, 4.0, 5.0):
+        window.add("key", ts)
+    assert window.get_timestamps_in_range("key", 2.0, 4.0) == [2.0, 3.0, 4.0]
+    assert window.get_timestamps_in_range("other", 1.0, 5.0) == []
+
+
+def test_reset():
+    window = SlidingWindowCounter(window=10)
+    window.add("key", 1)
+    window.reset("key")
+    assert window.count("key") == 0
+    assert window.get_stats()["entries"] == 0
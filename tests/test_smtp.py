@@ -42,7 +42,6 @@ def test_check_smtp_bruteforce(timestamps, expected_call_count):
     mock_set_evidence = MagicMock()
     smtp.set_evidence.smtp_bruteforce = mock_set_evidence
 
-    smtp.smtp_bruteforce_cache = {profileid: ([], [])}
     for i, ts in enumerate(timestamps):
         flow = SMTP(
             starttime=ts,
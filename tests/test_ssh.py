@@ -12,7 +12,6 @@ from unittest.mock import (
 )
 from unittest.mock import MagicMock
 import pytest
-from tests.common_test_utils import get_mock_coro
 
 # dummy params used for testing
 profileid = "profile_192.168.1.1"
@@ -42,7 +41,7 @@ daddr = "192.168.1.2"
         ("some_other_value", False, True),
     ],
 )
-async def test_check_successful_ssh(
+def test_check_successful_ssh(
     mocker, auth_success, expected_zeek_evidence, expected_called_slips
 ):
     ssh = ModuleFactory().create_ssh_analyzer_obj()
@@ -73,7 +72,11 @@ async def test_check_successful_ssh(
         "slips_files.common.slips_utils.utils.get_original_conn_flow"
     ) as mock_get_original_conn_flow:
         mock_get_original_conn_flow.side_effect = [None, {"flow": {}}]
-        await ssh.check_successful_ssh(twid, flow)
+        ssh.check_successful_ssh(twid, flow)
+        # the conn.log flow isn't read yet, the check is deferred
+        assert not mock_set_evidence_ssh_successful_by_zeek.called
+        assert not mock_detect_slips.called
+        ssh.flowalerts.run_due_checks(run_all=True)
 
     assert (
         mock_set_evidence_ssh_successful_by_zeek.called
@@ -117,7 +120,6 @@ def test_check_ssh_password_guessing(auth_success, expected_call_count):
         )
         ssh.check_ssh_password_guessing(profileid, twid, flow)
     assert mock_set_evidence.call_count == expected_call_count
-    ssh.password_guessing_cache = {}
 
 
 @patch("slips_files.common.parsers.config_parser.ConfigParser")
@@ -198,7 +200,7 @@ async def test_analyze_no_message():
 @pytest.mark.parametrize("auth_success", ["true", "false"])
 async def test_analyze_with_message(auth_success):
     ssh = ModuleFactory().create_ssh_analyzer_obj()
-    ssh.check_successful_ssh = get_mock_coro(True)
+    ssh.check_successful_ssh = MagicMock()
     ssh.check_ssh_password_guessing = MagicMock()
     flow = SSH(
         starttime="1726655400.0",
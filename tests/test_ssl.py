@@ -105,10 +105,11 @@ def test_detect_malicious_ja3(
         "modules.flowalerts.set_evidence.SetEvidenceHelper.malicious_ja3s"
     )
 
-    ssl.db.get_all_blacklisted_ja3.return_value = {
+    malicious_ja3_dict = {
         "malicious_ja3": "Malicious JA3",
         "malicious_ja3s": "Malicious JA3S",
     }
+    ssl.db.is_blacklisted_ja3.side_effect = malicious_ja3_dict.get
     flow = SSL(
         starttime="1726593782.8840969",
         uid="123",
@@ -661,7 +662,9 @@ def test_search_ssl_recognized_flows_for_ts_range(
     ssl_recognized_flows, flow, start, end, expected
 ):
     ssl = ModuleFactory().create_ssl_analyzer_obj()
-    ssl.ssl_recognized_flows = ssl_recognized_flows
+    for key, timestamps in ssl_recognized_flows.items():
+        for ts in timestamps:
+            ssl.ssl_recognized_flows.add(key, ts)
     flow = Mock(saddr=flow["saddr"], daddr=flow["daddr"])
     result = ssl.search_ssl_recognized_flows_for_ts_range(flow, start, end)
     assert result == expected
@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for modules/exporting_alerts/stix_exporter.py"""
+import json
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from tests.module_factory import ModuleFactory
+
+
+def test_add_to_stix_file_doesnt_write_to_disk(tmp_path):
+    stix = ModuleFactory().create_stix_exporter_obj(str(tmp_path))
+    assert stix.add_to_stix_file(("PortScan", "1.2.3.4"))
+    assert len(stix.pending_indicators) == 1
+    assert not os.path.exists(stix.stix_filename)
+
+
+@pytest.mark.parametrize(
+    "first, duplicate",
+    [
+        # Testcase 1: ip
+        ("1.2.3.4", "1.2.3.4"),
+        # Testcase 2: domain with different case and a trailing dot
+        ("example.com", "Example.COM."),
+        # Testcase 3: url
+        ("http://example.com/x.exe", "http://example.com/x.exe"),
+    ],
+)
+def test_add_to_stix_file_skips_duplicates(tmp_path, first, duplicate):
+    stix = ModuleFactory().create_stix_exporter_obj(str(tmp_path))
+    stix.add_to_stix_file(("ThreatIntelligence", first))
+    stix.add_to_stix_file(("ThreatIntelligence", duplicate))
+    assert len(stix.pending_indicators) == 1
+
+
+def test_write_stix_file(tmp_path):
+    stix = ModuleFactory().create_stix_exporter_obj(str(tmp_path))
+    stix.add_to_stix_file(("PortScan", "1.2.3.4"))
+    stix.add_to_stix_file(("ThreatIntelligence", "example.com"))
+
+    bundle: str = stix.write_stix_file()
+
+    with open(stix.stix_filename) as stix_file:
+        assert stix_file.read() == bundle
+    indicators = json.loads(bundle)["objects"]
+    assert [indicator["pattern"] for indicator in indicators] == [
+        "[ip-addr:value = '1.2.3.4']",
+        "[domain-name:value = 'example.com']",
+    ]
+    assert stix.pending_indicators == []
+    assert not os.path.exists(f"{stix.stix_filename}.tmp")
+
+
+def test_push(tmp_path):
+    stix = ModuleFactory().create_stix_exporter_obj(str(tmp_path))
+    stix.export = Mock(return_value=True)
+    # nothing to push
+    assert stix.push() is None
+    stix.export.assert_not_called()
+
+    stix.add_to_stix_file(("PortScan", "1.2.3.4"))
+    assert stix.push()
+    stix.export.assert_called_once()
+    assert not os.path.exists(stix.stix_filename)
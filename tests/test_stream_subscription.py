@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/core/database/redis_db/stream_subscription.py"""
+from unittest.mock import Mock
+
+import pytest
+import redis
+
+from slips_files.core.database.redis_db.stream_subscription import (
+    StreamSubscription,
+)
+
+
+def create_subscription(batches, batch_size=2):
+    """
+    :param batches: the msgs returned by each call to xreadgroup
+    """
+    r = Mock()
+    r.xreadgroup.side_effect = [
+        [["new_flow_stream", batch]] if batch else [] for batch in batches
+    ]
+    return StreamSubscription(r, "new_flow", "Flow Alerts", batch_size)
+
+
+def get_entry(msg_id, data):
+    return msg_id, {"data": data, "published_at": "1.5"}
+
+
+def test_group_is_created_once():
+    subscription = create_subscription([])
+    subscription.r.xgroup_create.assert_called_once_with(
+        "new_flow_stream", "Flow Alerts", id="$", mkstream=True
+    )
+
+    r = Mock()
+    r.xgroup_create.side_effect = redis.exceptions.ResponseError(
+        "BUSYGROUP Consumer Group name already exists"
+    )
+    # a restarted module reuses its group
+    StreamSubscription(r, "new_flow", "Flow Alerts")
+
+    r.xgroup_create.side_effect = redis.exceptions.ResponseError("WRONGTYPE")
+    with pytest.raises(redis.exceptions.ResponseError):
+        StreamSubscription(r, "new_flow", "Flow Alerts")
+
+
+def test_msgs_are_read_in_batches_and_acked_per_batch():
+    subscription = create_subscription(
+        [
+            # no unacked msgs from before
+            [],
+            [get_entry("1-0", "msg1"), get_entry("2-0", "msg2")],
+            [get_entry("3-0", "msg3")],
+        ]
+    )
+    assert subscription.get_message() is None
+    msg = subscription.get_message()
+    assert msg == {
+        "type": "message",
+        "pattern": None,
+        "channel": "new_flow",
+        "data": "msg1",
+        "published_at": 1.5,
+    }
+    assert subscription.get_message()["data"] == "msg2"
+    # the whole batch was read from redis at once
+    assert subscription.r.xreadgroup.call_count == 2
+    subscription.r.xack.assert_not_called()
+
+    assert subscription.get_message()["data"] == "msg3"
+    subscription.r.xack.assert_called_once_with(
+        "new_flow_stream", "Flow Alerts", "1-0", "2-0"
+    )
+
+
+def test_unacked_msgs_are_read_first():
+    subscription = create_subscription(
+        [
+            [get_entry("1-0", "pending")],
+            [],
+            [get_entry("2-0", "new")],
+        ]
+    )
+    assert subscription.get_message()["data"] == "pending"
+    assert subscription.get_message() is None
+    assert subscription.get_message()["data"] == "new"
+    ids = [
+        call.args[2]["new_flow_stream"]
+        for call in subscription.r.xreadgroup.call_args_list
+    ]
+    assert ids == ["0", "0", ">"]
+
+
+def test_trimmed_msgs_are_skipped():
+    subscription = create_subscription(
+        [[("1-0", None), get_entry("2-0", "msg2")]]
+    )
+    assert subscription.get_message()["data"] == "msg2"
+    assert subscription.to_ack == ["1-0", "2-0"]
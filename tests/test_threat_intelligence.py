@@ -1724,3 +1724,72 @@ def test_read_configuration(mocker):
         )
         MockConfigParser.return_value.local_ti_data_path.assert_called_once()
         os.mkdir.assert_called_once_with("/tmp/slips/local_ti_files")
+
+
+def test_lookups_are_deferred_until_ti_is_ready(mocker):
+    threatintel = ModuleFactory().create_threatintel_obj()
+    threatintel.wait_for_ti = True
+    threatintel.db.is_ti_ready.return_value = False
+    threatintel.db.get_disabled_modules.return_value = []
+    mock_handle_lookup = mocker.patch.object(threatintel, "handle_lookup")
+    lookup = {"to_lookup": "1.2.3.4", "ip_state": "dstip"}
+
+    def get_msg(channel):
+        if channel == "give_threat_intelligence":
+            return {"data": json.dumps(lookup)}
+
+    mocker.patch.object(threatintel, "get_msg", side_effect=get_msg)
+    threatintel.main()
+    mock_handle_lookup.assert_not_called()
+    assert list(threatintel.deferred_lookups) == [lookup]
+
+    mocker.patch.object(
+        threatintel,
+        "get_msg",
+        side_effect=lambda channel: channel == "ti_ready" or None,
+    )
+    threatintel.main()
+    mock_handle_lookup.assert_called_once_with(lookup)
+    assert not threatintel.deferred_lookups
+
+
+@pytest.mark.parametrize(
+    "is_ti_ready, disabled_modules, seconds_since_start, expected",
+    [
+        # testcase1: the update manager is done
+        (True, [], 0, True),
+        # testcase2: the update manager is disabled
+        (False, ["update_manager"], 0, True),
+        # testcase3: the update manager is still loading the feeds
+        (False, [], 0, False),
+        # testcase4: waited too long for the feeds
+        (False, [], 30 * 60, True),
+    ],
+)
+def test_is_ti_ready(
+    is_ti_ready, disabled_modules, seconds_since_start, expected
+):
+    threatintel = ModuleFactory().create_threatintel_obj()
+    threatintel.db.is_ti_ready.return_value = is_ti_ready
+    threatintel.db.get_disabled_modules.return_value = disabled_modules
+    threatintel.start_time -= seconds_since_start
+    assert threatintel.is_ti_ready() == expected
+
+
+def test_deferred_lookups_are_evaluated_on_shutdown(mocker):
+    threatintel = ModuleFactory().create_threatintel_obj()
+    mock_handle_lookup = mocker.patch.object(threatintel, "handle_lookup")
+    threatintel.defer_lookup({"to_lookup": "1.1.1.1"})
+    threatintel.shutdown_gracefully()
+    mock_handle_lookup.assert_called_once_with({"to_lookup": "1.1.1.1"})
+    assert not threatintel.deferred_lookups
+
+
+def test_deferred_lookups_are_bounded(mocker):
+    threatintel = ModuleFactory().create_threatintel_obj()
+    threatintel.max_deferred_lookups = 2
+    mock_handle_lookup = mocker.patch.object(threatintel, "handle_lookup")
+    for i in range(3):
+        threatintel.defer_lookup({"to_lookup": f"1.1.1.{i}"})
+    mock_handle_lookup.assert_called_once_with({"to_lookup": "1.1.1.0"})
+    assert len(threatintel.deferred_lookups) == 2
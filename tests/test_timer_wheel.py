@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/common/data_structures/timer_wheel.py"""
+from unittest.mock import Mock
+
+import pytest
+
+from slips_files.common.data_structures.timer_wheel import TimerWheel
+
+
+@pytest.mark.parametrize(
+    "delay, advance_to, expected_due",
+    [
+        # Testcase 1: not due yet
+        (15, 1010, 0),
+        # Testcase 2: due
+        (15, 1016, 1),
+        # Testcase 3: due more than a round of the wheel later
+        (100, 1050, 0),
+        (100, 1101, 1),
+    ],
+)
+def test_advance(delay, advance_to, expected_due):
+    wheel = TimerWheel(resolution=1, number_of_slots=64)
+    func = Mock()
+    wheel.schedule("key", delay, func, "arg", now=1000)
+
+    due = wheel.advance(now=advance_to)
+
+    assert due == [(func, ("arg",))] * expected_due
+    assert len(wheel) == 1 - expected_due
+
+
+def test_timers_are_never_missed():
+    wheel = TimerWheel(resolution=1, number_of_slots=8)
+    func = Mock()
+    for i in range(20):
+        wheel.schedule(i, i * 0.7, func, i, now=1000.5)
+
+    fired = []
+    now = 1000.5
+    while now < 1020:
+        now += 0.3
+        fired.extend(args[0] for _, args in wheel.advance(now=now))
+
+    assert sorted(fired) == list(range(20))
+    assert not wheel
+
+
+def test_schedule_deduplicates_pending_keys():
+    wheel = TimerWheel()
+    assert wheel.schedule("1.1.1.1", 15, Mock(), now=1000)
+    assert not wheel.schedule("1.1.1.1", 15, Mock(), now=1001)
+    assert wheel.get_stats()["deduplicated"] == 1
+
+    wheel.advance(now=1020)
+    # not pending anymore
+    assert wheel.schedule("1.1.1.1", 15, Mock(), now=1020)
+
+
+def test_pop_all():
+    wheel = TimerWheel()
+    first, second = Mock(), Mock()
+    wheel.schedule("b", 20, second, now=1000)
+    wheel.schedule("a", 10, first, now=1000)
+
+    assert wheel.pop_all() == [(first, ()), (second, ())]
+    assert wheel.get_stats()["pending"] == 0
@@ -0,0 +1,56 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for slips_files/common/data_structures/top_k_counter.py"""
+from slips_files.common.data_structures.top_k_counter import TopKCounter
+
+
+def test_add():
+    counter = TopKCounter()
+    counter.add("8.8.8.8", 10, "uid1", 1)
+    counter.add("8.8.8.8", 20, "uid2", 2)
+    assert counter.get("8.8.8.8") == (30, ["uid1", "uid2"], 2, 0)
+    assert counter.get("1.1.1.1") is None
+
+
+def test_smallest_key_is_replaced_and_its_total_inherited():
+    counter = TopKCounter(k=2)
+    counter.add("a", 10)
+    counter.add("b", 20)
+    counter.add("c", 5, "uid1")
+    assert "a" not in counter
+    assert len(counter) == 2
+    assert counter.get("c") == (15, ["uid1"], None, 10)
+    assert counter.overflow == {"total": 10, "keys": 1}
+
+
+def test_smallest_key_is_found_after_its_total_grows():
+    counter = TopKCounter(k=3)
+    counter.add("a", 10)
+    counter.add("b", 20)
+    counter.add("c", 30)
+    # a is no longer the smallest one
+    counter.add("a", 100)
+    counter.add("d", 1)
+    assert "b" not in counter
+    assert counter.get("d") == (21, [], None, 20)
+    assert counter.get("a") == (110, [], None, 0)
+
+
+def test_key_added_after_the_counter_is_full_is_counted():
+    counter = TopKCounter(k=1000)
+    for i in range(1000):
+        counter.add(f"10.0.0.{i}", 100)
+    # an upload split into flows that are smaller than all the totals
+    for i in range(500):
+        counter.add("1.2.3.4", 50, f"uid{i}")
+    total, uids, _, error = counter.get("1.2.3.4")
+    assert total - error == 500 * 50
+    assert len(uids) == counter.max_ids_per_key
+    assert len(counter) == 1000
+
+
+def test_ids_per_key_are_capped():
+    counter = TopKCounter(max_ids_per_key=2)
+    for i in range(5):
+        counter.add("a", 1, f"uid{i}")
+    assert counter.get("a") == (5, ["uid0", "uid1"], None, 0)
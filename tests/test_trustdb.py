@@ -4,11 +4,11 @@ import pytest
 from unittest.mock import (
     patch,
     call,
-    MagicMock,
     Mock,
 )
 from tests.module_factory import ModuleFactory
 import datetime
+import sqlite3
 import time
 
 
@@ -257,7 +257,7 @@ def test_insert_go_ip_pairing(peerid, ip, timestamp, expected_params):
         "update_time) VALUES (?, ?, ?);",
         expected_params,
     )
-    trust_db.conn.commit.assert_called_once()
+    assert trust_db.pending_writes == 1
 
 
 @pytest.mark.parametrize(
@@ -287,7 +287,7 @@ def test_insert_slips_score(
             "update_time) VALUES (?, ?, ?, ?);",
             expected_params,
         )
-        trust_db.conn.commit.assert_called_once()
+        assert trust_db.pending_writes == 1
 
 
 @pytest.mark.parametrize(
@@ -320,7 +320,7 @@ def test_insert_go_reliability(
             "update_time) VALUES (?, ?, ?);",
             expected_params,
         )
-        trust_db.conn.commit.assert_called_once()
+        assert trust_db.pending_writes == 1
 
 
 @pytest.mark.parametrize(
@@ -453,7 +453,7 @@ def test_insert_new_go_report(
         assert actual_params[:-1] == expected_params[:-1]
         assert isinstance(actual_params[-1], (float, int))
         assert abs(actual_params[-1] - expected_params[-1]) < 0.001
-        trust_db.conn.commit.assert_called_once()
+        assert trust_db.pending_writes == 1
 
 
 @pytest.mark.parametrize(
@@ -563,39 +563,86 @@ def test_get_reporter_ip(
     assert ip == expected_ip
 
 
+def create_sqlite_trust_db():
+    trust_db = ModuleFactory().create_trust_db_obj()
+    trust_db.conn = sqlite3.connect(":memory:")
+    trust_db.create_tables()
+    return trust_db
+
+
+def test_get_opinion_on_ip():
+    trust_db = create_sqlite_trust_db()
+    # reporter_1 is at 192.168.1.2 with a reliability of 0.7
+    trust_db.insert_go_ip_pairing("reporter_1", "192.168.1.2", 100)
+    trust_db.insert_go_reliability("reporter_1", 0.5, 100)
+    trust_db.insert_go_reliability("reporter_1", 0.7, 200)
+    trust_db.insert_slips_score("192.168.1.2", 0.6, 0.9, 100)
+    # reporter_2 was at the reported ip when it reported it
+    trust_db.insert_go_ip_pairing("reporter_2", "192.168.1.1", 100)
+    trust_db.insert_go_reliability("reporter_2", 0.8, 100)
+    trust_db.insert_slips_score("192.168.1.1", 0.4, 0.7, 100)
+    # reporter_3 has no known reputation
+    trust_db.insert_go_ip_pairing("reporter_3", "192.168.1.4", 100)
+    trust_db.insert_go_reliability("reporter_3", 0.9, 100)
+    trust_db.insert_new_go_data(
+        [
+            ("reporter_1", "ip", "192.168.1.1", 0.5, 0.8, 300),
+            ("reporter_1", "ip", "192.168.1.9", 0.1, 0.1, 300),
+            ("reporter_2", "ip", "192.168.1.1", 0.3, 0.6, 300),
+            ("reporter_3", "ip", "192.168.1.1", 0.2, 0.2, 300),
+        ]
+    )
+
+    assert trust_db.get_opinion_on_ip("192.168.1.1") == [
+        (0.5, 0.8, 0.7, 0.6, 0.9)
+    ]
+    assert trust_db.get_opinion_on_ip("192.168.1.5") == []
+
+
+def test_get_opinion_on_ip_uses_the_reporter_ip_at_report_time():
+    trust_db = create_sqlite_trust_db()
+    trust_db.insert_go_ip_pairing("reporter_1", "192.168.1.2", 100)
+    trust_db.insert_go_ip_pairing("reporter_1", "192.168.1.3", 400)
+    trust_db.insert_go_reliability("reporter_1", 0.7, 100)
+    trust_db.insert_slips_score("192.168.1.2", 0.6, 0.9, 100)
+    trust_db.insert_slips_score("192.168.1.3", 0.1, 0.1, 100)
+    trust_db.insert_new_go_data(
+        [("reporter_1", "ip", "192.168.1.1", 0.5, 0.8, 300)]
+    )
+    assert trust_db.get_opinion_on_ip("192.168.1.1") == [
+        (0.5, 0.8, 0.7, 0.6, 0.9)
+    ]
+
+
 @pytest.mark.parametrize(
-    "ipaddress, reports, expected_result",
+    "pending_writes, new_writes, seconds_since_commit, should_commit",
     [
-        # Testcase 1: No reports for the IP
-        ("192.168.1.1", [], []),
-        # Testcase 2: One report with valid reporter data
-        (
-            "192.168.1.1",
-            [("reporter_1", 1678886400, 0.5, 0.8, "192.168.1.1")],
-            [(0.5, 0.8, 0.7, 0.6, 0.9)],
-        ),
-        # Testcase 3: Multiple reports with valid reporter data
-        (
-            "192.168.1.1",
-            [
-                ("reporter_1", 1678886400, 0.5, 0.8, "192.168.1.1"),
-                ("reporter_2", 1678886500, 0.3, 0.6, "192.168.1.1"),
-            ],
-            [(0.5, 0.8, 0.7, 0.6, 0.9), (0.3, 0.6, 0.8, 0.4, 0.7)],
-        ),
+        # Testcase 1: nothing to commit
+        (0, 0, 10, False),
+        # Testcase 2: the batch is full
+        (99, 1, 0, True),
+        # Testcase 3: the writes have been pending for too long
+        (1, 0, 10, True),
+        # Testcase 4: a burst that isn't over yet
+        (5, 1, 0, False),
     ],
 )
-def test_get_opinion_on_ip(ipaddress, reports, expected_result):
+def test_commit_if_due(
+    pending_writes, new_writes, seconds_since_commit, should_commit
+):
     trust_db = ModuleFactory().create_trust_db_obj()
+    trust_db.pending_writes = pending_writes
+    trust_db.last_commit_time = time.time() - seconds_since_commit
+    trust_db.commit_if_due(new_writes)
+    assert trust_db.conn.commit.called == should_commit
+    if should_commit:
+        assert trust_db.pending_writes == 0
 
-    trust_db.get_reports_for_ip = MagicMock(return_value=reports)
-    trust_db.get_reporter_ip = MagicMock(
-        side_effect=["192.168.1.2", "192.168.1.3", "192.168.1.2"]
-    )
-    trust_db.get_reporter_reliability = MagicMock(side_effect=[0.7, 0.8, 0.7])
-    trust_db.get_reporter_reputation = MagicMock(
-        side_effect=[(0.6, 0.9), (0.4, 0.7), (0.6, 0.9)]
-    )
 
-    result = trust_db.get_opinion_on_ip(ipaddress)
-    assert result == expected_result
+def test_close_commits_and_closes_only_once():
+    trust_db = ModuleFactory().create_trust_db_obj()
+    trust_db.close()
+    # e.g. when the garbage collector deletes the closed db
+    trust_db.__del__()
+    trust_db.conn.commit.assert_called_once()
+    trust_db.conn.close.assert_called_once()
@@ -2,7 +2,12 @@
 # SPDX-License-Identifier: GPL-2.0-only
 """Unit test for modules/update_manager/update_manager.py"""
 
+from modules.update_manager.feed_fetcher import (
+    FeedFetcher,
+    FetchResult,
+)
 from tests.module_factory import ModuleFactory
+import asyncio
 import json
 import requests
 import pytest
@@ -615,25 +620,53 @@ def test_parse_ti_feed_valid_data(
         result = update_manager.parse_ti_feed(
             "https://example.com/test.txt", "test.txt"
         )
-    update_manager.db.add_ips_to_ioc.assert_any_call(
-        {
+    update_manager.db.start_feed_update.assert_called_once_with("test.txt")
+    update_manager.db.add_feed_iocs.assert_called_once_with(
+        "test.txt",
+        ips={
             "1.2.3.4": '{"description": "Test description", '
             '"source": "test.txt", '
             '"threat_level": "low", '
             '"tags": ["tag3"]}'
-        }
-    )
-    update_manager.db.add_domains_to_ioc.assert_any_call(
-        {
+        },
+        domains={
             "example.com": '{"description": "Another description",'
             ' "source": "test.txt",'
             ' "threat_level": "low", '
             '"tags": ["tag3"]}'
-        }
+        },
+        ip_ranges={},
     )
+    update_manager.db.finish_feed_update.assert_called_once_with("test.txt")
     assert result is True
 
 
+@patch("os.path.getsize", return_value=10)
+def test_parse_ti_feed_in_chunks(mocker):
+    update_manager = ModuleFactory().create_update_manager_obj()
+    update_manager.ti_feed_chunk_size = 1
+    update_manager.db.add_feed_iocs.return_value = {"added": 1, "changed": 0}
+    update_manager.url_feeds = {
+        "https://example.com/test.txt": {
+            "threat_level": "low",
+            "tags": ["tag3"],
+        }
+    }
+    test_data = """# Comment
+    1.2.3.4,Test description
+    example.com,Another description"""
+    with patch("builtins.open", mock_open(read_data=test_data)):
+        update_manager.parse_ti_feed(
+            "https://example.com/test.txt", "test.txt"
+        )
+    # one call per ioc and a last one with the remaining iocs
+    assert update_manager.db.add_feed_iocs.call_count == 3
+    first_chunk = update_manager.db.add_feed_iocs.call_args_list[0]
+    assert list(first_chunk.kwargs["ips"]) == ["1.2.3.4"]
+    assert update_manager.feed_update_counts["added"] == 3
+    update_manager.db.finish_feed_update.assert_called_once_with("test.txt")
+
+
 def test_parse_ti_feed_invalid_data(mocker, tmp_path):
     """Test parse_ti_feed with invalid data."""
     update_manager = ModuleFactory().create_update_manager_obj()
@@ -823,3 +856,87 @@ def test_parse_ssl_feed_no_valid_fingerprints(mocker, tmp_path):
 
     update_manager.db.add_ssl_sha1_to_ioc.assert_not_called()
     assert result is False
+
+
+@pytest.mark.parametrize(
+    "status, e_tag, cached_e_tag, expected_result",
+    [
+        # Testcase1: the server says the feed didn't change
+        (FeedFetcher.NOT_MODIFIED, None, "1234", False),
+        # Testcase2: the server ignored the conditional request
+        (FeedFetcher.MODIFIED, "1234", "1234", False),
+        # Testcase3: new version of the feed
+        (FeedFetcher.MODIFIED, "5678", "1234", True),
+        # Testcase4: download failed
+        (FeedFetcher.FAILED, None, "1234", False),
+    ],
+)
+def test_is_new_feed_version(
+    tmp_path, status, e_tag, cached_e_tag, expected_result
+):
+    update_manager = ModuleFactory().create_update_manager_obj()
+    update_manager.mark_feed_as_updated = Mock()
+    update_manager.db.get_ti_feed_info.return_value = {"e-tag": cached_e_tag}
+    path = tmp_path / "feed.txt"
+    path.write_text("1.2.3.4")
+    fetched = FetchResult(
+        url="https://example.com/feed.txt",
+        path=str(path),
+        status=status,
+        e_tag=e_tag,
+    )
+    assert update_manager.is_new_feed_version(fetched) is expected_result
+    if status != FeedFetcher.FAILED and not expected_result:
+        update_manager.mark_feed_as_updated.assert_called_once_with(
+            "https://example.com/feed.txt"
+        )
+
+
+async def test_update_parses_all_changed_feeds():
+    update_manager = ModuleFactory().create_update_manager_obj()
+    update_manager.update_period = 86400
+    update_manager.url_feeds = {
+        "https://a.com/1.txt": {},
+        "https://a.com/2.txt": {},
+        "https://b.com/3.txt": {},
+    }
+    update_manager.ja3_feeds = {}
+    update_manager.ssl_feeds = {}
+    update_manager.should_update_mac_db = Mock(return_value=False)
+    update_manager.should_update_online_whitelist = Mock(return_value=False)
+    update_manager.should_update = Mock(return_value=False)
+    update_manager.delete_unused_cached_remote_feeds = Mock()
+    update_manager.did_update_period_pass = Mock(return_value=True)
+
+    async def fetch_feed(fetcher, feed):
+        return FetchResult(
+            url=feed, path=feed, status=FeedFetcher.MODIFIED, e_tag="new"
+        )
+
+    update_manager.fetch_feed = fetch_feed
+    update_manager.is_new_feed_version = Mock(return_value=True)
+    update_manager.update_ti_file = Mock(
+        side_effect=lambda fetched: asyncio.sleep(0)
+    )
+    await update_manager.update()
+    parsed = {
+        call.args[0].url
+        for call in update_manager.update_ti_file.call_args_list
+    }
+    assert parsed == set(update_manager.url_feeds)
+
+
+@pytest.mark.parametrize("update_error", [None, ValueError("bad feed")])
+async def test_update_ti_files_signals_ti_ready(update_error):
+    update_manager = ModuleFactory().create_update_manager_obj()
+
+    async def update():
+        if update_error:
+            raise update_error
+
+    update_manager.update = update
+    try:
+        await update_manager.update_ti_files()
+    except ValueError:
+        pass
+    update_manager.db.set_ti_ready.assert_called_once()
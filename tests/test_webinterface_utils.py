@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
+# SPDX-License-Identifier: GPL-2.0-only
+"""Unit test for webinterface/utils.py"""
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from slips_files.core.database.sqlite_db.database import SQLiteDB
+from webinterface.utils import (
+    MAX_PAGE_LENGTH,
+    get_etag,
+    get_page_params,
+    paginate,
+)
+
+ROWS = [
+    {"ip": "10.0.0.2", "port": 443},
+    {"ip": "10.0.0.1", "port": 80},
+    {"ip": "8.8.8.8", "port": 53},
+]
+
+
+def test_get_page_params_without_params():
+    params = get_page_params({})
+    assert params["length"] is None
+    assert params["start"] == 0
+    assert params["search"] == ""
+    assert params["sort"] is None
+    assert params["draw"] is None
+
+
+@pytest.mark.parametrize(
+    "length, expected_length",
+    [
+        ("10", 10),
+        # datatables sends -1 to show all rows
+        ("-1", MAX_PAGE_LENGTH),
+        (str(MAX_PAGE_LENGTH + 1), MAX_PAGE_LENGTH),
+        ("invalid", None),
+    ],
+)
+def test_get_page_params_length(length, expected_length):
+    assert get_page_params({"length": length})["length"] == expected_length
+
+
+def test_get_page_params_datatables():
+    params = get_page_params(
+        {
+            "draw": "3",
+            "start": "20",
+            "length": "10",
+            "search[value]": "10.0",
+            "order[0][column]": "1",
+            "order[0][dir]": "desc",
+            "columns[0][data]": "ip",
+            "columns[1][data]": "port",
+            "columns[1][search][value]": "80",
+        }
+    )
+    assert params == {
+        "draw": 3,
+        "start": 20,
+        "length": 10,
+        "search": "10.0",
+        "sort": "port",
+        "descending": True,
+        "filters": {"port": "80"},
+    }
+
+
+def test_paginate_returns_everything_without_params():
+    page = paginate(ROWS, get_page_params({}))
+    assert page == {
+        "data": ROWS,
+        "recordsTotal": 3,
+        "recordsFiltered": 3,
+    }
+
+
+def test_paginate_sorts_numerically_and_slices():
+    params = get_page_params({"sort": "port", "start": "1", "length": "1"})
+    page = paginate(ROWS, params)
+    assert page["data"] == [{"ip": "10.0.0.1", "port": 80}]
+    assert page["recordsFiltered"] == 3
+
+
+def test_paginate_search():
+    page = paginate(ROWS, get_page_params({"search": "10.0.0", "draw": "1"}))
+    assert page["recordsTotal"] == 3
+    assert page["recordsFiltered"] == 2
+    assert page["draw"] == 1
+
+
+def test_get_etag():
+    assert get_etag("profile", "tw1") == get_etag("profile", "tw1")
+    assert get_etag("profile", "tw1") != get_etag("profile", "tw2")
+
+
+@pytest.fixture
+def flows_db(tmp_path):
+    sqlite = SQLiteDB(Mock(), str(tmp_path))
+    flows = {
+        "uid1": {"saddr": "10.0.0.1", "proto": "tcp", "dport": 80},
+        "uid2": {"saddr": "10.0.0.2", "proto": "udp", "dport": 53},
+        "uid3": {"saddr": "10.0.0.3", "proto": "TCP", "dport": 50},
+    }
+    for uid, flow in flows.items():
+        sqlite.execute(
+            "INSERT INTO flows (uid, flow, profileid, twid) "
+            "VALUES (?, ?, ?, ?)",
+            (uid, json.dumps(flow), "profile_10.0.0.1", "timewindow1"),
+        )
+    return sqlite
+
+
+@pytest.mark.parametrize(
+    "search, expected_uids",
+    [
+        # the keys of the flows aren't searched
+        ("saddr", []),
+        ("10.0.0.2", ["uid2"]),
+        ("tcp", ["uid1", "uid3"]),
+        # wildcards are matched literally
+        ("%", []),
+        ("10.0.0._", []),
+    ],
+)
+def test_get_flows_page_search(flows_db, search, expected_uids):
+    total, matching, flows = flows_db.get_flows_page_in_profileid_twid(
+        "profile_10.0.0.1", "timewindow1", search=search
+    )
+    assert total == 3
+    assert matching == len(expected_uids)
+    assert sorted(flows) == expected_uids
+
+
+def test_get_flows_page_filters(flows_db):
+    total, matching, flows = flows_db.get_flows_page_in_profileid_twid(
+        "profile_10.0.0.1",
+        "timewindow1",
+        filters={"proto": "tcp", "dport": "80"},
+    )
+    assert total == 3
+    assert matching == 1
+    assert list(flows) == ["uid1"]
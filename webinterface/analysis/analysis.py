@@ -1,11 +1,27 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
 from flask import Blueprint
-from flask import render_template
+from flask import (
+    make_response,
+    render_template,
+    request,
+)
 import json
+import re
 from collections import defaultdict
-from typing import Dict, List
+from functools import wraps
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
 from ..database.database import db
+from ..utils import (
+    get_etag,
+    get_page,
+    get_page_params,
+    paginate,
+)
 from slips_files.common.slips_utils import utils
 
 analysis = Blueprint(
@@ -42,11 +58,11 @@ def get_all_tw_with_ts(profileid):
     return dict_tws
 
 
-def get_ip_info(ip):
+def format_ip_info(ip_info: Optional[dict]) -> dict:
     """
-    Retrieve IP information from database
-    :param ip: active IP
-    :return: all data about the IP in database
+    Formats the info of an IP stored in the database for displaying
+    :param ip_info: the info of the IP in the database
+    :return: the geocountry, asn, TI and VT info of the IP
     """
     data = {
         "geocountry": "-",
@@ -58,7 +74,7 @@ def get_ip_info(ip):
         "ref_file": "-",
         "com_file": "-",
     }
-    if ip_info := db.get_ip_info(ip):
+    if ip_info:
         # Hardcoded decapsulation due to the complexity of data inside.
         # Ex: {"asn":{"asnorg": "CESNET", "timestamp": 0.001}}
         # set geocountry
@@ -111,6 +127,99 @@ def get_ip_info(ip):
     return data
 
 
+def get_ip_info(ip):
+    """
+    Retrieve IP information from database
+    :param ip: active IP
+    :return: all data about the IP in database
+    """
+    return format_ip_info(db.get_ip_info(ip))
+
+
+def add_ip_info(tuples: List[dict]):
+    """
+    adds the info of the IP of each of the given in/out tuples to it,
+    the info of all IPs is retrieved from the database at once
+    """
+    ips = {row["tuple"].split("-")[0] for row in tuples}
+    ips_info: Dict[str, Optional[dict]] = db.get_ips_info(ips)
+    for row in tuples:
+        ip = row["tuple"].split("-")[0]
+        row.update(format_ip_info(ips_info.get(ip)))
+
+
+def get_tuples_page(tuples: Optional[str]) -> dict:
+    """
+    returns the requested page of the given in/out tuples and the info
+    of their IPs
+    :param tuples: the tuples of a tw as stored in the database
+    """
+    params = get_page_params(request.args)
+    rows = []
+    if tuples:
+        rows = [
+            {"tuple": key, "string": value[0]}
+            for key, value in json.loads(tuples).items()
+        ]
+    # the info of the ips is only needed before paginating when
+    # searching or sorting by it
+    needs_ip_info = (
+        params["search"]
+        or params["filters"]
+        or params["sort"] not in (None, "tuple", "string")
+    )
+    if needs_ip_info:
+        add_ip_info(rows)
+    page = paginate(rows, params)
+    if not needs_ip_info:
+        add_ip_info(page["data"])
+    return page
+
+
+def is_tw_closed(profileid: str, twid: str) -> bool:
+    """
+    the data of a tw doesn't change once it's closed. a tw is closed
+    once the analysis ended, or once slips saw traffic after the end of
+    the tw, plus some time for the modules to finish setting evidence
+    """
+    if "analysis_end" in db.get_analysis_info():
+        return True
+    if db.get_tw_start_time(profileid, twid) is None:
+        return False
+    _, tw_end = db.get_tw_limits(profileid, twid)
+    grace_period = 300
+    return float(db.get_slips_internal_time()) > tw_end + grace_period
+
+
+def cache_if_tw_closed(route):
+    """
+    adds an etag to the responses of the given route if the tw it's
+    about is closed, so the browser doesn't download the same data
+    again
+    the route should receive the ip of the profile and the timewindow
+    """
+
+    @wraps(route)
+    def wrapper(ip, timewindow, *args, **kwargs):
+        if not is_tw_closed(f"profile_{ip}", timewindow):
+            return route(ip, timewindow, *args, **kwargs)
+
+        # the start time distinguishes the dbs of different runs that
+        # used the same port
+        etag = get_etag(db.get_slips_start_time(), request.full_path)
+        if etag in request.if_none_match:
+            response = make_response("", 304)
+        else:
+            response = make_response(route(ip, timewindow, *args, **kwargs))
+        response.set_etag(etag)
+        # the browser has to check if the etag changed before using the
+        # cached response
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return wrapper
+
+
 # ----------------------------------------
 #
 # ----------------------------------------
@@ -124,6 +233,8 @@ def set_profile_tws():
     """
     Set profiles and their timewindows into the tree.
     Blocked are highligted in red.
+    supports the pagination, filtering and sorting params of
+    get_page_params()
     """
     profiles_dict = {}
     # Fetch profiles
@@ -141,7 +252,7 @@ def set_profile_tws():
         {"profile": profile_ip, "blocked": blocked_state}
         for profile_ip, blocked_state in profiles_dict.items()
     ]
-    return {"data": data}
+    return paginate(data, get_page_params(request.args))
 
 
 @analysis.route("/info/<ip>")
@@ -170,13 +281,7 @@ def set_tws(ip):
     profileid = f"profile_{ip}"
     tws: Dict[str, dict] = get_all_tw_with_ts(profileid)
 
-    blocked_tws: List[str] = []
-    for tw_id, twid_details in tws.items():
-        is_blocked: bool = db.get_profileid_twid_alerts(profileid, tw_id)
-        if is_blocked:
-            blocked_tws.append(tw_id)
-
-    for tw in blocked_tws:
+    for tw in db.get_alerted_tws(profileid, list(tws)):
         tws[tw]["blocked"] = True
 
     data = [
@@ -187,10 +292,11 @@ def set_tws(ip):
         }
         for tw_key, tw_value in tws.items()
     ]
-    return {"data": data}
+    return paginate(data, get_page_params(request.args))
 
 
 @analysis.route("/intuples/<ip>/<timewindow>")
+@cache_if_tw_closed
 def set_intuples(ip, timewindow):
     """
     Set intuples of a chosen profile and timewindow.
@@ -198,22 +304,13 @@ def set_intuples(ip, timewindow):
     :param timewindow: active timewindow
     :return: (tuple, string, ip_info)
     """
-    data = []
     profileid = f"profile_{ip}"
-    if intuples := db.get_intuples_from_profile_tw(profileid, timewindow):
-        intuples = json.loads(intuples)
-        for key, value in intuples.items():
-            ip, port, protocol = key.split("-")
-            ip_info = get_ip_info(ip)
-
-            outtuple_dict = dict({"tuple": key, "string": value[0]})
-            outtuple_dict.update(ip_info)
-            data.append(outtuple_dict)
-
-    return {"data": data}
+    intuples = db.get_intuples_from_profile_tw(profileid, timewindow)
+    return get_tuples_page(intuples)
 
 
 @analysis.route("/outtuples/<ip>/<timewindow>")
+@cache_if_tw_closed
 def set_outtuples(ip, timewindow):
     """
     Set outtuples of a chosen profile and timewindow.
@@ -221,50 +318,59 @@ def set_outtuples(ip, timewindow):
     :param timewindow: active timewindow
     :return: (tuple, key, ip_info)
     """
-
-    data = []
     profileid = f"profile_{ip}"
-    if outtuples := db.get_outtuples_from_profile_tw(profileid, timewindow):
-        outtuples = json.loads(outtuples)
-        for key, value in outtuples.items():
-            ip, port, protocol = key.split("-")
-            ip_info = get_ip_info(ip)
-            outtuple_dict = dict({"tuple": key, "string": value[0]})
-            outtuple_dict.update(ip_info)
-            data.append(outtuple_dict)
-
-    return {"data": data}
+    outtuples = db.get_outtuples_from_profile_tw(profileid, timewindow)
+    return get_tuples_page(outtuples)
 
 
 @analysis.route("/timeline_flows/<ip>/<timewindow>")
+@cache_if_tw_closed
 def set_timeline_flows(ip, timewindow):
     """
     Set timeline flows of a chosen profile and timewindow.
+    the flows are paginated, searched and sorted by the sqlite db
     :return: list of timeline flows as set initially in database
     """
     data = []
     profileid = f"profile_{ip}"
-    if timeline_flows := db.get_all_flows_in_profileid_twid(
-        profileid, timewindow
-    ):
-        for key, value in timeline_flows.items():
-            value = json.loads(value)
+    params = get_page_params(request.args)
+    # the fields are used in json paths, only allow field names
+    sort = params["sort"]
+    if sort and not re.fullmatch(r"\w+", sort):
+        sort = None
+    filters = {
+        field: value
+        for field, value in params["filters"].items()
+        if re.fullmatch(r"\w+", field)
+    }
 
-            # convert timestamp to date
-            timestamp = value["ts"]
-            dt_obj = ts_to_date(timestamp, seconds=True)
-            value["ts"] = dt_obj
+    total, filtered, timeline_flows = db.get_flows_page_in_profileid_twid(
+        profileid,
+        timewindow,
+        offset=params["start"],
+        limit=-1 if params["length"] is None else params["length"],
+        search=params["search"],
+        sort_by=sort,
+        descending=params["descending"],
+        filters=filters,
+    )
+    for value in timeline_flows.values():
+        # convert timestamp to date
+        timestamp = value["ts"]
+        dt_obj = ts_to_date(timestamp, seconds=True)
+        value["ts"] = dt_obj
 
-            # limit duration decimals
-            duration = float(value["dur"])
-            value["dur"] = "{:.5f}".format(duration)
+        # limit duration decimals
+        duration = float(value["dur"])
+        value["dur"] = "{:.5f}".format(duration)
 
-            data.append(value)
+        data.append(value)
 
-    return {"data": data}
+    return get_page(data, total, filtered, params)
 
 
 @analysis.route("/timeline/<ip>/<timewindow>")
+@cache_if_tw_closed
 def set_timeline(
     ip,
     timewindow,
@@ -301,10 +407,11 @@ def set_timeline(
 
             data.append(flow)
 
-    return {"data": data}
+    return paginate(data, get_page_params(request.args))
 
 
 @analysis.route("/alerts/<ip>/<timewindow>")
+@cache_if_tw_closed
 def set_alerts(ip, timewindow):
     """
     Set alerts for chosen profile and timewindow
@@ -337,10 +444,11 @@ def set_alerts(ip, timewindow):
                     "evidence_count": evidence_count,
                 }
             )
-    return {"data": data}
+    return paginate(data, get_page_params(request.args))
 
 
 @analysis.route("/evidence/<ip>/<timewindow>/<alert_id>")
+@cache_if_tw_closed
 def set_evidence(ip, timewindow, alert_id: str):
     """
     Set evidence table for the pressed alert in chosen profile and timewindow
@@ -360,10 +468,11 @@ def set_evidence(ip, timewindow, alert_id: str):
                 profileid, timewindow, evidence_id
             )
             data.append(evidence)
-    return {"data": data}
+    return paginate(data, get_page_params(request.args))
 
 
 @analysis.route("/evidence/<ip>/<timewindow>/")
+@cache_if_tw_closed
 def set_evidence_general(ip: str, timewindow: str):
     """
     Set an analysis tag with general evidence
@@ -379,7 +488,7 @@ def set_evidence_general(ip: str, timewindow: str):
             evidence_details: str
             evidence_details: dict = json.loads(evidence_details)
             data.append(evidence_details)
-    return {"data": data}
+    return paginate(data, get_page_params(request.args))
 
 
 @analysis.route("/")
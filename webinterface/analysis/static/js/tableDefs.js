@@ -118,6 +118,12 @@ let analysisTableDefs = {
         buttons: ['colvis'],
         scrollX: true,
         searching: true,
+        // the flows are paginated, searched and sorted by the server
+        serverSide: true,
+        // don't request the flows before a timewindow is chosen
+        deferLoading: 0,
+        pageLength: 100,
+        lengthMenu: [10, 50, 100, 500, 1000],
         columns: [
             { data: 'ts' },
             { data: 'dur' },
@@ -175,11 +181,15 @@ let analysisTableDefs = {
 
     "profiles": {
         destroy: true,
-        dom: '<"top"f>rt',
+        dom: '<"top"f>rtp',
         scrollX: false,
         scrollY: "78vh", // hardcoded height to fit the page
         scrollCollapse: true,
-        paging: false,
+        // the profiles are paginated, searched and sorted by the server
+        serverSide: true,
+        paging: true,
+        pagingType: "simple",
+        pageLength: 500,
         info: false,
         ajax: '/analysis/profiles_tws',
         columns: [
@@ -1,8 +1,11 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
-from flask import Flask, render_template, redirect, url_for
+from flask import Flask, Response, render_template, redirect, url_for
 
 from slips_files.common.parsers.config_parser import ConfigParser
+from slips_files.common.performance_profilers.channel_metrics import (
+    to_prometheus_text,
+)
 from .database.database import db
 from .database.signals import message_sent
 from .analysis.analysis import analysis
@@ -62,6 +65,33 @@ def set_pcap_info():
     return info
 
 
+@app.route("/metrics")
+def get_channel_metrics():
+    """
+    returns the msgs received and processed by each module in each
+    channel, their backlog, processing time and publish-to-consume lag,
+    and how long the profiler waited for them, in the prometheus text format
+    """
+    return Response(
+        to_prometheus_text(
+            db.get_channel_metrics(),
+            db.get_msgs_published_at_runtime(),
+            db.get_backpressure_stats(),
+        ),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+@app.route("/metrics/json")
+def get_channel_metrics_json():
+    """same as /metrics but in json"""
+    return {
+        "published": db.get_msgs_published_at_runtime(),
+        "modules": db.get_channel_metrics(),
+        "backpressure": db.get_backpressure_stats(),
+    }
+
+
 if __name__ == "__main__":
     app.register_blueprint(analysis, url_prefix="/analysis")
     app.register_blueprint(general, url_prefix="/general")
@@ -1,11 +1,18 @@
 # SPDX-FileCopyrightText: 2021 Sebastian Garcia <sebastian.garcia@agents.fel.cvut.cz>
 # SPDX-License-Identifier: GPL-2.0-only
+import hashlib
 import os
 from typing import (
+    Any,
     Dict,
     List,
+    Mapping,
+    Optional,
 )
 
+# max number of rows returned in one page, even if more are requested
+MAX_PAGE_LENGTH = 1000
+
 
 def get_open_redis_ports_in_order() -> List[Dict[str, str]]:
     available_db = []
@@ -92,3 +99,123 @@ def get_open_redis_servers() -> Dict[int, dict]:
 
     except FileNotFoundError:
         return {}
+
+
+def _get_int(args: Mapping, key: str, default: Optional[int]):
+    try:
+        return int(args[key])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def get_page_params(args: Mapping) -> Dict[str, Any]:
+    """
+    reads the pagination, filtering and sorting params of a request.
+    supports the params sent by datatables in server side mode
+    (draw, start, length, search[value], order[0][column],
+    order[0][dir], columns[i][data] and columns[i][search][value]),
+    and the simpler start, length, search, sort and dir.
+    :param args: the query params of the request
+    :return: the params. length is None if the whole dataset was
+    requested, for compatibility with the clients that don't paginate
+    """
+    length = _get_int(args, "length", None)
+    if length is not None and (length <= 0 or length > MAX_PAGE_LENGTH):
+        # datatables sends -1 when the user chooses to show all rows
+        length = MAX_PAGE_LENGTH
+
+    sort = args.get("sort")
+    sort_column = _get_int(args, "order[0][column]", None)
+    if sort_column is not None:
+        sort = args.get(f"columns[{sort_column}][data]")
+    direction = args.get("order[0][dir]") or args.get("dir", "asc")
+
+    filters = {}
+    column = 0
+    while (name := args.get(f"columns[{column}][data]")) is not None:
+        if value := args.get(f"columns[{column}][search][value]"):
+            filters[name] = value
+        column += 1
+
+    return {
+        "draw": _get_int(args, "draw", None),
+        "start": max(_get_int(args, "start", 0), 0),
+        "length": length,
+        "search": args.get("search[value]") or args.get("search") or "",
+        "sort": sort or None,
+        "descending": direction.lower() == "desc",
+        "filters": filters,
+    }
+
+
+def _get_sort_key(value):
+    """sorts numbers numerically and everything else as text"""
+    if value is None:
+        return 2, ""
+    try:
+        return 0, float(value)
+    except (TypeError, ValueError):
+        return 1, str(value).lower()
+
+
+def matches_search(row, search: str) -> bool:
+    search = search.lower()
+    values = row.values() if isinstance(row, dict) else [row]
+    return any(search in str(value).lower() for value in values)
+
+
+def _get_field(row, field: str):
+    return row.get(field) if isinstance(row, dict) else None
+
+
+def paginate(rows: List[dict], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    filters, sorts and slices the given rows according to the given
+    params of get_page_params()
+    :return: the requested page in the format datatables expects
+    """
+    total = len(rows)
+    if params["search"]:
+        rows = [row for row in rows if matches_search(row, params["search"])]
+
+    for column, value in params["filters"].items():
+        rows = [
+            row
+            for row in rows
+            if str(_get_field(row, column)).lower() == value.lower()
+        ]
+
+    if params["sort"]:
+        rows = sorted(
+            rows,
+            key=lambda row: _get_sort_key(_get_field(row, params["sort"])),
+            reverse=params["descending"],
+        )
+
+    filtered = len(rows)
+    if params["length"] is not None:
+        start = params["start"]
+        rows = rows[start : start + params["length"]]
+
+    return get_page(rows, total, filtered, params)
+
+
+def get_page(
+    rows: List[dict], total: int, filtered: int, params: Dict[str, Any]
+) -> Dict[str, Any]:
+    page = {
+        "data": rows,
+        "recordsTotal": total,
+        "recordsFiltered": filtered,
+    }
+    if params["draw"] is not None:
+        page["draw"] = params["draw"]
+    return page
+
+
+def get_etag(*parts) -> str:
+    """returns a strong etag of the given parts"""
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=16
+    )
+    return digest.hexdigest()